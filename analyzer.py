@@ -13,8 +13,35 @@ TODO: Implement RequirementsAnalyzer class with methods:
 - extract_intents(message: str) -> List[Intent]
 """
 
+import asyncio # concurrent extraction and batch analysis
 from abc import ABC, abstractmethod # abstract base class for interface definition
-from typing import List, Dict, Any # typing for method signatures
+from collections import deque # in-order window of running batch tasks
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, List, Dict, Any, Optional, Tuple, Union # typing for method signatures
+
+from .classifier import classify_message # precompiled keyword categories
+from .context_window import ContextBudget, preview # token-bounded prompts and word-safe summaries
+from .dedup import DuplicateIndex # exact and near-duplicate collapsing of batch inputs
+from .llm import DegradedExtraction, LLMBackend # pluggable LLM extraction layer
+from .metrics import REGISTRY, stage_histogram # counters and per-stage latency histograms
+from .normalization import NormalizedMessage, normalize # one shared pre-pass per message
+from .scheduling import BULK, INTERACTIVE, PriorityScheduler, classify_lane # urgency-aware priority lanes
+from .tracing import TRACER # per-stage spans, no-ops unless tracing is configured
+from .validation import RequirementsValidator, get_default_validator # compiled completeness rules
+
+if TYPE_CHECKING:
+    from .cache import ResultCache
+    from .gazetteer import EntityExtractor
+    from .intent_index import IntentIndex
+
+# Bump whenever analysis output changes, so cached results are invalidated
+ANALYZER_VERSION = "0.4.0"
+# Summaries are the start of the context, cut after a whole word
+SUMMARY_CHARS = 200
+# Inputs per deduplication window of analyze_many; bounds the index and
+# the representative results kept for fan-out
+DEDUP_WINDOW = 1024
+# Stages yielded by RequirementsAnalyzer.analyze_stages, in order
+STAGES = ("classification", "intents", "entities", "validation")
 
 
 class IRequirementsAnalyzer(ABC):
@@ -49,6 +76,7 @@ class IRequirementsAnalyzer(ABC):
 
 # TODO: Implement concrete RequirementsAnalyzer class
 class Intent():
+    __slots__ = ("name", "confidence") # no per-instance __dict__, we hold millions of these
     def __init__(self, name: str, confidence: float):
         self.name = name
         self.confidence = confidence
@@ -56,15 +84,70 @@ class Intent():
         return self.name
     def return_confidence(self): # confidence is a float between 0 and 1 
         return self.confidence
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "confidence": self.confidence}
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Intent":
+        return cls(data["name"], data["confidence"])
+    def __repr__(self) -> str:
+        return f"Intent({self.name!r}, {self.confidence!r})"
     
 class Entity():
-    def __init__(self, name: str, confidence: float):
+    __slots__ = ("name", "confidence", "label") # no per-instance __dict__, we hold millions of these
+    def __init__(self, name: str, confidence: float, label: Optional[str] = None):
         self.name = name
         self.confidence = confidence
+        self.label = label # entity type ("location", "date", "time"), used by validation rules
     def return_entity(self):
         return self.name
     def return_confidence(self): # confidence is a float between 0 and 1 
         return self.confidence
+    def to_dict(self) -> Dict[str, Any]:
+        if self.label is None:
+            return {"name": self.name, "confidence": self.confidence}
+        return {"name": self.name, "confidence": self.confidence, "label": self.label}
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Entity":
+        return cls(data["name"], data["confidence"], data.get("label"))
+    def __repr__(self) -> str:
+        if self.label is None:
+            return f"Entity({self.name!r}, {self.confidence!r})"
+        return f"Entity({self.name!r}, {self.confidence!r}, {self.label!r})"
+
+
+def serialize_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn an analysis into plain JSON-ready data (Intent/Entity become dicts)"""
+    data = dict(analysis)
+    data["intents"] = [intent.to_dict() for intent in analysis.get("intents", [])]
+    data["entities"] = [entity.to_dict() for entity in analysis.get("entities", [])]
+    return data
+
+
+def analysis_result(conversation_id: str, analysis: Any) -> Dict[str, Any]:
+    """Task/API payload for one analysis, or for the exception that replaced it"""
+    if isinstance(analysis, Exception):
+        return {
+            'conversation_id': conversation_id,
+            'status': 'failed',
+            'error': type(analysis).__name__,
+            'error_message': str(analysis),
+            'requirements': {},
+            'confidence': 0.0,
+        }
+    return {
+        'conversation_id': conversation_id,
+        'status': 'success',
+        'requirements': serialize_analysis(analysis),
+        'confidence': analysis.get('confidence', 0.0),
+    }
+
+
+def deserialize_analysis(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Inverse of `serialize_analysis`"""
+    analysis = dict(data)
+    analysis["intents"] = [Intent.from_dict(item) for item in data.get("intents", [])]
+    analysis["entities"] = [Entity.from_dict(item) for item in data.get("entities", [])]
+    return analysis
     
     
 class RequirementsAnalyzer(IRequirementsAnalyzer):
@@ -72,54 +155,330 @@ class RequirementsAnalyzer(IRequirementsAnalyzer):
     
     This class intentionally returns deterministic placeholder structures
     to establish contracts and enable downstream wiring and tests.
+    Intent and entity extraction is delegated to an optional `LLMBackend`.
     """
 
-    async def analyze_requirements(self, conversation_context: str) -> Dict[str, Any]:
+    def __init__(
+        self,
+        backend: Optional[LLMBackend] = None,
+        cache: Optional["ResultCache"] = None,
+        validator: Optional[RequirementsValidator] = None,
+        intent_index: Optional["IntentIndex"] = None,
+        entity_extractor: Optional["EntityExtractor"] = None,
+        context_budget: Optional[ContextBudget] = None,
+        scheduler: Optional[PriorityScheduler] = None,
+    ):
+        """
+        Args:
+            backend: LLM extraction backend; without one, extraction returns
+                empty lists (see llm.get_default_backend for env-based setup)
+            cache: Optional result cache; repeated contexts skip extraction
+            validator: Compiled completeness rules, defaults to validation.DEFAULT_RULES
+            intent_index: Local intent matcher tried before the backend;
+                only messages it finds ambiguous go to the LLM
+            entity_extractor: Local gazetteer/pattern extractor tried before
+                the backend; only messages without local matches go to the LLM
+            context_budget: Token budget per backend call; longer contexts
+                are sent as a summary plus the newest turns (unbounded if None)
+            scheduler: Priority lanes for extraction slots; urgent messages
+                and interactive callers go ahead of bulk work (unbounded if None)
+        """
+        self.backend = backend
+        self.cache = cache
+        self.validator = validator or get_default_validator()
+        self.intent_index = intent_index
+        self.entity_extractor = entity_extractor
+        self.context_budget = context_budget
+        self.scheduler = scheduler
+        fast_path = 'requirements_intent_fast_path_total'
+        fast_path_help = 'Intent extractions answered by the local index (hit) or passed to the LLM (miss)'
+        self._fast_path_hits = REGISTRY.counter(fast_path, fast_path_help, {'result': 'hit'})
+        self._fast_path_misses = REGISTRY.counter(fast_path, fast_path_help, {'result': 'miss'})
+        entity_path = 'requirements_entity_fast_path_total'
+        entity_path_help = 'Entity extractions answered by the local gazetteer (hit) or passed to the LLM (miss)'
+        self._entity_hits = REGISTRY.counter(entity_path, entity_path_help, {'result': 'hit'})
+        self._entity_misses = REGISTRY.counter(entity_path, entity_path_help, {'result': 'miss'})
+        self._extraction_latency = stage_histogram(type(self).__name__, 'extraction')
+
+    async def analyze_requirements(self, conversation_context: str, lane: str = INTERACTIVE) -> Dict[str, Any]:
         """Produce a structured placeholder analysis.
         
         - Why: establish return shape for callers and tests.
-        - How: return empty intents/entities and a short summary slice.
+        - How: return empty intents/entities and a short summary slice,
+          served from the result cache when one is configured. With a
+          scheduler, extraction waits for a slot in `lane` (or the urgent
+          lane, when the message reads as urgent).
         """
-        summary_preview = conversation_context[:200] if conversation_context else ""
-        intents: List[Intent] = await self.extract_intents(conversation_context or "")
-        entities: List[Entity] = await self.extract_entities(conversation_context or "")
-        return {
+        with TRACER.span("analyze_requirements"):
+            if self.cache is not None:
+                with TRACER.span("cache.get_or_compute"):
+                    return await self.cache.get_or_compute(
+                        conversation_context or "",
+                        lambda: self._analyze_uncached(conversation_context, lane),
+                    )
+            return await self._analyze_uncached(conversation_context, lane)
+
+    async def _analyze_uncached(self, conversation_context: str, lane: str = INTERACTIVE) -> Dict[str, Any]:
+        """Run the full analysis without consulting the cache"""
+        # Normalized once; the summary and both extractors share it
+        with TRACER.span("normalize"):
+            normalized = normalize(conversation_context)
+            summary_preview = preview(normalized, SUMMARY_CHARS)
+        lane = await self._acquire_slot(normalized, lane)
+        try:
+            # Intents and entities are independent, so extract them concurrently
+            with self._extraction_latency.time():
+                intents, entities = await asyncio.gather(
+                    self.extract_intents(normalized),
+                    self.extract_entities(normalized),
+                )
+        finally:
+            if self.scheduler is not None:
+                self.scheduler.release(lane)
+        analysis = {
             "summary": summary_preview,
-            "intents": intents, # a class of Intents
-            "entities":  entities, # a class of Entities
+            "intents": list(intents), # a class of Intents
+            "entities": list(entities), # a class of Entities
             "confidence": 0.0,
         }
+        if isinstance(intents, DegradedExtraction) or isinstance(entities, DegradedExtraction):
+            # Answered without the provider (outage fallback): must not be cached
+            analysis["degraded"] = True
+        return analysis
+
+    async def analyze_many(
+        self,
+        contexts: Iterable[str],
+        max_concurrency: int = 16,
+        ordered: bool = True,
+        return_exceptions: bool = False,
+        deduplicate: bool = False,
+        lane: str = BULK,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """Analyze many conversation contexts concurrently.
+        
+        - Why: bulk callers (Celery workers, backfills) would otherwise await
+          one context at a time and leave the I/O latency budget idle.
+        - How: a semaphore keeps at most `max_concurrency` analyses running
+          and a bounded window of scheduled tasks keeps huge or lazy inputs
+          from being materialized up front. In ordered mode the window is
+          twice the concurrency so one slow head-of-line context does not
+          stall the workers behind it. Results are yielded as
+          `(index, analysis)` pairs, either in input order (`ordered=True`)
+          or as soon as each one completes. With `deduplicate`, exact and
+          near duplicates within a window of DEDUP_WINDOW inputs (see
+          dedup.py) await their representative's analysis instead of
+          running their own; they get its intents, entities and
+          confidence with their own summary. With a scheduler, the
+          analyses take slots in `lane`, behind urgent and interactive
+          callers, except for the messages that read as urgent.
+        
+        Args:
+            contexts: Conversation contexts to analyze, consumed lazily
+            max_concurrency: Upper bound on analyses in flight
+            ordered: Yield in input order instead of completion order
+            return_exceptions: Yield a failed context's exception as its
+                result instead of aborting the whole batch (as in gather)
+            deduplicate: Analyze one representative per duplicate cluster
+            lane: Scheduling lane of the batch (see scheduling.py)
+            
+        Returns:
+            Async iterator of `(index, analysis)` pairs
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        semaphore = asyncio.Semaphore(max_concurrency)
+        duplicates = self.duplicate_index() if deduplicate else None
+        # Window position of each representative -> its running task
+        representatives: Dict[int, asyncio.Future] = {}
+
+        async def run(index: int, context: str) -> Tuple[int, Any]:
+            async with semaphore:
+                try:
+                    return index, await self.analyze_requirements(context, lane)
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    return index, e
+
+        async def fan_out(index: int, normalized: NormalizedMessage, representative: asyncio.Future) -> Tuple[int, Any]:
+            _, analysis = await asyncio.shield(representative)
+            if isinstance(analysis, Exception):
+                return index, analysis
+            duplicate = dict(analysis)
+            duplicate["summary"] = preview(normalized, SUMMARY_CHARS)
+            duplicate["intents"] = list(analysis["intents"])
+            duplicate["entities"] = list(analysis["entities"])
+            return index, duplicate
+
+        def start(index: int, context: str) -> asyncio.Future:
+            if duplicates is None:
+                return asyncio.ensure_future(run(index, context))
+            if len(duplicates) >= DEDUP_WINDOW:
+                duplicates.clear()
+                representatives.clear()
+            normalized = normalize(context)
+            position, is_new = duplicates.add(normalized)
+            if not is_new:
+                return asyncio.ensure_future(fan_out(index, normalized, representatives[position]))
+            task = representatives[position] = asyncio.ensure_future(run(index, context))
+            return task
+
+        source = enumerate(contexts)
+        if ordered:
+            window: deque = deque()
+            try:
+                for index, context in source:
+                    window.append(start(index, context))
+                    if len(window) >= 2 * max_concurrency:
+                        yield await window.popleft()
+                while window:
+                    yield await window.popleft()
+            finally:
+                for task in window:
+                    task.cancel()
+            return
+
+        pending = set()
+        try:
+            for index, context in source:
+                pending.add(start(index, context))
+                if len(pending) >= max_concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def duplicate_index(self) -> DuplicateIndex:
+        """A new dedup index; entity names found locally must match between near duplicates"""
+        extractor = self.entity_extractor
+        if extractor is None:
+            return DuplicateIndex()
+        return DuplicateIndex(salient=lambda normalized: [span.name for span in extractor.extract(normalized)])
+
+    async def analyze_stages(self, conversation_context: str, lane: str = INTERACTIVE) -> AsyncIterator[Tuple[str, Any]]:
+        """Analyze one context and yield each stage as soon as it is ready.
+        
+        - Why: the keyword classification takes microseconds while LLM
+          extraction can take seconds; streaming callers (the SSE view)
+          should not wait for the slowest stage to show the first ones.
+        - How: normalize once, yield the classification and summary right
+          away, then run intent and entity extraction concurrently and
+          yield them (and the validation of both) in STAGES order. The
+          result cache is not consulted, since partial results are the point.
+        
+        Returns:
+            Async iterator of `(stage, payload)` pairs: 'classification'
+            (keyword categories plus 'summary'), 'intents' and 'entities'
+            (lists of Intent/Entity) and 'validation' (validator result)
+        """
+        # Spans must not stay open across a yield: the consumer runs in between
+        with TRACER.span("classify"):
+            normalized = normalize(conversation_context)
+            classification = classify_message(normalized)
+            classification["summary"] = preview(normalized, SUMMARY_CHARS)
+        yield "classification", classification
+        lane = await self._acquire_slot(normalized, lane)
+        intents_task = asyncio.ensure_future(self.extract_intents(normalized))
+        entities_task = asyncio.ensure_future(self.extract_entities(normalized))
+        try:
+            intents = await intents_task
+            yield "intents", intents
+            entities = await entities_task
+            yield "entities", entities
+            with TRACER.span("validate"):
+                validation = self.validator.validate({"intents": intents, "entities": entities})
+            yield "validation", validation
+        finally:
+            # A client that disconnects mid-stream must not leave extractions running
+            for task in (intents_task, entities_task):
+                task.cancel()
+            if self.scheduler is not None:
+                self.scheduler.release(lane)
+
+    async def _acquire_slot(self, normalized: NormalizedMessage, lane: str) -> str:
+        """Wait for an extraction slot when a scheduler is set; returns the lane taken"""
+        if self.scheduler is None:
+            return lane
+        lane = classify_lane(normalized, lane)
+        with TRACER.span("queue_wait", lane=lane):
+            await self.scheduler.acquire(lane)
+        return lane
 
     async def validate_completeness(self, requirements: Dict[str, Any]) -> Dict[str, Any]:
-        """Perform a trivial completeness check.
+        """Check requirements against the per-intent rules.
         
-        - Why: give immediate, predictable behavior until real rules exist.
-        - How: mark incomplete if no intents detected in provided requirements.
+        - Why: every detected intent needs certain entities before we can act on it.
+        - How: one pass over the precompiled rule table (see validation.py);
+          incomplete when no intent is confident enough or entities are missing.
         """
-        intents = requirements.get("intents") if isinstance(requirements, dict) else None
-        has_intents = bool(intents)
-        missing = [] if has_intents else ["intents"]
-        return {
-            "is_complete": has_intents,
-            "missing_items": missing,
-            "confidence": 0.0,
-        }
+        with TRACER.span("validate"):
+            return self.validator.validate(requirements)
+
+    def validate_batch(self, batch: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Validate many analyses at once, in order (synchronous, no I/O involved)"""
+        with TRACER.span("validate_batch"):
+            return self.validator.validate_batch(batch)
     
-    async def extract_intents(self, message: str) -> List[Intent]:
-        """Extract intents from a message (placeholder implementation).
+    async def extract_intents(self, message: Union[str, NormalizedMessage]) -> List[Intent]:
+        """Extract intents from a message.
         
         - Why: define method contract and enable callers to consume intents.
-        - How: return an empty list for now; to be replaced by LLM/NLP logic.
+        - How: answer from the local intent index when it is confident,
+          otherwise ask the configured LLM backend; empty list without one.
         """
-        return []
-    async def extract_entities(self, message: str) -> List[Entity]:
-        """Extract entities from a message (placeholder implementation).
+        with TRACER.span("extract_intents") as span:
+            normalized = normalize(message)
+            if normalized.is_blank:
+                return []
+            if self.intent_index is not None:
+                intents = self.intent_index.match(normalized)
+                if intents is not None:
+                    self._fast_path_hits.inc()
+                    span.set_attribute("path", "local")
+                    return intents
+                self._fast_path_misses.inc()
+            if self.backend is None:
+                return []
+            span.set_attribute("path", "llm")
+            extracted = await self.backend.extract('intents', self._prompt_text(normalized))
+            intents = [Intent(name, confidence) for name, confidence in extracted]
+            # Keep the fallback marker so the analysis is flagged degraded
+            return DegradedExtraction(intents) if isinstance(extracted, DegradedExtraction) else intents
+    async def extract_entities(self, message: Union[str, NormalizedMessage]) -> List[Entity]:
+        """Extract entities from a message.
         
         - Why: define method contract and enable callers to consume entities.
-        - How: return an empty list for now; to be replaced by LLM/NLP logic.
+        - How: take the local gazetteer and time/date matches when there are
+          any, otherwise ask the configured LLM backend; empty list without one.
         """
-        return []
-    
-    
-# TODO: Add Celery tasks for async requirements analysis
-# TODO: Add integration with OpenAI/Azure OpenAI for LLM processing
\ No newline at end of file
+        with TRACER.span("extract_entities") as span:
+            normalized = normalize(message)
+            if normalized.is_blank:
+                return []
+            if self.entity_extractor is not None:
+                entities = self.entity_extractor.entities(normalized)
+                if entities:
+                    self._entity_hits.inc()
+                    span.set_attribute("path", "local")
+                    return entities
+                self._entity_misses.inc()
+            if self.backend is None:
+                return []
+            span.set_attribute("path", "llm")
+            # items are (name, confidence) or (name, confidence, label)
+            extracted = await self.backend.extract('entities', self._prompt_text(normalized))
+            entities = [Entity(*item) for item in extracted]
+            return DegradedExtraction(entities) if isinstance(extracted, DegradedExtraction) else entities
+
+    def _prompt_text(self, normalized: NormalizedMessage) -> str:
+        """The text sent to the backend, fitted into the token budget when one is set"""
+        if self.context_budget is None:
+            return normalized.text
+        return self.context_budget.fit(normalized)
@@ -2,15 +2,40 @@
 Learning about error handling - making our code safe
 """
 
+import itertools
+
+from ..classifier import classify_message
+from ..metrics import REGISTRY, InstanceCounter, stage_histogram
+from ..normalization import normalize
+
 class SafeRequirmentsAnalyzer:
     # An analyzer that handles errors gracefully
     def __init__(self):
         self.name = "Safe Requirments Analyzer"
-        self.totalMessages_procceed = 0
-        self.succesfulAnalysis = 0
-        self.failedAnalysis = 0
+        # Thread-safe sharded counters (metrics.py): get_stats reads this
+        # instance's counts, the export sums every analyzer with this name
+        labels = {'analyzer': self.name}
+        self._processed = InstanceCounter(REGISTRY.counter('requirements_messages_total', 'Messages received by the analyzer', labels))
+        self._succeeded = InstanceCounter(REGISTRY.counter('requirements_analyses_succeeded_total', 'Successful analyses', labels))
+        self._failed = InstanceCounter(REGISTRY.counter('requirements_analyses_failed_total', 'Failed analyses', labels))
+        self._validation_latency = stage_histogram(self.name, 'validation')
+        self._classification_latency = stage_histogram(self.name, 'classification')
+        # itertools.count hands out unique numbers even when threads race
+        self._analysis_numbers = itertools.count(1)
         print(f"{self.name} initialized!")
 
+    @property
+    def totalMessages_procceed(self) -> int:
+        return int(self._processed.value())
+
+    @property
+    def succesfulAnalysis(self) -> int:
+        return int(self._succeeded.value())
+
+    @property
+    def failedAnalysis(self) -> int:
+        return int(self._failed.value())
+
     def analyze_message_safely(self, message: str) -> dict:
         """
         Analyze a message with proper error handling
@@ -22,87 +47,96 @@ class SafeRequirmentsAnalyzer:
             Analysis result or error information
         """
         # Updating every message
-        self.totalMessages_procceed += 1
+        self._processed.inc()
+        analysis_number = next(self._analysis_numbers)
 
         try:
-            # Check if the message is valid:
-            if message is None:
-                raise ValueError("The message cannot be None.")
-            # Check if data type is not string
-            if not isinstance(message, str):
-                raise ValueError("The message must be a string.")
-            # Check if there's no characters in messages
-            if message.strip() == "":
-                raise ValueError("The message cannot be empty or contain only whitespace.")
+            with self._validation_latency.time():
+                # Check if the message is valid:
+                if message is None:
+                    raise ValueError("The message cannot be None.")
+                # Check if data type is not string
+                if not isinstance(message, str):
+                    raise ValueError("The message must be a string.")
+                # Normalized once, every later step reuses it
+                normalized = normalize(message)
+                # Check if there's no characters in messages (bidi marks alone count as empty)
+                if normalized.is_blank:
+                    raise ValueError("The message cannot be empty or contain only whitespace.")
 
+            # One pass over the message labels every keyword category
+            with self._classification_latency.time():
+                classification = classify_message(normalized)
             # Retrieving result message
             result = {
                 'message': message,
-                'len_message': len(message),
-                'has_question': '?' in message,
-                'seems_urgent': any(word in message.lower() for word in ['urgent', 'immediately', 'asap', 'important', 'critical']),
-                'seems_polite': any(word in message.lower() for word in ['please', 'thank you', 'appreciate', 'grateful', 'excuse me', 'kindly']),
-                'analysis_number': self.totalMessages_procceed,
+                'len_message': normalized.char_count,
+                'has_question': normalized.has_question,
+                'seems_urgent': classification['urgent'],
+                'seems_polite': classification['polite'],
+                'analysis_number': analysis_number,
                 'status': 'success'
             }
             # Adding how many succesfull messages are being added
-            self.succesfulAnalysis += 1
+            self._succeeded.inc()
             print("Message analyzed successfully!")
             return result
 
         except ValueError as e:
               # Handle value errors (like empty message)
-            self.failedAnalysis += 1
+            self._failed.inc()
             error_result = {
                 'error': 'ValueError',
                 'error_message': str(e),
-                'analysis_number': self.totalMessages_procceed,
+                'analysis_number': analysis_number,
                 'status': 'failed'
             }
-            print(f"Analysis #{self.totalMessages_procceed}, Error: {e}")
+            print(f"Analysis #{analysis_number}, Error: {e}")
             return error_result
 
         except TypeError as e:
             # Handle type errors (like wrong data type)
-            self.failedAnalysis += 1
+            self._failed.inc()
             error_result = {
                 'error': 'TypeError',
                 'error_message': str(e),
-                'analysis_number': self.totalMessages_procceed,
+                'analysis_number': analysis_number,
                 'status': 'failed'
             }
-            print(f"Analysis #{self.totalMessages_procceed}, Error: {e}")
+            print(f"Analysis #{analysis_number}, Error: {e}")
             return error_result
 
         except Exception as e:
             # Handle any other unexpected errors
-            self.failedAnalysis += 1
+            self._failed.inc()
             error_result = {
                 'error': 'UnexpectedError',
                 'error_message': str(e),
-                'analysis_number': self.totalMessages_procceed,
+                'analysis_number': analysis_number,
                 'status': 'failed'
             }
-            print(f"Analysis #{self.totalMessages_procceed}, Error: {e}")
+            print(f"Analysis #{analysis_number}, Error: {e}")
             return error_result
     def get_stats(self) -> dict:
-        # getting all statistics of analyzer messages
+        # getting all statistics of analyzer messages (each counter read once)
+        total, succeeded, failed = self.totalMessages_procceed, self.succesfulAnalysis, self.failedAnalysis
         stats = {
-            'totalMessages_procceed': self.totalMessages_procceed,
-            'succesfulAnalysis': self.succesfulAnalysis,
-            'failedAnalysis': self.failedAnalysis,
-            'success_rate': self.succesfulAnalysis / self.totalMessages_procceed if self.totalMessages_procceed > 0 else 0
+            'totalMessages_procceed': total,
+            'succesfulAnalysis': succeeded,
+            'failedAnalysis': failed,
+            'success_rate': succeeded / total if total > 0 else 0
         }
         return stats
 
-print("🚀 Testing Safe Requirements Analyzer")
-print("=" * 50)
-    
-    
-analyzer = SafeRequirmentsAnalyzer()
-    
+
+if __name__ == "__main__":
+    print("🚀 Testing Safe Requirements Analyzer")
+    print("=" * 50)
+
+    analyzer = SafeRequirmentsAnalyzer()
+
     # Test with good and bad inputs
-test_inputs = [
+    test_inputs = [
         "Hello, this is a good message!",      # Good message
         "",                                     # Empty message
         None,                                   # None value
@@ -111,14 +145,14 @@ test_inputs = [
         "What time is the bus?",                # Good question
         [],                                     # Wrong type (list)
     ]
-    
-for i, test_input in enumerate(test_inputs):
-    print(f"\n--- Test {i+1}: {repr(test_input)} ---")
-    result = analyzer.analyze_message_safely(test_input)
-    print(f"Result: {result}")
-    
-# Show final statistics
-print(f"\n📊 Final Statistics:")
-stats = analyzer.get_stats()
-for key, value in stats.items():
-    print(f"  {key}: {value}")
\ No newline at end of file
+
+    for i, test_input in enumerate(test_inputs):
+        print(f"\n--- Test {i+1}: {repr(test_input)} ---")
+        result = analyzer.analyze_message_safely(test_input)
+        print(f"Result: {result}")
+
+    # Show final statistics
+    print(f"\n📊 Final Statistics:")
+    stats = analyzer.get_stats()
+    for key, value in stats.items():
+        print(f"  {key}: {value}")
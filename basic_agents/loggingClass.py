@@ -2,20 +2,21 @@
 Learning about logging - keeping track of what our code does
 """
 
+import itertools
 import logging
 from datetime import datetime
 from typing import Dict, Any
 
+from ..classifier import classify_message
+from ..logging_config import configure_logging, shutdown_logging
+from ..metrics import REGISTRY, InstanceCounter, render_prometheus, stage_histogram
+from ..normalization import normalize
+from ..tracing import TRACER
 
-# Step 1: Set up logging configuration
-logging.basicConfig(
-    level=logging.DEBUG,  # Show DEBUG level and above
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('requirements_analyzer.log', encoding='utf-8'),  # Save to file
-        logging.StreamHandler()  # Also show on screen
-    ]
-)
+
+# Step 1: Logging is configured by the application (see logging_config.py),
+# not at import time; messages use lazy %-style arguments so nothing is
+# formatted unless the level is enabled
 
 #defiing the analyzer class
 class LoggingRequirementsAnalyzer:
@@ -27,153 +28,182 @@ class LoggingRequirementsAnalyzer:
     self.logger = logging.getLogger(self.__class__.__name__)
     # defing rest varilbles of class
     self.name = "Logging Requirments Analyzer"
-    self.totalMessages_procceed = 0
-    self.succesfulAnalysis = 0
-    self.failedAnalysis = 0
+    # thread-safe sharded counters (metrics.py): the stats read this
+    # instance's counts, the Prometheus export sums every analyzer with this name
+    labels = {'analyzer': self.name}
+    self._processed = InstanceCounter(REGISTRY.counter('requirements_messages_total', 'Messages received by the analyzer', labels))
+    self._succeeded = InstanceCounter(REGISTRY.counter('requirements_analyses_succeeded_total', 'Successful analyses', labels))
+    self._failed = InstanceCounter(REGISTRY.counter('requirements_analyses_failed_total', 'Failed analyses', labels))
+    self._validation_latency = stage_histogram(self.name, 'validation')
+    self._classification_latency = stage_histogram(self.name, 'classification')
+    # itertools.count hands out unique ids even when threads race
+    self._analysis_ids = itertools.count(1)
     #date
     self.startDate = datetime.now()
     # Step 3 - Defining Important Logging
-    self.logger.info(f"Starting {self.name} at {self.startDate}")
+    self.logger.info("Starting %s at %s", self.name, self.startDate)
     self.logger.info("Ready to Analyze Requirements!")
+  @property
+  def totalMessages_procceed(self) -> int:
+    return int(self._processed.value())
+  @property
+  def succesfulAnalysis(self) -> int:
+    return int(self._succeeded.value())
+  @property
+  def failedAnalysis(self) -> int:
+    return int(self._failed.value())
   def analyze_message_with_logging(self,message :str) -> Dict[str,Any]:
-     """
-        Analyze a message with detailed logging of every step
-        
-        Args:
-            message: The user's message to analyze
-            
-        Returns:
-            Analysis result with logging information
-      """
-     analysis_id =self.totalMessages_procceed +1
-     # Step 4 : Log the start of analysis
-     #info of analysis id
-     self.logger.info(f"Starting Analysis #{analysis_id}")
-     #debuging and checking what value message has
-     self.logger.debug(f"Messsage :{message}")
-     try:
-      # Check if the message is valid:
-      if message is None:
-        self.logger.warning("Recieved None message.")
-        raise ValueError("The message cannot be None.")
-      # Check if data type is not string
-      if not isinstance(message, str):
-        self.logger.warning("Recieved None correct Datatype.")
-        raise TypeError("The message must be a string.")
-      # Check if there's no characters in messages
-      if message.strip() == "":
-        self.logger.warning("Recieved Empty Message.")
-        raise ValueError("The message cannot be empty or contain only whitespace.")
-      # Basic Analysis
-      # Basic analysis
-      word_count = len(message.split())
-      char_count = len(message)
-      has_question = '?' in message
-      # Advanced analysis with logging
-      self.logger.debug(f"Basic Stats : Words counts :{word_count}")
-      # defining urgent keywords for classification
-      urgent_keywords =['urgent', 'immediately', 'asap', 'important', 'critical']
-      seems_urgent = any(word in message for word in urgent_keywords)
-      if seems_urgent:
-        self.logger.debug("🚨 Detected Urgent message")
-      #defiing polite keywords for classification
-      polite_keywords = ['please', 'thank you', 'appreciate', 'grateful', 'excuse me', 'kindly']
-      seems_polite = any(word in message for word in polite_keywords)
-      if seems_polite:
-        self.logger.debug("😊 Detected Polite Message")
-      #defining greetings keywords for classification
-      greeting_keywords = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']
-      seems_greeting = any(word in message for word in greeting_keywords)
-      if seems_greeting:
-        self.logger.debug("👋 Detected Greeting Message")
-      # Step 7: Create result
-      result = {
-        'analysis_id' : analysis_id
-        ,'message' :message,
-        'stats':{
-          'word_count' : word_count,
-          'char_count' :char_count,
-          'has_question' : has_question
-        },
-        'classification':{
-          'seems_urgent' :seems_urgent,
-          'seems_polite' :seems_polite,
-          'seems_greeting' : seems_greeting
+    """
+    Analyze a message with detailed logging of every step
+
+    Args:
+        message: The user's message to analyze
+
+    Returns:
+        Analysis result with logging information
+    """
+    analysis_id =next(self._analysis_ids)
+    self._processed.inc()
+    # Step 4 : Log the start of analysis
+    #info of analysis id
+    self.logger.info("Starting Analysis #%s", analysis_id)
+    #debuging and checking what value message has
+    self.logger.debug("Messsage :%s", message)
+    with TRACER.span('analyze_message_with_logging', analysis_id=analysis_id) as span:
+      try:
+        with self._validation_latency.time(), TRACER.span('validate_input'):
+          # Check if the message is valid:
+          if message is None:
+            self.logger.warning("Recieved None message.")
+            raise ValueError("The message cannot be None.")
+          # Check if data type is not string
+          if not isinstance(message, str):
+            self.logger.warning("Recieved None correct Datatype.")
+            raise TypeError("The message must be a string.")
+          # Normalized once, every later step reuses it
+          normalized = normalize(message)
+          # Check if there's no characters in messages (bidi marks alone count as empty)
+          if normalized.is_blank:
+            self.logger.warning("Recieved Empty Message.")
+            raise ValueError("The message cannot be empty or contain only whitespace.")
+        # Basic Analysis
+        word_count = normalized.word_count
+        char_count = normalized.char_count
+        has_question = normalized.has_question
+        # Advanced analysis with logging
+        self.logger.debug("Basic Stats : Words counts :%s", word_count)
+        # classify urgent / polite / greeting keywords in a single pass
+        with self._classification_latency.time(), TRACER.span('classify'):
+          classification = classify_message(normalized)
+        seems_urgent = classification['urgent']
+        if seems_urgent:
+          self.logger.debug("🚨 Detected Urgent message")
+        seems_polite = classification['polite']
+        if seems_polite:
+          self.logger.debug("😊 Detected Polite Message")
+        seems_greeting = classification['greeting']
+        if seems_greeting:
+          self.logger.debug("👋 Detected Greeting Message")
+        # Step 7: Create result
+        with TRACER.span('build_result'):
+          result = {
+            'analysis_id' : analysis_id
+            ,'message' :message,
+            'stats':{
+              'word_count' : word_count,
+              'char_count' :char_count,
+              'has_question' : has_question
+            },
+            'classification':{
+              'seems_urgent' :seems_urgent,
+              'seems_polite' :seems_polite,
+              'seems_greeting' : seems_greeting
+            }
+            ,'processed_at' : datetime.now().isoformat()
+            ,'status' : 'sucesss'
+          }
+        # Step 8: Update counters and log success
+        self._succeeded.inc()
+        with TRACER.span('log'):
+          self.logger.info("Message #%s has been Analyzed!", analysis_id)
+          self.logger.debug("Result summary :urgent =%s , poilite =%s , greeting=%s", seems_urgent, seems_polite, seems_greeting)
+        return result
+
+      except ValueError as e:
+        # Step 9: Handle and log errors
+        self.logger.error("Value Error in analysis :#%s", analysis_id)
+        self._failed.inc()
+        span.set_attribute('status', 'failed')
+        return {
+          'analysis_id' : analysis_id,
+          'error' : 'ValueError',
+          'error_message' :str(e),
+          'processed_at' :datetime.now().isoformat()
+          ,'status' :'failed'
+        }
+      except TypeError as e:
+        self.logger.error("Type Error in analysis :#%s", analysis_id)
+        self._failed.inc()
+        span.set_attribute('status', 'failed')
+        return {
+          'analysis_id' : analysis_id,
+          'error' : 'TypeError',
+          'error_message' :str(e),
+          'processed_at' :datetime.now().isoformat()
+          ,'status' :'failed'
+        }
+      except Exception as e:
+        self.logger.critical("Unexpected Error in analysis :#%s", analysis_id, exc_info=True)
+        self._failed.inc()
+        span.set_attribute('status', 'failed')
+        return {
+          'analysis_id' : analysis_id,
+          'error' : 'UnexpectedError',
+          'error_message' :str(e),
+          'processed_at' :datetime.now().isoformat()
+          ,'status' :'failed'
         }
-        ,'processed_at' : datetime.now().isoformat()
-        ,'status' : 'sucesss'
-
-
-      }
-      # Step 8: Update counters and log success
-      self.totalMessages_procceed +=1
-      self.succesfulAnalysis +=1
-      self.logger.info(f"Message #{analysis_id} has been Analyzed!")
-      self.logger.debug(f"Result summary :urgent ={seems_urgent} , poilite ={seems_polite} , greeting={seems_greeting}")
-
-      return result
-      
-     except ValueError as e:
-      # Step 9: Handle and log errors
-       self.logger.error(f"Value Error in analysis :#{analysis_id}")
-       self.totalMessages_procceed +=1
-       self.failedAnalysis +=1
-       return {
-         'analysis_id' : analysis_id,
-         'error' : 'ValueError',
-         'error_message' :str(e),
-         'processed_at' :datetime.now().isoformat()
-         ,'status' :'failed'
-       }
-     except TypeError as e:
-       self.logger.error(f"Type Error in analysis :#{analysis_id}")
-       self.totalMessages_procceed +=1
-       self.failedAnalysis +=1
-       return {
-         'analysis_id' : analysis_id,
-         'error' : 'TypeError',
-         'error_message' :str(e),
-         'processed_at' :datetime.now().isoformat()
-         ,'status' :'failed'
-       }
-     except Exception as e:
-       self.logger.critical(f"Type Error in analysis :#{analysis_id}")
-       self.totalMessages_procceed +=1
-       self.failedAnalysis +=1
-       return {
-         'analysis_id' : analysis_id,
-         'error' : 'UnexpectedError',
-         'error_message' :str(e),
-         'processed_at' :datetime.now().isoformat()
-         ,'status' :'failed'
-       }
   def get_detailed_stats(self) -> Dict[str, Any]:
     """Get detailed statistics with logging"""
     self.logger.info("Generating detailed stastics :")
     uptime =datetime.now() - self.startDate
-    success_rate = (self.succesfulAnalysis / self.totalMessages_procceed if self.totalMessages_procceed > 0 else 0)
+    # read each counter once so the numbers are consistent with each other
+    total, succeeded, failed = self.totalMessages_procceed, self.succesfulAnalysis, self.failedAnalysis
+    success_rate = (succeeded / total if total > 0 else 0)
     stats = {
        'analyzer_name': self.name,
         'uptime_seconds': uptime.total_seconds(),
         'uptime_formatted': str(uptime),
-        'total_processed': self.totalMessages_procceed,
-        'successful_analyses': self.succesfulAnalysis,
-        'failed_analyses': self.failedAnalysis,
+        'total_processed': total,
+        'successful_analyses': succeeded,
+        'failed_analyses': failed,
         'success_rate': round(success_rate * 100, 2),
+        'latency_ms': {
+          stage: {
+            'p50': round(histogram.quantile(0.5) * 1000, 3),
+            'p99': round(histogram.quantile(0.99) * 1000, 3),
+          }
+          for stage, histogram in (('validation', self._validation_latency), ('classification', self._classification_latency))
+        },
         'start_time': self.startDate.isoformat(),
         'current_time': datetime.now().isoformat()
     }
-    self.logger.info(f"📈 Statistics: {self.succesfulAnalysis}/{self.totalMessages_procceed} successful ({stats['success_rate']}%)")
+    self.logger.info("📈 Statistics: %s/%s successful (%s%%)", succeeded, total, stats['success_rate'])
     return stats
+  def export_metrics(self) -> str:
+    """Prometheus text for all analyzers (and worker snapshots, if configured)"""
+    return render_prometheus()
   def shutdown(self):
         """Properly shut down the analyzer with final logging"""
         self.logger.info("🔄 Shutting down analyzer...")
         final_stats = self.get_detailed_stats()
-        self.logger.info(f"🏁 Final stats: {final_stats}")
+        self.logger.info("🏁 Final stats: %s", final_stats)
         self.logger.info("👋 Analyzer shutdown complete")
 
 if __name__ == "__main__":
     # Step 11: Test our logging analyzer
+    # Non-blocking logging: DEBUG and above, JSON lines to file, text on screen
+    configure_logging('requirements_analyzer.log', level=logging.DEBUG)
     # Create analyzer
     analyzer = LoggingRequirementsAnalyzer()
 
@@ -210,6 +240,7 @@ if __name__ == "__main__":
 
     # Proper shutdown
     analyzer.shutdown()
+    shutdown_logging()
 
     print(f"\n📂 Check 'requirements_analyzer.log' file for detailed logs!")
 
@@ -1,3 +1,7 @@
+from ..classifier import classify_message
+from ..normalization import normalize
+
+
 class SimpleRequirementsAnalyzer:
   # defining the init of This Agent
   def __init__(self):
@@ -18,39 +22,40 @@ class SimpleRequirementsAnalyzer:
             A dictionary with basic analysis
         """
       print(f"Analyzing Message :{message}")
+      # Normalized once; the classifier reuses its case-folded text
+      normalized = normalize(message)
+      # One pass over the message labels every keyword category
+      classification = classify_message(normalized)
       # Retrieving result message
 
       result = {
          'message' :message,
-         'len_message' :len(message),
-         'has_question' : '?' in message,
-         'seems_urgent' : any(word in message.lower() for word in ['urgent','immediately','asap','important','critical']),
-         'seems_polite' :any(word in message.lower() for word in ['please','thank you','appreciate','grateful','excuse me','kindly']),
+         'len_message' :normalized.char_count,
+         'has_question' : normalized.has_question,
+         'seems_urgent' : classification['urgent'],
+         'seems_polite' : classification['polite'],
          'status' :'Analyzed'
       }
       return result
 
 
 
-messages = [
-  "I need a bus to Tel Aviv ASAP!",
-  "Please find me the fastest route to the beach, thank you!",
-  "Is there a bus running to Jerusalem on Saturday?",
-  "Urgent! I missed my bus, what should I do?",
-  "Kindly provide information about bus schedules."
-]
-
-# trying the class
-analyzer =SimpleRequirementsAnalyzer()
-# trying the method
-analyzer.say_hello()
-# list comphernsive , analyziing the requirments messages
-results = [analyzer.analyze_requirements_message(message) for message in messages]
-
-for result in results:
-   print(result)
-   print()
+if __name__ == "__main__":
+  messages = [
+    "I need a bus to Tel Aviv ASAP!",
+    "Please find me the fastest route to the beach, thank you!",
+    "Is there a bus running to Jerusalem on Saturday?",
+    "Urgent! I missed my bus, what should I do?",
+    "Kindly provide information about bus schedules."
+  ]
 
+  # trying the class
+  analyzer =SimpleRequirementsAnalyzer()
+  # trying the method
+  analyzer.say_hello()
+  # list comphernsive , analyziing the requirments messages
+  results = [analyzer.analyze_requirements_message(message) for message in messages]
 
-  
-  
\ No newline at end of file
+  for result in results:
+     print(result)
+     print()
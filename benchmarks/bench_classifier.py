@@ -0,0 +1,101 @@
+"""
+Benchmark - shared keyword classifier vs. the previous per-analyzer scans
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_classifier [--messages N] [--repeat R]
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+from ..classifier import DEFAULT_CATEGORIES, KeywordClassifier, classify_message
+
+
+SAMPLE_MESSAGES = [
+    "I need a bus to Tel Aviv ASAP!",
+    "Please find me the fastest route to the beach, thank you!",
+    "Is there a bus running to Jerusalem on Saturday?",
+    "Urgent! I missed my bus, what should I do?",
+    "Kindly provide information about bus schedules.",
+    "Hello! Can you help me find bus schedules please?",
+    "Good morning, what are the routes?",
+    "Is this shipping route still running this evening?",
+]
+
+
+def legacy_structure_scan(message: str) -> Dict[str, bool]:
+    """Keyword scan as done by SimpleRequirementsAnalyzer before the shared classifier"""
+    return {
+        'urgent': any(word in message.lower() for word in ['urgent', 'immediately', 'asap', 'important', 'critical']),
+        'polite': any(word in message.lower() for word in ['please', 'thank you', 'appreciate', 'grateful', 'excuse me', 'kindly']),
+    }
+
+
+def legacy_logging_scan(message: str) -> Dict[str, bool]:
+    """Keyword scan as done by LoggingRequirementsAnalyzer before the shared classifier"""
+    urgent_keywords = ['urgent', 'immediately', 'asap', 'important', 'critical']
+    polite_keywords = ['please', 'thank you', 'appreciate', 'grateful', 'excuse me', 'kindly']
+    greeting_keywords = ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']
+    return {
+        'urgent': any(word in message for word in urgent_keywords),
+        'polite': any(word in message for word in polite_keywords),
+        'greeting': any(word in message for word in greeting_keywords),
+    }
+
+
+def build_corpus(size: int, seed: int = 7) -> List[str]:
+    """Build a reproducible corpus of short and long chat messages"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        parts = rng.choices(SAMPLE_MESSAGES, k=rng.randint(1, 6))
+        corpus.append(' '.join(parts))
+    return corpus
+
+
+def run(func: Callable[[str], Dict[str, bool]], corpus: List[str], repeat: int) -> float:
+    """Return the best messages/second over `repeat` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in corpus:
+            func(message)
+        best = min(best, time.perf_counter() - start)
+    return len(corpus) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    print(f"Classifying {len(corpus)} messages, best of {args.repeat} runs")
+    candidates = [
+        ("legacy structure/safe scan", legacy_structure_scan),
+        ("legacy logging scan", legacy_logging_scan),
+        ("shared classifier (find)", KeywordClassifier(DEFAULT_CATEGORIES, strategy='find').classify),
+        ("shared classifier (regex)", KeywordClassifier(DEFAULT_CATEGORIES, strategy='regex').classify),
+    ]
+    for name, func in candidates:
+        print(f"  {name:<28} {run(func, corpus, args.repeat):>12,.0f} msg/s")
+
+    # With a large vocabulary the per-keyword scans grow linearly, the regex does not
+    large = {category: list(keywords) + [f'{category}{i}' for i in range(100)] for category, keywords in DEFAULT_CATEGORIES.items()}
+    print(f"\nSame corpus, {sum(len(k) for k in large.values())} keywords:")
+    for strategy in ('find', 'regex'):
+        classifier = KeywordClassifier(large, strategy=strategy)
+        print(f"  {'shared classifier (' + strategy + ')':<28} {run(classifier.classify, corpus, args.repeat):>12,.0f} msg/s")
+
+    # The legacy scans match substrings, the shared classifier matches words
+    sample = "Is this shipping route still running this evening?"
+    print(f"\nFalse positive check on {sample!r}:")
+    print(f"  legacy greeting: {legacy_logging_scan(sample)['greeting']}")
+    print(f"  shared greeting: {classify_message(sample)['greeting']}")
+
+
+if __name__ == "__main__":
+    main()
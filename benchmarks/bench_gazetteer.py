@@ -0,0 +1,64 @@
+"""
+Benchmark - gazetteer open and extraction cost as the gazetteer grows
+
+Compiles synthetic gazetteers of increasing size and shows that opening one
+(mmap + header) and extracting entities from a message do not depend on the
+number of names.
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_gazetteer [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from ..gazetteer import EntityExtractor, Gazetteer, build_gazetteer, read_entries, DEFAULT_SOURCE
+from .bench_classifier import SAMPLE_MESSAGES
+
+
+SYLLABLES = ["ka", "ri", "ya", "tel", "mo", "shav", "ne", "ar", "bet", "gan", "el", "or", "ha", "zi", "dor"]
+
+
+def synthetic_entries(size: int, seed: int = 7):
+    """The bundled places plus `size` random one to three word names"""
+    yield from read_entries(DEFAULT_SOURCE)
+    rng = random.Random(seed)
+    for _ in range(size):
+        words = rng.randint(1, 3)
+        yield ' '.join(''.join(rng.choices(SYLLABLES, k=3)) for _ in range(words)), 'location', 0.9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=20, help="passes over the sample messages per size")
+    args = parser.parse_args()
+
+    corpus = SAMPLE_MESSAGES * args.repeat
+    print(f"{len(corpus)} messages per size")
+    print(f"  {'names':>10}{'build s':>10}{'file MiB':>10}{'open us':>10}{'us/msg':>10}{'entities':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            path = os.path.join(directory, f'{size}.gaz')
+            start = time.perf_counter()
+            build_gazetteer(synthetic_entries(size), path)
+            built = time.perf_counter() - start
+
+            start = time.perf_counter()
+            gazetteer = Gazetteer(path)
+            opened = time.perf_counter() - start
+
+            extractor = EntityExtractor(gazetteer)
+            start = time.perf_counter()
+            found = sum(len(extractor.extract(message)) for message in corpus)
+            elapsed = time.perf_counter() - start
+            gazetteer.close()
+            print(f"  {size:>10,}{built:>10.2f}{os.path.getsize(path) / 2**20:>10.1f}{opened * 1e6:>10.0f}"
+                  f"{elapsed / len(corpus) * 1e6:>10.1f}{found:>10,}")
+
+
+if __name__ == "__main__":
+    main()
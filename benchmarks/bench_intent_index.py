@@ -0,0 +1,72 @@
+"""
+Benchmark - local intent index fast path vs. asking the LLM for every message
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_intent_index [--conversations N] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import time
+
+from ..analyzer import RequirementsAnalyzer
+from ..intent_index import IntentIndex
+from ..llm import FakeLLMBackend
+from .bench_classifier import SAMPLE_MESSAGES, build_corpus
+
+
+# Turns the prototypes do not cover, which must fall through to the LLM
+UNCOVERED_MESSAGES = [
+    "When does the last bus to Haifa leave?",
+    "Can I bring a bike on the bus?",
+    "What's the weather like?",
+]
+
+async def measure(analyzer: RequirementsAnalyzer, corpus, concurrency: int) -> float:
+    """Extract intents for the whole corpus and return messages/second"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(message: str) -> None:
+        async with semaphore:
+            await analyzer.extract_intents(message)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(message) for message in corpus))
+    return len(corpus) / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--connections', type=int, default=8, help="simulated connection limit of the fake backend")
+    parser.add_argument('--threshold', type=float, default=0.5)
+    args = parser.parse_args()
+
+    # Single-sentence chat turns, the traffic the fast path is meant for
+    turns = SAMPLE_MESSAGES + UNCOVERED_MESSAGES
+    corpus = (turns * (args.conversations // len(turns) + 1))[:args.conversations]
+    index = IntentIndex(threshold=args.threshold)
+    print(f"{len(corpus)} messages, model latency {args.latency_ms} ms, {args.connections} connections")
+
+    start = time.perf_counter()
+    matches = index.match_batch(corpus)
+    elapsed = time.perf_counter() - start
+    local = sum(1 for match in matches if match is not None)
+    print(f"  index alone (batched)     {len(corpus) / elapsed:>10,.0f} msg/s  "
+          f"({elapsed / len(corpus) * 1e6:.0f} us/msg, {local / len(corpus):.0%} answered locally)")
+    mixed = build_corpus(args.conversations)
+    mixed_local = sum(1 for match in index.match_batch(mixed) if match is not None)
+    print(f"  multi-sentence corpus     {mixed_local / len(mixed):.0%} answered locally")
+
+    make_backend = lambda: FakeLLMBackend(latency_ms=args.latency_ms, max_parallel_requests=args.connections)
+    llm_only = await measure(RequirementsAnalyzer(backend=make_backend()), corpus, args.concurrency)
+    print(f"  LLM for every message     {llm_only:>10,.0f} msg/s")
+    backend = make_backend()
+    fast = await measure(RequirementsAnalyzer(backend=backend, intent_index=index), corpus, args.concurrency)
+    print(f"  index, LLM fallback       {fast:>10,.0f} msg/s  ({backend.requests} LLM requests)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
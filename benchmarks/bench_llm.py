@@ -0,0 +1,64 @@
+"""
+Benchmark - LLM extraction throughput with and without micro-batching
+
+`--target fake` uses the in-process FakeLLMBackend (no dependencies).
+`--target server` starts fake_llm_server.py and goes through the real
+OpenAIBackend and its pooled HTTP client (needs the openai package).
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_llm [--target fake|server] [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import time
+
+from ..analyzer import RequirementsAnalyzer
+from ..llm import BatchingBackend, FakeLLMBackend, LLMBackend, OpenAIBackend
+from .bench_classifier import build_corpus
+
+
+async def measure(backend: LLMBackend, corpus, concurrency: int) -> float:
+    """Analyze the corpus and return conversations/second"""
+    analyzer = RequirementsAnalyzer(backend=backend)
+    start = time.perf_counter()
+    async for _ in analyzer.analyze_many(corpus, max_concurrency=concurrency, ordered=False):
+        pass
+    elapsed = time.perf_counter() - start
+    await backend.aclose()
+    return len(corpus) / elapsed
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=('fake', 'server'), default='fake')
+    parser.add_argument('--conversations', type=int, default=2_000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--batch-wait-ms', type=float, default=5.0)
+    parser.add_argument('--connections', type=int, default=8, help="simulated connection limit of the fake backend")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.conversations)
+    if args.target == 'server':
+        from ..fake_llm_server import start_fake_server
+
+        server, base_url = start_fake_server(latency_ms=args.latency_ms)
+        make_backend = lambda: OpenAIBackend(api_key='fake', base_url=base_url)
+    else:
+        server = None
+        make_backend = lambda: FakeLLMBackend(latency_ms=args.latency_ms, max_parallel_requests=args.connections)
+
+    print(f"{len(corpus)} conversations, concurrency {args.concurrency}, "
+          f"model latency {args.latency_ms} ms, target {args.target}")
+    unbatched = await measure(make_backend(), corpus, args.concurrency)
+    print(f"  one request per extraction   {unbatched:>10,.0f} conv/s")
+    batched = await measure(BatchingBackend(make_backend(), max_wait_ms=args.batch_wait_ms), corpus, args.concurrency)
+    print(f"  micro-batched ({args.batch_wait_ms} ms window) {batched:>10,.0f} conv/s")
+    if server is not None:
+        print(f"  fake server handled {server.requests} requests")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
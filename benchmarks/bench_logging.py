@@ -0,0 +1,133 @@
+"""
+Benchmark - LoggingRequirementsAnalyzer throughput with and without logging
+
+Compares the analysis path with logging disabled, with the old synchronous
+basicConfig-style FileHandler at DEBUG, and with the queue-based setup from
+logging_config.py (text and JSON). The "slow disk" scenarios sleep on every
+flush to show what a loaded disk does to the analysis thread.
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_logging [--messages N]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from ..basic_agents.loggingClass import LoggingRequirementsAnalyzer
+from ..logging_config import DEFAULT_FORMAT, BatchingFileHandler, configure_logging, shutdown_logging
+from .bench_classifier import build_corpus
+
+
+def reset_root() -> None:
+    """Remove every root handler so each scenario starts clean"""
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def setup_disabled(directory: str) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def setup_sync_file(directory: str) -> None:
+    # What loggingClass.py used to do at import time (minus the console)
+    handler = logging.FileHandler(os.path.join(directory, 'sync.log'), encoding='utf-8')
+    handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.DEBUG)
+
+
+class SlowDiskHandler(logging.StreamHandler):
+    """Writes to /dev/null but sleeps on every flush, like a busy disk"""
+
+    def __init__(self, flush_ms: float = 0.5):
+        super().__init__(open(os.devnull, 'w', encoding='utf-8'))
+        self.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        self.flush_delay = flush_ms / 1000
+
+    def flush(self) -> None:
+        super().flush()
+        time.sleep(self.flush_delay)
+
+
+class SlowDiskBatchingHandler(BatchingFileHandler):
+    """The batching handler on the same simulated busy disk"""
+
+    def __init__(self, flush_ms: float = 0.5):
+        super().__init__(os.devnull)
+        self.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        self.flush_delay = flush_ms / 1000
+
+    def _flush_now(self, now=None) -> None:
+        super()._flush_now(now)
+        time.sleep(self.flush_delay)
+
+
+def setup_sync_slow_disk(directory: str) -> None:
+    logging.getLogger().addHandler(SlowDiskHandler())
+    logging.getLogger().setLevel(logging.DEBUG)
+
+
+def setup_queue_slow_disk(directory: str) -> None:
+    configure_logging(None, level=logging.DEBUG, console=False, extra_handlers=[SlowDiskBatchingHandler()])
+
+
+def setup_queue_text(directory: str) -> None:
+    configure_logging(os.path.join(directory, 'queue.log'), level=logging.DEBUG, json_format=False, console=False)
+
+
+def setup_queue_json(directory: str) -> None:
+    configure_logging(os.path.join(directory, 'queue.json.log'), level=logging.DEBUG, json_format=True, console=False)
+
+
+def setup_queue_info(directory: str) -> None:
+    configure_logging(os.path.join(directory, 'queue.info.log'), level=logging.INFO, json_format=True, console=False)
+
+
+def measure(setup: Callable[[str], None], corpus: List[str], directory: str) -> float:
+    """Analyze the corpus under one logging setup and return messages/second"""
+    reset_root()
+    setup(directory)
+    analyzer = LoggingRequirementsAnalyzer()
+    start = time.perf_counter()
+    for message in corpus:
+        analyzer.analyze_message_with_logging(message)
+    elapsed = time.perf_counter() - start
+    reset_root()  # drain the queue outside the timed section
+    return len(corpus) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20_000)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages)
+    scenarios = [
+        ("logging disabled", setup_disabled),
+        ("sync FileHandler, DEBUG", setup_sync_file),
+        ("sync, slow disk, DEBUG", setup_sync_slow_disk),
+        ("queue, slow disk, DEBUG", setup_queue_slow_disk),
+        ("queue + text, DEBUG", setup_queue_text),
+        ("queue + JSON, DEBUG", setup_queue_json),
+        ("queue + JSON, INFO", setup_queue_info),
+    ]
+    print(f"Analyzing {len(corpus)} messages")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, setup in scenarios:
+            try:
+                rate = measure(setup, corpus, directory)
+            except ImportError as e:
+                print(f"  {name:<26} skipped ({e})")
+                continue
+            print(f"  {name:<26} {rate:>10,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark - cost of tracing on the analysis hot path
+
+Runs LoggingRequirementsAnalyzer and RequirementsAnalyzer (local paths
+only, no backend, so span overhead is not hidden behind LLM latency) with
+tracing disabled, with every trace exported to memory, with 1% head
+sampling, and with the sampling profiler on.
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_tracing [--messages N]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Callable, List
+
+from ..analyzer import RequirementsAnalyzer
+from ..basic_agents.loggingClass import LoggingRequirementsAnalyzer
+from ..gazetteer import get_default_entity_extractor
+from ..intent_index import get_default_intent_index
+from ..tracing import TRACER, InMemoryExporter, SamplingProfiler
+from .bench_classifier import build_corpus
+
+
+SCENARIOS = [
+    ('disabled', lambda: TRACER.configure()),
+    ('all traces', lambda: TRACER.configure(InMemoryExporter())),
+    ('1% sampled', lambda: TRACER.configure(InMemoryExporter(), ratio=0.01)),
+    ('profiler', lambda: TRACER.configure(InMemoryExporter(), profiler=SamplingProfiler(slowest=10))),
+]
+
+
+def per_message_us(run: Callable[[], None], messages: int) -> float:
+    start = time.perf_counter()
+    run()
+    return (time.perf_counter() - start) / messages * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    corpus: List[str] = build_corpus(args.messages)
+    logging_analyzer = LoggingRequirementsAnalyzer()
+    analyzer = RequirementsAnalyzer(
+        intent_index=get_default_intent_index(),
+        entity_extractor=get_default_entity_extractor(),
+    )
+
+    def run_logging() -> None:
+        for message in corpus:
+            logging_analyzer.analyze_message_with_logging(message)
+
+    async def analyze_all() -> None:
+        for message in corpus:
+            await analyzer.analyze_requirements(message)
+
+    # Build the intent index and warm the caches outside the timed runs
+    TRACER.configure()
+    run_logging()
+    asyncio.run(analyze_all())
+    print(f"{args.messages} messages, us per message")
+    print(f"  {'':<14}{'logging':>12}{'analyzer':>12}")
+    for name, configure in SCENARIOS:
+        configure()
+        logging_us = per_message_us(run_logging, len(corpus))
+        analyzer_us = per_message_us(lambda: asyncio.run(analyze_all()), len(corpus))
+        print(f"  {name:<14}{logging_us:>12.2f}{analyzer_us:>12.2f}")
+    TRACER.shutdown()
+
+
+if __name__ == "__main__":
+    main()
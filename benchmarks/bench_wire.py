@@ -0,0 +1,83 @@
+"""
+Benchmark - wire format vs JSON for analysis results
+
+Encodes a chunk of task results (what one batch task returns) both ways
+and compares size, encode time, full decode time and the time to answer
+"which results have intent X and are complete?" - the lazy path, which
+only touches the fields it reads.
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.bench_wire [--results 100] [--repeat 200]
+"""
+
+import argparse
+import json
+import random
+import time
+
+from ..analyzer import Entity, Intent, analysis_result
+from ..wire import dumps, loads
+from .bench_classifier import SAMPLE_MESSAGES
+
+
+INTENTS = ['find_route', 'book_ticket', 'check_schedule', 'cancel_booking']
+PLACES = ['Tel Aviv', 'Jerusalem', 'Haifa', 'Beer Sheva', 'Eilat']
+
+
+def synthetic_results(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    results = []
+    for index in range(count):
+        analysis = {
+            'summary': rng.choice(SAMPLE_MESSAGES),
+            'intents': [Intent(name, rng.random()) for name in rng.sample(INTENTS, 2)],
+            'entities': [Entity(name, rng.random(), 'location') for name in rng.sample(PLACES, 3)],
+            'confidence': 0.0,
+        }
+        result = analysis_result(f'conversation-{index}', analysis)
+        result['validation'] = {'is_complete': rng.random() < 0.5, 'missing_items': ['time'], 'confidence': 0.5}
+        results.append(result)
+    return results
+
+
+def timed(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, default=100, help="results per encoded chunk")
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    results = synthetic_results(args.results)
+    as_json = json.dumps(results, ensure_ascii=False).encode('utf-8')
+    as_wire = dumps(results)
+
+    def json_query():
+        return [r['conversation_id'] for r in json.loads(as_json)
+                if r['validation']['is_complete'] and any(i['name'] == 'find_route' for i in r['requirements']['intents'])]
+
+    def wire_query():
+        return [r.conversation_id for r in loads(as_wire) if r.is_complete and r.has_intent('find_route')]
+
+    assert json_query() == wire_query()
+    rows = [
+        ('bytes', len(as_json), len(as_wire)),
+        ('encode us', timed(lambda: json.dumps(results, ensure_ascii=False).encode('utf-8'), args.repeat) * 1e6,
+         timed(lambda: dumps(results), args.repeat) * 1e6),
+        ('decode us', timed(lambda: json.loads(as_json), args.repeat) * 1e6,
+         timed(lambda: loads(as_wire, lazy=False), args.repeat) * 1e6),
+        ('query us', timed(json_query, args.repeat) * 1e6, timed(wire_query, args.repeat) * 1e6),
+    ]
+    print(f"{args.results} results per chunk")
+    print(f"  {'':<12}{'json':>12}{'wire':>12}")
+    for name, json_value, wire_value in rows:
+        print(f"  {name:<12}{json_value:>12,.0f}{wire_value:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark suite - throughput, latency and peak memory of every analyzer
+
+Runs each analyzer over the same synthetic corpus and reports:
+- throughput (messages/second over the timed pass)
+- p50 / p99 latency of a single call
+- peak traced memory (tracemalloc, measured in a separate pass because
+  tracing slows everything down)
+
+Analyzers: SimpleRequirementsAnalyzer, SafeRequirmentsAnalyzer,
+LoggingRequirementsAnalyzer and RequirementsAnalyzer (with the in-process
+FakeLLMBackend). Results can be saved as JSON and compared against a
+previous run to catch regressions between commits.
+
+Run with:
+    python -m apps.requirements_analyzer.benchmarks.run --messages 20000 -o bench.json
+    python -m apps.requirements_analyzer.benchmarks.run --compare bench.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .bench_classifier import SAMPLE_MESSAGES
+
+
+# Words the synthetic messages are drawn from
+VOCABULARY = sorted({word for message in SAMPLE_MESSAGES for word in message.split()})
+
+LENGTH_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+
+
+def build_synthetic_corpus(size: int, mean_words: int = 20, distribution: str = 'lognormal', seed: int = 7) -> List[str]:
+    """
+    Build a reproducible corpus with a configurable message-length distribution
+
+    Args:
+        size: Number of messages
+        mean_words: Average words per message
+        distribution: 'fixed' (every message has `mean_words`), 'uniform'
+            (1 to 2 * mean_words) or 'lognormal' (long tail of big messages)
+        seed: Random seed
+
+    Returns:
+        List of messages
+    """
+    rng = random.Random(seed)
+    sigma = 0.8
+    mu = math.log(max(mean_words, 1)) - sigma ** 2 / 2
+    corpus = []
+    for _ in range(size):
+        if distribution == 'fixed':
+            length = mean_words
+        elif distribution == 'uniform':
+            length = rng.randint(1, 2 * mean_words)
+        else:
+            length = int(rng.lognormvariate(mu, sigma))
+        corpus.append(' '.join(rng.choices(VOCABULARY, k=max(1, length))))
+    return corpus
+
+
+def make_simple() -> Callable[[str], Any]:
+    from ..basic_agents.stucture_class import SimpleRequirementsAnalyzer
+
+    return SimpleRequirementsAnalyzer().analyze_requirements_message
+
+
+def make_safe() -> Callable[[str], Any]:
+    from ..basic_agents.execption_class import SafeRequirmentsAnalyzer
+
+    return SafeRequirmentsAnalyzer().analyze_message_safely
+
+
+def make_logging() -> Callable[[str], Any]:
+    from ..basic_agents.loggingClass import LoggingRequirementsAnalyzer
+
+    return LoggingRequirementsAnalyzer().analyze_message_with_logging
+
+
+def make_requirements(loop: asyncio.AbstractEventLoop) -> Callable[[str], Any]:
+    from ..analyzer import RequirementsAnalyzer
+    from ..llm import FakeLLMBackend
+
+    analyzer = RequirementsAnalyzer(backend=FakeLLMBackend())
+    # One persistent loop: the timed call is the analysis, not loop setup
+    return lambda message: loop.run_until_complete(analyzer.analyze_requirements(message))
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def measure(call: Callable[[str], Any], corpus: Sequence[str], warmup: int) -> Dict[str, float]:
+    """Time every call of one analyzer over the corpus"""
+    for message in corpus[:warmup]:
+        call(message)
+
+    latencies = [0] * len(corpus)
+    clock = time.perf_counter_ns
+    start = clock()
+    for i, message in enumerate(corpus):
+        begin = clock()
+        call(message)
+        latencies[i] = clock() - begin
+    elapsed = (clock() - start) / 1e9
+    latencies.sort()
+
+    tracemalloc.start()
+    try:
+        for message in corpus:
+            call(message)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'throughput_per_s': len(corpus) / elapsed if elapsed else 0.0,
+        'p50_us': percentile(latencies, 0.50) / 1000,
+        'p99_us': percentile(latencies, 0.99) / 1000,
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def run_suite(args: argparse.Namespace) -> Dict[str, Any]:
+    """Benchmark every selected analyzer and return the JSON-ready report"""
+    corpus = build_synthetic_corpus(args.messages, args.mean_words, args.distribution, args.seed)
+    loop = asyncio.new_event_loop()
+    factories: Dict[str, Callable[[], Callable[[str], Any]]] = {
+        'simple': make_simple,
+        'safe': make_safe,
+        'logging': make_logging,
+        'requirements': lambda: make_requirements(loop),
+    }
+
+    # Analyzer output (prints, INFO logs) is part of the work but not of the report
+    root = logging.getLogger()
+    previous_handlers, previous_level = root.handlers[:], root.level
+    root.handlers = [logging.NullHandler()]
+    root.setLevel(args.log_level)
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for name in args.analyzers:
+                results[name] = measure(factories[name](), corpus, args.warmup)
+    finally:
+        root.handlers = previous_handlers
+        root.setLevel(previous_level)
+        loop.close()
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'messages': args.messages,
+            'mean_words': args.mean_words,
+            'distribution': args.distribution,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+
+
+# Metric name -> True when bigger is better
+METRICS = {
+    'throughput_per_s': True,
+    'p50_us': False,
+    'p99_us': False,
+    'peak_memory_kib': False,
+}
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Compare two reports
+
+    Args:
+        baseline: Report of the reference commit
+        current: Report of this run
+        threshold: Relative change (0.1 = 10%) that counts as a regression
+
+    Returns:
+        Human-readable regressions, empty when there are none
+    """
+    regressions = []
+    for name, metrics in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = reference.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(f"{name}.{metric}: {old:,.1f} -> {new:,.1f} ({change:+.1%})")
+    return regressions
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    meta = report['meta']
+    print(f"{meta['messages']} messages, {meta['distribution']} lengths (mean {meta['mean_words']} words), "
+          f"commit {meta['commit'] or 'unknown'}")
+    print(f"  {'analyzer':<14}{'msg/s':>12}{'p50 us':>10}{'p99 us':>10}{'peak KiB':>11}")
+    for name, metrics in report['results'].items():
+        line = (f"  {name:<14}{metrics['throughput_per_s']:>12,.0f}{metrics['p50_us']:>10.1f}"
+                f"{metrics['p99_us']:>10.1f}{metrics['peak_memory_kib']:>11,.1f}")
+        reference = (baseline or {}).get('results', {}).get(name)
+        if reference and reference.get('throughput_per_s'):
+            change = metrics['throughput_per_s'] / reference['throughput_per_s'] - 1
+            line += f"   ({change:+.1%} msg/s vs {baseline['meta'].get('commit') or 'baseline'})"
+        print(line)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--mean-words', type=int, default=20)
+    parser.add_argument('--distribution', choices=LENGTH_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--analyzers', nargs='+', choices=('simple', 'safe', 'logging', 'requirements'),
+                        default=['simple', 'safe', 'logging', 'requirements'])
+    parser.add_argument('--log-level', default='INFO', help="root log level while benchmarking (records go to a NullHandler)")
+    parser.add_argument('-o', '--output', help="write the JSON report here")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON report of a previous run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="relative slowdown that fails --compare")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    report = run_suite(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.output}")
+    if baseline is not None:
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
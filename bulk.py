@@ -0,0 +1,264 @@
+"""
+Bulk Analysis CLI - stream JSONL conversation dumps through the analyzer
+
+Reads JSONL/NDJSON (optionally gzip-compressed, or stdin), one conversation
+per line, fans chunks of lines out over a process pool and writes one
+result per input line as streaming JSONL or Parquet. Memory stays constant
+regardless of input size:
+- input is read lazily, one chunk at a time
+- at most `--max-pending` chunks are in flight; reading pauses until the
+  oldest chunk is written (back-pressure)
+- results are written in input order as soon as their chunk is done
+
+With `--dedup`, exact and near-duplicate conversations inside a chunk are
+analyzed once and the result is copied to the rest (see dedup.py), which
+cuts LLM calls on repetitive dumps. Only duplicates within the same chunk
+are collapsed, so larger `--chunk-size` values find more of them.
+
+Run with:
+    python -m apps.requirements_analyzer.bulk conversations.jsonl.gz -o results.jsonl
+    python -m apps.requirements_analyzer.bulk - --format parquet -o results.parquet < dump.jsonl
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, IO, Iterable, Iterator, List, Optional
+
+from .analyzer import RequirementsAnalyzer, serialize_analysis
+from .cache import get_default_cache
+from .classifier import classify_message
+from .llm import get_default_backend
+from .runtime import run_sync
+
+
+def open_input(path: str) -> IO[str]:
+    """Open a JSONL input path, '-' for stdin, transparently gunzipping"""
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """Group non-empty lines into lists of at most `chunk_size`"""
+    chunk: List[str] = []
+    for line in lines:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+_analyzer: Optional[RequirementsAnalyzer] = None
+
+
+def _worker_analyzer() -> RequirementsAnalyzer:
+    """One analyzer per worker process, built from the environment"""
+    global _analyzer
+    if _analyzer is None:
+        # numpy is imported with the index, on first use rather than at worker start
+        from .context_window import get_default_context_budget
+        from .gazetteer import get_default_entity_extractor
+        from .intent_index import get_default_intent_index
+
+        _analyzer = RequirementsAnalyzer(
+            backend=get_default_backend(),
+            intent_index=get_default_intent_index(),
+            entity_extractor=get_default_entity_extractor(),
+            context_budget=get_default_context_budget(),
+            cache=get_default_cache(),
+        )
+    return _analyzer
+
+
+def build_row(record: Dict[str, Any], analysis: Dict[str, Any], id_field: str, text_field: str) -> Dict[str, Any]:
+    """Build the output row for one successfully parsed input record"""
+    return {
+        'conversation_id': record.get(id_field),
+        'classification': classify_message(record[text_field]),
+        'analysis': serialize_analysis(analysis),
+        'status': 'success',
+    }
+
+
+def build_failed_row(conversation_id: Any, error: Exception) -> Dict[str, Any]:
+    """Build the output row for an input line whose analysis failed"""
+    return {
+        'conversation_id': conversation_id,
+        'error': type(error).__name__,
+        'error_message': str(error),
+        'status': 'failed',
+    }
+
+
+def analyze_chunk(lines: List[str], id_field: str, text_field: str, concurrency: int, dedup: bool = False) -> List[Dict[str, Any]]:
+    """
+    Analyze one chunk of JSONL lines inside a worker process
+
+    Args:
+        lines: Raw JSONL lines (parsing happens here, in parallel)
+        id_field: Input field holding the conversation id
+        text_field: Input field holding the conversation text
+        concurrency: Concurrent analyses within the chunk
+        dedup: Analyze one representative per duplicate cluster
+
+    Returns:
+        One output row per input line, in input order
+    """
+    rows: List[Optional[Dict[str, Any]]] = [None] * len(lines)
+    records: List[Dict[str, Any]] = []
+    positions: List[int] = []
+    for position, line in enumerate(lines):
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict) or not isinstance(record.get(text_field), str):
+                raise ValueError(f"Record must be an object with a string {text_field!r} field")
+        except ValueError as e:
+            rows[position] = {'conversation_id': None, 'error': 'ValueError', 'error_message': str(e), 'status': 'failed'}
+            continue
+        records.append(record)
+        positions.append(position)
+
+    async def run() -> None:
+        contexts = (record[text_field] for record in records)
+        # A failed analysis fails its own line, not the chunk (and with it the whole run)
+        async for index, analysis in _worker_analyzer().analyze_many(
+            contexts, max_concurrency=concurrency, return_exceptions=True, deduplicate=dedup,
+        ):
+            if isinstance(analysis, Exception):
+                rows[positions[index]] = build_failed_row(records[index].get(id_field), analysis)
+            else:
+                rows[positions[index]] = build_row(records[index], analysis, id_field, text_field)
+
+    run_sync(run())
+    return rows
+
+
+class JsonlWriter:
+    """Streams rows as JSON lines"""
+
+    def __init__(self, path: str):
+        self._file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        self._file.write(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+
+    def close(self) -> None:
+        if self._file is not sys.stdout:
+            self._file.close()
+        else:
+            self._file.flush()
+
+
+class ParquetWriter:
+    """Streams rows into a Parquet file, one row group per chunk (needs pyarrow)"""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow") from e
+        self._pa = pa
+        intent = pa.struct([('name', pa.string()), ('confidence', pa.float32())])
+        # Label is null for entities without one (Entity.to_dict leaves the key out)
+        entity = pa.struct([('name', pa.string()), ('confidence', pa.float32()), ('label', pa.string())])
+        self.schema = pa.schema([
+            ('conversation_id', pa.string()),
+            ('status', pa.string()),
+            ('error_message', pa.string()),
+            ('seems_urgent', pa.bool_()),
+            ('seems_polite', pa.bool_()),
+            ('seems_greeting', pa.bool_()),
+            ('summary', pa.string()),
+            ('intents', pa.list_(intent)),
+            ('entities', pa.list_(entity)),
+        ])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        columns: Dict[str, List[Any]] = {name: [] for name in self.schema.names}
+        for row in rows:
+            classification = row.get('classification', {})
+            analysis = row.get('analysis', {})
+            conversation_id = row.get('conversation_id')
+            columns['conversation_id'].append(None if conversation_id is None else str(conversation_id))
+            columns['status'].append(row['status'])
+            columns['error_message'].append(row.get('error_message'))
+            columns['seems_urgent'].append(classification.get('urgent'))
+            columns['seems_polite'].append(classification.get('polite'))
+            columns['seems_greeting'].append(classification.get('greeting'))
+            columns['summary'].append(analysis.get('summary'))
+            columns['intents'].append(analysis.get('intents', []))
+            columns['entities'].append(analysis.get('entities', []))
+        self._writer.write_table(self._pa.table(columns, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def run_bulk(args: argparse.Namespace) -> Dict[str, int]:
+    """Drive the whole pipeline and return simple counters"""
+    writer = ParquetWriter(args.output) if args.format == 'parquet' else JsonlWriter(args.output)
+    counters = {'chunks': 0, 'rows': 0, 'failed': 0}
+    pending: Deque[Future] = deque()
+
+    def drain_one() -> None:
+        rows = pending.popleft().result()
+        writer.write(rows)
+        counters['chunks'] += 1
+        counters['rows'] += len(rows)
+        counters['failed'] += sum(1 for row in rows if row['status'] == 'failed')
+
+    try:
+        with open_input(args.input) as source, ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for chunk in iter_chunks(source, args.chunk_size):
+                pending.append(pool.submit(analyze_chunk, chunk, args.id_field, args.text_field, args.concurrency, args.dedup))
+                # Back-pressure: stop reading until the oldest chunk is written
+                while len(pending) >= max(1, args.max_pending):
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+    return counters
+
+
+def build_parser() -> argparse.ArgumentParser:
+    workers = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Bulk requirements analysis of JSONL conversation dumps")
+    parser.add_argument('input', help="JSONL/NDJSON input path (.gz supported), '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="output path, '-' for stdout (JSONL only)")
+    parser.add_argument('--format', choices=('jsonl', 'parquet'), default='jsonl')
+    parser.add_argument('--id-field', default='conversation_id')
+    parser.add_argument('--text-field', default='context')
+    parser.add_argument('--workers', type=int, default=workers)
+    parser.add_argument('--chunk-size', type=int, default=500, help="lines per process-pool task")
+    parser.add_argument('--max-pending', type=int, default=2 * workers, help="chunks in flight before reading pauses")
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent analyses inside one chunk")
+    parser.add_argument('--dedup', action='store_true', help="analyze duplicate conversations within a chunk once")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.format == 'parquet' and args.output == '-':
+        raise SystemExit("Parquet output needs a file path (-o results.parquet)")
+    counters = run_bulk(args)
+    print(f"Analyzed {counters['rows']} conversations in {counters['chunks']} chunks "
+          f"({counters['failed']} failed)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
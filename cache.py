@@ -0,0 +1,251 @@
+"""
+Result Cache - content-addressed cache for RequirementsAnalyzer results
+
+Two tiers, checked in order:
+- an in-process LRU with a TTL and a bounded number of entries
+- an optional shared Redis tier (redis.asyncio), so retries and replays on
+  other workers hit too
+
+Keys are a SHA-256 of the whitespace-normalized context plus
+ANALYZER_VERSION, so a new analyzer release never serves stale results.
+Redis values are wire.py records (JSON values written by older releases
+are still read).
+Concurrent requests for the same key are coalesced: only one of them runs
+the analysis, the others await its result (single-flight). If that leader
+is cancelled, the next waiter takes over the computation. Degraded
+analyses (answered by the resilience fallbacks during an outage) are
+handed to the waiting callers but never stored, so the next request asks
+the provider again.
+
+`get_default_cache()` builds the process-wide cache from the environment.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .analyzer import ANALYZER_VERSION, deserialize_analysis
+from .wire import ResultView, encode_analysis, is_record
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_context(context: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return ' '.join(context.split())
+
+
+def cache_key(context: str, version: str = ANALYZER_VERSION) -> str:
+    """Content address of a conversation context for a given analyzer version"""
+    digest = hashlib.sha256(f"{version}\0{normalize_context(context)}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier (LRU + Redis) cache with single-flight de-duplication"""
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        ttl: float = 3600.0,
+        redis_url: Optional[str] = None,
+        redis_ttl: int = 86_400,
+        namespace: str = 'requirements_analyzer:analysis',
+    ):
+        """
+        Args:
+            max_entries: Size bound of the in-process LRU
+            ttl: Seconds a local entry stays valid
+            redis_url: Enables the Redis tier when given (e.g. redis://localhost:6379/0)
+            redis_ttl: Seconds a Redis entry stays valid
+            namespace: Prefix for Redis keys
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_url = redis_url
+        self.redis_ttl = redis_ttl
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._redis: Any = None
+        self.counters: Dict[str, int] = {
+            'local_hits': 0,
+            'redis_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'redis_errors': 0,
+            'degraded': 0,
+        }
+
+    async def get_or_compute(self, context: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Return the cached analysis for `context`, computing it at most once
+
+        Args:
+            context: Conversation context (the cache key source)
+            compute: Coroutine factory producing the analysis on a miss
+
+        Returns:
+            The analysis; callers get their own shallow copy
+        """
+        key = cache_key(context)
+        while True:
+            analysis = self._get_local(key)
+            if analysis is not None:
+                self.counters['local_hits'] += 1
+                return dict(analysis)
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                analysis = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    # We were cancelled ourselves, not the leader
+                    raise
+                # The leader was cancelled: look again, and lead if nobody else does
+                continue
+            self.counters['coalesced'] += 1
+            return dict(analysis)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            analysis = await self._get_remote(key)
+            if analysis is not None:
+                self.counters['redis_hits'] += 1
+            else:
+                self.counters['misses'] += 1
+                analysis = await compute()
+                if analysis.get('degraded'):
+                    self.counters['degraded'] += 1
+                else:
+                    await self._set_remote(key, analysis)
+            if not analysis.get('degraded'):
+                self._set_local(key, analysis)
+            future.set_result(analysis)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so asyncio does not warn when nobody else waited
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: waiters must not hang on our future;
+            # seeing it cancelled, they retry and one of them takes over
+            future.cancel()
+            raise
+        finally:
+            del self._inflight[key]
+        return dict(analysis)
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, analysis = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.counters['expirations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return analysis
+
+    def _set_local(self, key: str, analysis: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, analysis)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _redis_client(self) -> Any:
+        if self._redis is None:
+            import redis.asyncio as redis_asyncio
+
+            self._redis = redis_asyncio.from_url(self.redis_url)
+        return self._redis
+
+    async def _get_remote(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.redis_url:
+            return None
+        try:
+            raw = await self._redis_client().get(f"{self.namespace}:{key}")
+        except Exception as e:
+            # The cache must never fail an analysis; fall through to compute
+            self.counters['redis_errors'] += 1
+            logger.warning("Redis cache read failed: %s", e)
+            return None
+        if raw is None:
+            return None
+        if is_record(raw):
+            return ResultView(raw).analysis()
+        return deserialize_analysis(json.loads(raw))
+
+    async def _set_remote(self, key: str, analysis: Dict[str, Any]) -> None:
+        if not self.redis_url:
+            return
+        try:
+            payload = encode_analysis(analysis)
+            await self._redis_client().set(f"{self.namespace}:{key}", payload, ex=self.redis_ttl)
+        except Exception as e:
+            self.counters['redis_errors'] += 1
+            logger.warning("Redis cache write failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the current local size and hit rate"""
+        lookups = self.counters['local_hits'] + self.counters['redis_hits'] + self.counters['misses'] + self.counters['coalesced']
+        hits = lookups - self.counters['misses']
+        return {
+            **self.counters,
+            'local_entries': len(self._entries),
+            'hit_rate': hits / lookups if lookups > 0 else 0,
+        }
+
+    def clear(self) -> None:
+        """Drop every local entry (the Redis tier expires on its own)"""
+        self._entries.clear()
+
+    async def aclose(self) -> None:
+        """Close the Redis connection pool, if one was opened"""
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+_default_cache: Optional[ResultCache] = None
+_cache_pid: Optional[int] = None
+
+
+def get_default_cache() -> Optional[ResultCache]:
+    """
+    Process-wide result cache, configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_CACHE: 'local' for the in-process LRU only, a
+      redis:// URL to add the shared Redis tier; unset disables caching
+      (returns None)
+    - REQUIREMENTS_ANALYZER_CACHE_ENTRIES: LRU size bound (default 10000)
+    - REQUIREMENTS_ANALYZER_CACHE_TTL: seconds a local entry stays valid (default 3600)
+    - REQUIREMENTS_ANALYZER_CACHE_REDIS_TTL: seconds a Redis entry stays valid (default 86400)
+    """
+    global _default_cache, _cache_pid
+    target = os.getenv('REQUIREMENTS_ANALYZER_CACHE', '')
+    if not target:
+        return None
+    # In-flight futures and the Redis pool belong to the parent's event loop
+    if _default_cache is None or _cache_pid != os.getpid():
+        _default_cache = ResultCache(
+            max_entries=int(os.getenv('REQUIREMENTS_ANALYZER_CACHE_ENTRIES', '10000')),
+            ttl=float(os.getenv('REQUIREMENTS_ANALYZER_CACHE_TTL', '3600')),
+            redis_url=None if target == 'local' else target,
+            redis_ttl=int(os.getenv('REQUIREMENTS_ANALYZER_CACHE_REDIS_TTL', '86400')),
+        )
+        _cache_pid = os.getpid()
+    return _default_cache
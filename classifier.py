@@ -0,0 +1,188 @@
+"""
+Keyword Classifier - shared precompiled message classification
+
+This module replaces the per-call keyword scans that every analyzer used to
+do on its own (`any(word in message.lower() for word in [...])`):
+- Keyword categories are compiled once, at import time, instead of
+  rebuilding the keyword lists on every call
+- The message is lower-cased once, not once per keyword
+- Keywords only match on word boundaries, so "hi" no longer matches
+  "this" or "shipping"
+- The words of a multi-word keyword may be separated by any whitespace,
+  so "thank  you" and "thank\nyou" match "thank you"
+
+Two scan strategies are compiled up front and the cheaper one is picked
+for the size of the keyword set:
+- small sets (our urgent/polite/greeting lists): one C-level `str.find`
+  per keyword with a boundary check, stopping at the first hit of each
+  category. For a few dozen short keywords this beats any pure-Python
+  automaton, because CPython's regex engine pays per character.
+- large sets: one trie-factored regex with a named group per category,
+  which labels every category in a single pass over the text no matter
+  how many keywords there are.
+"""
+
+import re
+from typing import Dict, Iterable, List, Mapping, Optional, Pattern, Tuple, Union
+
+from .normalization import NormalizedMessage
+
+
+URGENT_KEYWORDS: Tuple[str, ...] = ('urgent', 'immediately', 'asap', 'important', 'critical')
+POLITE_KEYWORDS: Tuple[str, ...] = ('please', 'thank you', 'appreciate', 'grateful', 'excuse me', 'kindly')
+GREETING_KEYWORDS: Tuple[str, ...] = ('hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening')
+
+DEFAULT_CATEGORIES: Dict[str, Tuple[str, ...]] = {
+    'urgent': URGENT_KEYWORDS,
+    'polite': POLITE_KEYWORDS,
+    'greeting': GREETING_KEYWORDS,
+}
+
+# Above this many keywords in total the single-pass regex is cheaper than
+# scanning once per keyword (measured with benchmarks/bench_classifier.py)
+REGEX_KEYWORD_THRESHOLD = 48
+
+
+def _is_word_char(char: str) -> bool:
+    """Same notion of a word character as the regex `\\w` class"""
+    return char.isalnum() or char == '_'
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a regex alternation with common prefixes factored out.
+
+    - Why: a flat `a|b|c` alternation makes the regex engine retry every
+      keyword at every position; a trie only follows matching prefixes.
+    - How: insert keywords into a nested dict and emit it recursively.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        # Keywords are stored single-spaced; any run of whitespace matches the space
+        alternatives = [(r'\s+' if char == ' ' else re.escape(char)) + emit(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+def _spaced_fallback(keyword: str) -> Optional[Tuple[str, Pattern[str]]]:
+    """First word and whitespace-tolerant pattern of a multi-word keyword (None for one word)"""
+    words = keyword.split()
+    if len(words) < 2:
+        return None
+    return words[0], re.compile(r'(?<!\w)' + r'\s+'.join(map(re.escape, words)) + r'(?!\w)')
+
+
+class KeywordClassifier:
+    """Labels a message with every keyword category using precompiled keyword sets"""
+
+    def __init__(self, categories: Mapping[str, Iterable[str]], strategy: Optional[str] = None):
+        """
+        Compile all keyword categories
+
+        Args:
+            categories: Mapping of category name to its keywords. Category
+                names must be valid Python identifiers (they become regex
+                group names).
+            strategy: 'find' or 'regex'; picked from the keyword count when omitted
+        """
+        self.categories: Tuple[str, ...] = tuple(categories)
+        plan: List[Tuple[str, Tuple[str, ...]]] = []
+        for category, keywords in categories.items():
+            if not category.isidentifier():
+                raise ValueError(f"Category name must be an identifier: {category!r}")
+            # Longest keywords first so "good morning" wins over a shorter prefix
+            ordered = tuple(sorted({' '.join(k.lower().split()) for k in keywords if k.strip()}, key=len, reverse=True))
+            if not ordered:
+                raise ValueError(f"Category {category!r} has no keywords")
+            plan.append((category, ordered))
+        # The find scan checks the single-spaced form first and only falls
+        # back to a regex when the first word of a multi-word keyword occurs
+        self._plan: Tuple[Tuple[str, Tuple[Tuple[str, Optional[Tuple[str, Pattern[str]]]], ...]], ...] = tuple(
+            (category, tuple((keyword, _spaced_fallback(keyword)) for keyword in keywords)) for category, keywords in plan
+        )
+
+        total_keywords = sum(len(keywords) for _, keywords in plan)
+        if strategy is None:
+            strategy = 'regex' if total_keywords > REGEX_KEYWORD_THRESHOLD else 'find'
+        if strategy not in ('find', 'regex'):
+            raise ValueError(f"Unknown strategy: {strategy!r}")
+        self.strategy = strategy
+
+        groups = [f'(?P<{category}>{_trie_pattern(keywords)})' for category, keywords in plan]
+        # (?<!\w) / (?!\w) instead of \b so keywords that start or end with
+        # punctuation still get a sensible boundary
+        self.pattern: Pattern[str] = re.compile(r'(?<!\w)(?:' + '|'.join(groups) + r')(?!\w)')
+
+    def classify(self, message: Union[str, NormalizedMessage]) -> Dict[str, bool]:
+        """
+        Label a message for every category
+
+        Args:
+            message: The text to classify, or its NormalizedMessage (whose
+                case-folded text is reused instead of lower-casing again)
+
+        Returns:
+            Mapping of category name to whether any of its keywords occurs
+        """
+        text = message.folded if isinstance(message, NormalizedMessage) else message.lower()
+        if self.strategy == 'regex':
+            return self._classify_regex(text)
+        return self._classify_find(text)
+
+    def _classify_find(self, text: str) -> Dict[str, bool]:
+        """Scan once per keyword with `str.find`, checking word boundaries by hand"""
+        found = {}
+        length = len(text)
+        for category, keywords in self._plan:
+            hit = False
+            for keyword, fallback in keywords:
+                # `in` is the cheapest C-level test; only verify boundaries on a hit
+                if keyword in text:
+                    start = text.find(keyword)
+                    while start != -1:
+                        end = start + len(keyword)
+                        if (start == 0 or not _is_word_char(text[start - 1])) and (end == length or not _is_word_char(text[end])):
+                            hit = True
+                            break
+                        start = text.find(keyword, start + 1)
+                    if hit:
+                        break
+                # No single-spaced hit on word boundaries: try "thank  you" or
+                # "thank\nyou" for "thank you"
+                if fallback is not None and fallback[0] in text and fallback[1].search(text):
+                    hit = True
+                    break
+            found[category] = hit
+        return found
+
+    def _classify_regex(self, text: str) -> Dict[str, bool]:
+        """Label all categories in a single regex pass over the text"""
+        found = dict.fromkeys(self.categories, False)
+        remaining = len(found)
+        for match in self.pattern.finditer(text):
+            category = match.lastgroup
+            if not found[category]:
+                found[category] = True
+                remaining -= 1
+                if remaining == 0:
+                    # Every category is already labelled, no need to scan the rest
+                    break
+        return found
+
+
+# Shared, precompiled instance used by all analyzers
+default_classifier = KeywordClassifier(DEFAULT_CATEGORIES)
+
+
+def classify_message(message: Union[str, NormalizedMessage]) -> Dict[str, bool]:
+    """Classify a message with the default urgent/polite/greeting categories"""
+    return default_classifier.classify(message)
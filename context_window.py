@@ -0,0 +1,389 @@
+"""
+Context Window - token-bounded extraction prompts for long conversations
+
+Prompt size drives both latency and cost of an extraction call, and whole
+conversation contexts grow without limit. This module bounds them:
+- `TokenCounter` counts tokens locally: with tiktoken when it is installed
+  and configured, otherwise with a fast estimate that errs on the high side
+  (English words ~1 token, long and non-Latin words more, punctuation runs)
+- `ContextWindow` keeps the most recent turns that fit the budget verbatim
+  and folds older turns into a compressed extractive summary (the most
+  informative sentences, duplicates dropped) that is only recomputed when a
+  turn is evicted
+- `ContextBudget` applies the same to whole-context strings for
+  `RequirementsAnalyzer`: contexts under the budget pass through untouched,
+  longer ones are windowed, and summaries of already seen turn prefixes are
+  cached, so re-analyzing a growing conversation only compresses the turns
+  evicted since the last call
+- `preview` cuts summaries at a word boundary instead of mid-word
+
+The rendered context never exceeds `max_tokens` by the counter's measure.
+"""
+
+import hashlib
+import math
+import os
+import re
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from .normalization import NormalizedMessage, normalize
+
+
+SUMMARY_PREFIX = "Summary of earlier turns: "
+
+# Pieces the estimate counts: words, punctuation runs, line breaks
+_PIECES = re.compile(r"\w+|[^\w\s]+|\n")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+|\n+")
+# Words that carry no requirement content (summary scoring, near-duplicate detection)
+STOPWORDS = frozenset((
+    'a', 'an', 'the', 'i', 'me', 'my', 'you', 'your', 'we', 'it', 'is', 'are', 'was', 'be', 'to', 'of',
+    'and', 'or', 'in', 'on', 'at', 'for', 'with', 'this', 'that', 'do', 'does', 'can', 'could', 'would',
+    'please', 'thanks', 'thank', 'ok', 'okay', 'yes', 'no', 'hi', 'hello', 'so', 'just', 'what', 'how',
+))
+
+
+def _estimate_piece(piece: str) -> int:
+    if piece.isascii():
+        if piece[0].isalnum() or piece[0] == '_':
+            # Common English words are one token, long or rare ones split into ~4 char pieces
+            return 1 if len(piece) <= 6 else math.ceil(len(piece) / 4)
+        return math.ceil(len(piece) / 2)
+    # Hebrew/Arabic and other non-Latin text costs about one token per two characters
+    return math.ceil(len(piece) / 2)
+
+
+class TokenCounter:
+    """Local token counting and token-boundary truncation"""
+
+    def __init__(self, encoding: Optional[str] = None):
+        """
+        Args:
+            encoding: tiktoken encoding name (e.g. 'cl100k_base'); None uses
+                the built-in estimate, which needs no model files
+        """
+        self.encoding_name = encoding
+        self._encoding: Any = None
+        if encoding:
+            import tiktoken
+
+            self._encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        """Number of tokens in text"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return sum(_estimate_piece(piece) for piece in _PIECES.findall(text))
+
+    def truncate(self, text: str, max_tokens: int, keep: str = 'head') -> str:
+        """
+        Longest prefix ('head') or suffix ('tail') of text within max_tokens,
+        cut between words
+        """
+        if max_tokens <= 0:
+            return ''
+        if self.count(text) <= max_tokens:
+            return text
+        pieces = list(_PIECES.finditer(text))
+        if keep == 'tail':
+            pieces.reverse()
+        used = 0
+        cut: Optional[int] = None
+        for piece in pieces:
+            cost = self.count(piece.group()) if self._encoding is not None else _estimate_piece(piece.group())
+            if used + cost > max_tokens:
+                break
+            used += cost
+            cut = piece.end() if keep == 'head' else piece.start()
+        if cut is None:
+            return ''
+        return text[:cut].rstrip() if keep == 'head' else text[cut:].lstrip()
+
+
+def preview(message: Union[str, NormalizedMessage], max_chars: int = 200) -> str:
+    """The start of a message, at most max_chars long and cut after a whole word"""
+    normalized = normalize(message)
+    text = normalized.text
+    if len(text) <= max_chars:
+        return text
+    end = 0
+    for start, stop in normalized.spans:
+        if stop > max_chars:
+            break
+        end = stop
+    # A single word longer than max_chars is cut; nothing else is
+    return text[:end or max_chars].rstrip()
+
+
+def split_turn(turn: str) -> List[str]:
+    """Non-empty sentences of one turn"""
+    return [sentence.strip() for sentence in _SENTENCES.split(turn) if sentence.strip()]
+
+
+class _Summary:
+    """Extractive summary: the most informative sentences within a token budget, in order"""
+
+    __slots__ = ('sentences', 'tokens', 'seen')
+
+    def __init__(self, sentences: Sequence[Tuple[str, int, int]] = (), seen: Sequence[str] = ()):
+        # (sentence, informative word count, tokens)
+        self.sentences: List[Tuple[str, int, int]] = list(sentences)
+        self.tokens = sum(item[2] for item in self.sentences)
+        self.seen = set(seen)
+
+    def copy(self) -> "_Summary":
+        return _Summary(self.sentences, self.seen)
+
+    def fold(self, turn: str, counter: TokenCounter, max_tokens: int) -> None:
+        """Add the sentences of an evicted turn, dropping the least informative beyond max_tokens"""
+        for sentence in split_turn(turn):
+            normalized = normalize(sentence)
+            key = ' '.join(normalized.tokens)
+            if not key or key in self.seen:
+                continue
+            self.seen.add(key)
+            score = len({token for token in normalized.tokens if token not in STOPWORDS})
+            if not score:
+                # Greetings and acknowledgements carry no requirements
+                continue
+            tokens = counter.count(sentence)
+            if tokens > max_tokens:
+                sentence = counter.truncate(sentence, max_tokens)
+                tokens = counter.count(sentence)
+            self.sentences.append((sentence, score, tokens))
+            self.tokens += tokens
+        while self.tokens > max_tokens and self.sentences:
+            # Least informative first; the oldest of equally informative ones
+            victim = min(range(len(self.sentences)), key=lambda index: self.sentences[index][1])
+            self.tokens -= self.sentences.pop(victim)[2]
+
+    def render(self) -> str:
+        return ' '.join(sentence for sentence, _, _ in self.sentences)
+
+
+class ContextWindow:
+    """Rolling window of recent turns plus a compressed summary of older ones"""
+
+    def __init__(
+        self,
+        max_tokens: int = 512,
+        summary_tokens: int = 128,
+        max_turns: Optional[int] = None,
+        counter: Optional[TokenCounter] = None,
+    ):
+        """
+        Args:
+            max_tokens: Budget of the rendered context
+            summary_tokens: Part of the budget reserved for the summary
+            max_turns: Recent turns kept verbatim at most (None: as many as fit)
+            counter: Token counter, the process default if None
+        """
+        if not 0 <= summary_tokens < max_tokens:
+            raise ValueError("summary_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.max_turns = max_turns
+        self.counter = counter or get_token_counter()
+        self._prefix_tokens = self.counter.count(SUMMARY_PREFIX) + 1
+        self._recent: Deque[Tuple[str, int]] = deque()
+        self._recent_tokens = 0
+        self._summary = _Summary()
+        self._rendered: Optional[str] = None
+
+    @property
+    def recent_budget(self) -> int:
+        """Tokens available to verbatim turns"""
+        reserved = self.summary_tokens + self._prefix_tokens if self._summary.sentences else 0
+        return self.max_tokens - reserved
+
+    @property
+    def summary(self) -> str:
+        return self._summary.render()
+
+    @property
+    def turns(self) -> List[str]:
+        return [turn for turn, _ in self._recent]
+
+    def add_turn(self, turn: str) -> None:
+        tokens = self.counter.count(turn)
+        self._recent.append((turn, tokens))
+        self._recent_tokens += tokens
+        self._rendered = None
+        # The newest turn stays over budget (render keeps its end), but not over max_turns
+        while self._recent and (
+            (len(self._recent) > 1 and self._recent_tokens > self.recent_budget)
+            or (self.max_turns is not None and len(self._recent) > self.max_turns)
+        ):
+            self._evict()
+
+    def _evict(self) -> None:
+        turn, tokens = self._recent.popleft()
+        self._recent_tokens -= tokens
+        self._summary.fold(turn, self.counter, self.summary_tokens)
+
+    def render(self, extra: str = '') -> str:
+        """
+        The context to send: summary, recent turns and `extra` (a new turn
+        not added yet), within max_tokens
+
+        The newest text wins: older turns are dropped first and a single
+        oversized turn keeps its end.
+        """
+        if not extra and self._rendered is not None:
+            return self._rendered
+        summary = self._summary.render()
+        header = f"{SUMMARY_PREFIX}{summary}" if summary else ''
+        budget = self.max_tokens - (self.counter.count(header) + 1 if header else 0)
+        lines: List[str] = []
+        if extra:
+            extra_tokens = self.counter.count(extra)
+            if extra_tokens > budget:
+                extra = self.counter.truncate(extra, budget, keep='tail')
+                extra_tokens = self.counter.count(extra)
+            lines.append(extra)
+            budget -= extra_tokens + 1
+        for turn, tokens in reversed(self._recent):
+            if tokens > budget:
+                if not lines:
+                    lines.append(self.counter.truncate(turn, budget, keep='tail'))
+                break
+            lines.append(turn)
+            budget -= tokens + 1
+        if header:
+            lines.append(header)
+        rendered = '\n'.join(reversed(lines))
+        if not extra:
+            self._rendered = rendered
+        return rendered
+
+
+class ContextBudget:
+    """Fits whole conversation contexts into a token budget, caching summaries"""
+
+    def __init__(
+        self,
+        max_tokens: int = 1024,
+        summary_tokens: int = 256,
+        counter: Optional[TokenCounter] = None,
+        cache_size: int = 10_000,
+    ):
+        """
+        Args:
+            max_tokens: Budget of one extraction call's context
+            summary_tokens: Part of the budget reserved for the summary of
+                turns that do not fit verbatim
+            counter: Token counter, the process default if None
+            cache_size: Summaries and fitted contexts kept (LRU)
+        """
+        if not 0 <= summary_tokens < max_tokens:
+            raise ValueError("summary_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.counter = counter or get_token_counter()
+        self.cache_size = cache_size
+        # digest of an evicted turn prefix -> its summary
+        self._summaries: "OrderedDict[bytes, _Summary]" = OrderedDict()
+        # digest of a context -> fitted context (intents and entities fit the same text)
+        self._fitted: "OrderedDict[bytes, str]" = OrderedDict()
+        self.counters: Dict[str, int] = {'passed': 0, 'fitted': 0, 'summary_hits': 0}
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key: bytes, value: Any, size: int) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+    def fit(self, context: Union[str, NormalizedMessage]) -> str:
+        """The context itself when it fits, otherwise summary + the newest turns that fit"""
+        text = normalize(context).text
+        counter = self.counter
+        if counter.count(text) <= self.max_tokens:
+            self.counters['passed'] += 1
+            return text
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        fitted = self._fitted.get(key)
+        if fitted is not None:
+            self._fitted.move_to_end(key)
+            return fitted
+        self.counters['fitted'] += 1
+
+        turns = [turn for turn in text.split('\n') if turn.strip()]
+        costs = [counter.count(turn) for turn in turns]
+        # Newest turns that fit next to a full summary stay verbatim
+        budget = self.max_tokens - self.summary_tokens - counter.count(SUMMARY_PREFIX) - 1
+        first = len(turns)
+        while first > 0 and costs[first - 1] + 1 <= budget:
+            budget -= costs[first - 1] + 1
+            first -= 1
+        if first == len(turns):
+            # Even the newest turn alone is too long: render() cuts it, keeping its end
+            first -= 1
+        window = ContextWindow(self.max_tokens, self.summary_tokens, counter=counter)
+        window._summary = self._summarize(turns[:first])
+        window._recent.extend(zip(turns[first:], costs[first:]))
+        fitted = window.render()
+        self._remember(self._fitted, key, fitted, self.cache_size)
+        return fitted
+
+    def _summarize(self, older: Sequence[str]) -> _Summary:
+        """Summary of the evicted turns, resumed from the longest cached prefix"""
+        digest = hashlib.blake2b(digest_size=16)
+        digests: List[bytes] = []
+        for turn in older:
+            digest.update(turn.encode('utf-8'))
+            digest.update(b'\n')
+            digests.append(digest.copy().digest())
+        start, summary = 0, None
+        for index in range(len(digests) - 1, -1, -1):
+            cached = self._summaries.get(digests[index])
+            if cached is not None:
+                self.counters['summary_hits'] += 1
+                start, summary = index + 1, cached.copy()
+                break
+        summary = summary or _Summary()
+        for turn in older[start:]:
+            summary.fold(turn, self.counter, self.summary_tokens)
+        if digests:
+            self._remember(self._summaries, digests[-1], summary.copy(), self.cache_size)
+        return summary
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """
+    Process-wide token counter
+
+    - REQUIREMENTS_ANALYZER_TOKENIZER: tiktoken encoding name (needs the
+      tiktoken package); unset uses the built-in estimate
+    """
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = TokenCounter(os.getenv('REQUIREMENTS_ANALYZER_TOKENIZER') or None)
+    return _default_counter
+
+
+_default_budget: Optional[ContextBudget] = None
+
+
+def get_default_context_budget() -> Optional[ContextBudget]:
+    """
+    Process-wide budget for extraction calls, configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_CONTEXT_TOKENS: tokens per extraction call
+      (default 1024); 0 disables windowing (returns None)
+    - REQUIREMENTS_ANALYZER_SUMMARY_TOKENS: part of it for the summary of
+      older turns (default a quarter)
+    """
+    global _default_budget
+    max_tokens = int(os.getenv('REQUIREMENTS_ANALYZER_CONTEXT_TOKENS', '1024'))
+    if max_tokens <= 0:
+        return None
+    if _default_budget is None:
+        summary_tokens = int(os.getenv('REQUIREMENTS_ANALYZER_SUMMARY_TOKENS', str(max_tokens // 4)))
+        _default_budget = ContextBudget(max_tokens, summary_tokens)
+    return _default_budget
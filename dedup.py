@@ -0,0 +1,245 @@
+"""
+Deduplication - collapse duplicate and near-duplicate messages in a batch
+
+A large share of traffic is the same request with small variations
+("Is there a bus to Jerusalem on Saturday?" / "is there any bus to
+Jerusalem on saturday please"). `DuplicateIndex` clusters the messages of
+one batch window so that only one representative per cluster is analyzed
+and its result is fanned out to the rest:
+- exact duplicates: same normalized token sequence (case, punctuation,
+  whitespace, niqqud and bidi marks do not matter); a dict lookup
+- near duplicates: MinHash signatures of the content words (stopwords
+  dropped), indexed by LSH bands, so candidates are found without
+  comparing all pairs. Messages are a handful of words, where SimHash
+  distances jump with every added word; MinHash estimates the Jaccard
+  similarity of the word sets directly. A candidate is accepted only if
+  the exact Jaccard similarity is at least `min_similarity` and both
+  messages mention exactly the same salient terms - numbers (in digits or
+  spelled out, in English and Hebrew), negations, times and dates (the
+  gazetteer's time/date patterns plus parts of the day) and, when a
+  `salient` function is given (the analyzer passes its local entity
+  extractor), entity names - so "bus to Jerusalem" is never collapsed
+  into "bus to Haifa", "two tickets" into "three tickets", "at ten" into
+  "at eleven", nor "I need" into "I do not need".
+
+Clusters are greedy: a message joins the first representative it matches.
+"""
+
+import hashlib
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .context_window import STOPWORDS
+from .metrics import REGISTRY
+from .normalization import NormalizedMessage, normalize
+
+
+# LSH banding: a pair with Jaccard similarity s becomes a candidate with
+# probability 1 - (1 - s**ROWS)**BANDS (0.999 at 0.8, 0.74 at 0.5, 0.24 at 0.3)
+BANDS = 10
+ROWS = 3
+NUM_HASHES = BANDS * ROWS
+_PRIME = (1 << 61) - 1
+# (a, b) of the hash family h(x) = (a * x + b) mod p, fixed so signatures are reproducible
+_PERMUTATIONS = tuple(
+    (
+        int.from_bytes(hashlib.blake2b(b'a%d' % index, digest_size=8).digest(), 'little') % (_PRIME - 1) + 1,
+        int.from_bytes(hashlib.blake2b(b'b%d' % index, digest_size=8).digest(), 'little') % _PRIME,
+    )
+    for index in range(NUM_HASHES)
+)
+
+# Words that flip what is asked for: never filler, and always salient
+NEGATIONS = frozenset(('no', 'not', 'dont', "don't", 'never', 'without', 'cancel', '\u05dc\u05d0', '\u05d0\u05d9\u05df'))
+# Spelled-out numbers: "two tickets" and "three tickets" are different requests
+NUMBER_WORDS = frozenset((
+    'zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten', 'eleven', 'twelve',
+    'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen', 'twenty', 'thirty',
+    'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety', 'hundred', 'thousand', 'half', 'quarter',
+    'first', 'second', 'third', 'fourth', 'fifth', 'last', 'once', 'twice', 'single', 'double', 'couple',
+    'אחד', 'אחת', 'שניים', 'שתיים',
+    'שני', 'שתי', 'שלוש', 'שלושה',
+    'ארבע', 'ארבעה', 'חמש', 'חמישה',
+    'שש', 'שישה', 'שבע', 'שבעה',
+    'שמונה', 'תשע', 'תשעה', 'עשר',
+    'עשרה', 'עשרים', 'מאה', 'אלף',
+    'חצי', 'רבע',
+))
+# Parts of the day, which the time/date patterns leave to the words around them
+TIME_WORDS = frozenset((
+    'morning', 'afternoon', 'evening', 'night', 'tonight', 'noon', 'midnight', 'early', 'late',
+    'today', 'tomorrow', 'yesterday', 'weekend', 'now',
+    'בוקר', 'צהריים', 'ערב',
+    'לילה', 'היום', 'מחר', 'עכשיו',
+))
+_SALIENT_WORDS = NEGATIONS | NUMBER_WORDS | TIME_WORDS
+_FILLER = STOPWORDS - _SALIENT_WORDS
+# One-letter Hebrew prefixes written attached to a word ("בשלוש" = "at three")
+_HEBREW_PREFIXES = 'ובלמהכש'
+
+SalientTerms = Callable[[NormalizedMessage], Iterable[str]]
+
+
+@lru_cache(maxsize=65536)
+def _word_hashes(word: str) -> Tuple[int, ...]:
+    """The word under every hash of the family (words repeat a lot, so cached)"""
+    base = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+    return tuple((a * base + b) % _PRIME for a, b in _PERMUTATIONS)
+
+
+def _is_salient_word(token: str) -> bool:
+    """Negation, number (digits or spelled out) or time word, after up to two Hebrew prefixes"""
+    if token in _SALIENT_WORDS or any(char.isdigit() for char in token):
+        return True
+    # Hebrew words may carry up to two attached prefix letters
+    for _ in range(2):
+        if len(token) < 3 or token[0] not in _HEBREW_PREFIXES:
+            return False
+        token = token[1:]
+        if token in _SALIENT_WORDS:
+            return True
+    return False
+
+
+def _time_terms(normalized: NormalizedMessage) -> Iterable[str]:
+    """Times and dates found by the gazetteer's patterns ("5pm", "next Friday")"""
+    # Imported on first use: the gazetteer module loads mmap/argparse and the analyzer
+    from .gazetteer import find_patterns
+
+    return (' '.join(normalize(span.name).tokens) for span in find_patterns(normalized.text))
+
+
+def minhash(words: Iterable[str]) -> Tuple[int, ...]:
+    """MinHash signature of a word set (empty tuple for an empty set)"""
+    hashes = [_word_hashes(word) for word in set(words)]
+    if not hashes:
+        return ()
+    return tuple(map(min, *hashes)) if len(hashes) > 1 else hashes[0]
+
+
+class Signature:
+    """What the index compares about one message"""
+
+    __slots__ = ('content', 'salient', 'minhash')
+
+    def __init__(self, normalized: NormalizedMessage, salient: Optional[SalientTerms] = None):
+        self.content: FrozenSet[str] = frozenset(token for token in normalized.tokens if token not in _FILLER)
+        terms = {token for token in normalized.tokens if _is_salient_word(token)}
+        terms.update(_time_terms(normalized))
+        if salient is not None:
+            terms.update(normalize(term).folded for term in salient(normalized))
+        self.salient: FrozenSet[str] = frozenset(terms)
+        self.minhash = minhash(self.content)
+
+    def bands(self) -> List[Tuple[int, ...]]:
+        return [self.minhash[band * ROWS:(band + 1) * ROWS] for band in range(BANDS)]
+
+    def similarity(self, other: "Signature") -> float:
+        """Exact Jaccard similarity of the content-word sets"""
+        if not self.content and not other.content:
+            return 1.0
+        return len(self.content & other.content) / len(self.content | other.content)
+
+
+class DuplicateIndex:
+    """Clusters the messages of one batch window, in the order they are added"""
+
+    def __init__(self, min_similarity: float = 0.8, salient: Optional[SalientTerms] = None, max_candidates: int = 32):
+        """
+        Args:
+            min_similarity: Least Jaccard similarity of the content words of near duplicates
+            salient: Terms two messages must share exactly to be near
+                duplicates (e.g. extracted entity names); numbers and
+                negations always are
+            max_candidates: Most LSH candidates verified per message, which
+                bounds the cost when a band bucket grows large
+        """
+        if not 0 < min_similarity <= 1:
+            raise ValueError("min_similarity must be in (0, 1]")
+        self.min_similarity = min_similarity
+        self.salient = salient
+        self.max_candidates = max_candidates
+        self._exact: Dict[Tuple[str, ...], int] = {}
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(BANDS)]
+        self._signatures: Dict[int, Signature] = {}
+        self._count = 0
+        self.counters: Dict[str, int] = {'unique': 0, 'exact': 0, 'near': 0}
+        dedup = 'requirements_dedup_total'
+        dedup_help = 'Batch messages analyzed (unique) or answered from an exact or near duplicate'
+        self._metrics = {result: REGISTRY.counter(dedup, dedup_help, {'result': result}) for result in self.counters}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, message: Union[str, NormalizedMessage]) -> Tuple[int, bool]:
+        """
+        Add the next message of the window
+
+        Returns:
+            (index of its representative, True if it is a new representative);
+            indices count the messages added so far, starting at 0
+        """
+        normalized = normalize(message)
+        index = self._count
+        self._count += 1
+        representative = self._exact.get(normalized.tokens)
+        if representative is not None:
+            return self._found(representative, 'exact')
+        signature = Signature(normalized, self.salient)
+        # Messages of only filler words ("hi", "thanks") are matched exactly or not at all
+        if signature.content:
+            representative = self._near(signature)
+            if representative is not None:
+                self._exact[normalized.tokens] = representative
+                return self._found(representative, 'near')
+        self._exact[normalized.tokens] = index
+        if signature.content:
+            self._signatures[index] = signature
+            for band, buckets in zip(signature.bands(), self._buckets):
+                buckets.setdefault(band, []).append(index)
+        self.counters['unique'] += 1
+        self._metrics['unique'].inc()
+        return index, True
+
+    def _found(self, representative: int, kind: str) -> Tuple[int, bool]:
+        self.counters[kind] += 1
+        self._metrics[kind].inc()
+        return representative, False
+
+    def _near(self, signature: Signature) -> Optional[int]:
+        """First representative sharing an LSH band that passes the exact checks"""
+        seen = set()
+        size = len(signature.content)
+        min_similarity = self.min_similarity
+        for band, buckets in zip(signature.bands(), self._buckets):
+            for candidate in buckets.get(band, ()):
+                if candidate in seen:
+                    continue
+                if len(seen) >= self.max_candidates:
+                    return None
+                seen.add(candidate)
+                other = self._signatures[candidate]
+                # Jaccard can be at most the ratio of the set sizes
+                other_size = len(other.content)
+                if min(size, other_size) < min_similarity * max(size, other_size):
+                    continue
+                if signature.salient == other.salient and signature.similarity(other) >= min_similarity:
+                    return candidate
+        return None
+
+    def cluster(self, messages: Iterable[Union[str, NormalizedMessage]]) -> List[int]:
+        """Representative index of every message (a representative maps to itself)"""
+        return [self.add(message)[0] for message in messages]
+
+    def clear(self) -> None:
+        """Start a new window"""
+        self._exact.clear()
+        self._signatures.clear()
+        for buckets in self._buckets:
+            buckets.clear()
+        self._count = 0
+
+
+def representatives(clusters: Sequence[int]) -> List[int]:
+    """The distinct representatives in a `cluster()` result, in order"""
+    return [index for index, representative in enumerate(clusters) if index == representative]
@@ -0,0 +1,277 @@
+"""
+Events - publish analysis and validation results to Kafka
+
+Every worker process shares one `EventPublisher` wrapping one
+`kafka.KafkaProducer`, tuned for throughput:
+- `linger_ms` / `batch_size` let the producer group many events per request
+- lz4 (or zstd) compression of each batch
+- events are wire.py records (schema version 2), which consumers can
+  read lazily with `wire.ResultView` instead of decoding them in full
+
+`publish` does not wait for delivery: it appends to the producer's
+in-memory buffer, and delivery reports arrive through callbacks on the
+producer's I/O thread and update metrics. Appending can still block, for
+up to `max_block_ms`, while the buffer is full or topic metadata is
+missing, so coroutines hand a chunk to `publish_many` in a worker thread
+(tasks.py does) instead of calling it on the event loop. Publishing
+errors are logged and counted, never raised into the analysis.
+
+`InMemoryBroker` implements the part of the KafkaProducer interface the
+publisher uses, for tests and local runs (REQUIREMENTS_ANALYZER_KAFKA_BOOTSTRAP=memory).
+"""
+
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .metrics import REGISTRY
+from .wire import ResultView, encode_result
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_SCHEMA_VERSION = 2
+DEFAULT_TOPIC = 'requirements.analysis'
+
+# Event type codes on the wire
+EVENT_ANALYZED = 1
+EVENT_VALIDATED = 2
+EVENT_TYPES = {EVENT_ANALYZED: 'analyzed', EVENT_VALIDATED: 'validated'}
+
+
+def encode_event(result: Dict[str, Any], timestamp_ms: Optional[int] = None) -> bytes:
+    """
+    Encode a task result (see analyzer.analysis_result) as a binary event
+
+    The event is a wire.py record: validated events are the ones carrying
+    a 'validation' entry, the record timestamp is the event time.
+
+    Args:
+        result: Analysis result, with a 'validation' entry for validated events
+        timestamp_ms: Event time, defaults to now
+
+    Returns:
+        The encoded event
+    """
+    return encode_result(result, timestamp_ms)
+
+
+def decode_event(data: bytes) -> Dict[str, Any]:
+    """
+    Inverse of `encode_event`
+
+    Returns:
+        The result dict plus 'event_type', 'schema_version' and 'timestamp_ms'
+
+    Raises:
+        ValueError: On data that is not a wire.py record, an unknown
+            version or a truncated event
+    """
+    view = ResultView(data)
+    event = view.to_dict()
+    event['schema_version'] = EVENT_SCHEMA_VERSION
+    event['event_type'] = EVENT_TYPES[EVENT_VALIDATED if view.is_validated else EVENT_ANALYZED]
+    event['timestamp_ms'] = view.timestamp_ms
+    return event
+
+
+class EventPublisher:
+    """Fire-and-forget publishing of analysis events through one producer"""
+
+    def __init__(self, producer: Any, topic: str = DEFAULT_TOPIC):
+        """
+        Args:
+            producer: A kafka.KafkaProducer (or InMemoryBroker)
+            topic: Topic for analysis and validation events
+        """
+        self.producer = producer
+        self.topic = topic
+        labels = {'topic': topic}
+        self._sent = REGISTRY.counter('requirements_events_sent_total', 'Events handed to the producer', labels)
+        self._delivered = REGISTRY.counter('requirements_events_delivered_total', 'Events acknowledged by the broker', labels)
+        self._failed = REGISTRY.counter('requirements_events_failed_total', 'Events that could not be published', labels)
+
+    def publish(self, result: Dict[str, Any]) -> None:
+        """
+        Queue one analysis result for publishing without waiting for delivery
+
+        The conversation id is the message key, so all events of one
+        conversation land in the same partition, in order.
+        """
+        conversation_id = result.get('conversation_id')
+        key = None if conversation_id is None else str(conversation_id).encode('utf-8')
+        try:
+            future = self.producer.send(self.topic, key=key, value=encode_event(result))
+        except Exception:
+            # e.g. KafkaTimeoutError when the buffer stays full for max_block_ms
+            self._failed.inc()
+            logger.warning("Could not queue event for conversation %s", conversation_id, exc_info=True)
+            return
+        self._sent.inc()
+        future.add_callback(self._on_delivered)
+        future.add_errback(self._on_failed, conversation_id)
+
+    def publish_many(self, results: Iterable[Dict[str, Any]]) -> None:
+        """
+        Queue several results, in order
+
+        Blocks while the producer's buffer is full, so run it off the
+        event loop (e.g. `asyncio.to_thread`).
+        """
+        for result in results:
+            self.publish(result)
+
+    def _on_delivered(self, metadata: Any) -> None:
+        # Runs on the producer's I/O thread
+        self._delivered.inc()
+
+    def _on_failed(self, conversation_id: Any, error: BaseException) -> None:
+        self._failed.inc()
+        logger.error("Event for conversation %s was not delivered: %s", conversation_id, error)
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every queued event is delivered (or failed)"""
+        self.producer.flush(timeout=timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush and close the producer"""
+        self.producer.close(timeout=timeout)
+
+
+class _RecordMetadata:
+    __slots__ = ('topic', 'partition', 'offset')
+
+    def __init__(self, topic: str, partition: int, offset: int):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+
+class _SettledFuture:
+    """Already-completed stand-in for kafka's FutureRecordMetadata"""
+
+    def __init__(self, value: Any = None, error: Optional[BaseException] = None):
+        self.value = value
+        self.exception = error
+
+    def add_callback(self, callback: Callable[..., Any], *args: Any, **kwargs: Any) -> "_SettledFuture":
+        if self.exception is None:
+            callback(*args, self.value, **kwargs)
+        return self
+
+    def add_errback(self, errback: Callable[..., Any], *args: Any, **kwargs: Any) -> "_SettledFuture":
+        if self.exception is not None:
+            errback(*args, self.exception, **kwargs)
+        return self
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+class InMemoryBroker:
+    """In-process stand-in for KafkaProducer that keeps every record"""
+
+    def __init__(self) -> None:
+        self.records: Dict[str, List[Tuple[Optional[bytes], bytes]]] = {}
+        # Set to an exception to make the next sends fail delivery
+        self.fail_with: Optional[BaseException] = None
+        self.closed = False
+
+    def send(self, topic: str, value: bytes, key: Optional[bytes] = None) -> _SettledFuture:
+        if self.closed:
+            raise RuntimeError("Producer is closed")
+        if self.fail_with is not None:
+            return _SettledFuture(error=self.fail_with)
+        records = self.records.setdefault(topic, [])
+        records.append((key, value))
+        return _SettledFuture(_RecordMetadata(topic, 0, len(records) - 1))
+
+    def events(self, topic: str = DEFAULT_TOPIC) -> List[Dict[str, Any]]:
+        """Decoded events published to `topic`"""
+        return [decode_event(value) for _, value in self.records.get(topic, [])]
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        pass
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        self.closed = True
+
+
+def build_producer(
+    bootstrap_servers: str,
+    linger_ms: int = 20,
+    batch_size: int = 64 * 1024,
+    compression_type: Optional[str] = 'lz4',
+    acks: Any = 1,
+    max_block_ms: int = 1000,
+) -> Any:
+    """
+    Create a throughput-tuned kafka.KafkaProducer
+
+    Args:
+        bootstrap_servers: Comma-separated host:port list
+        linger_ms: How long the producer waits to fill a batch
+        batch_size: Bytes per partition batch
+        compression_type: 'lz4', 'zstd', 'gzip', 'snappy' or None
+            (lz4/zstd need the lz4/zstandard packages)
+        acks: 0, 1 or 'all'
+        max_block_ms: Upper bound on how long `send` may block when the
+            buffer is full or metadata is missing
+    """
+    from kafka import KafkaProducer
+
+    return KafkaProducer(
+        bootstrap_servers=bootstrap_servers.split(','),
+        linger_ms=linger_ms,
+        batch_size=batch_size,
+        compression_type=compression_type,
+        acks=acks,
+        max_block_ms=max_block_ms,
+    )
+
+
+_publisher: Optional[EventPublisher] = None
+_publisher_pid: Optional[int] = None
+
+
+def get_event_publisher() -> Optional[EventPublisher]:
+    """
+    Return this process's shared publisher, configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_KAFKA_BOOTSTRAP: broker list, 'memory' for an
+      InMemoryBroker, unset to disable publishing (returns None)
+    - REQUIREMENTS_ANALYZER_KAFKA_TOPIC: topic name
+    - REQUIREMENTS_ANALYZER_KAFKA_COMPRESSION: lz4 (default), zstd, gzip, snappy or none
+    - REQUIREMENTS_ANALYZER_KAFKA_LINGER_MS / REQUIREMENTS_ANALYZER_KAFKA_BATCH_BYTES
+    """
+    global _publisher, _publisher_pid
+    if _publisher is None or _publisher_pid != os.getpid():
+        # The producer's I/O thread does not survive a fork
+        bootstrap = os.getenv('REQUIREMENTS_ANALYZER_KAFKA_BOOTSTRAP', '')
+        if not bootstrap:
+            return None
+        topic = os.getenv('REQUIREMENTS_ANALYZER_KAFKA_TOPIC', DEFAULT_TOPIC)
+        if bootstrap == 'memory':
+            producer: Any = InMemoryBroker()
+        else:
+            compression = os.getenv('REQUIREMENTS_ANALYZER_KAFKA_COMPRESSION', 'lz4').lower()
+            producer = build_producer(
+                bootstrap,
+                linger_ms=int(os.getenv('REQUIREMENTS_ANALYZER_KAFKA_LINGER_MS', '20')),
+                batch_size=int(os.getenv('REQUIREMENTS_ANALYZER_KAFKA_BATCH_BYTES', str(64 * 1024))),
+                compression_type=None if compression == 'none' else compression,
+            )
+        _publisher = EventPublisher(producer, topic)
+        _publisher_pid = os.getpid()
+    return _publisher
+
+
+def close_event_publisher(timeout: Optional[float] = 10.0) -> None:
+    """Flush and close the shared publisher (call on worker shutdown)"""
+    global _publisher, _publisher_pid
+    if _publisher is not None and _publisher_pid == os.getpid():
+        _publisher.close(timeout=timeout)
+    _publisher = None
+    _publisher_pid = None
@@ -0,0 +1,151 @@
+"""
+Fake LLM Server - deterministic local stand-in for the OpenAI API
+
+Serves `POST /v1/chat/completions` in the OpenAI response format and
+answers the batched extraction prompts built by `llm.build_extraction_prompt`
+with simple keyword rules. Lets us benchmark the real HTTP path (pooled
+client, micro-batching, retries) offline and without cost.
+
+Run with:
+    python -m apps.requirements_analyzer.fake_llm_server [--port 8765] [--latency-ms 50]
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+from .classifier import URGENT_KEYWORDS, KeywordClassifier
+
+
+FAKE_INTENT_RULES: Dict[str, Tuple[str, ...]] = {
+    'find_route': ('route', 'routes', 'bus to', 'way to', 'get to', 'fastest'),
+    'bus_schedule': ('schedule', 'schedules', 'timetable', 'what time', 'running', 'when'),
+    'missed_bus': ('missed',),
+    'urgent_help': URGENT_KEYWORDS,
+}
+_fake_intents = KeywordClassifier(FAKE_INTENT_RULES)
+
+# Capitalized word runs ("Tel Aviv", "Jerusalem", "Saturday")
+_CAPITALIZED = re.compile(r"\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\b")
+_NOT_ENTITIES = frozenset({
+    'I', 'Is', 'Are', 'Can', 'Could', 'What', 'When', 'Where', 'How', 'Please', 'Kindly',
+    'Hello', 'Hi', 'Hey', 'Good', 'Thank', 'Thanks', 'Urgent', 'The', 'There',
+})
+_DATES = frozenset({
+    'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday', 'Today', 'Tomorrow',
+})
+
+
+def fake_extract(kind: str, message: str) -> List[Tuple[Any, ...]]:
+    """
+    Deterministic extraction used by the fake backend and the fake server
+
+    Args:
+        kind: 'intents' or 'entities'
+        message: The message to extract from
+
+    Returns:
+        (name, confidence) pairs for intents, (name, confidence, label)
+        for entities
+    """
+    if kind == 'intents':
+        return [(name, 0.9) for name, hit in _fake_intents.classify(message).items() if hit]
+    entities = []
+    for match in _CAPITALIZED.finditer(message):
+        words = [word for word in match.group().split() if word not in _NOT_ENTITIES]
+        if words:
+            name = ' '.join(words)
+            entities.append((name, 0.8, 'date' if name in _DATES else 'location'))
+    return entities
+
+
+class _FakeLLMHandler(BaseHTTPRequestHandler):
+    """Request handler speaking the subset of the chat completions API we use"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, so pooled clients can reuse connections
+
+    def do_POST(self) -> None:
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._reply(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            request = json.loads(body)
+            prompt = json.loads(request["messages"][-1]["content"])
+            kind, messages = prompt["kind"], prompt["messages"]
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            self._reply(400, {"error": {"message": f"Bad extraction prompt: {e}"}})
+            return
+
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        self.server.requests += 1
+        results = [
+            [dict(zip(("name", "confidence", "label"), item)) for item in fake_extract(kind, message)]
+            for message in messages
+        ]
+        self._reply(200, {
+            "id": f"fake-{self.server.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"results": results})},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _reply(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Silence per-request access logs; they would dominate benchmark output
+        pass
+
+
+def start_fake_server(host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the fake server on a background thread
+
+    Args:
+        host: Interface to bind
+        port: Port to bind, 0 picks a free one
+        latency_ms: Simulated model latency per request
+
+    Returns:
+        The running server and its OpenAI-style base URL
+    """
+    server = ThreadingHTTPServer((host, port), _FakeLLMHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, name='fake-llm-server', daemon=True).start()
+    bound_host, bound_port = server.server_address[:2]
+    return server, f"http://{bound_host}:{bound_port}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic local stand-in for the OpenAI API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args.host, args.port, args.latency_ms)
+    print(f"Fake LLM server listening on {base_url} (latency {args.latency_ms} ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,441 @@
+"""
+Gazetteer - local entity extraction from a memory-mapped place-name table
+
+Most entities in our traffic are city and stop names ("Tel Aviv",
+"Jerusalem Central Station"), days and times. `EntityExtractor` finds them
+without the LLM:
+- names come from a gazetteer compiled once (`build_gazetteer`, or the
+  `build` command below) into a binary file that every worker `mmap`s, so
+  all processes share one copy in the page cache and opening it costs the
+  same for 100 or 1,000,000 entries
+- the file is an open-addressing hash table of token prefixes: every prefix
+  of every name ("tel", "tel aviv", "tel aviv central", ...) is one fixed
+  16-byte slot (64-bit key, flags, label code, confidence), so a message is
+  matched in one left-to-right pass with at most one probe chain per token
+  and name length, never a scan of the gazetteer
+- times and dates ("17:30", "5pm", "Saturday", "tomorrow") come from
+  precompiled patterns
+
+File layout (little endian):
+
+    header   magic b'RAGZ', version u16, max tokens u16, slots u64,
+             entries u64, label table size u32
+    labels   UTF-8 label names joined by '\\n' (slot label code = position)
+    slots    (padded to 16 bytes) `slots` x <QHHf: key, flags, label, confidence
+
+Run with:
+    python -m apps.requirements_analyzer.gazetteer build data/places.tsv places.gaz
+    python -m apps.requirements_analyzer.gazetteer extract places.gaz "bus to Tel Aviv at 5pm"
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .analyzer import Entity
+from .normalization import NormalizedMessage, normalize
+
+
+MAGIC = b'RAGZ'
+VERSION = 1
+_HEADER = struct.Struct('<4sHHQQI')
+_SLOT = struct.Struct('<QHHf')
+
+# Slot flags: a name ends at this prefix / longer names continue it
+TERMINAL = 1
+PREFIX = 2
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'places.tsv')
+DEFAULT_CONFIDENCE = 0.95
+
+# One-letter Hebrew prepositions/conjunctions written attached to the next
+# word ("לתל אביב" = "to Tel Aviv"); at most two are stripped to find a name
+_HEBREW_PREFIXES = 'ובלמהכש'
+_MAX_PREFIXES = 2
+
+_WEEKDAYS = r"(?:mon|tues|wednes|thurs|fri|satur|sun)days?"
+_MONTHS = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+           r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+_DAY = r"(?:[12]\d|3[01]|0?[1-9])(?:st|nd|rd|th)?"
+# One scan finds both kinds; the named group is the entity label
+_PATTERNS = re.compile(
+    r"(?P<time>\b(?:(?:[01]?\d|2[0-3])[:.][0-5]\d(?:\s*[ap]\.?m\b\.?)?"
+    r"|(?:1[0-2]|0?[1-9])\s*[ap]\.?m\b\.?"
+    r"|noon|midnight)(?!\w))"
+    r"|(?P<date>\b(?:(?:next|this|last)\s+(?:" + _WEEKDAYS + r"|week(?:end)?)"
+    r"|" + _WEEKDAYS +
+    r"|today|tonight|tomorrow|yesterday|this\s+(?:morning|afternoon|evening)"
+    r"|" + _MONTHS + r"\s+" + _DAY +
+    r"|" + _DAY + r"\s+(?:of\s+)?" + _MONTHS +
+    r"|\d{1,2}[/.]\d{1,2}(?:[/.]\d{2,4})?)\b)"
+    # Hebrew days, after any attached prefix letters ("בשבת" = "on Saturday")
+    r"|(?P<date_he>(?<!\w)[" + _HEBREW_PREFIXES + r"]{0,2}(?P<date_he_word>היום|מחרתיים|מחר|הערב|הלילה|שבת"
+    r"|יום\s+(?:ראשון|שני|שלישי|רביעי|חמישי|שישי))(?!\w))",
+    re.IGNORECASE,
+)
+PATTERN_CONFIDENCE = {'time': 0.9, 'date': 0.9}
+# Pattern group -> (entity label, group holding the entity text)
+_PATTERN_GROUPS = {'time': ('time', 'time'), 'date': ('date', 'date'), 'date_he': ('date', 'date_he_word')}
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalized tokens of a name or message (see normalization.py)"""
+    return list(normalize(text).tokens)
+
+
+def prefix_key(tokens: Iterable[str]) -> int:
+    """Stable 64-bit slot key of a token sequence (never 0, which marks an empty slot)"""
+    digest = hashlib.blake2b(' '.join(tokens).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class EntitySpan:
+    """An entity found in a message, with its character offsets"""
+
+    __slots__ = ('name', 'label', 'confidence', 'start', 'end')
+
+    def __init__(self, name: str, label: str, confidence: float, start: int, end: int):
+        self.name = name
+        self.label = label
+        self.confidence = confidence
+        self.start = start
+        self.end = end
+
+    def to_entity(self) -> Entity:
+        return Entity(self.name, self.confidence, self.label)
+
+    def __repr__(self) -> str:
+        return f"EntitySpan({self.name!r}, {self.label!r}, {self.confidence}, {self.start}, {self.end})"
+
+
+def read_entries(path: str) -> Iterable[Tuple[str, str, float]]:
+    """
+    Read a gazetteer source: one `name<TAB>label[<TAB>confidence]` per line
+
+    Blank lines and lines starting with '#' are skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{number}: expected name<TAB>label[<TAB>confidence]")
+            confidence = float(fields[2]) if len(fields) > 2 and fields[2] else DEFAULT_CONFIDENCE
+            yield fields[0], fields[1], confidence
+
+
+def build_gazetteer(entries: Iterable[Tuple[str, str, float]], path: str, load_factor: float = 0.5) -> int:
+    """
+    Compile (name, label, confidence) entries into a gazetteer file
+
+    Args:
+        entries: Names with their entity label and confidence; a name listed
+            twice keeps its most confident entry
+        path: Output file, written atomically (workers may be mapping the old one)
+        load_factor: Maximum fraction of occupied slots, in (0, 1)
+
+    Returns:
+        Number of distinct names written
+
+    Raises:
+        ValueError: On a load factor outside (0, 1), too many labels or a
+            name longer than 65535 tokens
+    """
+    if not 0 < load_factor < 1:
+        # Lookups stop at the first empty slot; a full table never has one
+        raise ValueError(f"load_factor must be between 0 and 1 (exclusive), got {load_factor}")
+    labels: Dict[str, int] = {}
+    # key -> [flags, label code, confidence]
+    table: Dict[int, List] = {}
+    names = 0
+    max_tokens = 0
+    for name, label, confidence in entries:
+        tokens = tokenize(name)
+        if not tokens:
+            continue
+        if len(tokens) > 0xFFFF:
+            raise ValueError(f"Name too long for the gazetteer: {name[:50]!r}")
+        code = labels.setdefault(label, len(labels))
+        max_tokens = max(max_tokens, len(tokens))
+        for length in range(1, len(tokens)):
+            slot = table.setdefault(prefix_key(tokens[:length]), [0, 0, 0.0])
+            slot[0] |= PREFIX
+        slot = table.setdefault(prefix_key(tokens), [0, 0, 0.0])
+        if not slot[0] & TERMINAL:
+            names += 1
+        if not slot[0] & TERMINAL or confidence > slot[2]:
+            slot[1], slot[2] = code, confidence
+        slot[0] |= TERMINAL
+    if len(labels) > 0xFFFF:
+        raise ValueError("A gazetteer supports at most 65535 labels")
+
+    slot_count = 8
+    while slot_count * load_factor < len(table):
+        slot_count *= 2
+    mask = slot_count - 1
+    label_block = '\n'.join(sorted(labels, key=labels.get)).encode('utf-8')
+    offset = _HEADER.size + len(label_block)
+    offset += -offset % 16
+    data = bytearray(offset + slot_count * _SLOT.size)
+    _HEADER.pack_into(data, 0, MAGIC, VERSION, max_tokens, slot_count, names, len(label_block))
+    data[_HEADER.size:_HEADER.size + len(label_block)] = label_block
+    occupied = bytearray(slot_count)
+    for key, (flags, code, confidence) in table.items():
+        index = key & mask
+        while occupied[index]:
+            index = (index + 1) & mask
+        occupied[index] = 1
+        _SLOT.pack_into(data, offset + index * _SLOT.size, key, flags, code, confidence)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    return names
+
+
+class Gazetteer:
+    """Read-only, memory-mapped view of a compiled gazetteer file"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: File written by `build_gazetteer`
+
+        Raises:
+            ValueError: If the file is not a gazetteer of this version
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            # The mapping stays valid after the file is closed (or replaced)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} is not a gazetteer file")
+        magic, version, max_tokens, slot_count, names, label_size = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} gazetteer file")
+        self.max_tokens = max_tokens
+        self.slot_count = slot_count
+        self.names = names
+        label_block = self._map[_HEADER.size:_HEADER.size + label_size].decode('utf-8')
+        self.labels: List[str] = label_block.split('\n') if label_block else []
+        offset = _HEADER.size + label_size
+        self._offset = offset + (-offset % 16)
+        self._mask = slot_count - 1
+        if len(self._map) < self._offset + slot_count * _SLOT.size:
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self) -> int:
+        return self.names
+
+    def _probe(self, key: int) -> Optional[Tuple[int, int, int, float]]:
+        """(key, flags, label code, confidence) of a prefix key, or None"""
+        unpack = _SLOT.unpack_from
+        data, offset, mask = self._map, self._offset, self._mask
+        index = key & mask
+        while True:
+            slot = unpack(data, offset + index * 16)
+            if slot[0] == key:
+                return slot
+            if not slot[0]:
+                return None
+            index = (index + 1) & mask
+
+    def lookup(self, name: str) -> Optional[Tuple[str, float]]:
+        """(label, confidence) of an exact name, or None"""
+        tokens = tokenize(name)
+        slot = self._probe(prefix_key(tokens)) if tokens else None
+        if slot is None or not slot[1] & TERMINAL:
+            return None
+        return self.labels[slot[2]], round(slot[3], 4)
+
+    def _longest(self, tokens: Sequence[str], position: int, first: str) -> Optional[Tuple[int, Tuple]]:
+        """(last token, slot) of the longest name starting at `position` with `first` as its first token"""
+        best = None
+        prefix = [first]
+        probe = self._probe
+        # Extend while longer names continue this prefix; bounded by max_tokens
+        for end in range(position, min(len(tokens), position + self.max_tokens)):
+            if end > position:
+                prefix.append(tokens[end])
+            slot = probe(prefix_key(prefix))
+            if slot is None:
+                break
+            if slot[1] & TERMINAL:
+                best = (end, slot)
+            if not slot[1] & PREFIX:
+                break
+        return best
+
+    def find(self, message: Union[str, NormalizedMessage]) -> List[EntitySpan]:
+        """
+        Longest non-overlapping name matches, scanning the message once from the left
+
+        Offsets refer to the normalized text of the message.
+        """
+        normalized = normalize(message)
+        text, tokens, offsets = normalized.text, normalized.tokens, normalized.spans
+        spans: List[EntitySpan] = []
+        position = 0
+        while position < len(tokens):
+            token = tokens[position]
+            best = self._longest(tokens, position, token)
+            stripped = 0
+            while (best is None and stripped < _MAX_PREFIXES and len(token) - stripped > 2
+                   and token[stripped] in _HEBREW_PREFIXES):
+                stripped += 1
+                best = self._longest(tokens, position, token[stripped:])
+            if best is None:
+                position += 1
+                continue
+            end, slot = best
+            start_char, end_char = offsets[position][0], offsets[end][1]
+            for _ in range(stripped):
+                # Skip a prefix letter and the niqqud written on it
+                start_char += 1
+                while unicodedata.combining(text[start_char]):
+                    start_char += 1
+            spans.append(EntitySpan(text[start_char:end_char], self.labels[slot[2]],
+                                    round(slot[3], 4), start_char, end_char))
+            position = end + 1
+        return spans
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "Gazetteer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def find_patterns(text: str) -> List[EntitySpan]:
+    """Times and dates matched by the precompiled patterns"""
+    spans = []
+    for match in _PATTERNS.finditer(text):
+        label, group = _PATTERN_GROUPS[match.lastgroup]
+        start, end = match.span(group)
+        spans.append(EntitySpan(text[start:end], label, PATTERN_CONFIDENCE[label], start, end))
+    return spans
+
+
+class EntityExtractor:
+    """Gazetteer names plus time/date patterns, merged into non-overlapping spans"""
+
+    def __init__(self, gazetteer: Optional[Gazetteer] = None, patterns: bool = True):
+        """
+        Args:
+            gazetteer: Compiled name table; names are not matched without one
+            patterns: Also match times and dates
+        """
+        self.gazetteer = gazetteer
+        self.patterns = patterns
+
+    def extract(self, message: Union[str, NormalizedMessage]) -> List[EntitySpan]:
+        """Entity spans in order of the normalized text; on overlap the longer span wins"""
+        normalized = normalize(message)
+        if not normalized.tokens:
+            return []
+        candidates = self.gazetteer.find(normalized) if self.gazetteer is not None else []
+        if self.patterns:
+            candidates.extend(find_patterns(normalized.text))
+        candidates.sort(key=lambda span: (span.start, span.start - span.end))
+        spans: List[EntitySpan] = []
+        for span in candidates:
+            if spans and span.start < spans[-1].end:
+                if span.end - span.start <= spans[-1].end - spans[-1].start:
+                    continue
+                spans.pop()
+            spans.append(span)
+        return spans
+
+    def entities(self, message: Union[str, NormalizedMessage]) -> List[Entity]:
+        """The extracted spans as analyzer entities"""
+        return [span.to_entity() for span in self.extract(message)]
+
+
+def compiled_path(source: str, cache_dir: Optional[str] = None) -> str:
+    """Compile a TSV source once into the cache directory and return the compiled file"""
+    stat = os.stat(source)
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'requirements_analyzer')
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    # Keyed by source identity, so an edited source is recompiled
+    tag = hashlib.blake2b(f'{os.path.abspath(source)}:{stat.st_size}:{stat.st_mtime_ns}:{VERSION}'.encode(),
+                          digest_size=8).hexdigest()
+    path = os.path.join(cache_dir, f'{stem}-{tag}.gaz')
+    if not os.path.exists(path):
+        build_gazetteer(read_entries(source), path)
+    return path
+
+
+_default_extractor: Optional[EntityExtractor] = None
+
+
+def get_default_entity_extractor() -> Optional[EntityExtractor]:
+    """
+    Return the process-wide extractor configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_GAZETTEER: compiled gazetteer file, or a TSV
+      source compiled once into the cache directory (defaults to the bundled
+      data/places.tsv); 'off' disables local entity extraction (returns None)
+    - REQUIREMENTS_ANALYZER_CACHE_DIR: where compiled TSV sources are kept
+    """
+    global _default_extractor
+    source = os.getenv('REQUIREMENTS_ANALYZER_GAZETTEER', DEFAULT_SOURCE)
+    if source.lower() in ('off', '0', 'false', 'no'):
+        return None
+    if _default_extractor is None:
+        path = source
+        if not source.endswith('.gaz'):
+            path = compiled_path(source, os.getenv('REQUIREMENTS_ANALYZER_CACHE_DIR'))
+        _default_extractor = EntityExtractor(Gazetteer(path))
+    return _default_extractor
+
+
+def _load_factor(value: str) -> float:
+    load_factor = float(value)
+    if not 0 < load_factor < 1:
+        raise argparse.ArgumentTypeError(f"must be between 0 and 1 (exclusive), got {value}")
+    return load_factor
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile and query entity gazetteers")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="compile a name<TAB>label[<TAB>confidence] file")
+    build.add_argument('source')
+    build.add_argument('output')
+    build.add_argument('--load-factor', type=_load_factor, default=0.5)
+    extract = commands.add_parser('extract', help="print the entities found in a message")
+    extract.add_argument('gazetteer')
+    extract.add_argument('message')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        names = build_gazetteer(read_entries(args.source), args.output, args.load_factor)
+        print(f"Wrote {names} names to {args.output} ({os.path.getsize(args.output):,} bytes)")
+        return 0
+    with Gazetteer(args.gazetteer) as gazetteer:
+        for span in EntityExtractor(gazetteer).extract(args.message):
+            print(f"{span.start:>4}-{span.end:<4} {span.label:<10} {span.confidence:.2f}  {span.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,334 @@
+"""
+Intent Index - local nearest-prototype intent classifier (fast path before the LLM)
+
+Most traffic in our domain is a handful of repetitive intents ("when is the
+next bus", "I missed my bus"). `IntentIndex` recognizes those locally:
+- `HashingVectorizer` turns text into sparse hashed word, word-bigram and
+  character n-gram features (CRC32, so vectors are identical in every
+  process), IDF-weighted and L2-normalized; no model files, CPU only
+- every example phrase of every intent is a row of one float32 prototype
+  matrix
+- a message is split into sentences, all sentences of a batch are scored
+  against all prototypes with one matrix product, and an intent's
+  confidence is its best cosine similarity
+
+A message is answered locally only when every sentence clears the
+threshold; otherwise `match` returns None and the caller asks the LLM.
+"""
+
+import os
+import re
+import zlib
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .analyzer import Intent
+from .normalization import NormalizedMessage
+
+
+# Prototype phrases per intent; NO_INTENT examples are confidently "no intent"
+NO_INTENT = 'none'
+DEFAULT_INTENT_EXAMPLES: Dict[str, Tuple[str, ...]] = {
+    'find_route': (
+        "I need a bus to Tel Aviv",
+        "how do I get to the central station",
+        "find me the fastest route to the beach",
+        "which bus goes to Jerusalem",
+        "what is the best way to get to the airport",
+        "route from Haifa to Tel Aviv",
+    ),
+    'bus_schedule': (
+        "when is the next bus",
+        "what time does the bus leave",
+        "is there a bus running on Saturday",
+        "is this route still running this evening",
+        "provide information about bus schedules",
+        "can you help me find bus schedules",
+        "what are the routes and timetables",
+    ),
+    'missed_bus': (
+        "I missed my bus",
+        "I missed my bus what should I do",
+        "the bus left without me",
+        "my bus already left",
+    ),
+    'urgent_help': (
+        "urgent",
+        "this is urgent",
+        "I need it ASAP",
+        "right now immediately",
+        "this is critical",
+        "it is important",
+    ),
+    NO_INTENT: (
+        "hello",
+        "good morning",
+        "thank you",
+        "thank you for your help",
+        "thanks",
+    ),
+}
+
+_WORDS = re.compile(r"\w+")
+_SENTENCES = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class HashingVectorizer:
+    """Hashed word, word-bigram and character n-gram features"""
+
+    def __init__(self, n_features: int = 1 << 14, char_ngrams: Tuple[int, int] = (3, 4)):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.n_features = n_features
+        self.char_ngrams = char_ngrams
+        self._mask = n_features - 1
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.cache_size = 100_000
+        self._cache: Dict[object, Tuple[Tuple[int, ...], Tuple[float, ...]]] = {}
+
+    def features(self, text: str) -> List[str]:
+        """Feature strings of one text (before hashing)"""
+        words = _WORDS.findall(text.lower())
+        features = ['w:' + word for word in words]
+        features.extend(f'b:{first} {second}' for first, second in zip(words, words[1:]))
+        low, high = self.char_ngrams
+        for word in words:
+            padded = f' {word} '
+            for n in range(low, high + 1):
+                features.extend('c:' + padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def _hash(self, features: Iterable[str]) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+        indices, signs = [], []
+        mask = self._mask
+        for feature in features:
+            h = zlib.crc32(feature.encode('utf-8'))
+            indices.append(h & mask)
+            # The top bit picks the sign, so collisions tend to cancel out
+            signs.append(-1.0 if h & 0x80000000 else 1.0)
+        return tuple(indices), tuple(signs)
+
+    def _indices(self, text: str) -> Tuple[List[int], List[float]]:
+        """Hashed feature indices and signs of one text"""
+        # Words repeat constantly in our traffic, so the hashed features of
+        # each word (and word pair) are computed once and cached
+        cache = self._cache
+        if len(cache) > self.cache_size:
+            cache.clear()
+        indices: List[int] = []
+        signs: List[float] = []
+        words = _WORDS.findall(text.lower())
+        low, high = self.char_ngrams
+        for i, word in enumerate(words):
+            hashed = cache.get(word)
+            if hashed is None:
+                padded = f' {word} '
+                features = ['w:' + word]
+                for n in range(low, high + 1):
+                    features.extend('c:' + padded[j:j + n] for j in range(len(padded) - n + 1))
+                hashed = cache[word] = self._hash(features)
+            indices.extend(hashed[0])
+            signs.extend(hashed[1])
+            if i:
+                pair = (words[i - 1], word)
+                hashed = cache.get(pair)
+                if hashed is None:
+                    hashed = cache[pair] = self._hash([f'b:{pair[0]} {word}'])
+                indices.extend(hashed[0])
+                signs.extend(hashed[1])
+        return indices, signs
+
+    def fit_idf(self, documents: Iterable[str]) -> None:
+        """Weight features by inverse document frequency over `documents`"""
+        frequency = np.zeros(self.n_features, dtype=np.float32)
+        count = 0
+        for document in documents:
+            indices, _ = self._indices(document)
+            frequency[np.unique(np.asarray(indices, dtype=np.intp))] += 1
+            count += 1
+        # Unseen features get the highest weight: they make a message less like any prototype
+        self.idf = (np.log((1 + count) / (1 + frequency)) + 1).astype(np.float32)
+
+    def transform_sparse(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        L2-normalized vectors of `texts` in coordinate form
+
+        Returns:
+            (rows, columns, values), sorted by row then column, without
+            duplicate (row, column) pairs
+        """
+        rows: List[int] = []
+        columns: List[int] = []
+        signs: List[float] = []
+        for row, text in enumerate(texts):
+            indices, text_signs = self._indices(text)
+            rows.extend([row] * len(indices))
+            columns.extend(indices)
+            signs.extend(text_signs)
+        # Sum repeated features: unique (row, column) keys, signs added up per key
+        keys, inverse = np.unique(
+            np.asarray(rows, dtype=np.int64) * self.n_features + np.asarray(columns, dtype=np.int64),
+            return_inverse=True,
+        )
+        values = np.bincount(inverse, weights=np.asarray(signs, dtype=np.float64)).astype(np.float32)
+        unique_rows = (keys // self.n_features).astype(np.intp)
+        unique_columns = (keys % self.n_features).astype(np.intp)
+        values *= self.idf[unique_columns]
+        norms = np.sqrt(np.bincount(unique_rows, weights=values.astype(np.float64) ** 2, minlength=len(texts)))
+        norms[norms == 0] = 1.0
+        values /= norms[unique_rows].astype(np.float32)
+        return unique_rows, unique_columns, values
+
+    def transform(self, texts: Sequence[str]) -> np.ndarray:
+        """L2-normalized (len(texts), n_features) dense float32 matrix"""
+        matrix = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        rows, columns, values = self.transform_sparse(texts)
+        matrix[rows, columns] = values
+        return matrix
+
+
+def split_sentences(message: str) -> List[str]:
+    """Non-empty sentences of a message"""
+    return [sentence for sentence in _SENTENCES.split(message) if sentence.strip()]
+
+
+class IntentIndex:
+    """Cosine nearest-prototype intent matcher with an ambiguity fallback"""
+
+    def __init__(
+        self,
+        examples: Mapping[str, Sequence[str]] = DEFAULT_INTENT_EXAMPLES,
+        threshold: float = 0.5,
+        min_score: float = 0.3,
+        vectorizer: Optional[HashingVectorizer] = None,
+    ):
+        """
+        Args:
+            examples: Prototype phrases per intent (NO_INTENT for "no intent")
+            threshold: Cosine similarity a sentence's best intent needs for a
+                local answer
+            min_score: Similarity at which further intents of a confidently
+                matched sentence are reported too ("bus to Tel Aviv ASAP")
+            vectorizer: Feature extractor, a default HashingVectorizer if None
+
+        Raises:
+            ValueError: If there are no intents or an intent has no examples
+        """
+        empty = sorted(label for label, phrases in examples.items() if not phrases)
+        if empty:
+            # Its column range would be empty, and reduceat would score it
+            # (and shift its neighbours) with the next label's prototypes
+            raise ValueError(f"Intents without example phrases: {', '.join(empty)}")
+        if not examples:
+            raise ValueError("At least one intent with example phrases is required")
+        self.threshold = threshold
+        self.min_score = min(min_score, threshold)
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.labels: List[str] = sorted(examples)
+        phrases: List[str] = []
+        owners: List[int] = []
+        for code, label in enumerate(self.labels):
+            for phrase in examples[label]:
+                phrases.append(phrase)
+                owners.append(code)
+        self.vectorizer.fit_idf(phrases)
+        # (n_features, n_prototypes): a sentence's scores are the weighted
+        # sum of the rows of its (few) non-zero features
+        self._prototypes_t = np.ascontiguousarray(self.vectorizer.transform(phrases).T)
+        # Prototypes are grouped by label, so each label is one column range
+        self._label_starts = np.searchsorted(np.asarray(owners, dtype=np.intp), np.arange(len(self.labels)))
+
+    def _label_scores(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), len(labels)) best similarity of each text to each label"""
+        rows, columns, values = self.vectorizer.transform_sparse(texts)
+        # Sparse-dense product: scatter each feature's prototype row into its text's row
+        similarities = np.zeros((len(texts), self._prototypes_t.shape[1]), dtype=np.float32)
+        if len(rows):
+            contributions = self._prototypes_t[columns] * values[:, None]
+            starts = np.flatnonzero(np.diff(rows, prepend=-1))
+            similarities[rows[starts]] = np.add.reduceat(contributions, starts, axis=0)
+        return np.maximum.reduceat(similarities, self._label_starts, axis=1)
+
+    def match_batch(self, messages: Sequence[Union[str, NormalizedMessage]]) -> List[Optional[List[Intent]]]:
+        """
+        Match many messages with one scoring pass (normalized messages are
+        matched on their case-folded text)
+
+        Returns:
+            Per message: the detected intents (possibly empty) when every
+            sentence is confidently matched, None when the message is
+            ambiguous and should go to the LLM
+        """
+        sentences: List[str] = []
+        owners: List[int] = []
+        for index, message in enumerate(messages):
+            text = message.folded if isinstance(message, NormalizedMessage) else message or ''
+            for sentence in split_sentences(text):
+                sentences.append(sentence)
+                owners.append(index)
+        results: List[Optional[List[Intent]]] = [[] for _ in messages]
+        if not sentences:
+            return results
+        scores = self._label_scores(sentences)
+        confident = scores.max(axis=1) >= self.threshold
+        reported = scores >= self.min_score
+        best: List[Dict[str, float]] = [{} for _ in messages]
+        for row, index in enumerate(owners):
+            if results[index] is None:
+                continue
+            if not confident[row]:
+                results[index] = None
+                continue
+            found = best[index]
+            for code in np.flatnonzero(reported[row]):
+                label = self.labels[code]
+                if label != NO_INTENT:
+                    score = float(scores[row, code])
+                    if score > found.get(label, 0.0):
+                        found[label] = score
+        for index, found in enumerate(best):
+            if results[index] is not None:
+                results[index] = [Intent(label, round(score, 4)) for label, score in sorted(found.items())]
+        return results
+
+    def match(self, message: Union[str, NormalizedMessage]) -> Optional[List[Intent]]:
+        """Intents of one message, or None when it needs the LLM"""
+        return self.match_batch([message])[0]
+
+    def rank(self, message: Union[str, NormalizedMessage]) -> List[Intent]:
+        """
+        Best-effort intents of one message, without the ambiguity check
+
+        For degraded mode (see resilience.LocalFallback): every intent whose
+        best sentence score reaches min_score, even when no sentence is
+        confident enough for `match`.
+        """
+        text = message.folded if isinstance(message, NormalizedMessage) else message or ''
+        sentences = split_sentences(text)
+        if not sentences:
+            return []
+        scores = self._label_scores(sentences).max(axis=0)
+        return [
+            Intent(label, round(float(score), 4))
+            for label, score in zip(self.labels, scores)
+            if label != NO_INTENT and score >= self.min_score
+        ]
+
+
+_default_index: Optional[IntentIndex] = None
+
+
+def get_default_intent_index() -> Optional[IntentIndex]:
+    """
+    Return the process-wide index configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_INTENT_INDEX: 'on' (default) or 'off' (returns None)
+    - REQUIREMENTS_ANALYZER_INTENT_THRESHOLD: similarity for a local answer
+    """
+    global _default_index
+    if os.getenv('REQUIREMENTS_ANALYZER_INTENT_INDEX', 'on').lower() in ('off', '0', 'false', 'no'):
+        return None
+    if _default_index is None:
+        _default_index = IntentIndex(threshold=float(os.getenv('REQUIREMENTS_ANALYZER_INTENT_THRESHOLD', '0.5')))
+    return _default_index
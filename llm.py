@@ -0,0 +1,407 @@
+"""
+LLM Backend - pluggable extraction backends for RequirementsAnalyzer
+
+This module is the layer between `RequirementsAnalyzer.extract_intents` /
+`extract_entities` and the language model:
+- `LLMBackend` is the interface every backend implements
+- `OpenAIBackend` talks to OpenAI/Azure OpenAI (or any compatible server)
+  through ONE pooled async HTTP client per process and event loop
+- `BatchingBackend` merges extraction prompts that arrive within a few
+  milliseconds into one request
+- `FakeLLMBackend` is a deterministic in-process stand-in for tests and
+  offline benchmarks (see `fake_llm_server.py` for the HTTP version)
+- `get_default_backend` guards real backends with `resilience.ResilientBackend`
+  (adaptive concurrency limit, deadlines, circuit breaker, local fallback)
+
+Heavy dependencies (openai, httpx) are only imported on first use.
+"""
+
+import asyncio
+import json
+import os
+import random
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple, Type, TypeVar
+
+
+# One extraction result: (name, confidence) pairs, confidence between 0 and 1;
+# entities may carry a third item, their label ("location", "date", "time")
+Extraction = List[Tuple[Any, ...]]
+
+EXTRACTION_KINDS = ('intents', 'entities')
+
+
+class DegradedExtraction(list):
+    """An extraction answered without the provider (stale, local or empty, see resilience.py)"""
+
+T = TypeVar('T')
+
+
+class LLMBackendError(Exception):
+    """Raised when a backend returns an unusable response"""
+
+
+class LLMBackend(ABC):
+    """Interface for LLM extraction backends"""
+
+    @abstractmethod
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        """
+        Extract intents or entities for several messages in one call
+
+        Args:
+            kind: 'intents' or 'entities'
+            messages: Messages to extract from
+
+        Returns:
+            One extraction per message, in input order
+        """
+        pass
+
+    async def extract(self, kind: str, message: str) -> Extraction:
+        """Extract intents or entities from a single message"""
+        results = await self.extract_batch(kind, [message])
+        return results[0]
+
+    async def aclose(self) -> None:
+        """Release resources held by the backend"""
+        return None
+
+
+# Transport failures of the HTTP stack (openai, httpx), matched by class
+# name so checking an error never imports them
+_TRANSIENT_ERROR_NAMES = frozenset({'APIConnectionError', 'APITimeoutError', 'TimeoutException', 'TransportError'})
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of an SDK/httpx error, if it carries one"""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether a failed call is worth retrying
+
+    Timeouts, connection errors, rate limiting (429) and server errors (5xx)
+    are; bad requests, authentication errors and malformed answers are not.
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    status = _status_code(error)
+    return status is not None and (status == 429 or status >= 500)
+
+
+async def retry_with_backoff(
+    call: Callable[[], Awaitable[T]],
+    attempts: int = 4,
+    base_delay: float = 0.2,
+    max_delay: float = 5.0,
+    retry_on: Optional[Tuple[Type[BaseException], ...]] = None,
+) -> T:
+    """
+    Await `call()` and retry failures with full-jitter exponential backoff
+
+    Args:
+        call: Zero-argument coroutine factory, called once per attempt
+        attempts: Total number of attempts
+        base_delay: Backoff base in seconds
+        max_delay: Upper bound for a single sleep in seconds
+        retry_on: Exception types worth retrying, defaults to transient
+            errors (see `is_transient_error`)
+
+    Returns:
+        The result of the first successful attempt
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except Exception as e:
+            retryable = isinstance(e, retry_on) if retry_on is not None else is_transient_error(e)
+            if not retryable or attempt == attempts - 1:
+                raise
+            # Full jitter spreads retries out so a provider hiccup does not
+            # turn into a synchronized retry storm from every worker
+            await asyncio.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+    raise RuntimeError("unreachable")
+
+
+SYSTEM_PROMPT = (
+    "You extract {kind} from bus passenger messages. "
+    "The user sends a JSON object with a list of messages. "
+    'Answer with a JSON object {{"results": [...]}} holding one list per message, in order, '
+    'each item being {{"name": str, "confidence": float between 0 and 1}}. '
+    'Entities also have a "label": one of "location", "date", "time" or "other".'
+)
+
+
+def build_extraction_prompt(kind: str, messages: Sequence[str]) -> List[Dict[str, str]]:
+    """Build the chat messages for one batched extraction request"""
+    if kind not in EXTRACTION_KINDS:
+        raise ValueError(f"Unknown extraction kind: {kind!r}")
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT.format(kind=kind)},
+        {"role": "user", "content": json.dumps({"kind": kind, "messages": list(messages)}, ensure_ascii=False)},
+    ]
+
+
+def parse_extraction_response(content: str, count: int) -> List[Extraction]:
+    """
+    Parse a batched extraction answer
+
+    Args:
+        content: Raw model output
+        count: Number of messages that were sent
+
+    Returns:
+        One extraction per message
+
+    Raises:
+        LLMBackendError: On an answer that is not the expected JSON shape
+    """
+    try:
+        results = json.loads(content)["results"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise LLMBackendError(f"Malformed extraction response: {e}") from e
+    if not isinstance(results, list) or len(results) != count:
+        raise LLMBackendError(f"Expected {count} results, got {len(results) if isinstance(results, list) else results!r}")
+    parsed: List[Extraction] = []
+    try:
+        for items in results:
+            extraction: Extraction = []
+            for item in items or []:
+                confidence = min(max(float(item.get("confidence", 0.0)), 0.0), 1.0)
+                if item.get("label"):
+                    extraction.append((str(item["name"]), confidence, str(item["label"])))
+                else:
+                    extraction.append((str(item["name"]), confidence))
+            parsed.append(extraction)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        # e.g. an item that is not an object, or a confidence like "high"
+        raise LLMBackendError(f"Malformed extraction item: {e!r}") from e
+    return parsed
+
+
+# One client per event loop, per process. httpx pools are bound to the loop
+# they were created on; keying on the loop also means a forked worker never
+# reuses its parent's sockets.
+_shared_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[Any, ...], Any]]" = weakref.WeakKeyDictionary()
+
+
+def get_shared_client(
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    max_connections: int = 100,
+    timeout: float = 30.0,
+) -> Any:
+    """
+    Return the process-wide pooled `AsyncOpenAI` client for the running loop
+
+    Args:
+        api_key: API key, defaults to OPENAI_API_KEY
+        base_url: API base URL, defaults to the OpenAI endpoint
+        max_connections: Size of the keep-alive connection pool
+        timeout: Request timeout in seconds
+
+    Returns:
+        A shared `openai.AsyncOpenAI` instance
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    clients = _shared_clients.setdefault(loop, {})
+    key = (api_key, base_url, os.getpid())
+    client = clients.get(key)
+    if client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        # Retries are handled by retry_with_backoff, not by the SDK
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+        clients[key] = client
+    return client
+
+
+class OpenAIBackend(LLMBackend):
+    """Extraction through the OpenAI chat completions API"""
+
+    def __init__(
+        self,
+        model: str = "gpt-3.5-turbo",
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_connections: int = 100,
+        timeout: float = 30.0,
+        attempts: int = 4,
+    ):
+        self.model = model
+        self.api_key = api_key or os.getenv('OPENAI_API_KEY')
+        self.base_url = base_url or os.getenv('OPENAI_BASE_URL')
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.attempts = attempts
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        if not messages:
+            return []
+        client = get_shared_client(self.api_key, self.base_url, self.max_connections, self.timeout)
+        prompt = build_extraction_prompt(kind, messages)
+
+        async def call() -> List[Extraction]:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=prompt,
+                temperature=0,
+                response_format={"type": "json_object"},
+            )
+            return parse_extraction_response(response.choices[0].message.content or "", len(messages))
+
+        return await retry_with_backoff(call, attempts=self.attempts)
+
+
+class BatchingBackend(LLMBackend):
+    """Merges extraction calls arriving within `max_wait_ms` into one request"""
+
+    def __init__(self, backend: LLMBackend, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """
+        Args:
+            backend: Backend that receives the merged batches
+            max_batch_size: Flush as soon as this many messages are waiting
+            max_wait_ms: Flush at the latest this long after the first message
+        """
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {kind: [] for kind in EXTRACTION_KINDS}
+        self._timers: Dict[str, Optional[asyncio.TimerHandle]] = dict.fromkeys(EXTRACTION_KINDS)
+        # The loop only keeps weak references to tasks: an unreferenced send
+        # could be garbage-collected mid-flight and leave its callers waiting
+        self._sending: Set[asyncio.Task] = set()
+
+    async def extract(self, kind: str, message: str) -> Extraction:
+        if kind not in EXTRACTION_KINDS:
+            raise ValueError(f"Unknown extraction kind: {kind!r}")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending[kind]
+        pending.append((message, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(kind)
+        elif self._timers[kind] is None:
+            self._timers[kind] = loop.call_later(self.max_wait, self._flush, kind)
+        return await future
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        return list(await asyncio.gather(*(self.extract(kind, message) for message in messages)))
+
+    def _flush(self, kind: str) -> None:
+        """Send everything waiting for `kind` as one backend request"""
+        timer = self._timers[kind]
+        if timer is not None:
+            timer.cancel()
+            self._timers[kind] = None
+        batch, self._pending[kind] = self._pending[kind], []
+        if batch:
+            task = asyncio.ensure_future(self._send(kind, batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, kind: str, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            results = await self.backend.extract_batch(kind, [message for message, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+        if len(results) != len(batch):
+            # A short answer must not leave the remaining callers waiting forever
+            error = LLMBackendError(f"Expected {len(batch)} results, got {len(results)}")
+            for _, future in batch[len(results):]:
+                if not future.done():
+                    future.set_exception(error)
+
+    async def aclose(self) -> None:
+        for kind in EXTRACTION_KINDS:
+            self._flush(kind)
+        # Let the batches in flight finish before their backend is closed
+        if self._sending:
+            await asyncio.gather(*self._sending, return_exceptions=True)
+        await self.backend.aclose()
+
+
+class FakeLLMBackend(LLMBackend):
+    """Deterministic in-process stand-in for an LLM, for tests and benchmarks"""
+
+    def __init__(self, latency_ms: float = 0.0, max_parallel_requests: int = 0):
+        """
+        Args:
+            latency_ms: Simulated round-trip time per request (not per message)
+            max_parallel_requests: Simulated connection/rate limit, 0 for none
+        """
+        self.latency = latency_ms / 1000
+        self.max_parallel_requests = max_parallel_requests
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.requests = 0
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        from .fake_llm_server import fake_extract
+
+        if self.max_parallel_requests and self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_parallel_requests)
+        if self._slots is not None:
+            async with self._slots:
+                return await self._respond(kind, messages, fake_extract)
+        return await self._respond(kind, messages, fake_extract)
+
+    async def _respond(self, kind: str, messages: Sequence[str], fake_extract: Callable[[str, str], Extraction]) -> List[Extraction]:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [fake_extract(kind, message) for message in messages]
+
+
+_default_backend: Optional[LLMBackend] = None
+
+
+def get_default_backend() -> Optional[LLMBackend]:
+    """
+    Return the process-wide backend configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_LLM: 'openai', 'fake' or unset (no backend)
+    - REQUIREMENTS_ANALYZER_LLM_MODEL: model name for the OpenAI backend
+    - REQUIREMENTS_ANALYZER_BATCH_WAIT_MS: micro-batching window, 0 disables it
+    - REQUIREMENTS_ANALYZER_LLM_DEADLINE: seconds per LLM call before the
+      local fallback answers (see resilience.py), 0 disables the limiter,
+      deadline and circuit breaker
+    """
+    global _default_backend
+    if _default_backend is None:
+        name = os.getenv('REQUIREMENTS_ANALYZER_LLM', '').lower()
+        if name == 'openai':
+            backend: LLMBackend = OpenAIBackend(model=os.getenv('REQUIREMENTS_ANALYZER_LLM_MODEL', 'gpt-3.5-turbo'))
+        elif name == 'fake':
+            backend = FakeLLMBackend()
+        elif name in ('', 'none'):
+            return None
+        else:
+            raise ValueError(f"Unknown REQUIREMENTS_ANALYZER_LLM backend: {name!r}")
+        deadline = float(os.getenv('REQUIREMENTS_ANALYZER_LLM_DEADLINE', '10'))
+        if deadline > 0:
+            from .resilience import LocalFallback, ResilientBackend
+
+            # Guards the real requests, so it sits below the micro-batcher
+            backend = ResilientBackend(backend, deadline=deadline, fallback=LocalFallback(use_defaults=True))
+        wait_ms = float(os.getenv('REQUIREMENTS_ANALYZER_BATCH_WAIT_MS', '5'))
+        _default_backend = BatchingBackend(backend, max_wait_ms=wait_ms) if wait_ms > 0 else backend
+    return _default_backend
@@ -0,0 +1,190 @@
+"""
+Logging Configuration - non-blocking logging for the analyzers
+
+`logging.basicConfig` with a FileHandler makes every log call write (and
+flush) to disk on the thread doing the analysis. `configure_logging`
+instead installs:
+- a QueueHandler on the root logger: callers only enqueue the record
+- a QueueListener thread that formats and writes records
+- a file handler that flushes in batches instead of after every record
+- structured JSON lines through python-json-logger for the file
+
+Messages should use lazy `%`-style arguments (`logger.debug("x=%s", x)`):
+records are formatted on the listener thread, and never at all when the
+level is disabled.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import List, Optional, Sequence
+
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class BatchingFileHandler(logging.FileHandler):
+    """
+    FileHandler that flushes every `flush_every` records or `flush_interval` seconds
+
+    A timer thread flushes what is buffered once `flush_interval` passes
+    without a new record, so an idle worker's last records reach the disk.
+    """
+
+    def __init__(self, filename: str, flush_every: int = 64, flush_interval: float = 1.0, encoding: str = 'utf-8'):
+        super().__init__(filename, encoding=encoding)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+
+    def flush(self) -> None:
+        # StreamHandler.emit calls flush() after every record; only honour
+        # it once a batch is full, an error is logged, or time is up
+        self._unflushed += 1
+        now = time.monotonic()
+        if self._unflushed >= self.flush_every or now - self._last_flush >= self.flush_interval:
+            self._flush_now(now)
+
+    def _flush_now(self, now: Optional[float] = None) -> None:
+        super().flush()
+        self._unflushed = 0
+        self._last_flush = now if now is not None else time.monotonic()
+
+    def _run_timer(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            self.acquire()
+            try:
+                if self.stream is not None and self._unflushed and time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_now()
+            finally:
+                self.release()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Started on first use (and again after a fork, which threads do not survive)
+        if self._timer is None or not self._timer.is_alive():
+            self._timer = threading.Thread(target=self._run_timer, name='log-flush', daemon=True)
+            self._timer.start()
+        super().emit(record)
+        if record.levelno >= logging.ERROR:
+            # Errors are worth a syscall, they must survive a crash
+            self._flush_now()
+
+    def close(self) -> None:
+        self._closed.set()
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self._flush_now()
+        finally:
+            self.release()
+        super().close()
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread
+
+    The stock `QueueHandler.prepare` formats the message on the calling
+    thread. This one only renders the traceback (traceback objects must
+    not outlive the call) and enqueues the record with its raw args, so
+    log arguments must not be mutated after the call.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # Block instead of dropping (and erroring) when the queue is full
+        self.queue.put(record)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _BlockingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop sentinel waits for room in a full queue"""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _json_formatter() -> logging.Formatter:
+    """JSON formatter from python-json-logger"""
+    from pythonjsonlogger import jsonlogger
+
+    return jsonlogger.JsonFormatter('%(asctime)s %(name)s %(levelname)s %(message)s')
+
+
+def configure_logging(
+    log_file: Optional[str] = 'requirements_analyzer.log',
+    level: int = logging.INFO,
+    json_format: bool = True,
+    console: bool = True,
+    flush_every: int = 64,
+    flush_interval: float = 1.0,
+    queue_size: int = 10_000,
+    extra_handlers: Sequence[logging.Handler] = (),
+) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a background listener thread
+
+    Args:
+        log_file: File to write to, None for no file
+        level: Root logger level
+        json_format: Write the file as JSON lines instead of plain text
+        console: Also log (plain text) to stderr
+        flush_every: Records between file flushes
+        flush_interval: Maximum seconds between file flushes
+        queue_size: Bound on queued records; callers block when it is full
+        extra_handlers: More handlers to run on the listener thread
+
+    Returns:
+        The started QueueListener (stopped again by `shutdown_logging`)
+    """
+    global _listener
+    shutdown_logging()
+
+    handlers: List[logging.Handler] = []
+    if log_file:
+        file_handler = BatchingFileHandler(log_file, flush_every=flush_every, flush_interval=flush_interval)
+        file_handler.setFormatter(_json_formatter() if json_format else logging.Formatter(DEFAULT_FORMAT))
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        handlers.append(console_handler)
+    handlers.extend(extra_handlers)
+
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(level)
+
+    _listener = _BlockingQueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Drain the queue, stop the listener thread and close its handlers"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,405 @@
+"""
+Metrics - thread-safe counters, latency histograms and a Prometheus exporter
+
+Counters and histograms are sharded per thread: every thread updates its own
+shard without locks (only the first update from a new thread takes a lock to
+register the shard) and readers sum the shards. Values live in a
+process-wide `REGISTRY`:
+- `render_prometheus()` returns the Prometheus text exposition format
+- `write_snapshot()` dumps this process's values to a directory so one
+  exporter can aggregate all worker processes
+  (REQUIREMENTS_ANALYZER_METRICS_DIR); `start_snapshot_writer()` does it
+  periodically from a worker, `stop_snapshot_writer()` once more on exit
+- `start_metrics_server()` serves `/metrics` for scraping
+"""
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+# Latency buckets in seconds, 1 microsecond (keyword stages) to 10 seconds (LLM calls)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.000001, 0.0000025, 0.000005, 0.00001, 0.000025,
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (f'{key}="{_escape(str(value))}"' for key, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+class _Sharded:
+    """Per-thread shards registered once and summed on read"""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def _new_shard(self) -> List[float]:
+        raise NotImplementedError
+
+    def _shard(self) -> List[float]:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._new_shard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _all_shards(self) -> List[List[float]]:
+        with self._lock:
+            return list(self._shards)
+
+
+class Counter(_Sharded):
+    """Monotonic counter"""
+
+    def _new_shard(self) -> List[float]:
+        return [0]
+
+    def inc(self, amount: float = 1) -> None:
+        # Only this thread writes its shard, so no lock is needed
+        self._shard()[0] += amount
+
+    def value(self) -> float:
+        return sum(shard[0] for shard in self._all_shards())
+
+
+class InstanceCounter(Counter):
+    """
+    Counter private to one object that also feeds a shared registry counter
+
+    Registry counters are shared by every analyzer with the same labels in
+    the process; an analyzer's own statistics read its instance counter.
+    """
+
+    def __init__(self, shared: Counter) -> None:
+        super().__init__()
+        self.shared = shared
+
+    def inc(self, amount: float = 1) -> None:
+        self._shard()[0] += amount
+        self.shared.inc(amount)
+
+
+class Histogram(_Sharded):
+    """Cumulative-bucket histogram (Prometheus style) of observed values"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__()
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+
+    def _new_shard(self) -> List[float]:
+        # one slot per bucket, +Inf, then sum and count
+        return [0] * (len(self.buckets) + 3)
+
+    def observe(self, value: float) -> None:
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the wall-clock duration of the `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> List[float]:
+        """Per-bucket counts (not cumulative), +Inf, sum, count"""
+        totals = [0.0] * (len(self.buckets) + 3)
+        for shard in self._all_shards():
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+    def quantile(self, q: float, snapshot: Optional[List[float]] = None) -> float:
+        """Estimate a quantile by interpolating inside its bucket"""
+        counts = snapshot if snapshot is not None else self.snapshot()
+        total = counts[-1]
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0.0
+        lower = 0.0
+        for upper, count in zip(self.buckets, counts):
+            if seen + count >= rank and count:
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+            lower = upper
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Named metric families keyed by label set"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._families: Dict[str, Dict[str, Any]] = {}
+
+    def _get(self, kind: str, name: str, help_text: str, labels: Optional[Dict[str, str]], factory: Any) -> Any:
+        key = _labels_key(labels)
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = {'kind': kind, 'help': help_text, 'metrics': {}}
+            elif family['kind'] != kind:
+                raise ValueError(f"Metric {name!r} is already registered as a {family['kind']}")
+            metric = family['metrics'].get(key)
+            if metric is None:
+                metric = family['metrics'][key] = factory()
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        """Return (creating on first use) the counter for `name` and `labels`"""
+        return self._get('counter', name, help_text, labels, Counter)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Optional[Dict[str, str]] = None,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Return (creating on first use) the histogram for `name` and `labels`"""
+        return self._get('histogram', name, help_text, labels, lambda: Histogram(buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-ready values of every metric in this process"""
+        with self._lock:
+            families = {name: dict(family, metrics=dict(family['metrics'])) for name, family in self._families.items()}
+        data: Dict[str, Any] = {}
+        for name, family in families.items():
+            series = []
+            for labels, metric in family['metrics'].items():
+                entry: Dict[str, Any] = {'labels': dict(labels)}
+                if family['kind'] == 'counter':
+                    entry['value'] = metric.value()
+                else:
+                    entry['buckets'] = list(metric.buckets)
+                    entry['counts'] = metric.snapshot()
+                series.append(entry)
+            data[name] = {'kind': family['kind'], 'help': family['help'], 'series': series}
+        return data
+
+    def write_snapshot(self, directory: Optional[str] = None) -> Optional[str]:
+        """
+        Write this process's values to `<directory>/metrics-<pid>.json`
+
+        Args:
+            directory: Target directory, defaults to REQUIREMENTS_ANALYZER_METRICS_DIR
+
+        Returns:
+            The written path, or None when no directory is configured
+        """
+        directory = directory or os.getenv('REQUIREMENTS_ANALYZER_METRICS_DIR')
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        # Atomic replace: a concurrent reader never sees a half-written file
+        os.replace(temporary, path)
+        return path
+
+    def render_prometheus(self, directory: Optional[str] = None) -> str:
+        """
+        Render metrics in the Prometheus text format
+
+        Args:
+            directory: Snapshot directory of other worker processes to merge in,
+                defaults to REQUIREMENTS_ANALYZER_METRICS_DIR
+
+        Returns:
+            The exposition text
+        """
+        snapshots = [self.snapshot()]
+        directory = directory or os.getenv('REQUIREMENTS_ANALYZER_METRICS_DIR')
+        if directory and os.path.isdir(directory):
+            own = f'metrics-{os.getpid()}.json'
+            for filename in sorted(os.listdir(directory)):
+                if filename.startswith('metrics-') and filename.endswith('.json') and filename != own:
+                    try:
+                        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+                            snapshots.append(json.load(f))
+                    except (OSError, ValueError):
+                        continue  # a worker is rewriting its file right now
+        return _render(_merge_snapshots(snapshots))
+
+
+def _merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Sum counter values and histogram counts of the same series"""
+    merged: Dict[str, Any] = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, {'kind': family['kind'], 'help': family['help'], 'series': {}})
+            for entry in family['series']:
+                key = _labels_key(entry['labels'])
+                existing = target['series'].get(key)
+                if existing is None:
+                    target['series'][key] = json.loads(json.dumps(entry))
+                elif family['kind'] == 'counter':
+                    existing['value'] += entry['value']
+                else:
+                    existing['counts'] = [a + b for a, b in zip(existing['counts'], entry['counts'])]
+    return merged
+
+
+def _render(merged: Dict[str, Any]) -> str:
+    lines: List[str] = []
+    for name in sorted(merged):
+        family = merged[name]
+        lines.append(f'# HELP {name} {family["help"]}')
+        lines.append(f'# TYPE {name} {family["kind"]}')
+        for labels, entry in sorted(family['series'].items()):
+            if family['kind'] == 'counter':
+                lines.append(f'{name}{_format_labels(labels)} {entry["value"]:g}')
+                continue
+            counts = entry['counts']
+            cumulative = 0.0
+            for upper, count in zip(entry['buckets'], counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", f"{upper:g}")])} {cumulative:g}')
+            cumulative += counts[len(entry['buckets'])]
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {cumulative:g}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {counts[-2]:.9g}')
+            lines.append(f'{name}_count{_format_labels(labels)} {counts[-1]:g}')
+    return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by all analyzers
+REGISTRY = MetricsRegistry()
+
+
+def stage_histogram(analyzer: str, stage: str) -> Histogram:
+    """Latency histogram of one analysis stage (validation, classification, extraction, ...)"""
+    return REGISTRY.histogram(
+        'requirements_analysis_stage_seconds',
+        'Latency of each analysis stage in seconds',
+        {'analyzer': analyzer, 'stage': stage},
+    )
+
+
+def render_prometheus() -> str:
+    """Prometheus text for the default registry (plus other workers' snapshots)"""
+    return REGISTRY.render_prometheus()
+
+
+def start_metrics_server(port: int = 9464, host: str = '0.0.0.0') -> "ThreadingHTTPServer":
+    """Serve GET /metrics from a daemon thread and return the server"""
+    # http.server is only needed by the process that exports metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+
+class SnapshotWriter:
+    """Rewrites this process's snapshot file every `interval` seconds from a daemon thread"""
+
+    def __init__(self, interval: float, directory: Optional[str] = None, registry: Optional[MetricsRegistry] = None):
+        self.interval = interval
+        self.directory = directory
+        self.registry = registry or REGISTRY
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+
+    def start(self) -> "SnapshotWriter":
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self) -> None:
+        try:
+            self.registry.write_snapshot(self.directory)
+        except OSError:
+            pass  # the next round tries again; metrics must never take a worker down
+
+    def stop(self) -> None:
+        """Stop the thread and write a final snapshot"""
+        self._stop.set()
+        self._thread.join(timeout=self.interval)
+        self._write()
+
+
+_snapshot_writer: Optional[SnapshotWriter] = None
+
+
+def start_snapshot_writer(interval: Optional[float] = None) -> Optional[SnapshotWriter]:
+    """
+    Write this worker's snapshot periodically, so `render_prometheus` in
+    another process sees it (call after the fork, in every worker process)
+
+    Args:
+        interval: Seconds between writes, defaults to
+            REQUIREMENTS_ANALYZER_METRICS_INTERVAL (15)
+
+    Returns:
+        The writer, or None when REQUIREMENTS_ANALYZER_METRICS_DIR is unset
+    """
+    global _snapshot_writer
+    if not os.getenv('REQUIREMENTS_ANALYZER_METRICS_DIR'):
+        return None
+    if _snapshot_writer is None:
+        if interval is None:
+            interval = float(os.getenv('REQUIREMENTS_ANALYZER_METRICS_INTERVAL', '15'))
+        _snapshot_writer = SnapshotWriter(interval).start()
+    return _snapshot_writer
+
+
+def stop_snapshot_writer() -> None:
+    """Stop the periodic writer (if any) after one final snapshot"""
+    global _snapshot_writer
+    if _snapshot_writer is not None:
+        _snapshot_writer.stop()
+        _snapshot_writer = None
@@ -0,0 +1,46 @@
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('external_id', models.CharField(max_length=255, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Analysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('analyzer_version', models.CharField(max_length=32)),
+                ('status', models.CharField(choices=[('success', 'Success'), ('failed', 'Failed')], max_length=16)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('confidence', models.FloatField(default=0.0)),
+                ('intents', models.JSONField(default=list)),
+                ('entities', models.JSONField(default=list)),
+                ('validation', models.JSONField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, default='', max_length=128)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analyses', to='requirements_analyzer.conversation')),
+            ],
+            options={
+                'indexes': [
+                    django.contrib.postgres.indexes.GinIndex(fields=['intents'], name='ra_analysis_intents_gin', opclasses=['jsonb_path_ops']),
+                    django.contrib.postgres.indexes.GinIndex(fields=['entities'], name='ra_analysis_entities_gin', opclasses=['jsonb_path_ops']),
+                    models.Index(fields=['conversation', '-created_at'], name='ra_analysis_conv_created'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+"""
+Models - persisted conversations and their analyses
+
+Intents and entities are stored denormalized as JSONB arrays of
+{"name", "confidence"} objects on `Analysis`, with GIN indexes
+(jsonb_path_ops) so containment queries stay indexed:
+
+    Analysis.objects.with_intent('find_route')
+    Analysis.objects.filter(entities__contains=[{'name': 'Tel Aviv'}])
+
+Rows are written in batches by persistence.AnalysisWriter, not one ORM
+insert per analysis.
+"""
+
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+from django.utils import timezone
+
+
+class Conversation(models.Model):
+    """A conversation, identified by the id the caller gave it"""
+
+    external_id = models.CharField(max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return self.external_id
+
+
+class AnalysisQuerySet(models.QuerySet):
+    def with_intent(self, name: str) -> "AnalysisQuerySet":
+        """Analyses that detected intent `name` (served by the GIN index)"""
+        return self.filter(intents__contains=[{'name': name}])
+
+    def with_entity(self, name: str) -> "AnalysisQuerySet":
+        """Analyses that extracted entity `name` (served by the GIN index)"""
+        return self.filter(entities__contains=[{'name': name}])
+
+
+class Analysis(models.Model):
+    """One analysis (and optional validation) result of a conversation"""
+
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [(STATUS_SUCCESS, 'Success'), (STATUS_FAILED, 'Failed')]
+
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='analyses')
+    analyzer_version = models.CharField(max_length=32)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES)
+    summary = models.TextField(blank=True, default='')
+    confidence = models.FloatField(default=0.0)
+    intents = models.JSONField(default=list)
+    entities = models.JSONField(default=list)
+    validation = models.JSONField(null=True, blank=True)
+    error = models.CharField(max_length=128, blank=True, default='')
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = AnalysisQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['intents'], name='ra_analysis_intents_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['entities'], name='ra_analysis_entities_gin', opclasses=['jsonb_path_ops']),
+            models.Index(fields=['conversation', '-created_at'], name='ra_analysis_conv_created'),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.conversation_id} ({self.status})"
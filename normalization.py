@@ -0,0 +1,132 @@
+"""
+Text Normalization - one pre-pass per message, shared by every stage
+
+Analyzers used to re-derive the same things from the raw string
+(`message.lower()` per keyword, `message.split()`, `message.strip()`,
+`'?' in message`). `normalize()` does it once and returns a
+`NormalizedMessage` that validation, keyword classification, intent and
+entity extraction and summarization all consume:
+- `text`: NFKC-normalized (full-width and compatibility forms folded) with
+  invisible bidi controls (LRM/RLM, embeddings, isolates, BOM) removed; the
+  offsets of tokens and extracted entities refer to this string
+- `folded`: `text` case-folded and without combining marks (Hebrew niqqud
+  and cantillation, Arabic harakat), for keyword matching
+- `tokens` / `spans`: folded word tokens and their (start, end) in `text`
+- stats: `char_count`, `word_count`, `has_question`, `is_blank`
+- `scripts` and `direction`: the scripts of all words and the base
+  direction ('rtl' when the first word is Hebrew/Arabic), so mixed
+  Hebrew/English messages are handled per word, not per message
+
+ASCII messages (most of our traffic) skip the Unicode work entirely.
+"""
+
+import re
+import unicodedata
+from typing import FrozenSet, Tuple, Union
+
+
+# Invisible bidi formatting characters; they only affect display order
+BIDI_CONTROLS = '\u200e\u200f\u061c\u202a\u202b\u202c\u202d\u202e\u2066\u2067\u2068\u2069\ufeff'
+_STRIP_BIDI = {ord(char): None for char in BIDI_CONTROLS}
+
+# Words, including the combining marks written inside Hebrew/Arabic words
+# (niqqud are not \w, so without them a pointed word would split in pieces)
+_TOKENS = re.compile("[\\w\u0300-\u036f\u0591-\u05bd\u05bf\u05c1-\u05c2\u05c4-\u05c5\u05c7\u0610-\u061a\u064b-\u065f\u0670]+")
+
+# (first code point, last code point, script) of the scripts we tell apart
+_SCRIPT_RANGES: Tuple[Tuple[int, int, str], ...] = (
+    (0x0041, 0x024F, 'latin'),
+    (0x0370, 0x03FF, 'greek'),
+    (0x0400, 0x052F, 'cyrillic'),
+    (0x0590, 0x05FF, 'hebrew'),
+    (0x0600, 0x06FF, 'arabic'),
+    (0x0750, 0x077F, 'arabic'),
+    (0x1E00, 0x1EFF, 'latin'),
+    (0xFB1D, 0xFB4F, 'hebrew'),
+    (0xFB50, 0xFDFF, 'arabic'),
+    (0xFE70, 0xFEFF, 'arabic'),
+)
+RTL_SCRIPTS = frozenset(('hebrew', 'arabic'))
+# '?' after NFKC (full-width forms fold to it) plus the Arabic question mark
+_QUESTION_MARKS = ('?', '\u061f')
+
+
+def script_of(char: str) -> str:
+    """Script name of one letter ('other' outside the known ranges)"""
+    code = ord(char)
+    for first, last, script in _SCRIPT_RANGES:
+        if first <= code <= last:
+            return script
+    return 'other'
+
+
+def _strip_marks(text: str) -> str:
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+class NormalizedMessage:
+    """A message normalized once; see the module docstring for the fields"""
+
+    __slots__ = ('raw', 'text', 'folded', 'tokens', 'spans', 'scripts', 'direction')
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        if raw.isascii():
+            text = raw
+            matches = list(_TOKENS.finditer(text))
+            self.folded = text.lower()
+            self.tokens: Tuple[str, ...] = tuple(match.group().lower() for match in matches)
+            has_letters = any(not token.isdigit() for token in self.tokens)
+            self.scripts: FrozenSet[str] = frozenset(('latin',)) if has_letters else frozenset()
+            self.direction = 'ltr'
+        else:
+            text = raw if unicodedata.is_normalized('NFKC', raw) else unicodedata.normalize('NFKC', raw)
+            text = text.translate(_STRIP_BIDI)
+            matches = list(_TOKENS.finditer(text))
+            self.folded = _strip_marks(text).casefold()
+            self.tokens = tuple(_strip_marks(match.group()).casefold() for match in matches)
+            scripts = []
+            for match in matches:
+                # A word's first letter decides its script (digits have none)
+                letter = next((char for char in match.group() if char.isalpha()), None)
+                if letter is not None:
+                    scripts.append(script_of(letter))
+            self.scripts = frozenset(scripts)
+            self.direction = 'rtl' if scripts and scripts[0] in RTL_SCRIPTS else 'ltr'
+        self.text = text
+        self.spans: Tuple[Tuple[int, int], ...] = tuple(match.span() for match in matches)
+
+    @property
+    def char_count(self) -> int:
+        return len(self.text)
+
+    @property
+    def word_count(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def has_question(self) -> bool:
+        return any(mark in self.text for mark in _QUESTION_MARKS)
+
+    @property
+    def is_blank(self) -> bool:
+        """True for empty, whitespace-only or bidi-controls-only messages"""
+        return not self.text.strip()
+
+    @property
+    def is_mixed_script(self) -> bool:
+        return len(self.scripts) > 1
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __repr__(self) -> str:
+        return f"NormalizedMessage({self.text!r}, tokens={len(self.tokens)}, scripts={sorted(self.scripts)})"
+
+
+def normalize(message: Union[str, NormalizedMessage]) -> NormalizedMessage:
+    """Normalize a message; already normalized messages are returned as they are"""
+    if isinstance(message, NormalizedMessage):
+        return message
+    return NormalizedMessage(message or '')
+
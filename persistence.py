@@ -0,0 +1,256 @@
+"""
+Persistence - buffered, batched writes of analysis results to the database
+
+Inserting one ORM row per analysis costs a round-trip and a connection
+checkout per result. `AnalysisWriter` instead:
+- buffers task results in memory (`add`/`extend` never touch the database)
+- flushes from a background thread every `batch_size` results or
+  `flush_interval` seconds, whichever comes first
+- upserts the batch's conversations with one `bulk_create`, then writes the
+  analyses with PostgreSQL `COPY ... FROM STDIN` (psycopg2 `copy_expert`),
+  falling back to `bulk_create` on other drivers/databases
+
+A failed flush is logged and its rows are retried with the next flush, up
+to `max_buffer` buffered rows; beyond that the oldest rows are dropped and
+counted. Results still buffered when a worker is killed are lost, so call
+`close_analysis_writer()` on shutdown (tasks.py does).
+"""
+
+import io
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .analyzer import ANALYZER_VERSION
+from .metrics import REGISTRY
+
+
+logger = logging.getLogger(__name__)
+
+# Analysis columns written by COPY, in order
+COPY_COLUMNS = (
+    'conversation_id', 'analyzer_version', 'status', 'summary', 'confidence',
+    'intents', 'entities', 'validation', 'error', 'error_message', 'created_at',
+)
+
+
+def _copy_value(value: Any) -> str:
+    """Render one value in the COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def analysis_fields(result: Dict[str, Any], created_at: datetime) -> Dict[str, Any]:
+    """Column values of one task result (see analyzer.analysis_result), without the conversation"""
+    requirements = result.get('requirements') or {}
+    return {
+        'analyzer_version': ANALYZER_VERSION,
+        'status': result.get('status', 'success'),
+        'summary': requirements.get('summary') or '',
+        'confidence': result.get('confidence', 0.0),
+        'intents': requirements.get('intents', []),
+        'entities': requirements.get('entities', []),
+        'validation': result.get('validation'),
+        'error': result.get('error') or '',
+        'error_message': result.get('error_message') or '',
+        'created_at': created_at,
+    }
+
+
+class AnalysisWriter:
+    """Buffers analysis results and writes them to the database in batches"""
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_buffer: int = 50_000,
+        use_copy: Optional[bool] = None,
+    ):
+        """
+        Args:
+            batch_size: Results per database write
+            flush_interval: Maximum seconds a result waits in the buffer
+            max_buffer: Buffered results kept while the database is failing
+            use_copy: Force COPY on/off; by default COPY is used when the
+                connection is PostgreSQL through psycopg2
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.use_copy = use_copy
+        # (buffered at, task result) pairs
+        self._buffer: List[Tuple[datetime, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        # Serializes flushes between the background thread and callers
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._written = REGISTRY.counter('requirements_persisted_rows_total', 'Analyses written to the database')
+        self._dropped = REGISTRY.counter('requirements_persistence_dropped_total', 'Analyses dropped after failed writes')
+        self._flush_latency = REGISTRY.histogram('requirements_persistence_flush_seconds', 'Duration of one batched database write')
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """Buffer one task result; never blocks on the database"""
+        self.extend([result])
+
+    def extend(self, results: Iterable[Dict[str, Any]]) -> None:
+        """Buffer many task results; never blocks on the database"""
+        from django.utils import timezone
+
+        if self._closed:
+            raise RuntimeError("AnalysisWriter is closed")
+        now = timezone.now()
+        stamped = [(now, result) for result in results]
+        with self._lock:
+            self._buffer.extend(stamped)
+            full = len(self._buffer) >= self.batch_size
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='analysis-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self) -> None:
+        from django.db import connection
+
+        try:
+            while not self._closed:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self.flush()
+        finally:
+            # Django connections are per thread; do not leak this one
+            connection.close()
+
+    def flush(self) -> int:
+        """
+        Write everything buffered so far
+
+        Returns:
+            Number of results written
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, []
+            written = 0
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                try:
+                    with self._flush_latency.time():
+                        self._write_batch(batch)
+                except Exception:
+                    logger.exception("Writing %s analyses failed, will retry", len(pending) - start)
+                    self._requeue(pending[start:])
+                    break
+                written += len(batch)
+                self._written.inc(len(batch))
+            return written
+
+    def _requeue(self, rows: List[Tuple[datetime, Dict[str, Any]]]) -> None:
+        with self._lock:
+            self._buffer[:0] = rows
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+        if overflow > 0:
+            self._dropped.inc(overflow)
+            logger.error("Dropped %s buffered analyses, database writes keep failing", overflow)
+
+    def _write_batch(self, entries: Sequence[Tuple[datetime, Dict[str, Any]]]) -> None:
+        """Write one batch in a single transaction (conversations first, then analyses)"""
+        from django.db import connection, transaction
+
+        from .models import Analysis, Conversation
+
+        entries = [(created_at, result) for created_at, result in entries if result.get('conversation_id') is not None]
+        if not entries:
+            return
+        external_ids = {str(result['conversation_id']) for _, result in entries}
+        with transaction.atomic():
+            Conversation.objects.bulk_create(
+                [Conversation(external_id=external_id) for external_id in external_ids],
+                ignore_conflicts=True,
+                batch_size=self.batch_size,
+            )
+            ids = dict(Conversation.objects.filter(external_id__in=external_ids).values_list('external_id', 'id'))
+            rows = [
+                dict(analysis_fields(result, created_at), conversation_id=ids[str(result['conversation_id'])])
+                for created_at, result in entries
+            ]
+            with connection.cursor() as cursor:
+                use_copy = self.use_copy
+                if use_copy is None:
+                    use_copy = connection.vendor == 'postgresql' and hasattr(cursor.cursor, 'copy_expert')
+                if use_copy:
+                    self._copy(cursor, Analysis, rows)
+                    return
+            Analysis.objects.bulk_create([Analysis(**row) for row in rows], batch_size=self.batch_size)
+
+    @staticmethod
+    def _copy(cursor: Any, model: Any, rows: List[Dict[str, Any]]) -> None:
+        buffer = io.StringIO()
+        for row in rows:
+            values = []
+            for column in COPY_COLUMNS:
+                value = row[column]
+                if column in ('intents', 'entities', 'validation') and value is not None:
+                    value = json.dumps(value, ensure_ascii=False)
+                values.append(_copy_value(value))
+            buffer.write('\t'.join(values))
+            buffer.write('\n')
+        buffer.seek(0)
+        quote = cursor.db.ops.quote_name
+        columns = ', '.join(quote(column) for column in COPY_COLUMNS)
+        cursor.cursor.copy_expert(f"COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the background thread and write whatever is still buffered"""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+
+_writer: Optional[AnalysisWriter] = None
+_writer_pid: Optional[int] = None
+
+
+def get_analysis_writer() -> Optional[AnalysisWriter]:
+    """
+    Return this process's shared writer, configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_PERSIST: '1' enables persistence (needs Django
+      settings with a database), unset disables it (returns None)
+    - REQUIREMENTS_ANALYZER_PERSIST_BATCH: results per write
+    - REQUIREMENTS_ANALYZER_PERSIST_INTERVAL: seconds between flushes
+    """
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        # The flush thread does not survive a fork
+        if os.getenv('REQUIREMENTS_ANALYZER_PERSIST', '').lower() not in ('1', 'true', 'yes'):
+            return None
+        _writer = AnalysisWriter(
+            batch_size=int(os.getenv('REQUIREMENTS_ANALYZER_PERSIST_BATCH', '500')),
+            flush_interval=float(os.getenv('REQUIREMENTS_ANALYZER_PERSIST_INTERVAL', '1.0')),
+        )
+        _writer_pid = os.getpid()
+    return _writer
+
+
+def close_analysis_writer() -> None:
+    """Flush and stop the shared writer (call on worker shutdown)"""
+    global _writer, _writer_pid
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.close()
+    _writer = None
+    _writer_pid = None
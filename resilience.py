@@ -0,0 +1,447 @@
+"""
+Resilience - adaptive concurrency, deadlines and a circuit breaker for LLM calls
+
+When the provider slows down, every extraction used to wait for its full
+timeout (and retries), so worker pools piled up blocked coroutines until
+memory ran out. `ResilientBackend` wraps a backend with three guards:
+- `AdaptiveLimiter`: AIMD concurrency limit driven by latency. Calls within
+  `tolerance` x the baseline latency grow the limit by about one per
+  window of calls; errors, timeouts and slow calls shrink it
+  multiplicatively, scaled by how far latency drifted (the gradient),
+  at most once per observed round-trip. Callers over the limit wait in a
+  bounded queue and are rejected at once when it is full.
+- per-call deadlines: queueing plus the call itself (with its retries)
+  must finish within `deadline` seconds
+- `CircuitBreaker`: opens when the failure rate over the recent calls
+  crosses `failure_threshold`, rejects calls for `reset_timeout` seconds,
+  then lets a few probe calls through (half-open) before closing again
+
+A call that is rejected or fails is answered from the fallback chain
+instead: the last good extraction of the same message, then
+`LocalFallback` (best-effort intent index scores, keyword classifier,
+gazetteer entities), then an empty extraction. Callers never see provider
+errors, only degraded results, which are counted per source and returned
+as `llm.DegradedExtraction`, so the analysis is flagged 'degraded' and
+the result cache does not keep it.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from .classifier import classify_message
+from .llm import DegradedExtraction, Extraction, LLMBackend, LLMBackendError
+from .metrics import REGISTRY
+
+
+logger = logging.getLogger(__name__)
+
+
+class LimitExceededError(LLMBackendError):
+    """Raised when no concurrency slot frees up in time, or the wait queue is full"""
+
+
+class DeadlineExceededError(LLMBackendError, TimeoutError):
+    """Raised when a call does not finish within its deadline"""
+
+
+class CircuitOpenError(LLMBackendError):
+    """Raised while the circuit breaker rejects calls"""
+
+
+class AdaptiveLimiter:
+    """Latency-driven AIMD concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(
+        self,
+        initial: int = 16,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        backoff: float = 0.7,
+        tolerance: float = 2.0,
+        max_queue: int = 1024,
+        baseline_window: int = 500,
+    ):
+        """
+        Args:
+            initial: Starting concurrency limit
+            min_limit: The limit never drops below this
+            max_limit: The limit never grows above this
+            backoff: Strongest multiplicative decrease (0.7 = -30%)
+            tolerance: Latency up to tolerance x baseline counts as healthy
+            max_queue: Callers allowed to wait for a slot; more are rejected
+            baseline_window: Samples after which the baseline (minimum
+                latency) moves toward the window's minimum, so it can
+                slowly follow a permanently slower provider
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.max_queue = max_queue
+        self.baseline_window = baseline_window
+        self.inflight = 0
+        self.baseline: Optional[float] = None
+        self.smoothed: Optional[float] = None
+        self._window_min: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Take a concurrency slot, waiting at most `timeout` seconds
+
+        Raises:
+            LimitExceededError: If the queue is full or no slot frees up in time
+        """
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise LimitExceededError(f"Concurrency limit {int(self.limit)} reached and {len(self._waiters)} callers waiting")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise LimitExceededError(f"No concurrency slot within {timeout:.3f}s") from None
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self.inflight -= 1
+                self._wake()
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+
+    def release(self, latency: Optional[float], ok: bool = True) -> None:
+        """
+        Return a slot and adapt the limit
+
+        Args:
+            latency: Seconds the call took, None if it never completed
+                (a cancelled call with ok=True leaves the limit as it is)
+            ok: False for errors and timeouts
+        """
+        self.inflight -= 1
+        if not ok:
+            self._decrease(self.backoff)
+        elif latency is not None:
+            self._observe(latency)
+        self._wake()
+
+    def _observe(self, latency: float) -> None:
+        self._samples += 1
+        self._window_min = latency if self._window_min is None else min(self._window_min, latency)
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        if self._samples >= self.baseline_window:
+            # Rise slowly: under load the window minimum includes our own queueing
+            if self._window_min > self.baseline:
+                self.baseline += 0.1 * (self._window_min - self.baseline)
+            self._window_min, self._samples = None, 0
+        self.smoothed = latency if self.smoothed is None else 0.9 * self.smoothed + 0.1 * latency
+        allowed = self.tolerance * self.baseline
+        if latency <= allowed:
+            # Additive increase: about +1 per `limit` healthy calls
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        else:
+            # Gradient: shrink in proportion to how far latency drifted
+            self._decrease(max(self.backoff, allowed / latency))
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        # One decrease per round-trip: a burst of failures from the same
+        # moment is one congestion signal, not many
+        round_trip = self.smoothed if self.smoothed is not None else 0.1
+        if now - self._last_decrease < round_trip:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with a half-open probing state"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        reset_timeout: float = 30.0,
+        half_open_calls: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            failure_threshold: Failure fraction of the recent calls that opens the circuit
+            window: Recent calls the failure fraction is computed over
+            min_calls: Calls needed in the window before it can open
+            reset_timeout: Seconds the circuit stays open before probing
+            half_open_calls: Successful probes needed to close again
+            clock: Time source (monotonic seconds)
+        """
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        transitions = 'requirements_llm_circuit_transitions_total'
+        transitions_help = 'Circuit breaker state changes around LLM calls'
+        self._transitions = {
+            state: REGISTRY.counter(transitions, transitions_help, {'state': state})
+            for state in (self.CLOSED, self.OPEN, self.HALF_OPEN)
+        }
+
+    def _enter(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("LLM circuit breaker %s -> %s", self.state, state)
+            self.state = state
+            self._transitions[state].inc()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; a True in half-open state takes a probe slot"""
+        if self.state == self.OPEN:
+            if self.clock() - self._opened_at < self.reset_timeout:
+                return False
+            self._enter(self.HALF_OPEN)
+            self._probes = self._probe_successes = 0
+        if self.state == self.HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                return False
+            self._probes += 1
+        return True
+
+    def record(self, ok: bool) -> None:
+        """Record the outcome of an allowed call"""
+        if self.state == self.HALF_OPEN:
+            if not ok:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._outcomes.clear()
+                self._enter(self.CLOSED)
+            return
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_threshold:
+            self._open()
+
+    def release(self) -> None:
+        """Give back a probe slot of an allowed call that never reached the provider"""
+        if self.state == self.HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def _open(self) -> None:
+        self._opened_at = self.clock()
+        self._enter(self.OPEN)
+
+
+class LocalFallback:
+    """Best-effort extraction without the LLM, for degraded mode"""
+
+    def __init__(self, intent_index: Any = None, entity_extractor: Any = None, use_defaults: bool = False):
+        """
+        Args:
+            intent_index: IntentIndex whose scores are used even when ambiguous
+            entity_extractor: gazetteer.EntityExtractor for entities
+            use_defaults: Load the process-wide index and extractor on first
+                use when none are given (keeps numpy out of startup)
+        """
+        self.intent_index = intent_index
+        self.entity_extractor = entity_extractor
+        self._use_defaults = use_defaults
+
+    def _load(self) -> None:
+        if self._use_defaults:
+            from .gazetteer import get_default_entity_extractor
+            from .intent_index import get_default_intent_index
+
+            self.intent_index = self.intent_index or get_default_intent_index()
+            self.entity_extractor = self.entity_extractor or get_default_entity_extractor()
+            self._use_defaults = False
+
+    def __call__(self, kind: str, message: str) -> Extraction:
+        self._load()
+        if kind == 'entities':
+            if self.entity_extractor is None:
+                return []
+            return [(span.name, span.confidence, span.label) for span in self.entity_extractor.extract(message)]
+        extraction: Extraction = []
+        if self.intent_index is not None:
+            extraction = [(intent.name, intent.confidence) for intent in self.intent_index.rank(message)]
+        if classify_message(message)['urgent'] and all(name != 'urgent_help' for name, *_ in extraction):
+            extraction.append(('urgent_help', 0.6))
+        return extraction
+
+
+class ResilientBackend(LLMBackend):
+    """Wraps a backend with an adaptive limiter, deadlines, a circuit breaker and fallbacks"""
+
+    def __init__(
+        self,
+        backend: LLMBackend,
+        deadline: float = 10.0,
+        limiter: Optional[AdaptiveLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        fallback: Optional[Callable[[str, str], Extraction]] = None,
+        cache_size: int = 10_000,
+    ):
+        """
+        Args:
+            backend: Backend doing the actual calls
+            deadline: Seconds a call may take, waiting for a slot included
+            limiter: Concurrency limiter, a default AdaptiveLimiter if None
+            breaker: Circuit breaker, a default CircuitBreaker if None
+            fallback: (kind, message) -> extraction used when no cached
+                result exists, e.g. a LocalFallback; empty results if None
+            cache_size: Last good extractions kept for fallback (LRU)
+        """
+        self.backend = backend
+        self.deadline = deadline
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback = fallback
+        self.cache_size = cache_size
+        # (kind, message digest) -> last good extraction
+        self._last_good: "OrderedDict[tuple, Extraction]" = OrderedDict()
+        self._latency = REGISTRY.histogram('requirements_llm_call_seconds', 'Duration of LLM extraction calls')
+        rejected, rejected_help = 'requirements_llm_rejected_total', 'LLM calls that were not answered by the provider'
+        self._rejected = {
+            reason: REGISTRY.counter(rejected, rejected_help, {'reason': reason})
+            for reason in ('circuit_open', 'overload', 'deadline', 'error')
+        }
+        fallbacks, fallbacks_help = 'requirements_llm_fallback_total', 'Extractions answered without the LLM'
+        self._fallbacks = {
+            source: REGISTRY.counter(fallbacks, fallbacks_help, {'source': source})
+            for source in ('cache', 'local', 'empty')
+        }
+
+    @staticmethod
+    def _key(kind: str, message: str) -> tuple:
+        return kind, hashlib.blake2b(message.encode('utf-8'), digest_size=16).digest()
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        if not messages:
+            return []
+        try:
+            results = await self._call(kind, messages)
+        except CircuitOpenError:
+            self._rejected['circuit_open'].inc()
+        except LimitExceededError:
+            self._rejected['overload'].inc()
+        except DeadlineExceededError:
+            self._rejected['deadline'].inc()
+        except Exception as e:
+            self._rejected['error'].inc()
+            # Breaker transitions are logged as warnings; single failures would flood the log
+            logger.debug("LLM extraction failed, using fallback: %s", e)
+        else:
+            for message, result in zip(messages, results):
+                key = self._key(kind, message)
+                self._last_good[key] = result
+                self._last_good.move_to_end(key)
+            while len(self._last_good) > self.cache_size:
+                self._last_good.popitem(last=False)
+            return results
+        return [self._fall_back(kind, message) for message in messages]
+
+    async def _call(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open")
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await self.limiter.acquire(self.deadline)
+        except BaseException:
+            self.breaker.release()
+            raise
+        begin = loop.time()
+        remaining = self.deadline - (begin - started)
+        expected = self.limiter.smoothed
+        if expected is not None and remaining < expected:
+            # Queueing used up the deadline: do not start a call that cannot finish
+            self.limiter.release(None)
+            self.breaker.release()
+            raise LimitExceededError("Deadline used up while waiting for a concurrency slot")
+        try:
+            results = await asyncio.wait_for(self.backend.extract_batch(kind, messages), remaining)
+        except asyncio.CancelledError:
+            # Our caller gave up; that says nothing about the provider
+            self.limiter.release(None)
+            self.breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            # Only a call that had a fair share of time counts against the provider
+            if expected is None or remaining >= self.limiter.tolerance * expected:
+                self.limiter.release(None, ok=False)
+                self.breaker.record(False)
+            else:
+                self.limiter.release(None)
+                self.breaker.release()
+            raise DeadlineExceededError(f"LLM call exceeded its {self.deadline}s deadline") from None
+        except BaseException:
+            self.limiter.release(None, ok=False)
+            self.breaker.record(False)
+            raise
+        latency = loop.time() - begin
+        self._latency.observe(latency)
+        self.limiter.release(latency)
+        self.breaker.record(True)
+        return results
+
+    def _fall_back(self, kind: str, message: str) -> Extraction:
+        cached = self._last_good.get(self._key(kind, message))
+        if cached is not None:
+            self._fallbacks['cache'].inc()
+            return DegradedExtraction(cached)
+        if self.fallback is not None:
+            try:
+                extraction = self.fallback(kind, message)
+            except Exception:
+                logger.exception("Local fallback extraction failed")
+            else:
+                self._fallbacks['local'].inc()
+                return DegradedExtraction(extraction)
+        self._fallbacks['empty'].inc()
+        return DegradedExtraction()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limiter and breaker state"""
+        return {
+            'limit': self.limiter.limit,
+            'inflight': self.limiter.inflight,
+            'waiting': len(self.limiter._waiters),
+            'baseline_s': self.limiter.baseline,
+            'circuit': self.breaker.state,
+        }
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
@@ -0,0 +1,46 @@
+"""
+Async Runtime - one persistent event loop per worker process
+
+Celery prefork workers and process-pool workers are synchronous, while
+`RequirementsAnalyzer` is async. Calling `asyncio.run` per invocation
+creates and tears down a loop every time and throws away everything bound
+to it (pooled HTTP clients, micro-batching timers, Redis connections).
+`run_sync` instead reuses one loop for the lifetime of the process and
+transparently creates a fresh one after a fork.
+"""
+
+import asyncio
+import os
+from typing import Any, Coroutine, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Return this process's persistent event loop, creating it on first use"""
+    global _loop, _loop_pid
+    if _loop is None or _loop.is_closed() or _loop_pid != os.getpid():
+        # A loop inherited through fork shares its selector with the parent
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion on the persistent worker loop"""
+    return get_worker_loop().run_until_complete(coro)
+
+
+def close_worker_loop() -> None:
+    """Close the persistent loop (call on worker shutdown)"""
+    global _loop, _loop_pid
+    if _loop is not None and not _loop.is_closed() and _loop_pid == os.getpid():
+        _loop.run_until_complete(_loop.shutdown_asyncgens())
+        _loop.close()
+    _loop = None
+    _loop_pid = None
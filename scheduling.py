@@ -0,0 +1,277 @@
+"""
+Scheduling - urgency-aware priority lanes for analysis work
+
+Every message is put into a lane when it arrives: one keyword
+classification (the same `urgent` category LoggingRequirementsAnalyzer
+reports: "ASAP", "urgent", "emergency", ...) costs microseconds.
+- 'urgent': the message itself asks for haste, whatever its source
+- 'interactive': a user waits for the answer (HTTP requests, single tasks)
+- 'bulk': backfills, batch imports and other throughput work
+
+Two paths share the lanes:
+- asyncio (the ASGI views): `PriorityScheduler` bounds the analyses in
+  flight in the process. Waiting callers are served by weighted fair
+  sharing (stride scheduling: each lane advances its pass by 1 / weight
+  per slot granted, and the lane with the lowest pass goes next). Bulk
+  can only fill part of the slots, so a burst of bulk work never leaves
+  interactive requests waiting for a slot. For starvation protection,
+  a caller that has waited `max_wait` seconds is served next whatever
+  its lane's share.
+- Celery: `route_task` routes every task to the queue of its lane
+  (QUEUES), and `build_analysis_pipeline` moves the urgent conversations
+  of a bulk job into their own chunks. Fair sharing between queues comes
+  from the workers: give urgent/interactive queues their own workers, or
+  list them first in `-Q`, so bulk backlogs never sit in front of them.
+
+Queue wait (enqueue to start) is recorded per lane in the
+`requirements_queue_wait_seconds` histogram: by the scheduler on the
+asyncio path, and by tasks.py from a publish timestamp on the Celery path.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from .classifier import classify_message
+from .metrics import DEFAULT_BUCKETS, REGISTRY, Histogram
+from .normalization import NormalizedMessage, normalize
+
+
+URGENT = 'urgent'
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+# In priority order: ties in fair sharing go to the earlier lane
+LANES = (URGENT, INTERACTIVE, BULK)
+DEFAULT_WEIGHTS = {URGENT: 8.0, INTERACTIVE: 4.0, BULK: 1.0}
+# Celery queue of each lane
+QUEUES = {lane: f'requirements.{lane}' for lane in LANES}
+_LANE_OF_QUEUE = {queue: lane for lane, queue in QUEUES.items()}
+# Celery queue waits can be minutes long while a backfill drains
+WAIT_BUCKETS = DEFAULT_BUCKETS + (30.0, 60.0, 300.0, 900.0)
+
+# Tasks by lane when their messages are not urgent (see route_task)
+_TASK_LANES = {
+    'analyze_requirements_task': INTERACTIVE,
+    'analyze_and_validate_task': INTERACTIVE,
+    'validate_requirements_task': INTERACTIVE,
+    'analyze_requirements_batch_task': BULK,
+    'analyze_and_validate_batch_task': BULK,
+    'collect_batch_results_task': BULK,
+}
+
+
+def classify_lane(message: Union[str, NormalizedMessage, None], default: str = INTERACTIVE) -> str:
+    """
+    The lane of one message: URGENT when it reads as urgent, otherwise `default`
+
+    Args:
+        message: Raw or normalized message (None counts as not urgent)
+        default: Lane of the caller (INTERACTIVE for users, BULK for batch jobs)
+    """
+    if message is not None and classify_message(normalize(message))['urgent']:
+        return URGENT
+    return default
+
+
+def queue_wait_histogram(lane: str, source: str) -> Histogram:
+    """Enqueue-to-start wait of one lane; `source` is 'asyncio' or 'celery'"""
+    return REGISTRY.histogram(
+        'requirements_queue_wait_seconds',
+        'Time analysis work waited for a slot or worker, by lane',
+        {'lane': lane, 'source': source},
+        buckets=WAIT_BUCKETS,
+    )
+
+
+def lane_of_queue(queue: Optional[str]) -> Optional[str]:
+    """The lane a Celery queue serves, None for queues outside QUEUES"""
+    return _LANE_OF_QUEUE.get(queue) if queue else None
+
+
+def route_task(name: str, args: Sequence[Any], kwargs: Dict[str, Any], options: Dict[str, Any], task: Any = None, **kw: Any) -> Optional[Dict[str, str]]:
+    """
+    Celery router: the queue of a task's lane (`app.conf.task_routes = (route_task,)`)
+
+    Single-conversation tasks whose context reads as urgent go to the urgent
+    queue; batch tasks keep their lane (build_analysis_pipeline splits
+    urgent conversations out beforehand). A queue given to apply_async
+    takes precedence over the route.
+
+    Returns:
+        {'queue': ...}, or None for tasks of other apps
+    """
+    lane = _TASK_LANES.get(name.rsplit('.', 1)[-1])
+    if lane is None:
+        return None
+    if lane == INTERACTIVE and name.endswith(('analyze_requirements_task', 'analyze_and_validate_task')):
+        context = kwargs.get('context') if kwargs else None
+        if context is None and args and len(args) > 1:
+            context = args[1]
+        if isinstance(context, str):
+            lane = classify_lane(context, lane)
+    return {'queue': QUEUES[lane]}
+
+
+def split_urgent(conversations: Sequence[Tuple[str, str]]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Split (conversation_id, context) pairs into (urgent, the rest), keeping order"""
+    urgent: List[Tuple[str, str]] = []
+    rest: List[Tuple[str, str]] = []
+    for conversation in conversations:
+        (urgent if classify_lane(conversation[1], BULK) == URGENT else rest).append(conversation)
+    return urgent, rest
+
+
+class PriorityScheduler:
+    """Bounds analyses in flight; waiting callers get slots by weighted fair share"""
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        weights: Optional[Dict[str, float]] = None,
+        max_wait: float = 2.0,
+        bulk_share: float = 0.75,
+    ):
+        """
+        Args:
+            max_concurrency: Analyses in flight across all lanes; keep it at
+                or below the LLM limiter's limit, so callers queue here (by
+                priority) rather than in the limiter (first come, first served)
+            weights: Share of each lane while several are waiting (DEFAULT_WEIGHTS)
+            max_wait: Seconds after which a waiting caller is served next,
+                whatever its lane's share (starvation protection)
+            bulk_share: Fraction of the slots bulk work may hold at once;
+                the rest stay free for urgent and interactive callers
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights or {})
+        self.max_wait = max_wait
+        self.limits = {lane: max_concurrency for lane in LANES}
+        self.limits[BULK] = max(1, int(max_concurrency * bulk_share))
+        self.inflight = 0
+        self._lane_inflight = {lane: 0 for lane in LANES}
+        self._waiters: Dict[str, Deque[Tuple[float, asyncio.Future]]] = {lane: deque() for lane in LANES}
+        # Stride scheduling: virtual time each lane has consumed
+        self._pass = {lane: 0.0 for lane in LANES}
+        self._virtual_time = 0.0
+        self._wait = {lane: queue_wait_histogram(lane, 'asyncio') for lane in LANES}
+        aged = 'requirements_scheduler_aged_total'
+        aged_help = 'Slots granted out of fair-share order because the caller waited max_wait'
+        self._aged = {lane: REGISTRY.counter(aged, aged_help, {'lane': lane}) for lane in LANES}
+
+    async def acquire(self, lane: str) -> None:
+        """Wait for a slot in `lane`"""
+        if lane not in self._waiters:
+            raise ValueError(f"Unknown lane {lane!r}, expected one of {LANES}")
+        queue = self._waiters[lane]
+        if self.inflight < self.max_concurrency and self._lane_inflight[lane] < self.limits[lane] and not queue:
+            self._grant(lane)
+            self._wait[lane].observe(0.0)
+            return
+        if not queue:
+            # A lane that was idle does not bank credit for the time it was idle
+            self._pass[lane] = max(self._pass[lane], self._virtual_time)
+        enqueued = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append((enqueued, waiter))
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled: pass it on
+                self.release(lane)
+            raise
+        finally:
+            if not waiter.done():
+                waiter.cancel()
+            # Cancelling the task cancels the waiter too, so it is done by now
+            if waiter.cancelled():
+                try:
+                    queue.remove((enqueued, waiter))
+                except ValueError:
+                    pass
+        self._wait[lane].observe(time.monotonic() - enqueued)
+
+    def release(self, lane: str) -> None:
+        """Return a slot taken with `acquire(lane)`"""
+        self.inflight -= 1
+        self._lane_inflight[lane] -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, lane: str) -> AsyncIterator[None]:
+        """Hold a slot in `lane` for the `async with` block"""
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def _grant(self, lane: str) -> None:
+        self.inflight += 1
+        self._lane_inflight[lane] += 1
+
+    def _next_lane(self) -> Optional[str]:
+        """The lane served next, None when no waiting caller can take a slot"""
+        eligible = [lane for lane in LANES if self._waiters[lane] and self._lane_inflight[lane] < self.limits[lane]]
+        if not eligible:
+            return None
+        oldest, lane = min((self._waiters[lane][0][0], lane) for lane in eligible)
+        if time.monotonic() - oldest >= self.max_wait:
+            self._aged[lane].inc()
+            return lane
+        return min(eligible, key=self._pass.__getitem__)
+
+    def _wake(self) -> None:
+        while self.inflight < self.max_concurrency:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            _, waiter = self._waiters[lane].popleft()
+            if waiter.done():
+                continue
+            self._virtual_time = self._pass[lane]
+            self._pass[lane] += 1.0 / self.weights[lane]
+            self._grant(lane)
+            waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots in flight and callers waiting, per lane"""
+        return {
+            'max_concurrency': self.max_concurrency,
+            'inflight': dict(self._lane_inflight),
+            'waiting': {lane: len(queue) for lane, queue in self._waiters.items()},
+        }
+
+
+_default_scheduler: Optional[PriorityScheduler] = None
+_scheduler_pid: Optional[int] = None
+
+
+def get_default_scheduler() -> Optional[PriorityScheduler]:
+    """
+    Process-wide scheduler, configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_SCHEDULER_SLOTS: analyses in flight across all
+      lanes; unset or 0 disables scheduling (returns None)
+    - REQUIREMENTS_ANALYZER_SCHEDULER_MAX_WAIT: starvation bound in seconds (default 2)
+    - REQUIREMENTS_ANALYZER_SCHEDULER_BULK_SHARE: fraction of the slots bulk may hold (default 0.75)
+    """
+    global _default_scheduler, _scheduler_pid
+    slots = int(os.getenv('REQUIREMENTS_ANALYZER_SCHEDULER_SLOTS', '0'))
+    if slots <= 0:
+        return None
+    # Waiters are futures of one event loop; a forked child starts over
+    if _default_scheduler is None or _scheduler_pid != os.getpid():
+        _default_scheduler = PriorityScheduler(
+            max_concurrency=slots,
+            max_wait=float(os.getenv('REQUIREMENTS_ANALYZER_SCHEDULER_MAX_WAIT', '2')),
+            bulk_share=float(os.getenv('REQUIREMENTS_ANALYZER_SCHEDULER_BULK_SHARE', '0.75')),
+        )
+        _scheduler_pid = os.getpid()
+    return _default_scheduler
@@ -0,0 +1,50 @@
+"""
+Serializers - request validation for the HTTP API (see views.py)
+
+Responses are the same plain dicts the Celery tasks return
+(`analyzer.analysis_result`), so only requests need serializers.
+"""
+
+from rest_framework import serializers
+
+
+# Bounds on one request, so a single call cannot hold the LLM budget hostage
+MAX_CONTEXT_CHARS = 100_000
+MAX_BATCH_SIZE = 500
+MAX_CONCURRENCY = 64
+
+
+class AnalyzeRequestSerializer(serializers.Serializer):
+    """One conversation to analyze"""
+
+    conversation_id = serializers.CharField(max_length=255, required=False, default='')
+    context = serializers.CharField(max_length=MAX_CONTEXT_CHARS, allow_blank=True, trim_whitespace=False)
+    with_validation = serializers.BooleanField(required=False, default=False)
+
+
+class AnalyzeTurnRequestSerializer(serializers.Serializer):
+    """One new turn of a conversation analyzed incrementally"""
+
+    conversation_id = serializers.CharField(max_length=255)
+    turn = serializers.CharField(max_length=MAX_CONTEXT_CHARS, allow_blank=True, trim_whitespace=False)
+    # Start the conversation over, forgetting its earlier turns
+    reset = serializers.BooleanField(required=False, default=False)
+    with_validation = serializers.BooleanField(required=False, default=False)
+
+
+class ConversationSerializer(serializers.Serializer):
+    """One conversation inside a batch request"""
+
+    conversation_id = serializers.CharField(max_length=255, required=False, default='')
+    context = serializers.CharField(max_length=MAX_CONTEXT_CHARS, allow_blank=True, trim_whitespace=False)
+
+
+class BatchAnalyzeRequestSerializer(serializers.Serializer):
+    """Many conversations analyzed concurrently in one request"""
+
+    conversations = serializers.ListField(
+        child=ConversationSerializer(), allow_empty=False, max_length=MAX_BATCH_SIZE,
+    )
+    with_validation = serializers.BooleanField(required=False, default=False)
+    concurrency = serializers.IntegerField(required=False, default=16, min_value=1, max_value=MAX_CONCURRENCY)
+    dedup = serializers.BooleanField(required=False, default=False)
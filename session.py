@@ -0,0 +1,199 @@
+"""
+Conversation Session - incremental, per-turn requirements analysis
+
+`RequirementsAnalyzer.analyze_requirements` takes the whole conversation
+as one string, so re-analyzing after every new turn costs O(turns^2) over
+a conversation. A `ConversationSession` instead:
+- receives turns one at a time
+- runs extraction only on the new turn plus a token-bounded
+  `ContextWindow`: the turns right before it (for references like "and
+  back on Sunday?") and a compressed summary of the older ones
+- merges the new intents/entities into the ones already extracted,
+  keeping the highest confidence per name
+
+`SessionStore` keeps the sessions of a server process by conversation id
+(LRU, idle sessions expire); the `analyze/turn/` view (views.py) answers
+each new turn from it. Sessions live in one process, so a conversation's
+turns must reach the same server process (sticky routing); a turn that
+lands elsewhere starts a new session there.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
+
+from .analyzer import SUMMARY_CHARS, Entity, Intent, RequirementsAnalyzer
+from .context_window import ContextWindow, TokenCounter, preview
+from .llm import DegradedExtraction
+
+
+Extracted = TypeVar('Extracted', Intent, Entity)
+
+
+def _merge(merged: Dict[str, Extracted], items: List[Extracted]) -> None:
+    """Merge extraction results by name, keeping the most confident one"""
+    for item in items:
+        current = merged.get(item.name)
+        if current is None or item.confidence > current.confidence:
+            merged[item.name] = item
+
+
+class ConversationSession:
+    """Keeps the running analysis of one conversation, updated per turn"""
+
+    def __init__(
+        self,
+        analyzer: RequirementsAnalyzer,
+        context_turns: int = 2,
+        max_context_tokens: int = 512,
+        summary_tokens: int = 128,
+        counter: Optional[TokenCounter] = None,
+    ):
+        """
+        Args:
+            analyzer: Analyzer whose extract_intents/extract_entities are used
+            context_turns: Earlier turns sent verbatim along with each new turn
+            max_context_tokens: Hard bound on the tokens sent per extraction
+            summary_tokens: Part of it for the summary of older turns
+            counter: Token counter, the process default if None
+        """
+        self.analyzer = analyzer
+        self.context_turns = context_turns
+        self.max_context_tokens = max_context_tokens
+        self.turn_count = 0
+        self._window = ContextWindow(max_context_tokens, summary_tokens, max_turns=context_turns, counter=counter)
+        self._summary = ""
+        # Set once a turn had to be cut: later turns are not appended after it
+        self._summary_full = False
+        self._intents: Dict[str, Intent] = {}
+        self._entities: Dict[str, Entity] = {}
+        # Set once a turn was answered without the provider (see resilience.py)
+        self._degraded = False
+        self._lock = asyncio.Lock()
+
+    async def add_turn(self, turn: str) -> Dict[str, Any]:
+        """
+        Analyze one new turn and merge it into the session
+
+        Args:
+            turn: Text of the new conversation turn
+
+        Returns:
+            The updated analysis of the whole conversation so far
+        """
+        # Turns must be merged in arrival order, even if callers race
+        async with self._lock:
+            if turn and turn.strip():
+                # The new turn wins the budget over older context
+                window = self._window.render(extra=turn)
+                intents, entities = await asyncio.gather(
+                    self.analyzer.extract_intents(window),
+                    self.analyzer.extract_entities(window),
+                )
+                _merge(self._intents, intents)
+                _merge(self._entities, entities)
+                if isinstance(intents, DegradedExtraction) or isinstance(entities, DegradedExtraction):
+                    self._degraded = True
+                if not self._summary_full:
+                    separator = '\n' if self._summary else ''
+                    summary = self._summary + separator + turn
+                    self._summary = preview(summary, SUMMARY_CHARS)
+                    self._summary_full = len(summary) >= SUMMARY_CHARS
+                self._window.add_turn(turn)
+                self.turn_count += 1
+            return self.analysis()
+
+    async def add_turns(self, turns: List[str]) -> Dict[str, Any]:
+        """Analyze several new turns in order and return the final analysis"""
+        analysis = self.analysis()
+        for turn in turns:
+            analysis = await self.add_turn(turn)
+        return analysis
+
+    def analysis(self) -> Dict[str, Any]:
+        """The current analysis, in the same shape as analyze_requirements"""
+        analysis = {
+            "summary": self._summary,
+            "intents": list(self._intents.values()),
+            "entities": list(self._entities.values()),
+            "confidence": 0.0,
+            "turns": self.turn_count,
+        }
+        if self._degraded:
+            analysis["degraded"] = True
+        return analysis
+
+
+class SessionStore:
+    """The conversation sessions of one process, by conversation id"""
+
+    def __init__(
+        self,
+        analyzer: RequirementsAnalyzer,
+        max_sessions: int = 10_000,
+        ttl: float = 1800.0,
+        **session_options: Any,
+    ):
+        """
+        Args:
+            analyzer: Analyzer shared by all sessions
+            max_sessions: Size bound; the least recently used session goes first
+            ttl: Seconds a session without new turns is kept
+            session_options: Passed to every ConversationSession
+        """
+        self.analyzer = analyzer
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.session_options = session_options
+        # conversation id -> (last use, session)
+        self._sessions: "OrderedDict[str, Tuple[float, ConversationSession]]" = OrderedDict()
+        self.counters: Dict[str, int] = {'created': 0, 'evictions': 0, 'expirations': 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def session(self, conversation_id: str) -> ConversationSession:
+        """The session of a conversation, a new one if it has none (or it expired)"""
+        now = time.monotonic()
+        entry = self._sessions.get(conversation_id)
+        if entry is not None and now - entry[0] > self.ttl:
+            del self._sessions[conversation_id]
+            self.counters['expirations'] += 1
+            entry = None
+        if entry is None:
+            session = ConversationSession(self.analyzer, **self.session_options)
+            self.counters['created'] += 1
+        else:
+            session = entry[1]
+        self._sessions[conversation_id] = (now, session)
+        self._sessions.move_to_end(conversation_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.counters['evictions'] += 1
+        return session
+
+    async def add_turn(self, conversation_id: str, turn: str) -> Dict[str, Any]:
+        """Analyze one new turn of a conversation and return its updated analysis"""
+        return await self.session(conversation_id).add_turn(turn)
+
+    def discard(self, conversation_id: str) -> None:
+        """Forget a conversation; its next turn starts a new session"""
+        self._sessions.pop(conversation_id, None)
+
+
+def session_store_from_env(analyzer: RequirementsAnalyzer) -> SessionStore:
+    """
+    A SessionStore configured by environment variables
+
+    - REQUIREMENTS_ANALYZER_SESSIONS: sessions kept at most (default 10000)
+    - REQUIREMENTS_ANALYZER_SESSION_TTL: seconds an idle session is kept (default 1800)
+    - REQUIREMENTS_ANALYZER_SESSION_CONTEXT_TURNS: earlier turns sent with each new one (default 2)
+    """
+    return SessionStore(
+        analyzer,
+        max_sessions=int(os.getenv('REQUIREMENTS_ANALYZER_SESSIONS', '10000')),
+        ttl=float(os.getenv('REQUIREMENTS_ANALYZER_SESSION_TTL', '1800')),
+        context_turns=int(os.getenv('REQUIREMENTS_ANALYZER_SESSION_CONTEXT_TURNS', '2')),
+    )
@@ -1,55 +1,269 @@
 """
 Celery tasks for Requirements Analyzer agent
+
+Every worker process keeps one RequirementsAnalyzer and one persistent
+event loop (see runtime.py), so a task invocation never pays for
+`asyncio.run`, a new LLM client or a cold cache.
+
+Bulk work should use the batch tasks: one broker message carries a chunk
+of conversations, which are analyzed concurrently inside the worker.
+`analyze_and_validate_*` run validation in the same task as analysis, so
+the pipeline needs a single broker round-trip instead of two.
+
+When REQUIREMENTS_ANALYZER_KAFKA_BOOTSTRAP is set, every analysis (or
+analysis + validation) result is also published as an event through the
+worker's shared Kafka producer (see events.py) without waiting for delivery;
+the chunk is handed to the producer from a thread, so a full producer
+buffer never stalls the worker's event loop.
+With REQUIREMENTS_ANALYZER_PERSIST=1 results are also buffered and written
+to the database in batches (see persistence.py). With tracing configured
+(see tracing.py), each batch is one trace: analysis, serialization,
+publishing and persistence are its spans.
+
+Importing this module registers the binary 'requirements-wire' kombu
+serializer (see wire.py); set `task_serializer`/`result_serializer` to it
+(and add it to `accept_content`/`result_accept_content`) so task results
+travel as compact records that the chord callback reads lazily.
+
+Work is split into priority lanes (see scheduling.py): set
+`task_routes = (scheduling.route_task,)` and run the urgent and
+interactive queues (QUEUES) on workers that bulk jobs cannot saturate.
+Every published task is stamped with its publish time, so workers report
+how long it waited in its queue (requirements_queue_wait_seconds).
 """
 
-from celery import shared_task
-from typing import Dict, Any
+import asyncio
+import time
+
+from celery import chord, group, shared_task
+from celery.signals import before_task_publish, task_prerun, worker_process_init, worker_process_shutdown
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .analyzer import RequirementsAnalyzer, analysis_result
+from .cache import get_default_cache
+from .events import close_event_publisher, get_event_publisher
+from .llm import get_default_backend
+from .metrics import start_snapshot_writer, stop_snapshot_writer
+from .persistence import close_analysis_writer, get_analysis_writer
+from .runtime import close_worker_loop, get_worker_loop, run_sync
+from .scheduling import BULK, INTERACTIVE, QUEUES, URGENT, get_default_scheduler, lane_of_queue, queue_wait_histogram, split_urgent
+from .tracing import TRACER
+from .wire import register_kombu_serializer
+
+
+# (conversation_id, context) pairs; lists after a JSON round-trip
+Conversation = Tuple[str, str]
+
+_analyzer: Optional[RequirementsAnalyzer] = None
+
+register_kombu_serializer()
+
+
+def get_analyzer() -> RequirementsAnalyzer:
+    """The analyzer shared by every task in this worker process"""
+    global _analyzer
+    if _analyzer is None:
+        # numpy is imported with the index, on first use rather than at worker start
+        from .context_window import get_default_context_budget
+        from .gazetteer import get_default_entity_extractor
+        from .intent_index import get_default_intent_index
+
+        _analyzer = RequirementsAnalyzer(
+            backend=get_default_backend(),
+            intent_index=get_default_intent_index(),
+            entity_extractor=get_default_entity_extractor(),
+            context_budget=get_default_context_budget(),
+            cache=get_default_cache(),
+            scheduler=get_default_scheduler(),
+        )
+    return _analyzer
+
+
+@worker_process_init.connect
+def _start_worker_loop(**kwargs: Any) -> None:
+    # Create the loop right after the prefork, not in the parent
+    get_worker_loop()
+    # Threads do not survive a fork, so the snapshot thread starts here too
+    start_snapshot_writer()
+
+
+@worker_process_shutdown.connect
+def _stop_worker_loop(**kwargs: Any) -> None:
+    close_event_publisher()
+    close_analysis_writer()
+    close_worker_loop()
+    stop_snapshot_writer()
+    # Prefork children leave through os._exit, so atexit would not flush the traces
+    TRACER.shutdown()
+
+
+@before_task_publish.connect
+def _stamp_publish_time(headers: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+    # Wall-clock time: publisher and worker are different processes
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def _observe_queue_wait(task: Any = None, **kwargs: Any) -> None:
+    request = getattr(task, 'request', None)
+    # Custom headers become request attributes (protocol 2) or stay in request.headers
+    published_at = getattr(request, 'published_at', None) or (getattr(request, 'headers', None) or {}).get('published_at')
+    if published_at is None:
+        return
+    delivery_info = getattr(request, 'delivery_info', None) or {}
+    lane = lane_of_queue(delivery_info.get('routing_key'))
+    if lane is not None:
+        queue_wait_histogram(lane, 'celery').observe(max(0.0, time.time() - published_at))
+
+
+async def _analyze_batch(
+    conversations: Sequence[Conversation], validate: bool, concurrency: int, dedup: bool = False, lane: str = BULK,
+) -> List[Dict[str, Any]]:
+    """Analyze (and optionally validate) a chunk concurrently, keeping input order"""
+    with TRACER.span('analyze_batch', conversations=len(conversations), dedup=dedup):
+        analyzer = get_analyzer()
+        publisher = get_event_publisher()
+        results: List[Dict[str, Any]] = []
+        contexts = (context for _, context in conversations)
+        async for index, analysis in analyzer.analyze_many(
+            contexts, max_concurrency=concurrency, return_exceptions=True, deduplicate=dedup, lane=lane,
+        ):
+            with TRACER.span('serialize'):
+                results.append(analysis_result(conversations[index][0], analysis))
+        if validate:
+            # One pass over the compiled rules for the whole chunk
+            succeeded = [result for result in results if result['status'] == 'success']
+            for result, validation in zip(succeeded, analyzer.validate_batch(result['requirements'] for result in succeeded)):
+                result['validation'] = validation
+        if publisher is not None:
+            with TRACER.span('publish'):
+                # send() blocks while the producer's buffer is full
+                await asyncio.to_thread(publisher.publish_many, results)
+        writer = get_analysis_writer()
+        if writer is not None:
+            with TRACER.span('persist'):
+                writer.extend(results)
+        return results
 
 
 @shared_task(bind=True)
 def analyze_requirements_task(self, conversation_id: str, context: str) -> Dict[str, Any]:
     """
     Async task for analyzing user requirements
-    
+
     Args:
         conversation_id: Unique conversation identifier
         context: Conversation context to analyze
-        
+
     Returns:
         Requirements analysis result
-        
-    TODO: Implement requirements analysis logic
-    TODO: Integrate with LLM for natural language processing
-    TODO: Store results in database
-    TODO: Publish events to Kafka
     """
-    # Placeholder implementation
-    return {
-        'conversation_id': conversation_id,
-        'status': 'TODO - implement requirements analysis',
-        'requirements': {},
-        'confidence': 0.0
-    }
+    return run_sync(_analyze_batch([(conversation_id, context)], validate=False, concurrency=1, lane=INTERACTIVE))[0]
 
 
 @shared_task(bind=True)
 def validate_requirements_task(self, requirements: Dict[str, Any]) -> Dict[str, Any]:
     """
     Async task for validating requirement completeness
-    
+
     Args:
         requirements: Requirements to validate
-        
+
     Returns:
         Validation result
-        
-    TODO: Implement validation logic
-    TODO: Check for missing required fields
-    TODO: Assess requirement clarity and specificity
     """
-    # Placeholder implementation
+    # Pure computation over the compiled rules, no event loop needed
+    return get_analyzer().validator.validate(requirements)
+
+
+@shared_task(bind=True)
+def analyze_requirements_batch_task(
+    self, conversations: List[Conversation], concurrency: int = 16, dedup: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Analyze a chunk of conversations in one task message
+
+    Args:
+        conversations: (conversation_id, context) pairs
+        concurrency: Concurrent analyses inside the worker
+        dedup: Analyze duplicate conversations of the chunk once
+
+    Returns:
+        One analysis result per conversation, in input order
+    """
+    return run_sync(_analyze_batch(conversations, validate=False, concurrency=concurrency, dedup=dedup))
+
+
+@shared_task(bind=True)
+def analyze_and_validate_task(self, conversation_id: str, context: str) -> Dict[str, Any]:
+    """
+    Analyze and validate one conversation without a second broker hop
+
+    Returns:
+        Analysis result with a 'validation' entry
+    """
+    return run_sync(_analyze_batch([(conversation_id, context)], validate=True, concurrency=1, lane=INTERACTIVE))[0]
+
+
+@shared_task(bind=True)
+def analyze_and_validate_batch_task(
+    self, conversations: List[Conversation], concurrency: int = 16, dedup: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Analyze and validate a chunk of conversations in one task message
+
+    Args:
+        conversations: (conversation_id, context) pairs
+        concurrency: Concurrent analyses inside the worker
+        dedup: Analyze duplicate conversations of the chunk once
+
+    Returns:
+        One analysis result (with 'validation') per conversation
+    """
+    return run_sync(_analyze_batch(conversations, validate=True, concurrency=concurrency, dedup=dedup))
+
+
+@shared_task(bind=True)
+def collect_batch_results_task(self, chunk_results: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Chord callback: flatten chunk results into one summary
+
+    Returns:
+        Counts plus the flattened results
+    """
+    results = [result for chunk in chunk_results for result in chunk]
     return {
-        'is_complete': False,
-        'missing_items': ['TODO - implement validation logic'],
-        'confidence': 0.0
+        'total': len(results),
+        'failed': sum(1 for result in results if result['status'] == 'failed'),
+        'complete': sum(1 for result in results if result.get('validation', {}).get('is_complete')),
+        'results': results,
     }
+
+
+def build_analysis_pipeline(
+    conversations: Sequence[Conversation], chunk_size: int = 100, collect: bool = False, dedup: bool = False,
+):
+    """
+    Build a Celery canvas that analyzes and validates conversations in chunks
+
+    Conversations that read as urgent are chunked separately and sent to
+    the urgent queue; the rest go to the bulk queue. The collected
+    summary therefore lists the urgent results first.
+
+    Args:
+        conversations: (conversation_id, context) pairs
+        chunk_size: Conversations per task message
+        collect: Wrap the chunks in a chord that gathers one summary
+        dedup: Analyze duplicates within each chunk once
+
+    Returns:
+        A group (or chord) signature; call `.apply_async()` to run it
+    """
+    urgent, rest = split_urgent([tuple(conversation) for conversation in conversations])
+    chunks = group(
+        analyze_and_validate_batch_task.s(part[start:start + chunk_size], dedup=dedup).set(queue=QUEUES[lane])
+        for lane, part in ((URGENT, urgent), (BULK, rest))
+        for start in range(0, len(part), chunk_size)
+    )
+    return chord(chunks, collect_batch_results_task.s()) if collect else chunks
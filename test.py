@@ -5,38 +5,95 @@ import os
 import sys
 from pathlib import Path
 
+# (import name, distribution name, label) of every runtime dependency
+REQUIRED_PACKAGES = [
+    ("django", "Django", "Django"),
+    ("rest_framework", "djangorestframework", "Django REST Framework"),
+    ("psycopg2", None, "PostgreSQL adapter"),
+    ("celery", "celery", "Celery"),
+    ("redis", "redis", "Redis"),
+    ("openai", "openai", "OpenAI"),
+    ("kafka", "kafka-python", "Kafka Python"),
+]
+
+# Modules a worker imports at startup, and the packages they must not drag in
+STARTUP_MODULES = [
+    "apps.requirements_analyzer.analyzer",
+    "apps.requirements_analyzer.llm",
+    "apps.requirements_analyzer.cache",
+    "apps.requirements_analyzer.results",
+    "apps.requirements_analyzer.basic_agents.stucture_class",
+    "apps.requirements_analyzer.basic_agents.execption_class",
+    "apps.requirements_analyzer.basic_agents.loggingClass",
+]
+LAZY_PACKAGES = ["django", "celery", "kafka", "openai", "httpx", "redis", "numpy", "pyarrow", "pythonjsonlogger"]
+
 def test_imports():
     """Test if all required packages are installed"""
     print("🔧 Testing package imports...")
-    
-    try:
-        import django
-        print(f"✅ Django {django.get_version()}")
-        
-        import rest_framework
-        print("✅ Django REST Framework")
-        
-        import psycopg2
-        print("✅ PostgreSQL adapter")
-        
-        import celery
-        print(f"✅ Celery {celery.__version__}")
-        
-        import redis
-        print("✅ Redis")
-        
-        import openai
-        print(f"✅ OpenAI {openai.__version__}")
-        
-        import kafka
-        print("✅ Kafka Python")
-        
-        return True
-        
-    except ImportError as e:
-        print(f"❌ Import error: {e}")
+    # find_spec locates a package without importing (and initialising) it
+    from importlib.metadata import PackageNotFoundError, version
+    from importlib.util import find_spec
+
+    missing = []
+    for module, distribution, label in REQUIRED_PACKAGES:
+        if find_spec(module) is None:
+            print(f"❌ Import error: No module named '{module}'")
+            missing.append(module)
+            continue
+        try:
+            print(f"✅ {label} {version(distribution)}" if distribution else f"✅ {label}")
+        except PackageNotFoundError:
+            print(f"✅ {label}")
+
+    return not missing
+
+def test_import_time():
+    """Test that importing the analyzers is fast and has no side effects"""
+    print("\n⏱️ Testing analyzer import time...")
+    import subprocess
+
+    budget_ms = float(os.getenv('IMPORT_TIME_BUDGET_MS', '150'))
+    # test.py lives in <project>/apps/requirements_analyzer
+    project_root = Path(__file__).absolute().parents[2]
+    if not (project_root / 'apps' / 'requirements_analyzer').is_dir():
+        print(f"❌ Run from a checkout at <project>/apps/requirements_analyzer (found {project_root})")
+        return False
+
+    # A fresh interpreter, so nothing is already cached in sys.modules
+    code = "import " + ", ".join(STARTUP_MODULES)
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=project_root, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        print(f"❌ Import failed:\n{completed.stderr[-2000:]}")
+        return False
+    if completed.stdout.strip():
+        print(f"❌ Importing printed output:\n{completed.stdout[:500]}")
+        return False
+
+    # Lines look like "import time: self [us] | cumulative | imported package";
+    # nested imports are indented, so only count our top-level entries
+    total_us = 0
+    imported = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        imported.add(name.strip().split('.')[0])
+        if name.startswith(' apps'):
+            total_us += int(cumulative)
+
+    eager = sorted(set(LAZY_PACKAGES) & imported)
+    if eager:
+        print(f"❌ Imported at startup instead of on first use: {', '.join(eager)}")
         return False
 
+    total_ms = total_us / 1000
+    print(f"{'✅' if total_ms <= budget_ms else '❌'} Analyzer modules imported in {total_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    return total_ms <= budget_ms
+
 def test_environment():
     """Test environment variables"""
     print("\n🔑 Testing environment variables...")
@@ -86,8 +143,8 @@ def test_openai_connection():
         
         print(f"🔗 Attempting to connect with API key: {api_key[:10]}...{api_key[-4:]}")
         
-        # Initialize client without any extra parameters
-        client = OpenAI(api_key=api_key)
+        # Bounded timeout so a slow provider fails the check instead of hanging it
+        client = OpenAI(api_key=api_key, timeout=15.0, max_retries=1)
         
         print("🔄 Making test API call...")
         response = client.chat.completions.create(
@@ -124,6 +181,7 @@ def main():
     
     tests = [
         ("Package Imports", test_imports),
+        ("Import Time", test_import_time),
         ("Environment Variables", test_environment),
         ("OpenAI Connection", test_openai_connection)
     ]
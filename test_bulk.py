@@ -0,0 +1,71 @@
+"""
+Tests for the bulk-analysis CLI (bulk.py)
+"""
+
+import json
+import unittest
+from importlib.util import find_spec
+from typing import List, Sequence
+
+from . import bulk
+from .analyzer import Entity, RequirementsAnalyzer, serialize_analysis
+from .llm import Extraction, LLMBackend, LLMBackendError
+
+
+class FailingBackend(LLMBackend):
+    """Fails every call for a message containing 'boom'"""
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        if any('boom' in message for message in messages):
+            raise LLMBackendError("provider exploded")
+        return [[('find_route', 0.9)] if kind == 'intents' else [('Haifa', 0.9, 'location')] for _ in messages]
+
+
+class AnalyzeChunkTests(unittest.TestCase):
+
+    def setUp(self):
+        self._saved = bulk._analyzer
+        bulk._analyzer = RequirementsAnalyzer(backend=FailingBackend())
+
+    def tearDown(self):
+        bulk._analyzer = self._saved
+
+    def test_failed_analysis_fails_only_its_line(self):
+        lines = [
+            json.dumps({'conversation_id': 'a', 'context': 'bus to Haifa'}),
+            json.dumps({'conversation_id': 'b', 'context': 'boom'}),
+            'not json',
+            json.dumps({'conversation_id': 'c', 'context': 'bus to Haifa please'}),
+        ]
+        rows = bulk.analyze_chunk(lines, 'conversation_id', 'context', concurrency=4)
+        self.assertEqual([row['status'] for row in rows], ['success', 'failed', 'failed', 'success'])
+        self.assertEqual(rows[1]['conversation_id'], 'b')
+        self.assertEqual(rows[1]['error'], 'LLMBackendError')
+        self.assertEqual(rows[1]['error_message'], 'provider exploded')
+        self.assertEqual(rows[2]['error'], 'ValueError')
+        self.assertEqual(rows[3]['analysis']['entities'][0]['label'], 'location')
+
+
+@unittest.skipUnless(find_spec('pyarrow'), "pyarrow is not installed")
+class ParquetWriterTests(unittest.TestCase):
+
+    def test_entity_labels_are_kept(self):
+        import os
+        import tempfile
+
+        import pyarrow.parquet as pq
+
+        analysis = serialize_analysis({
+            'summary': 'bus', 'intents': [], 'entities': [Entity('Haifa', 0.9, 'location'), Entity('Eilat', 0.5)],
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'rows.parquet')
+            writer = bulk.ParquetWriter(path)
+            writer.write([{'conversation_id': 'a', 'status': 'success', 'analysis': analysis}])
+            writer.close()
+            entities = pq.read_table(path).column('entities').to_pylist()[0]
+        self.assertEqual([entity['label'] for entity in entities], ['location', None])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Tests for the result cache (cache.py)
+"""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from . import cache
+from .cache import ResultCache, cache_key, get_default_cache
+
+
+def analysis(summary: str = 'bus'):
+    return {'summary': summary, 'intents': [], 'entities': [], 'confidence': 0.0}
+
+
+class SingleFlightTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_misses_compute_once(self):
+        result_cache = ResultCache()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return analysis()
+
+        results = await asyncio.gather(*(result_cache.get_or_compute('bus  to Haifa', compute) for _ in range(5)))
+        self.assertEqual(calls, 1)
+        self.assertEqual([result['summary'] for result in results], ['bus'] * 5)
+        self.assertEqual(result_cache.counters['coalesced'], 4)
+        # Callers get their own copies
+        results[0]['summary'] = 'changed'
+        self.assertEqual((await result_cache.get_or_compute('bus to Haifa', compute))['summary'], 'bus')
+
+    async def test_cancelled_leader_hands_over(self):
+        result_cache = ResultCache()
+        started = asyncio.Event()
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await asyncio.sleep(0.05)
+            return analysis(f'run {calls}')
+
+        leader = asyncio.ensure_future(result_cache.get_or_compute('ctx', compute))
+        await started.wait()
+        waiters = [asyncio.ensure_future(result_cache.get_or_compute('ctx', compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(calls, 2)
+        self.assertEqual({result['summary'] for result in results}, {'run 2'})
+
+    async def test_failure_reaches_every_waiter(self):
+        result_cache = ResultCache()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            *(result_cache.get_or_compute('ctx', compute) for _ in range(3)), return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(result_cache._inflight, {})
+
+
+class LocalTierTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_lru_eviction_and_ttl(self):
+        result_cache = ResultCache(max_entries=2, ttl=60)
+        for context in ('a', 'b', 'c'):
+            await result_cache.get_or_compute(context, lambda: asyncio.sleep(0, analysis(context)))
+        self.assertEqual(result_cache.counters['evictions'], 1)
+        self.assertIsNone(result_cache._get_local(cache_key('a')))
+        result_cache.ttl = -1
+        await result_cache.get_or_compute('d', lambda: asyncio.sleep(0, analysis()))
+        self.assertIsNone(result_cache._get_local(cache_key('d')))
+        self.assertEqual(result_cache.counters['expirations'], 1)
+
+
+class DefaultCacheTests(unittest.TestCase):
+
+    def tearDown(self):
+        cache._default_cache = None
+
+    def test_configured_from_environment(self):
+        with mock.patch.dict(os.environ, {'REQUIREMENTS_ANALYZER_CACHE': ''}):
+            self.assertIsNone(get_default_cache())
+        with mock.patch.dict(os.environ, {'REQUIREMENTS_ANALYZER_CACHE': 'local', 'REQUIREMENTS_ANALYZER_CACHE_ENTRIES': '5'}):
+            default = get_default_cache()
+            self.assertIs(default, get_default_cache())
+            self.assertEqual(default.max_entries, 5)
+            self.assertIsNone(default.redis_url)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Tests for the keyword classifier (classifier.py)
+"""
+
+import unittest
+
+from .classifier import DEFAULT_CATEGORIES, KeywordClassifier
+from .normalization import normalize
+
+
+class KeywordClassifierTests(unittest.TestCase):
+
+    def setUp(self):
+        self.classifiers = [KeywordClassifier(DEFAULT_CATEGORIES, strategy=strategy) for strategy in ('find', 'regex')]
+
+    def classify(self, message):
+        results = [classifier.classify(message) for classifier in self.classifiers]
+        self.assertEqual(results[0], results[1], f"strategies disagree on {message!r}")
+        return results[0]
+
+    def test_categories(self):
+        self.assertEqual(self.classify("Hello, I need a bus ASAP please"), {'urgent': True, 'polite': True, 'greeting': True})
+        self.assertEqual(self.classify("When is the next bus?"), {'urgent': False, 'polite': False, 'greeting': False})
+
+    def test_word_boundaries(self):
+        self.assertFalse(self.classify("this shipping is fine")['greeting'])
+        self.assertTrue(self.classify("hi!")['greeting'])
+
+    def test_multi_word_keywords_match_any_whitespace(self):
+        for message in ("Thank you", "thank  you", "thank\nyou", "THANK\t you!"):
+            self.assertTrue(self.classify(message)['polite'], message)
+        self.assertTrue(self.classify("good\r\nmorning")['greeting'])
+        self.assertFalse(self.classify("thankyou")['polite'])
+
+    def test_spaced_match_after_a_single_spaced_non_match(self):
+        # The single-spaced form occurs but not on a word boundary
+        self.assertTrue(self.classify("thank your driver, thank  you")['polite'])
+        self.assertTrue(self.classify("good mornings and good\nmorning")['greeting'])
+        self.assertFalse(self.classify("thank your driver")['polite'])
+
+    def test_normalized_message(self):
+        self.assertTrue(self.classify(normalize("ＵＲＧＥＮＴ: thank\nyou"))['urgent'])
+        self.assertTrue(self.classify(normalize("thank\nyou"))['polite'])
+
+    def test_invalid_categories(self):
+        with self.assertRaises(ValueError):
+            KeywordClassifier({'not-an-identifier': ['x']})
+        with self.assertRaises(ValueError):
+            KeywordClassifier({'empty': ['  ']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Tests for batch deduplication (dedup.py and analyze_many(deduplicate=True))
+"""
+
+import unittest
+from typing import List
+
+from .analyzer import RequirementsAnalyzer
+from .dedup import DuplicateIndex, representatives
+from .gazetteer import get_default_entity_extractor
+from .llm import FakeLLMBackend
+
+
+class DuplicateIndexTests(unittest.TestCase):
+
+    def test_exact_duplicates_ignore_case_and_punctuation(self):
+        index = DuplicateIndex()
+        clusters = index.cluster(['Bus to Haifa?', 'bus  to HAIFA', 'Bus to Eilat'])
+        self.assertEqual(clusters, [0, 0, 2])
+        self.assertEqual(representatives(clusters), [0, 2])
+        self.assertEqual(index.counters, {'unique': 2, 'exact': 1, 'near': 0})
+
+    def test_near_duplicates(self):
+        index = DuplicateIndex()
+        clusters = index.cluster([
+            'Is there a bus to Jerusalem on Saturday?',
+            'is there any bus to Jerusalem on saturday please',
+        ])
+        self.assertEqual(clusters, [0, 0])
+        self.assertEqual(index.counters['near'], 1)
+
+    def test_numbers_and_negations_must_match(self):
+        index = DuplicateIndex(min_similarity=0.5)
+        clusters = index.cluster([
+            'I need bus 18 to the central station',
+            'I need bus 19 to the central station',
+            'I do not need bus 18 to the central station',
+        ])
+        self.assertEqual(clusters, [0, 1, 2])
+
+    def test_salient_terms_must_match(self):
+        to_jerusalem = 'is there a direct night bus from the central station to jerusalem on saturday'
+        to_haifa = to_jerusalem.replace('jerusalem', 'haifa')
+        self.assertEqual(DuplicateIndex(min_similarity=0.5).cluster([to_jerusalem, to_haifa]), [0, 0])
+        cities = lambda normalized: [token for token in normalized.tokens if token in ('haifa', 'jerusalem')]
+        self.assertEqual(DuplicateIndex(min_similarity=0.5, salient=cities).cluster([to_jerusalem, to_haifa]), [0, 1])
+
+    def test_spelled_out_numbers_and_times_must_match(self):
+        analyzer = RequirementsAnalyzer(entity_extractor=get_default_entity_extractor())
+        pairs = [
+            ('I need a bus from Tel Aviv to Jerusalem tomorrow morning at ten',
+             'I need a bus from Tel Aviv to Jerusalem tomorrow morning at eleven'),
+            ('I need two tickets for the bus from Tel Aviv to Jerusalem tomorrow',
+             'I need three tickets for the bus from Tel Aviv to Jerusalem tomorrow'),
+            ('bus from Tel Aviv to Jerusalem tomorrow at 5pm', 'bus from Tel Aviv to Jerusalem tomorrow at 6pm'),
+            ('bus from Tel Aviv to Jerusalem tomorrow morning', 'bus from Tel Aviv to Jerusalem tomorrow evening'),
+            ('אני צריך אוטובוס לירושלים בשלוש', 'אני צריך אוטובוס לירושלים בארבע'),
+        ]
+        for pair in pairs:
+            self.assertEqual(analyzer.duplicate_index().cluster(pair), [0, 1], pair)
+            self.assertEqual(DuplicateIndex(min_similarity=0.5).cluster(pair), [0, 1], pair)
+
+    def test_filler_only_messages_match_exactly_or_not_at_all(self):
+        self.assertEqual(DuplicateIndex().cluster(['hi', 'Hi!', 'thanks']), [0, 0, 2])
+
+    def test_clear_starts_a_new_window(self):
+        index = DuplicateIndex()
+        index.cluster(['Bus to Haifa', 'Bus to Eilat'])
+        index.clear()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.add('Bus to Eilat'), (0, True))
+
+    def test_min_similarity_bounds(self):
+        with self.assertRaises(ValueError):
+            DuplicateIndex(min_similarity=0)
+
+
+class CountingAnalyzer(RequirementsAnalyzer):
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.analyzed: List[str] = []
+
+    async def analyze_requirements(self, conversation_context, *args, **kwargs):
+        self.analyzed.append(conversation_context)
+        return await super().analyze_requirements(conversation_context, *args, **kwargs)
+
+
+class AnalyzeManyDedupTests(unittest.IsolatedAsyncioTestCase):
+
+    async def analyze(self, analyzer, contexts, **kwargs):
+        return [analysis async for _, analysis in analyzer.analyze_many(contexts, deduplicate=True, **kwargs)]
+
+    async def test_duplicates_share_the_representative_analysis(self):
+        analyzer = CountingAnalyzer(backend=FakeLLMBackend())
+        contexts = ['I need a bus to Haifa please', 'i need a bus to haifa, please!', 'Bus to Eilat']
+        results = await self.analyze(analyzer, contexts)
+        self.assertEqual(analyzer.analyzed, ['I need a bus to Haifa please', 'Bus to Eilat'])
+        self.assertTrue(results[0]['intents'])
+        self.assertEqual(results[1]['intents'], results[0]['intents'])
+        self.assertEqual(results[1]['entities'], results[0]['entities'])
+        self.assertEqual(results[1]['confidence'], results[0]['confidence'])
+        # Own summary and own lists, so callers can change one result safely
+        self.assertEqual(results[1]['summary'], 'i need a bus to haifa, please!')
+        self.assertIsNot(results[1]['intents'], results[0]['intents'])
+
+    async def test_without_dedup_every_context_is_analyzed(self):
+        analyzer = CountingAnalyzer()
+        contexts = ['Bus to Haifa', 'Bus to Haifa']
+        _ = [item async for item in analyzer.analyze_many(contexts)]
+        self.assertEqual(analyzer.analyzed, contexts)
+
+    async def test_failed_representative_fails_its_duplicates(self):
+        class FailingAnalyzer(CountingAnalyzer):
+            async def analyze_requirements(self, conversation_context, *args, **kwargs):
+                self.analyzed.append(conversation_context)
+                raise RuntimeError("down")
+
+        analyzer = FailingAnalyzer()
+        results = await self.analyze(analyzer, ['Bus to Haifa', 'bus to haifa'], return_exceptions=True)
+        self.assertEqual(len(analyzer.analyzed), 1)
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
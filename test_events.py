@@ -0,0 +1,134 @@
+"""
+Tests for event encoding and the fire-and-forget publisher (events.py)
+"""
+
+import os
+import unittest
+from unittest import mock
+
+from . import events
+from .analyzer import Entity, Intent, analysis_result
+from .events import (
+    DEFAULT_TOPIC, EVENT_SCHEMA_VERSION, EventPublisher, InMemoryBroker, decode_event, encode_event,
+)
+
+
+def analyzed(conversation_id='conv-1') -> dict:
+    return analysis_result(conversation_id, {
+        'summary': 'Bus to Haifa tomorrow',
+        'intents': [Intent('find_route', 0.75)],
+        'entities': [Entity('Haifa', 0.9, 'location'), Entity('tomorrow', 0.5, 'date')],
+        'confidence': 0.75,
+    })
+
+
+def validated(conversation_id='conv-1') -> dict:
+    result = analyzed(conversation_id)
+    result['validation'] = {'is_complete': False, 'missing_items': ['time'], 'confidence': 0.5}
+    return result
+
+
+class EncodingTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        result = validated()
+        event = decode_event(encode_event(result, timestamp_ms=1234))
+        self.assertEqual(event.pop('schema_version'), EVENT_SCHEMA_VERSION)
+        self.assertEqual(event.pop('event_type'), 'validated')
+        self.assertEqual(event.pop('timestamp_ms'), 1234)
+        self.assertEqual(event, result)
+
+    def test_event_type_follows_validation(self):
+        self.assertEqual(decode_event(encode_event(analyzed()))['event_type'], 'analyzed')
+        failed = analysis_result('conv-2', ValueError('boom'))
+        self.assertEqual(decode_event(encode_event(failed))['event_type'], 'analyzed')
+
+    def test_rejects_other_data(self):
+        with self.assertRaises(ValueError):
+            decode_event(b'{"conversation_id": "conv-1"}')
+
+
+class PublisherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = InMemoryBroker()
+        self.publisher = EventPublisher(self.broker)
+        self.counts = self._counts()
+
+    def _counts(self):
+        return (self.publisher._sent.value(), self.publisher._delivered.value(), self.publisher._failed.value())
+
+    def _delta(self):
+        return tuple(now - before for now, before in zip(self._counts(), self.counts))
+
+    def test_publish_round_trip(self):
+        results = [analyzed('conv-1'), validated('conv-2')]
+        self.publisher.publish_many(results)
+        published = self.broker.events()
+        self.assertEqual([event['conversation_id'] for event in published], ['conv-1', 'conv-2'])
+        self.assertEqual([event['event_type'] for event in published], ['analyzed', 'validated'])
+        self.assertEqual(published[1]['requirements'], results[1]['requirements'])
+        self.assertEqual(self._delta(), (2, 2, 0))
+
+    def test_key_is_the_conversation_id(self):
+        self.publisher.publish(analyzed('conv-7'))
+        self.publisher.publish(analyzed(42))
+        result = analyzed()
+        del result['conversation_id']
+        self.publisher.publish(result)
+        keys = [key for key, _ in self.broker.records[DEFAULT_TOPIC]]
+        self.assertEqual(keys, [b'conv-7', b'42', None])
+
+    def test_failed_delivery_is_counted_and_logged(self):
+        self.broker.fail_with = ConnectionError('broker down')
+        with self.assertLogs(events.logger, level='ERROR') as logs:
+            self.publisher.publish(analyzed('conv-3'))
+        self.assertEqual(self._delta(), (1, 0, 1))
+        self.assertIn('conv-3', logs.output[0])
+        self.assertEqual(self.broker.events(), [])
+
+    def test_send_after_close_is_counted_not_raised(self):
+        self.publisher.close()
+        self.assertTrue(self.broker.closed)
+        with self.assertLogs(events.logger, level='WARNING'):
+            self.publisher.publish(analyzed())
+        self.assertEqual(self._delta(), (0, 0, 1))
+
+    def test_topic(self):
+        publisher = EventPublisher(self.broker, topic='requirements.other')
+        publisher.publish(analyzed())
+        self.assertEqual(len(self.broker.events('requirements.other')), 1)
+        self.assertEqual(self.broker.events(), [])
+
+
+class SharedPublisherTests(unittest.TestCase):
+
+    def setUp(self):
+        events.close_event_publisher()
+        self.addCleanup(events.close_event_publisher)
+
+    def test_disabled_without_bootstrap(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertIsNone(events.get_event_publisher())
+
+    def test_memory_broker_is_shared_per_process(self):
+        env = {'REQUIREMENTS_ANALYZER_KAFKA_BOOTSTRAP': 'memory', 'REQUIREMENTS_ANALYZER_KAFKA_TOPIC': 'requirements.test'}
+        with mock.patch.dict(os.environ, env):
+            publisher = events.get_event_publisher()
+            self.assertIsInstance(publisher.producer, InMemoryBroker)
+            self.assertEqual(publisher.topic, 'requirements.test')
+            self.assertIs(events.get_event_publisher(), publisher)
+            # A forked child gets its own producer
+            with mock.patch('os.getpid', return_value=os.getpid() + 1):
+                self.assertIsNot(events.get_event_publisher(), publisher)
+
+    def test_close(self):
+        with mock.patch.dict(os.environ, {'REQUIREMENTS_ANALYZER_KAFKA_BOOTSTRAP': 'memory'}):
+            publisher = events.get_event_publisher()
+            events.close_event_publisher()
+            self.assertTrue(publisher.producer.closed)
+            self.assertIsNot(events.get_event_publisher(), publisher)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Tests for the compiled gazetteer and the local entity extractor (gazetteer.py)
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from .gazetteer import (
+    DEFAULT_SOURCE, EntityExtractor, Gazetteer, build_gazetteer, find_patterns, main, read_entries,
+)
+
+
+def spans(extractor, message):
+    return [(span.name, span.label) for span in extractor.extract(message)]
+
+
+class ExtractorTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, 'places.gaz')
+        build_gazetteer(read_entries(DEFAULT_SOURCE), path)
+        cls.gazetteer = Gazetteer(path)
+        cls.extractor = EntityExtractor(cls.gazetteer)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.gazetteer.close()
+        cls.directory.cleanup()
+
+    def test_multi_word_places_take_the_longest_name(self):
+        self.assertEqual(spans(self.extractor, "bus to Tel Aviv Central Station please"),
+                         [('Tel Aviv Central Station', 'location')])
+        self.assertEqual(spans(self.extractor, "from Tel Aviv to Ben Gurion Airport"),
+                         [('Tel Aviv', 'location'), ('Ben Gurion Airport', 'location')])
+
+    def test_offsets_point_into_the_message(self):
+        message = "I need to get from Tel Aviv to Jerusalem"
+        for span in self.extractor.extract(message):
+            self.assertEqual(message[span.start:span.end], span.name)
+
+    def test_hebrew_prefix_letters_are_stripped(self):
+        self.assertEqual(spans(self.extractor, "אני צריך אוטובוס לתל אביב"), [('תל אביב', 'location')])
+        # Two prefix letters, and a name that itself starts with a prefix letter
+        self.assertEqual(spans(self.extractor, "ומבאר שבע להתחנה המרכזית"),
+                         [('באר שבע', 'location'), ('התחנה המרכזית', 'location')])
+        message = "מבאר שבע לירושלים בשבת"
+        extracted = self.extractor.extract(message)
+        self.assertEqual([(span.name, span.label) for span in extracted],
+                         [('באר שבע', 'location'), ('ירושלים', 'location'), ('שבת', 'date')])
+        self.assertEqual([message[span.start:span.end] for span in extracted], ['באר שבע', 'ירושלים', 'שבת'])
+
+    def test_times_and_dates(self):
+        self.assertEqual(spans(self.extractor, "next Friday at 17:30"), [('next Friday', 'date'), ('17:30', 'time')])
+        self.assertEqual(spans(self.extractor, "on 3rd of March or 12/05/2025 at noon"),
+                         [('3rd of March', 'date'), ('12/05/2025', 'date'), ('noon', 'time')])
+        self.assertEqual(spans(self.extractor, "to the airport tomorrow at 9:15 am"),
+                         [('the airport', 'location'), ('tomorrow', 'date'), ('9:15 am', 'time')])
+        self.assertEqual([(span.name, span.label) for span in find_patterns("5pm מחר")],
+                         [('5pm', 'time'), ('מחר', 'date')])
+
+    def test_miss(self):
+        self.assertEqual(spans(self.extractor, "bus to Springfield please"), [])
+        self.assertEqual(spans(self.extractor, "Tel"), [])
+        self.assertEqual(spans(self.extractor, ""), [])
+        self.assertIsNone(self.gazetteer.lookup("Springfield"))
+        # A prefix of a name is not a name
+        self.assertIsNone(self.gazetteer.lookup("Tel"))
+        self.assertEqual(self.gazetteer.lookup("tel aviv"), ('location', 0.95))
+
+    def test_without_patterns_or_gazetteer(self):
+        self.assertEqual(spans(EntityExtractor(self.gazetteer, patterns=False), "Haifa at 5pm"), [('Haifa', 'location')])
+        self.assertEqual(spans(EntityExtractor(), "Haifa at 5pm"), [('5pm', 'time')])
+
+
+class BuildTests(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.gaz')
+
+    def test_duplicate_names_keep_the_most_confident_entry(self):
+        entries = [('Haifa', 'location', 0.5), ('haifa', 'city', 0.75), ('Haifa', 'stop', 0.25)]
+        self.assertEqual(build_gazetteer(entries, self.path), 1)
+        with Gazetteer(self.path) as gazetteer:
+            self.assertEqual(len(gazetteer), 1)
+            self.assertEqual(gazetteer.lookup('HAIFA'), ('city', 0.75))
+
+    def test_load_factor_must_leave_empty_slots(self):
+        entries = [(f'Stop {n}', 'location', 0.9) for n in range(8)]
+        for load_factor in (0, -0.5, 1, 1.5, float('nan')):
+            with self.assertRaises(ValueError):
+                build_gazetteer(entries, self.path, load_factor=load_factor)
+        self.assertFalse(os.path.exists(self.path))
+        build_gazetteer(entries, self.path, load_factor=0.9)
+        with Gazetteer(self.path) as gazetteer:
+            self.assertIsNone(gazetteer.lookup('Stop 9'))
+            self.assertEqual(gazetteer.lookup('Stop 7'), ('location', 0.9))
+
+    def test_cli_rejects_a_bad_load_factor(self):
+        with contextlib.redirect_stderr(io.StringIO()) as stderr, self.assertRaises(SystemExit):
+            main(['build', DEFAULT_SOURCE, self.path, '--load-factor', '1'])
+        self.assertIn('between 0 and 1', stderr.getvalue())
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(main(['build', DEFAULT_SOURCE, self.path, '--load-factor', '0.75']), 0)
+        with Gazetteer(self.path) as gazetteer:
+            self.assertEqual(gazetteer.lookup('Eilat'), ('location', 0.95))
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a gazetteer, just some bytes')
+        with self.assertRaises(ValueError):
+            Gazetteer(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Tests for the local nearest-prototype intent matcher (intent_index.py)
+"""
+
+import unittest
+
+from .intent_index import NO_INTENT, HashingVectorizer, IntentIndex, split_sentences
+from .normalization import normalize
+
+
+def labels(intents):
+    return None if intents is None else [intent.name for intent in intents]
+
+
+def scored(intents):
+    return None if intents is None else [(intent.name, intent.confidence) for intent in intents]
+
+
+class IntentIndexTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = IntentIndex()
+
+    def test_top_label(self):
+        self.assertEqual(labels(self.index.match("which bus goes to Haifa")), ['find_route'])
+        intents = self.index.match("I missed my bus")
+        self.assertEqual(labels(intents), ['missed_bus'])
+        self.assertEqual(intents[0].confidence, 1.0)
+
+    def test_every_sentence_reports_its_intents(self):
+        self.assertEqual(labels(self.index.match("when is the next bus. I missed my bus")), ['bus_schedule', 'missed_bus'])
+        # Further intents of a confident sentence are reported from min_score
+        self.assertIn('urgent_help', labels(self.index.match("bus to Tel Aviv ASAP. this is urgent")))
+
+    def test_no_intent_is_a_confident_empty_answer(self):
+        self.assertEqual(self.index.match("thank you"), [])
+        self.assertEqual(self.index.match(""), [])
+
+    def test_below_threshold_goes_to_the_llm(self):
+        self.assertIsNone(self.index.match("what is the weather on Mars"))
+        # One unmatched sentence is enough
+        self.assertIsNone(self.index.match("I missed my bus. what is the weather on Mars"))
+        self.assertEqual(self.index.rank("what is the weather on Mars"), [])
+
+    def test_threshold(self):
+        message = "which bus goes to Haifa"
+        score = self.index.match(message)[0].confidence
+        self.assertLess(score, 1.0)
+        self.assertIsNone(IntentIndex(threshold=score + 0.01).match(message))
+        self.assertEqual(labels(IntentIndex(threshold=score - 0.01).match(message)), ['find_route'])
+        # rank ignores the threshold
+        self.assertEqual(labels(IntentIndex(threshold=score + 0.01).rank(message)), ['find_route'])
+
+    def test_batch_matches_one_by_one(self):
+        messages = ["which bus goes to Haifa", "thank you", "what is the weather on Mars", "", normalize("I MISSED MY BUS")]
+        self.assertEqual([scored(intents) for intents in self.index.match_batch(messages)],
+                         [scored(self.index.match(message)) for message in messages])
+        self.assertEqual(labels(self.index.match_batch(messages)[4]), ['missed_bus'])
+
+    def test_custom_examples(self):
+        index = IntentIndex({'greet': ("hello there",), 'refund': ("I want my money back",), NO_INTENT: ("ok",)})
+        self.assertEqual(index.labels, ['greet', NO_INTENT, 'refund'])
+        self.assertEqual(labels(index.match("I want my money back")), ['refund'])
+        self.assertEqual(labels(index.match("hello there")), ['greet'])
+
+    def test_intent_without_examples_is_rejected(self):
+        examples = {'greet': ("hello there",), 'lost': (), 'refund': ("I want my money back",), 'spare': []}
+        with self.assertRaisesRegex(ValueError, 'lost, spare'):
+            IntentIndex(examples)
+        with self.assertRaises(ValueError):
+            IntentIndex({})
+
+
+class VectorizerTests(unittest.TestCase):
+
+    def test_rows_are_normalized_and_deterministic(self):
+        vectorizer = HashingVectorizer(n_features=1 << 10)
+        matrix = vectorizer.transform(["bus to Haifa", "bus to Haifa", ""])
+        self.assertAlmostEqual(float((matrix[0] ** 2).sum()), 1.0, places=5)
+        self.assertTrue((matrix[0] == matrix[1]).all())
+        self.assertFalse(matrix[2].any())
+        self.assertTrue((HashingVectorizer(n_features=1 << 10).transform(["bus to Haifa"])[0] == matrix[0]).all())
+
+    def test_n_features_must_be_a_power_of_two(self):
+        with self.assertRaises(ValueError):
+            HashingVectorizer(n_features=1000)
+
+    def test_split_sentences(self):
+        self.assertEqual(split_sentences("When is the bus? I missed it.\n\nthanks"), ["When is the bus?", "I missed it.", "thanks"])
+        self.assertEqual(split_sentences("  "), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
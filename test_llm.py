@@ -0,0 +1,149 @@
+"""
+Tests for the LLM backend plumbing (llm.py)
+"""
+
+import asyncio
+import unittest
+from typing import List, Sequence
+
+from .llm import (
+    BatchingBackend, Extraction, LLMBackend, LLMBackendError, is_transient_error, parse_extraction_response,
+    retry_with_backoff,
+)
+
+
+class RecordingBackend(LLMBackend):
+    """Echoes every message back, recording the batches it receives"""
+
+    def __init__(self, drop_last: bool = False):
+        self.batches: List[List[str]] = []
+        self.drop_last = drop_last
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        self.batches.append(list(messages))
+        results = [[(message, 0.9)] for message in messages]
+        return results[:-1] if self.drop_last else results
+
+
+class BlockingBackend(RecordingBackend):
+    """Holds every batch until `release` is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+        self.closed = False
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        await self.release.wait()
+        return await super().extract_batch(kind, messages)
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class BatchingBackendTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_concurrent_calls_share_one_request(self):
+        inner = RecordingBackend()
+        backend = BatchingBackend(inner, max_batch_size=32, max_wait_ms=5)
+        results = await asyncio.gather(*(backend.extract('intents', f"m{i}") for i in range(3)))
+        self.assertEqual(inner.batches, [['m0', 'm1', 'm2']])
+        self.assertEqual(results, [[('m0', 0.9)], [('m1', 0.9)], [('m2', 0.9)]])
+
+    async def test_full_batch_is_sent_without_waiting(self):
+        inner = RecordingBackend()
+        backend = BatchingBackend(inner, max_batch_size=2, max_wait_ms=60_000)
+        results = await asyncio.wait_for(asyncio.gather(backend.extract('entities', 'a'), backend.extract('entities', 'b')), 1)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(inner.batches, [['a', 'b']])
+
+    async def test_short_answer_fails_the_leftover_calls(self):
+        backend = BatchingBackend(RecordingBackend(drop_last=True), max_wait_ms=1)
+        results = await asyncio.wait_for(
+            asyncio.gather(backend.extract('intents', 'a'), backend.extract('intents', 'b'), return_exceptions=True), 1)
+        self.assertEqual(results[0], [('a', 0.9)])
+        self.assertIsInstance(results[1], LLMBackendError)
+
+    async def test_sends_in_flight_are_referenced_until_done(self):
+        inner = BlockingBackend()
+        backend = BatchingBackend(inner, max_batch_size=1)
+        call = asyncio.ensure_future(backend.extract('intents', 'a'))
+        await asyncio.sleep(0)
+        self.assertEqual(len(backend._sending), 1)
+        inner.release.set()
+        self.assertEqual(await call, [('a', 0.9)])
+        await asyncio.sleep(0)
+        self.assertEqual(backend._sending, set())
+
+    async def test_aclose_waits_for_sends_in_flight(self):
+        inner = BlockingBackend()
+        backend = BatchingBackend(inner, max_wait_ms=60_000)
+        call = asyncio.ensure_future(backend.extract('entities', 'a'))
+        await asyncio.sleep(0)
+        closing = asyncio.ensure_future(backend.aclose())
+        await asyncio.sleep(0.01)
+        self.assertFalse(inner.closed)
+        inner.release.set()
+        await closing
+        self.assertTrue(inner.closed)
+        self.assertEqual(await call, [('a', 0.9)])
+
+
+class ParseExtractionResponseTests(unittest.TestCase):
+
+    def test_items(self):
+        content = '{"results": [[{"name": "Haifa", "confidence": 1.5, "label": "location"}, {"name": 7}], null]}'
+        self.assertEqual(parse_extraction_response(content, 2), [[('Haifa', 1.0, 'location'), ('7', 0.0)], []])
+
+    def test_malformed_answers_raise_backend_errors(self):
+        for content in (
+            'not json',
+            '{"answers": [[]]}',
+            '{"results": [[], []]}',
+            '{"results": {"a": 1}}',
+            '{"results": [["Haifa"]]}',
+            '{"results": [[{"name": "Haifa", "confidence": "high"}]]}',
+            '{"results": [[{"name": "Haifa", "confidence": [0.5]}]]}',
+            '{"results": [[{"confidence": 0.5}]]}',
+            '{"results": [3]}',
+        ):
+            with self.assertRaises(LLMBackendError, msg=content):
+                parse_extraction_response(content, 1)
+
+class RetryTests(unittest.IsolatedAsyncioTestCase):
+
+    async def run_failing(self, error: Exception) -> int:
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            raise error
+
+        with self.assertRaises(type(error)):
+            await retry_with_backoff(call, attempts=3, base_delay=0)
+        return calls
+
+    async def test_transient_errors_are_retried(self):
+        self.assertEqual(await self.run_failing(StatusError(503)), 3)
+        self.assertEqual(await self.run_failing(ConnectionResetError()), 3)
+
+    async def test_permanent_errors_are_not_retried(self):
+        self.assertEqual(await self.run_failing(StatusError(400)), 1)
+        self.assertEqual(await self.run_failing(LLMBackendError("malformed")), 1)
+
+    def test_is_transient_error(self):
+        self.assertTrue(is_transient_error(asyncio.TimeoutError()))
+        self.assertTrue(is_transient_error(StatusError(429)))
+        self.assertFalse(is_transient_error(StatusError(401)))
+        self.assertFalse(is_transient_error(ValueError()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests for the batching log file handler (logging_config.py)
+"""
+
+import logging
+import os
+import tempfile
+import time
+import unittest
+
+from .logging_config import BatchingFileHandler
+
+
+def record(message: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord('test', level, __file__, 1, message, None, None)
+
+
+class BatchingFileHandlerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'analyzer.log')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self) -> str:
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_idle_handler_flushes_within_interval(self):
+        handler = BatchingFileHandler(self.path, flush_every=1000, flush_interval=0.05)
+        try:
+            handler.handle(record('first'))
+            self.assertEqual(self.read(), '')
+            deadline = time.monotonic() + 2
+            while 'first' not in self.read() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertIn('first', self.read())
+        finally:
+            handler.close()
+
+    def test_batch_size_and_errors_flush_immediately(self):
+        handler = BatchingFileHandler(self.path, flush_every=2, flush_interval=60)
+        try:
+            handler.handle(record('one'))
+            handler.handle(record('two'))
+            self.assertEqual(self.read().split(), ['one', 'two'])
+            handler.handle(record('broken', logging.ERROR))
+            self.assertIn('broken', self.read())
+        finally:
+            handler.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for the metrics registry and the analyzers' statistics (metrics.py)
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from .basic_agents.execption_class import SafeRequirmentsAnalyzer
+from .basic_agents.loggingClass import LoggingRequirementsAnalyzer
+from .metrics import REGISTRY, InstanceCounter, MetricsRegistry, SnapshotWriter
+
+
+class InstanceStatsTests(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_logging_analyzer_stats_are_per_instance(self):
+        first = LoggingRequirementsAnalyzer()
+        first.analyze_message_with_logging("bus to Haifa please")
+        first.analyze_message_with_logging("")
+        shared = REGISTRY.counter('requirements_messages_total', '', {'analyzer': first.name}).value()
+        second = LoggingRequirementsAnalyzer()
+        second.analyze_message_with_logging("urgent bus")
+        self.assertEqual((first.totalMessages_procceed, first.succesfulAnalysis, first.failedAnalysis), (2, 1, 1))
+        stats = second.get_detailed_stats()
+        self.assertEqual((stats['total_processed'], stats['successful_analyses'], stats['failed_analyses']), (1, 1, 0))
+        # The exported counter still sums every analyzer with this name
+        self.assertEqual(REGISTRY.counter('requirements_messages_total', '', {'analyzer': first.name}).value(), shared + 1)
+
+    def test_safe_analyzer_stats_are_per_instance(self):
+        with mock.patch('builtins.print'):
+            SafeRequirmentsAnalyzer().analyze_message_safely("hello")
+            analyzer = SafeRequirmentsAnalyzer()
+            analyzer.analyze_message_safely(None)
+        self.assertEqual(analyzer.get_stats()['totalMessages_procceed'], 1)
+        self.assertEqual(analyzer.get_stats()['failedAnalysis'], 1)
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def test_instance_counter_feeds_shared_counter(self):
+        registry = MetricsRegistry()
+        shared = registry.counter('things_total', 'Things')
+        a, b = InstanceCounter(shared), InstanceCounter(shared)
+        a.inc()
+        b.inc(2)
+        self.assertEqual((a.value(), b.value(), shared.value()), (1, 2, 3))
+
+    def test_snapshot_writer_writes_periodically_and_on_stop(self):
+        registry = MetricsRegistry()
+        counter = registry.counter('things_total', 'Things')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+            writer = SnapshotWriter(0.01, directory, registry).start()
+            counter.inc()
+            deadline = time.monotonic() + 2
+            while not os.path.exists(path) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(os.path.exists(path))
+            counter.inc()
+            writer.stop()
+            with open(path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        self.assertEqual(snapshot['things_total']['series'][0]['value'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+"""
+Tests for the LLM resilience layer (resilience.py) and degraded analyses
+"""
+
+import asyncio
+import unittest
+from typing import List, Sequence
+
+from .analyzer import RequirementsAnalyzer
+from .cache import ResultCache
+from .llm import DegradedExtraction, Extraction, LLMBackend, LLMBackendError
+from .resilience import AdaptiveLimiter, CircuitBreaker, LimitExceededError, ResilientBackend
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SwitchableBackend(LLMBackend):
+    """Answers every message with one item, or fails while `down` is set"""
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    async def extract_batch(self, kind: str, messages: Sequence[str]) -> List[Extraction]:
+        self.calls += 1
+        if self.down:
+            raise LLMBackendError("provider down")
+        if kind == 'intents':
+            return [[('find_route', 0.9)] for _ in messages]
+        return [[('Haifa', 0.9, 'location')] for _ in messages]
+
+
+class AdaptiveLimiterTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_healthy_calls_raise_the_limit(self):
+        limiter = AdaptiveLimiter(initial=4, max_limit=5)
+        for _ in range(40):
+            await limiter.acquire()
+            limiter.release(0.01)
+        self.assertEqual(limiter.limit, 5)
+        self.assertEqual(limiter.inflight, 0)
+
+    async def test_failure_lowers_the_limit_once_per_round_trip(self):
+        limiter = AdaptiveLimiter(initial=10, backoff=0.5)
+        await limiter.acquire()
+        limiter.release(None, ok=False)
+        self.assertEqual(limiter.limit, 5)
+        # A burst of failures from the same moment is one congestion signal
+        await limiter.acquire()
+        limiter.release(None, ok=False)
+        self.assertEqual(limiter.limit, 5)
+
+    async def test_slow_calls_lower_the_limit_by_the_gradient(self):
+        limiter = AdaptiveLimiter(initial=10, backoff=0.5, tolerance=2.0)
+        await limiter.acquire()
+        limiter.release(0.01)
+        await limiter.acquire()
+        # 0.03s against an allowed 2 x 0.01s shrinks by 0.02 / 0.03
+        limiter.release(0.03)
+        self.assertAlmostEqual(limiter.limit, (10 + 0.1) * 2 / 3, places=6)
+
+    async def test_limit_never_drops_below_min(self):
+        limiter = AdaptiveLimiter(initial=2, min_limit=2)
+        await limiter.acquire()
+        limiter.release(None, ok=False)
+        self.assertEqual(limiter.limit, 2)
+
+    async def test_waiters_and_full_queue(self):
+        limiter = AdaptiveLimiter(initial=1, max_queue=1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with self.assertRaises(LimitExceededError):
+            await limiter.acquire()
+        limiter.release(0.01)
+        await asyncio.wait_for(waiter, 1)
+        self.assertEqual(limiter.inflight, 1)
+
+    async def test_wait_timeout(self):
+        limiter = AdaptiveLimiter(initial=1)
+        await limiter.acquire()
+        with self.assertRaises(LimitExceededError):
+            await limiter.acquire(timeout=0.01)
+        self.assertEqual(len(limiter._waiters), 0)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=0.5, window=4, min_calls=4, reset_timeout=10, half_open_calls=2, clock=self.clock)
+
+    def fail(self, times: int) -> None:
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record(False)
+
+    def test_opens_on_failure_rate(self):
+        self.fail(1)
+        self.breaker.record(True)
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_probes_then_closes(self):
+        self.fail(4)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+        # Only half_open_calls probes at a time
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record(True)
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.fail(4)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.clock.now = 15
+        self.assertFalse(self.breaker.allow())
+
+    def test_released_probe_slot_is_reusable(self):
+        self.fail(4)
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertTrue(self.breaker.allow())
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow())
+
+
+class ResilientBackendTests(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.inner = SwitchableBackend()
+        self.local_calls: List[str] = []
+
+        def local(kind: str, message: str) -> Extraction:
+            self.local_calls.append(message)
+            return [('local_guess', 0.4)]
+
+        breaker = CircuitBreaker(min_calls=100)
+        self.backend = ResilientBackend(self.inner, deadline=1.0, breaker=breaker, fallback=local)
+
+    async def test_success_is_not_degraded(self):
+        result = await self.backend.extract('intents', 'bus to Haifa')
+        self.assertEqual(result, [('find_route', 0.9)])
+        self.assertNotIsInstance(result, DegradedExtraction)
+
+    async def test_fallback_order(self):
+        await self.backend.extract('intents', 'bus to Haifa')
+        self.inner.down = True
+        # 1. the last good extraction of the same message
+        cached = await self.backend.extract('intents', 'bus to Haifa')
+        self.assertEqual(cached, [('find_route', 0.9)])
+        self.assertIsInstance(cached, DegradedExtraction)
+        self.assertEqual(self.local_calls, [])
+        # 2. the local fallback
+        local = await self.backend.extract('intents', 'bus to Eilat')
+        self.assertEqual(local, [('local_guess', 0.4)])
+        self.assertIsInstance(local, DegradedExtraction)
+        # 3. an empty extraction
+        self.backend.fallback = None
+        empty = await self.backend.extract('intents', 'bus to Acre')
+        self.assertEqual(empty, [])
+        self.assertIsInstance(empty, DegradedExtraction)
+
+    async def test_broken_local_fallback_gives_empty(self):
+        def broken(kind: str, message: str) -> Extraction:
+            raise RuntimeError("no index")
+
+        self.backend.fallback = broken
+        self.inner.down = True
+        with self.assertLogs(level='ERROR'):
+            self.assertEqual(await self.backend.extract('intents', 'bus'), [])
+
+    async def test_open_circuit_skips_the_provider(self):
+        self.backend.breaker = CircuitBreaker(min_calls=1, window=1, reset_timeout=60)
+        self.inner.down = True
+        await self.backend.extract('intents', 'bus')
+        calls = self.inner.calls
+        await self.backend.extract('intents', 'bus')
+        self.assertEqual(self.inner.calls, calls)
+        self.assertEqual(self.backend.stats()['circuit'], CircuitBreaker.OPEN)
+
+
+class DegradedAnalysisTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_degraded_analysis_is_flagged_and_not_cached(self):
+        inner = SwitchableBackend()
+        cache = ResultCache()
+        analyzer = RequirementsAnalyzer(backend=ResilientBackend(inner, breaker=CircuitBreaker(min_calls=100)), cache=cache)
+        inner.down = True
+        degraded = await analyzer.analyze_requirements('bus to Haifa tomorrow')
+        self.assertTrue(degraded['degraded'])
+        self.assertEqual(cache.stats()['local_entries'], 0)
+        self.assertEqual(cache.counters['degraded'], 1)
+
+        # Once the provider is back, the next request asks it again
+        inner.down = False
+        recovered = await analyzer.analyze_requirements('bus to Haifa tomorrow')
+        self.assertNotIn('degraded', recovered)
+        self.assertEqual([intent.name for intent in recovered['intents']], ['find_route'])
+        self.assertEqual(cache.stats()['local_entries'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests for the columnar result batches (results.py)
+"""
+
+import unittest
+
+from . import results
+from .analyzer import Entity, Intent
+from .results import EntityBatch, IntentBatch, Vocabulary
+
+
+ENTITIES = [
+    [Entity('Haifa', 0.9, 'location'), Entity('tomorrow', 0.4, 'date')],
+    [Entity('Eilat', 0.7)],
+    [Entity('Haifa', 0.2, 'location'), Entity('9am', 0.95, 'time')],
+]
+
+
+def as_tuples(batch):
+    return [(row, item.name, round(item.confidence, 3), getattr(item, 'label', None)) for row, item in batch]
+
+
+class ResultBatchTests(unittest.TestCase):
+
+    def test_entity_round_trip_keeps_labels(self):
+        batch = EntityBatch.from_results(ENTITIES)
+        self.assertEqual(as_tuples(batch), [
+            (0, 'Haifa', 0.9, 'location'), (0, 'tomorrow', 0.4, 'date'),
+            (1, 'Eilat', 0.7, None),
+            (2, 'Haifa', 0.2, 'location'), (2, '9am', 0.95, 'time'),
+        ])
+        self.assertEqual([entity.label for entity in batch.items_for_row(2)], ['location', 'time'])
+
+    def test_shared_vocabulary(self):
+        vocabulary = Vocabulary()
+        intents = IntentBatch.from_results([[Intent('find_route', 0.8)]], vocabulary)
+        entities = EntityBatch.from_results(ENTITIES, vocabulary)
+        self.assertIs(intents.vocabulary, entities.vocabulary)
+        self.assertEqual(vocabulary.names.count('Haifa'), 1)
+        self.assertEqual(vocabulary.names.count('location'), 1)
+
+    def _check_filter_and_top_k(self):
+        batch = EntityBatch.from_results(ENTITIES)
+        self.assertEqual(as_tuples(batch.filter(0.5)), [
+            (0, 'Haifa', 0.9, 'location'), (1, 'Eilat', 0.7, None), (2, '9am', 0.95, 'time'),
+        ])
+        self.assertEqual(as_tuples(batch.top_k(2)), [(2, '9am', 0.95, 'time'), (0, 'Haifa', 0.9, 'location')])
+        self.assertEqual(as_tuples(batch.top_k(1, per_row=True)), [
+            (0, 'Haifa', 0.9, 'location'), (1, 'Eilat', 0.7, None), (2, '9am', 0.95, 'time'),
+        ])
+        self.assertEqual(batch.nbytes(), 16 * len(batch))
+
+    def test_filter_and_top_k(self):
+        self._check_filter_and_top_k()
+
+    def test_filter_and_top_k_without_numpy(self):
+        saved = results._np
+        results._np = None
+        try:
+            self._check_filter_and_top_k()
+        finally:
+            results._np = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
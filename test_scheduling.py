@@ -0,0 +1,122 @@
+"""
+Tests for the priority lanes (scheduling.py)
+"""
+
+import asyncio
+import unittest
+from collections import Counter
+from typing import List
+
+from .scheduling import BULK, INTERACTIVE, QUEUES, URGENT, PriorityScheduler, classify_lane, route_task, split_urgent
+
+
+class LaneTests(unittest.TestCase):
+
+    def test_classify_lane(self):
+        self.assertEqual(classify_lane("I need a bus ASAP"), URGENT)
+        self.assertEqual(classify_lane("When is the next bus?"), INTERACTIVE)
+        self.assertEqual(classify_lane("When is the next bus?", BULK), BULK)
+        self.assertEqual(classify_lane(None, BULK), BULK)
+
+    def test_split_urgent_keeps_order(self):
+        urgent, rest = split_urgent([('a', 'urgent: bus now'), ('b', 'bus times'), ('c', 'ASAP please'), ('d', 'hello')])
+        self.assertEqual([cid for cid, _ in urgent], ['a', 'c'])
+        self.assertEqual([cid for cid, _ in rest], ['b', 'd'])
+
+    def test_route_task(self):
+        name = 'apps.requirements_analyzer.tasks.analyze_requirements_task'
+        self.assertEqual(route_task(name, ('c1', 'urgent help'), {}, {}), {'queue': QUEUES[URGENT]})
+        self.assertEqual(route_task(name, (), {'context': 'bus times'}, {}), {'queue': QUEUES[INTERACTIVE]})
+        batch = 'apps.requirements_analyzer.tasks.analyze_requirements_batch_task'
+        self.assertEqual(route_task(batch, ([('c1', 'urgent help')],), {}, {}), {'queue': QUEUES[BULK]})
+        self.assertIsNone(route_task('other.app.task', (), {}, {}))
+
+
+class PrioritySchedulerTests(unittest.IsolatedAsyncioTestCase):
+
+    async def run_queued(self, scheduler: PriorityScheduler, lanes: List[str], holder: str = INTERACTIVE) -> List[str]:
+        """Queue one caller per lane in `lanes` behind a held slot; return the order they are served in"""
+        await scheduler.acquire(holder)
+        served: List[str] = []
+
+        async def caller(lane: str) -> None:
+            async with scheduler.slot(lane):
+                served.append(lane)
+
+        tasks = [asyncio.ensure_future(caller(lane)) for lane in lanes]
+        await asyncio.sleep(0)
+        scheduler.release(holder)
+        await asyncio.gather(*tasks)
+        return served
+
+    async def test_weighted_fair_share(self):
+        scheduler = PriorityScheduler(max_concurrency=1, max_wait=60)
+        served = await self.run_queued(scheduler, [BULK] * 20 + [INTERACTIVE] * 20 + [URGENT] * 20)
+        # Weights 8/4/1: 13 slots go 8 urgent, 4 interactive, 1 bulk
+        self.assertEqual(Counter(served[:13]), {URGENT: 8, INTERACTIVE: 4, BULK: 1})
+        self.assertEqual(len(served), 60)
+        self.assertEqual(scheduler.inflight, 0)
+
+    async def test_bulk_share_leaves_slots_for_interactive(self):
+        scheduler = PriorityScheduler(max_concurrency=4, bulk_share=0.5)
+        await scheduler.acquire(BULK)
+        await scheduler.acquire(BULK)
+        third = asyncio.ensure_future(scheduler.acquire(BULK))
+        await asyncio.sleep(0)
+        self.assertFalse(third.done())
+        await asyncio.wait_for(scheduler.acquire(INTERACTIVE), 1)
+        scheduler.release(BULK)
+        await asyncio.wait_for(third, 1)
+        self.assertEqual(scheduler.stats()['inflight'], {URGENT: 0, INTERACTIVE: 1, BULK: 2})
+
+    async def test_aged_caller_is_served_first(self):
+        scheduler = PriorityScheduler(max_concurrency=1, max_wait=0.05)
+        await scheduler.acquire(INTERACTIVE)
+        served: List[str] = []
+
+        async def caller(lane: str) -> None:
+            async with scheduler.slot(lane):
+                served.append(lane)
+
+        bulk = asyncio.ensure_future(caller(BULK))
+        await asyncio.sleep(0.06)
+        urgent = [asyncio.ensure_future(caller(URGENT)) for _ in range(3)]
+        await asyncio.sleep(0)
+        scheduler.release(INTERACTIVE)
+        await asyncio.gather(bulk, *urgent)
+        self.assertEqual(served[0], BULK)
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        scheduler = PriorityScheduler(max_concurrency=1)
+        await scheduler.acquire(INTERACTIVE)
+        waiter = asyncio.ensure_future(scheduler.acquire(BULK))
+        await asyncio.sleep(0)
+        self.assertEqual(scheduler.stats()['waiting'][BULK], 1)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(scheduler.stats()['waiting'][BULK], 0)
+        scheduler.release(INTERACTIVE)
+        self.assertEqual(scheduler.inflight, 0)
+
+    async def test_slot_granted_to_a_cancelled_waiter_is_passed_on(self):
+        scheduler = PriorityScheduler(max_concurrency=1)
+        await scheduler.acquire(INTERACTIVE)
+        first = asyncio.ensure_future(scheduler.acquire(INTERACTIVE))
+        second = asyncio.ensure_future(scheduler.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        # The slot goes to `first`, which is cancelled before it can run
+        scheduler.release(INTERACTIVE)
+        first.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, 1)
+        self.assertEqual(scheduler.inflight, 1)
+
+    async def test_unknown_lane(self):
+        with self.assertRaises(ValueError):
+            await PriorityScheduler().acquire('background')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+"""
+Tests for incremental per-turn analysis (session.py)
+"""
+
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from .analyzer import SUMMARY_CHARS, Entity, Intent, RequirementsAnalyzer
+from .context_window import SUMMARY_PREFIX, TokenCounter
+from .gazetteer import get_default_entity_extractor
+from .intent_index import IntentIndex
+from .llm import DegradedExtraction
+from .session import ConversationSession, SessionStore, session_store_from_env
+
+
+class RecordingAnalyzer:
+    """Keyword extraction that records the window of every call"""
+
+    INTENTS = {'bus': Intent('find_route', 0.5), 'route': Intent('find_route', 0.8), 'urgent': Intent('urgent_help', 0.9)}
+    ENTITIES = {'Haifa': Entity('Haifa', 0.6, 'location'), 'Sunday': Entity('Sunday', 0.9, 'date')}
+
+    def __init__(self, degraded: bool = False):
+        self.windows = []
+        self.degraded = degraded
+
+    async def extract_intents(self, window):
+        self.windows.append(window)
+        await asyncio.sleep(0)
+        found = [intent for keyword, intent in self.INTENTS.items() if keyword in window]
+        return DegradedExtraction(found) if self.degraded else found
+
+    async def extract_entities(self, window):
+        return [entity for keyword, entity in self.ENTITIES.items() if keyword in window]
+
+
+def scored(items):
+    return sorted((item.name, item.confidence) for item in items)
+
+
+class ConversationSessionTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_turns_are_merged_keeping_the_best_confidence(self):
+        analyzer = RecordingAnalyzer()
+        session = ConversationSession(analyzer, context_turns=0)
+        analysis = await session.add_turn("a bus to Haifa")
+        self.assertEqual(scored(analysis['intents']), [('find_route', 0.5)])
+        analysis = await session.add_turn("which route is fastest")
+        self.assertEqual(scored(analysis['intents']), [('find_route', 0.8)])
+        analysis = await session.add_turn("the bus on Sunday, urgent")
+        self.assertEqual(scored(analysis['intents']), [('find_route', 0.8), ('urgent_help', 0.9)])
+        self.assertEqual(scored(analysis['entities']), [('Haifa', 0.6), ('Sunday', 0.9)])
+        self.assertEqual(analysis['turns'], 3)
+        # Without context turns, each extraction saw its own turn after the summary of the older ones
+        self.assertEqual(analyzer.windows[0], "a bus to Haifa")
+        self.assertEqual(analyzer.windows[1], f"{SUMMARY_PREFIX}a bus to Haifa\nwhich route is fastest")
+        self.assertEqual(analyzer.windows[2].split('\n')[1:], ["the bus on Sunday, urgent"])
+
+    async def test_blank_turns_are_not_analyzed(self):
+        analyzer = RecordingAnalyzer()
+        session = ConversationSession(analyzer)
+        await session.add_turn("a bus to Haifa")
+        analysis = await session.add_turn("   ")
+        self.assertEqual(analysis['turns'], 1)
+        self.assertEqual(len(analyzer.windows), 1)
+
+    async def test_window_holds_the_new_turn_and_recent_context(self):
+        analyzer = RecordingAnalyzer()
+        session = ConversationSession(analyzer, context_turns=2)
+        turns = [f"turn number {n} about the bus" for n in range(5)]
+        await session.add_turns(turns)
+        self.assertEqual(analyzer.windows[0], turns[0])
+        self.assertEqual(analyzer.windows[2], '\n'.join(turns[:3]))
+        # Older turns are folded into the summary, not sent verbatim
+        last = analyzer.windows[4]
+        self.assertTrue(last.endswith('\n'.join(turns[2:5])))
+        self.assertNotIn(turns[0] + '\n', last)
+
+    async def test_window_stays_within_the_token_budget(self):
+        counter = TokenCounter()
+        analyzer = RecordingAnalyzer()
+        session = ConversationSession(analyzer, context_turns=3, max_context_tokens=40, summary_tokens=10, counter=counter)
+        turns = [f"please find me a bus from stop {n} to Haifa. it must arrive before noon" for n in range(8)]
+        turns.append("urgent " + "very " * 100 + "late now Sunday")
+        await session.add_turns(turns)
+        for window in analyzer.windows:
+            self.assertLessEqual(counter.count(window), 40)
+        self.assertTrue(any(window.startswith(SUMMARY_PREFIX) for window in analyzer.windows))
+        # An oversized turn keeps its end
+        self.assertTrue(analyzer.windows[-1].endswith("late now Sunday"))
+
+    async def test_summary_is_the_start_of_the_conversation(self):
+        session = ConversationSession(RecordingAnalyzer())
+        analysis = await session.add_turns(["a bus to Haifa", "on Sunday"])
+        self.assertEqual(analysis['summary'], "a bus to Haifa\non Sunday")
+        long_turn = "and then " + "another stop " * 30
+        analysis = await session.add_turn(long_turn)
+        summary = analysis['summary']
+        self.assertLessEqual(len(summary), SUMMARY_CHARS)
+        self.assertTrue(summary.startswith("a bus to Haifa\non Sunday\nand then another stop"))
+        # Full: later turns are not appended after a cut
+        analysis = await session.add_turn("urgent")
+        self.assertEqual(analysis['summary'], summary)
+
+    async def test_concurrent_turns_are_merged_in_order(self):
+        analyzer = RecordingAnalyzer()
+        session = ConversationSession(analyzer, context_turns=5)
+        await asyncio.gather(*(session.add_turn(f"turn {n}") for n in range(4)))
+        self.assertEqual(analyzer.windows[-1], "turn 0\nturn 1\nturn 2\nturn 3")
+        self.assertEqual(session.turn_count, 4)
+
+    async def test_degraded_turns_flag_the_session(self):
+        analyzer = RecordingAnalyzer(degraded=True)
+        session = ConversationSession(analyzer)
+        self.assertTrue((await session.add_turn("a bus"))['degraded'])
+        analyzer.degraded = False
+        self.assertTrue((await session.add_turn("urgent"))['degraded'])
+        self.assertNotIn('degraded', ConversationSession(analyzer).analysis())
+
+    async def test_with_the_local_extractors(self):
+        analyzer = RequirementsAnalyzer(intent_index=IntentIndex(), entity_extractor=get_default_entity_extractor())
+        session = ConversationSession(analyzer)
+        await session.add_turn("I need a bus to Haifa")
+        analysis = await session.add_turn("and back on Sunday at 5pm")
+        self.assertIn('find_route', [intent.name for intent in analysis['intents']])
+        self.assertEqual([(entity.name, entity.label) for entity in analysis['entities']],
+                         [('Haifa', 'location'), ('Sunday', 'date'), ('5pm', 'time')])
+
+
+class SessionStoreTests(unittest.IsolatedAsyncioTestCase):
+
+    async def test_turns_of_one_conversation_share_a_session(self):
+        store = SessionStore(RecordingAnalyzer(), context_turns=0)
+        await store.add_turn('conv-1', "a bus to Haifa")
+        await store.add_turn('conv-2', "urgent")
+        analysis = await store.add_turn('conv-1', "on Sunday")
+        self.assertEqual(analysis['turns'], 2)
+        self.assertEqual(scored(analysis['entities']), [('Haifa', 0.6), ('Sunday', 0.9)])
+        self.assertEqual(store.session('conv-2').turn_count, 1)
+        self.assertEqual(store.counters['created'], 2)
+
+    async def test_least_recently_used_session_is_evicted(self):
+        store = SessionStore(RecordingAnalyzer(), max_sessions=2)
+        first = store.session('a')
+        store.session('b')
+        store.session('a')
+        store.session('c')
+        self.assertEqual(len(store), 2)
+        self.assertIs(store.session('a'), first)
+        self.assertEqual(store.counters['evictions'], 1)
+        self.assertEqual(store.session('b').turn_count, 0)
+
+    async def test_idle_sessions_expire(self):
+        store = SessionStore(RecordingAnalyzer(), ttl=60)
+        with mock.patch('time.monotonic', return_value=1000.0):
+            first = store.session('a')
+        with mock.patch('time.monotonic', return_value=1059.0):
+            self.assertIs(store.session('a'), first)
+        with mock.patch('time.monotonic', return_value=1120.0):
+            self.assertIsNot(store.session('a'), first)
+        self.assertEqual(store.counters['expirations'], 1)
+
+    async def test_discard(self):
+        store = SessionStore(RecordingAnalyzer())
+        await store.add_turn('a', "a bus")
+        store.discard('a')
+        store.discard('missing')
+        self.assertEqual((await store.add_turn('a', "urgent"))['turns'], 1)
+
+    def test_from_env(self):
+        env = {'REQUIREMENTS_ANALYZER_SESSIONS': '5', 'REQUIREMENTS_ANALYZER_SESSION_TTL': '30',
+               'REQUIREMENTS_ANALYZER_SESSION_CONTEXT_TURNS': '4'}
+        with mock.patch.dict(os.environ, env):
+            store = session_store_from_env(RecordingAnalyzer())
+        self.assertEqual((store.max_sessions, store.ttl), (5, 30.0))
+        self.assertEqual(store.session('a').context_turns, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Tests for the Celery tasks and the chunked pipeline (tasks.py)
+
+Tasks are called directly and canvases are only built, so no broker is
+needed; the module itself needs celery.
+"""
+
+import asyncio
+import unittest
+from importlib.util import find_spec
+from unittest import mock
+
+from .analyzer import RequirementsAnalyzer
+from .events import EventPublisher, InMemoryBroker
+from .intent_index import IntentIndex
+from .runtime import close_worker_loop
+from .scheduling import BULK, INTERACTIVE, QUEUES, URGENT
+
+if find_spec('celery'):
+    from . import tasks
+
+
+class FailingAnalyzer(RequirementsAnalyzer):
+    """Local-only analyzer that fails on contexts mentioning 'boom'"""
+
+    async def analyze_requirements(self, conversation_context, lane=INTERACTIVE):
+        if 'boom' in conversation_context:
+            raise RuntimeError(f"cannot analyze {conversation_context!r}")
+        return await super().analyze_requirements(conversation_context, lane)
+
+
+class RecordingWriter:
+
+    def __init__(self):
+        self.rows = []
+
+    def extend(self, results):
+        self.rows.extend(results)
+
+
+CONVERSATIONS = [
+    ('a', "I need a bus to Tel Aviv"),
+    ('b', "boom"),
+    ('c', "I missed my bus"),
+]
+
+
+@unittest.skipUnless(find_spec('celery'), "celery is not installed")
+class AnalyzeBatchTests(unittest.TestCase):
+
+    def setUp(self):
+        self.analyzer = FailingAnalyzer(intent_index=IntentIndex())
+        self.broker = InMemoryBroker()
+        self.writer = RecordingWriter()
+        for name, value in (
+            ('get_analyzer', self.analyzer),
+            ('get_event_publisher', EventPublisher(self.broker)),
+            ('get_analysis_writer', self.writer),
+        ):
+            patcher = mock.patch.object(tasks, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_results_keep_input_order(self):
+        results = asyncio.run(tasks._analyze_batch(CONVERSATIONS, validate=False, concurrency=2))
+        self.assertEqual([result['conversation_id'] for result in results], ['a', 'b', 'c'])
+        self.assertEqual([result['status'] for result in results], ['success', 'failed', 'success'])
+        self.assertEqual(results[1]['error'], 'RuntimeError')
+        self.assertEqual([intent['name'] for intent in results[2]['requirements']['intents']], ['missed_bus'])
+        self.assertTrue(all('validation' not in result for result in results))
+
+    def test_validation_is_added_to_successful_results(self):
+        results = asyncio.run(tasks._analyze_batch(CONVERSATIONS, validate=True, concurrency=2))
+        self.assertEqual(['validation' in result for result in results], [True, False, True])
+        self.assertEqual(results[0]['validation'], self.analyzer.validator.validate(results[0]['requirements']))
+
+    def test_results_are_published_and_persisted(self):
+        results = asyncio.run(tasks._analyze_batch(CONVERSATIONS, validate=True, concurrency=2))
+        events = self.broker.events()
+        self.assertEqual([event['conversation_id'] for event in events], ['a', 'b', 'c'])
+        self.assertEqual([event['event_type'] for event in events], ['validated', 'analyzed', 'validated'])
+        self.assertEqual(self.writer.rows, results)
+
+    def test_without_publisher_or_writer(self):
+        with mock.patch.object(tasks, 'get_event_publisher', return_value=None), \
+                mock.patch.object(tasks, 'get_analysis_writer', return_value=None):
+            results = asyncio.run(tasks._analyze_batch(CONVERSATIONS[:1], validate=False, concurrency=1))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(self.broker.events(), [])
+
+    def test_tasks_run_on_the_worker_loop(self):
+        self.addCleanup(close_worker_loop)
+        result = tasks.analyze_requirements_task('a', "I need a bus to Tel Aviv")
+        self.assertEqual((result['conversation_id'], result['status']), ('a', 'success'))
+        self.assertNotIn('validation', result)
+        results = tasks.analyze_and_validate_batch_task(CONVERSATIONS, concurrency=2)
+        self.assertEqual([result['status'] for result in results], ['success', 'failed', 'success'])
+        self.assertIn('validation', tasks.analyze_and_validate_task('c', "I missed my bus"))
+        self.assertIn('is_complete', tasks.validate_requirements_task(results[0]['requirements']))
+
+
+@unittest.skipUnless(find_spec('celery'), "celery is not installed")
+class CollectTests(unittest.TestCase):
+
+    def test_summary_counts(self):
+        chunks = [
+            [{'status': 'success', 'validation': {'is_complete': True}}, {'status': 'failed'}],
+            [],
+            [{'status': 'success', 'validation': {'is_complete': False}}, {'status': 'success'}],
+        ]
+        summary = tasks.collect_batch_results_task(chunks)
+        self.assertEqual((summary['total'], summary['failed'], summary['complete']), (4, 1, 1))
+        self.assertEqual(summary['results'], chunks[0] + chunks[2])
+
+    def test_empty(self):
+        self.assertEqual(tasks.collect_batch_results_task([]), {'total': 0, 'failed': 0, 'complete': 0, 'results': []})
+
+
+@unittest.skipUnless(find_spec('celery'), "celery is not installed")
+class PipelineTests(unittest.TestCase):
+
+    CONVERSATIONS = [
+        ['a', "bus times to Haifa"],
+        ['b', "urgent: I missed my bus"],
+        ['c', "route to the beach"],
+        ['d', "I need it ASAP"],
+        ['e', "next bus to Eilat"],
+        ['f', "thanks"],
+        ['g', "urgent help please"],
+    ]
+
+    def chunks(self, pipeline):
+        return [(signature.options['queue'], [conversation[0] for conversation in signature.args[0]])
+                for signature in pipeline.tasks]
+
+    def test_urgent_conversations_are_chunked_first_on_their_queue(self):
+        pipeline = tasks.build_analysis_pipeline(self.CONVERSATIONS, chunk_size=2)
+        self.assertEqual(self.chunks(pipeline), [
+            (QUEUES[URGENT], ['b', 'd']),
+            (QUEUES[URGENT], ['g']),
+            (QUEUES[BULK], ['a', 'c']),
+            (QUEUES[BULK], ['e', 'f']),
+        ])
+        # Conversations travel as (id, context) pairs
+        self.assertEqual(pipeline.tasks[0].args[0][0], ('b', "urgent: I missed my bus"))
+
+    def test_chunk_size(self):
+        pipeline = tasks.build_analysis_pipeline(self.CONVERSATIONS, chunk_size=100, dedup=True)
+        self.assertEqual(self.chunks(pipeline), [(QUEUES[URGENT], ['b', 'd', 'g']), (QUEUES[BULK], ['a', 'c', 'e', 'f'])])
+        self.assertTrue(all(signature.kwargs == {'dedup': True} for signature in pipeline.tasks))
+        self.assertEqual(pipeline.tasks[0].task, tasks.analyze_and_validate_batch_task.name)
+
+    def test_collect_wraps_the_chunks_in_a_chord(self):
+        pipeline = tasks.build_analysis_pipeline(self.CONVERSATIONS, chunk_size=3, collect=True)
+        self.assertEqual(pipeline.body.task, tasks.collect_batch_results_task.name)
+        self.assertEqual([len(signature.args[0]) for signature in pipeline.tasks], [3, 3, 1])
+
+    def test_no_conversations(self):
+        self.assertEqual(len(tasks.build_analysis_pipeline([]).tasks), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
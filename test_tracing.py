@@ -0,0 +1,249 @@
+"""
+Tests for spans, export, head sampling and the sampling profiler (tracing.py)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from .tracing import (
+    NOOP_SPAN, STATUS_ERROR, STATUS_OK, InMemoryExporter, JsonFileExporter, SamplingProfiler, Tracer,
+)
+
+
+def _busy(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class SpanTests(unittest.TestCase):
+
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.tracer = Tracer()
+        self.tracer.configure(self.exporter)
+
+    def tearDown(self):
+        self.tracer.shutdown()
+
+    def test_disabled_tracer_returns_the_noop_span(self):
+        tracer = Tracer()
+        self.assertIs(tracer.span('analyze'), NOOP_SPAN)
+        with tracer.span('analyze') as span:
+            span.set_attribute('ignored', 1)
+        self.assertIs(tracer.current_span(), NOOP_SPAN)
+
+    def test_nested_spans_export_one_trace_when_the_root_ends(self):
+        with self.tracer.span('analyze', lane='bulk') as root:
+            with self.tracer.span('classify') as child:
+                self.assertIs(self.tracer.current_span(), child)
+            self.assertEqual(len(self.exporter.traces), 0)
+        self.assertEqual(len(self.exporter.traces), 1)
+        spans = self.exporter.traces[0]
+        self.assertEqual([span.name for span in spans], ['classify', 'analyze'])
+        self.assertIs(child.parent, root)
+        self.assertIs(child.trace, root.trace)
+        self.assertLessEqual(root.start_ns, child.start_ns)
+        self.assertLessEqual(child.end_ns, root.end_ns)
+
+    def test_concurrent_tasks_share_the_enclosing_parent(self):
+        async def stage(name):
+            with self.tracer.span(name) as span:
+                await asyncio.sleep(0)
+                return span
+
+        async def analyze():
+            with self.tracer.span('analyze') as root:
+                intents, entities = await asyncio.gather(stage('extract_intents'), stage('extract_entities'))
+            return root, intents, entities
+
+        root, intents, entities = asyncio.run(analyze())
+        self.assertIs(intents.parent, root)
+        self.assertIs(entities.parent, root)
+        self.assertEqual(len(self.exporter.traces), 1)
+        self.assertEqual(len(self.exporter.traces[0]), 3)
+
+    def test_otlp_document(self):
+        with self.assertRaises(KeyError):
+            with self.tracer.span('analyze', conversations=3, dedup=True, lane='bulk', ratio=0.5):
+                with self.tracer.span('lookup'):
+                    raise KeyError('missing')
+        document, = self.exporter.documents()
+        json.dumps(document)
+        resource, = document['resourceSpans']
+        self.assertIn({'key': 'process.pid', 'value': {'intValue': str(os.getpid())}}, resource['resource']['attributes'])
+        child, root = resource['scopeSpans'][0]['spans']
+        self.assertEqual(child['traceId'], root['traceId'])
+        self.assertEqual(child['parentSpanId'], root['spanId'])
+        self.assertNotIn('parentSpanId', root)
+        self.assertEqual(child['status']['code'], STATUS_ERROR)
+        self.assertIn('KeyError', child['status']['message'])
+        self.assertEqual(root['attributes'], [
+            {'key': 'conversations', 'value': {'intValue': '3'}},
+            {'key': 'dedup', 'value': {'boolValue': True}},
+            {'key': 'lane', 'value': {'stringValue': 'bulk'}},
+            {'key': 'ratio', 'value': {'doubleValue': 0.5}},
+        ])
+        self.assertLessEqual(int(root['startTimeUnixNano']), int(child['startTimeUnixNano']))
+
+    def test_ok_status(self):
+        with self.tracer.span('analyze'):
+            pass
+        span, = self.exporter.documents()[0]['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual(span['status'], {'code': STATUS_OK})
+
+
+class SamplingTests(unittest.TestCase):
+
+    def test_unsampled_root_drops_its_children(self):
+        exporter = InMemoryExporter()
+        tracer = Tracer()
+        tracer.configure(exporter, ratio=0.0)
+        with tracer.span('analyze'):
+            self.assertIs(tracer.span('classify'), NOOP_SPAN)
+            self.assertIs(tracer.current_span(), NOOP_SPAN)
+        self.assertEqual(len(exporter.traces), 0)
+
+    def test_ratio_is_decided_at_the_root(self):
+        exporter = InMemoryExporter()
+        tracer = Tracer()
+        tracer.configure(exporter, ratio=0.25)
+        with mock.patch('random.random', side_effect=[0.1, 0.3, 0.2, 0.9]):
+            for _ in range(4):
+                with tracer.span('analyze'):
+                    with tracer.span('classify'):
+                        pass
+        self.assertEqual([len(spans) for spans in exporter.traces], [2, 2])
+
+
+class JsonFileExporterTests(unittest.TestCase):
+
+    def test_buffers_lines_and_writes_on_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            exporter = JsonFileExporter(os.path.join(directory, 'traces-{pid}.jsonl'), flush_every=2)
+            self.assertEqual(exporter.path, os.path.join(directory, f'traces-{os.getpid()}.jsonl'))
+            tracer = Tracer()
+            tracer.configure(exporter)
+            for name in ('first', 'second', 'third'):
+                with tracer.span(name):
+                    pass
+                if name == 'first':
+                    self.assertFalse(os.path.exists(exporter.path))
+            with open(exporter.path, encoding='utf-8') as f:
+                self.assertEqual(len(f.readlines()), 2)
+            tracer.shutdown()
+            with open(exporter.path, encoding='utf-8') as f:
+                names = [json.loads(line)['resourceSpans'][0]['scopeSpans'][0]['spans'][0]['name'] for line in f]
+        self.assertEqual(names, ['first', 'second', 'third'])
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def test_keeps_folded_stacks_of_the_slowest_traces(self):
+        profiler = SamplingProfiler(slowest=2, interval=0.001)
+        tracer = Tracer()
+        tracer.configure(profiler=profiler)
+        try:
+            for name, seconds in (('fast', 0.0), ('slow', 0.05), ('slower', 0.08)):
+                with tracer.span(name):
+                    _busy(seconds)
+        finally:
+            tracer.shutdown()
+        profiles = profiler.profiles()
+        self.assertEqual([name for _, _, name, _ in profiles], ['slower', 'slow'])
+        duration, _, _, stacks = profiles[0]
+        self.assertGreater(duration, profiles[1][0])
+        self.assertTrue(stacks)
+        self.assertTrue(any('_busy (test_tracing.py' in stack for stack in stacks))
+        # Samples are only kept while a trace is open on the thread
+        self.assertEqual(profiler._samples, {})
+
+    def test_dump_writes_one_file_per_trace(self):
+        profiler = SamplingProfiler(slowest=3, interval=0.001)
+        with tempfile.TemporaryDirectory() as directory:
+            tracer = Tracer()
+            tracer.configure(profiler=profiler, profile_dir=directory)
+            for _ in range(2):
+                with tracer.span('analyze'):
+                    _busy(0.01)
+            tracer.shutdown()
+            paths = [os.path.basename(path) for path in profiler.dump(directory)]
+            self.assertEqual(len(paths), 2)
+            self.assertEqual(sorted(os.listdir(directory)), sorted(paths))
+            self.assertTrue(all(path.startswith(('profile-01-', 'profile-02-')) for path in paths))
+
+    def test_restarts_after_a_stop(self):
+        profiler = SamplingProfiler(interval=0.001)
+        profiler.start()
+        profiler.stop()
+        profiler.start()
+        try:
+            self.assertTrue(profiler._thread.is_alive())
+        finally:
+            profiler.stop()
+
+
+class EnvironmentTests(unittest.TestCase):
+
+    def test_configured_by_the_first_root_span_not_on_creation(self):
+        with mock.patch.dict(os.environ, {'REQUIREMENTS_ANALYZER_TRACE': 'memory'}):
+            tracer = Tracer(from_env=True)
+            self.assertIsNone(tracer.exporter)
+            with tracer.span('analyze'):
+                pass
+        self.assertIsInstance(tracer.exporter, InMemoryExporter)
+        self.assertEqual(len(tracer.exporter.traces), 1)
+        tracer.shutdown()
+
+    def test_disabled_when_unset(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            tracer = Tracer(from_env=True)
+            self.assertIs(tracer.span('analyze'), NOOP_SPAN)
+        self.assertFalse(tracer.enabled)
+
+    def test_forked_child_configures_its_own_exporter_and_profiler(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        env = {
+            'REQUIREMENTS_ANALYZER_PROFILE_DIR': directory.name,
+            'REQUIREMENTS_ANALYZER_TRACE': 'memory',
+            'REQUIREMENTS_ANALYZER_PROFILE_SLOWEST': '1',
+            'REQUIREMENTS_ANALYZER_PROFILE_INTERVAL_MS': '1',
+        }
+        with mock.patch.dict(os.environ, env), mock.patch('atexit.register'):
+            tracer = Tracer(from_env=True)
+            with tracer.span('parent'):
+                pass
+            inherited_exporter, inherited_profiler = tracer.exporter, tracer.profiler
+            # What the child of a prefork sees: the parent's objects and pid
+            with mock.patch('os.getpid', return_value=os.getpid() + 1):
+                with tracer.span('child'):
+                    pass
+        try:
+            self.assertIsNot(tracer.exporter, inherited_exporter)
+            self.assertIsNot(tracer.profiler, inherited_profiler)
+            self.assertTrue(tracer.profiler._thread.is_alive())
+            self.assertEqual([spans[0].name for spans in tracer.exporter.traces], ['child'])
+            self.assertEqual([spans[0].name for spans in inherited_exporter.traces], ['parent'])
+        finally:
+            tracer.shutdown()
+            inherited_profiler.stop()
+
+    def test_explicit_configuration_wins_over_the_environment(self):
+        exporter = InMemoryExporter()
+        with mock.patch.dict(os.environ, {'REQUIREMENTS_ANALYZER_TRACE': 'memory'}):
+            tracer = Tracer(from_env=True)
+            tracer.configure(exporter)
+            with tracer.span('analyze'):
+                pass
+        self.assertIs(tracer.exporter, exporter)
+        self.assertEqual(len(exporter.traces), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Tests for the compiled validation rules (validation.py)
+"""
+
+import unittest
+
+from . import validation
+from .analyzer import Entity, Intent, serialize_analysis
+from .validation import MISSING_INTENTS, VECTORIZE_MIN_BATCH, RequirementsValidator
+
+
+class RequirementsValidatorTests(unittest.TestCase):
+
+    def setUp(self):
+        self.validator = RequirementsValidator()
+
+    def test_serialized_entity_without_label(self):
+        # Entity.to_dict() leaves out a None label, as LLM entities usually have none
+        requirements = serialize_analysis({
+            'intents': [Intent('find_route', 0.9)],
+            'entities': [Entity('Haifa', 0.9)],
+        })
+        self.assertNotIn('label', requirements['entities'][0])
+        result = self.validator.validate(requirements)
+        self.assertFalse(result['is_complete'])
+        self.assertEqual(result['missing_items'], ['location'])
+
+    def test_serialized_and_object_input_agree(self):
+        analysis = {
+            'intents': [Intent('find_route', 0.9)],
+            'entities': [Entity('Haifa', 0.9, 'location')],
+        }
+        from_objects = self.validator.validate(analysis)
+        from_dicts = self.validator.validate(serialize_analysis(analysis))
+        self.assertTrue(from_objects['is_complete'])
+        self.assertEqual(from_objects, from_dicts)
+
+    def test_no_confident_intent(self):
+        result = self.validator.validate({'intents': [Intent('find_route', 0.1)], 'entities': []})
+        self.assertFalse(result['is_complete'])
+        self.assertEqual(result['missing_items'], [MISSING_INTENTS])
+
+    def test_validate_batch_keeps_order(self):
+        batch = [
+            serialize_analysis({'intents': [Intent('urgent_help', 0.9)], 'entities': []}),
+            serialize_analysis({'intents': [Intent('find_route', 0.9)], 'entities': [Entity('Eilat', 0.8)]}),
+        ]
+        results = self.validator.validate_batch(batch)
+        self.assertEqual([result['is_complete'] for result in results], [True, False])
+
+    def test_missing_confidence_counts_as_zero(self):
+        result = self.validator.validate({'intents': [{'name': 'find_route'}]})
+        self.assertEqual(result['missing_items'], [MISSING_INTENTS])
+        result = self.validator.validate({
+            'intents': [{'name': 'find_route', 'confidence': 0.9}],
+            'entities': [{'name': 'Haifa'}],
+        })
+        self.assertEqual(result['missing_items'], ['location'])
+
+    def test_non_numeric_confidence_counts_as_zero(self):
+        result = self.validator.validate({
+            'intents': [{'name': 'find_route', 'confidence': 0.9}],
+            'entities': [{'name': 'Haifa', 'label': 'location', 'confidence': 'high'}],
+        })
+        self.assertEqual(result['missing_items'], ['location'])
+        result = self.validator.validate({'intents': [{'name': 'find_route', 'confidence': None}]})
+        self.assertEqual(result['missing_items'], [MISSING_INTENTS])
+
+
+class ValidateBatchTests(unittest.TestCase):
+
+    CASES = [
+        {'intents': [Intent('find_route', 0.9)], 'entities': [Entity('Haifa', 0.9, 'location')]},
+        {'intents': [Intent('find_route', 0.9)], 'entities': [Entity('Haifa', 0.2, 'location')]},
+        {'intents': [Intent('urgent_help', 0.9), Intent('bus_schedule', 0.6)], 'entities': [Entity('today', 0.9, 'date')]},
+        {'intents': [Intent('smalltalk', 0.7)], 'entities': []},
+        {'intents': [Intent('smalltalk', 0.2)], 'entities': []},
+        {'intents': [{'name': 'find_route'}]},
+        {'intents': [{'name': 'find_route', 'confidence': 0.9}], 'entities': [{'name': 'Haifa'}]},
+        {'intents': [{'name': 'missed_bus', 'confidence': 0.8}], 'entities': [{'name': 'Eilat', 'label': 'location', 'confidence': 0.5}]},
+        {'entities': [Entity('Haifa', 0.9, 'location')]},
+        'not a dict',
+    ]
+
+    def setUp(self):
+        self.validator = RequirementsValidator()
+        # Every other copy of the object-based cases in their serialized form
+        self.batch = [
+            serialize_analysis(case) if i % 2 and isinstance(case, dict) and all(not isinstance(item, dict) for item in case.get('intents', [])) else case
+            for i, case in enumerate(self.CASES * 5)
+        ]
+        self.assertGreaterEqual(len(self.batch), VECTORIZE_MIN_BATCH)
+
+    def test_vectorized_matches_validate(self):
+        expected = [self.validator.validate(requirements) for requirements in self.batch]
+        self.assertEqual(self.validator.validate_batch(self.batch), expected)
+
+    def test_without_numpy(self):
+        saved = validation._np
+        validation._np = None
+        try:
+            results = self.validator.validate_batch(iter(self.batch))
+        finally:
+            validation._np = saved
+        self.assertEqual(results, [self.validator.validate(requirements) for requirements in self.batch])
+
+    def test_rules_without_required_entities(self):
+        validator = RequirementsValidator(rules={'urgent_help': {'min_confidence': 0.5}})
+        batch = [{'intents': [Intent('urgent_help', 0.9)]}] * VECTORIZE_MIN_BATCH
+        self.assertEqual(validator.validate_batch(batch)[0], {'is_complete': True, 'missing_items': [], 'confidence': 1.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
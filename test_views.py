@@ -0,0 +1,204 @@
+"""
+Tests for the HTTP API (views.py, urls.py, serializers.py)
+
+Requests go through the app's urlconf with Django's AsyncClient; Django
+and DRF are configured with minimal settings when nothing else did.
+"""
+
+import json
+import unittest
+from importlib.util import find_spec
+from unittest import mock
+
+from .analyzer import RequirementsAnalyzer
+from .gazetteer import get_default_entity_extractor
+from .intent_index import IntentIndex
+from .wire import CONTENT_TYPE, loads
+
+HAS_DJANGO = bool(find_spec('django') and find_spec('rest_framework'))
+
+if HAS_DJANGO:
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            SECRET_KEY='requirements-analyzer-tests',
+            ROOT_URLCONF=f'{__package__}.urls',
+            ALLOWED_HOSTS=['testserver'],
+            INSTALLED_APPS=['rest_framework'],
+            DATABASES={},
+            USE_TZ=True,
+        )
+        django.setup()
+    from django.test import AsyncClient
+
+    from . import views
+
+
+class FailingAnalyzer(RequirementsAnalyzer):
+    """Local-only analyzer whose analyses fail on contexts mentioning 'boom'"""
+
+    async def analyze_requirements(self, conversation_context, lane='interactive'):
+        if 'boom' in conversation_context:
+            raise RuntimeError("provider down")
+        return await super().analyze_requirements(conversation_context, lane)
+
+    async def analyze_stages(self, conversation_context, lane='interactive'):
+        async for stage, payload in super().analyze_stages(conversation_context, lane):
+            if stage == 'entities' and 'boom' in conversation_context:
+                raise RuntimeError("provider down")
+            yield stage, payload
+
+
+def sse_events(body: bytes):
+    """(event, data) pairs of a server-sent event stream"""
+    events = []
+    for frame in body.decode('utf-8').split('\n\n'):
+        if frame:
+            event, data = frame.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+@unittest.skipUnless(HAS_DJANGO, "django and djangorestframework are not installed")
+class ViewTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        analyzer = FailingAnalyzer(intent_index=IntentIndex(), entity_extractor=get_default_entity_extractor())
+        for name, value in (('_analyzer', analyzer), ('_sessions', None)):
+            patcher = mock.patch.object(views, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = AsyncClient()
+
+    async def post(self, path, data, **kwargs):
+        return await self.client.post(path, json.dumps(data), content_type='application/json', **kwargs)
+
+
+class AnalyzeViewTests(ViewTestCase):
+
+    async def test_json_response(self):
+        response = await self.post('/analyze/', {'conversation_id': 'conv-1', 'context': "I need a bus to Haifa"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        result = response.json()
+        self.assertEqual((result['conversation_id'], result['status']), ('conv-1', 'success'))
+        self.assertEqual(result['requirements']['intents'][0]['name'], 'find_route')
+        self.assertEqual(result['requirements']['entities'], [{'name': 'Haifa', 'confidence': 0.95, 'label': 'location'}])
+        self.assertNotIn('validation', result)
+
+    async def test_validation_and_non_ascii_text(self):
+        response = await self.post('/analyze/', {'context': "אוטובוס לחיפה", 'with_validation': True})
+        self.assertIn('חיפה'.encode('utf-8'), response.content)
+        result = response.json()
+        self.assertEqual(result['conversation_id'], '')
+        self.assertIn('is_complete', result['validation'])
+
+    async def test_wire_response(self):
+        data = {'conversation_id': 'conv-1', 'context': "I missed my bus"}
+        response = await self.post('/analyze/', data, headers={'Accept': CONTENT_TYPE})
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        self.assertEqual(loads(response.content), (await self.post('/analyze/', data)).json())
+
+    async def test_bad_payload(self):
+        response = await self.post('/analyze/', {'conversation_id': 'conv-1'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('context', response.json()['errors'])
+        response = await self.client.post('/analyze/', b'{not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = await self.post('/analyze/', {'context': 'x', 'with_validation': 'maybe'})
+        self.assertIn('with_validation', response.json()['errors'])
+
+    async def test_failed_analysis(self):
+        response = await self.post('/analyze/', {'conversation_id': 'conv-1', 'context': "boom"})
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertEqual(response.json()['error'], 'RuntimeError')
+
+    async def test_post_only(self):
+        self.assertEqual((await self.client.get('/analyze/')).status_code, 405)
+
+
+class BatchAnalyzeViewTests(ViewTestCase):
+
+    async def test_results_in_input_order(self):
+        conversations = [
+            {'conversation_id': 'a', 'context': "I need a bus to Haifa"},
+            {'conversation_id': 'b', 'context': "boom"},
+            {'conversation_id': 'c', 'context': "I missed my bus"},
+        ]
+        response = await self.post('/analyze/batch/', {'conversations': conversations, 'with_validation': True, 'dedup': True})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['conversation_id'] for result in results], ['a', 'b', 'c'])
+        self.assertEqual([result['status'] for result in results], ['success', 'failed', 'success'])
+        self.assertEqual(['validation' in result for result in results], [True, False, True])
+
+    async def test_bad_payload(self):
+        for data in ({'conversations': []}, {'conversations': [{'context': 'x'}], 'concurrency': 0}, {}):
+            response = await self.post('/analyze/batch/', data)
+            self.assertEqual(response.status_code, 400, data)
+            self.assertIn('errors', response.json())
+
+
+class AnalyzeTurnViewTests(ViewTestCase):
+
+    async def test_turns_are_merged(self):
+        await self.post('/analyze/turn/', {'conversation_id': 'conv-1', 'turn': "I need a bus to Haifa"})
+        response = await self.post('/analyze/turn/', {'conversation_id': 'conv-1', 'turn': "and back on Sunday at 5pm"})
+        self.assertEqual(response.status_code, 200)
+        requirements = response.json()['requirements']
+        self.assertEqual(requirements['turns'], 2)
+        self.assertEqual([entity['name'] for entity in requirements['entities']], ['Haifa', 'Sunday', '5pm'])
+
+    async def test_reset(self):
+        await self.post('/analyze/turn/', {'conversation_id': 'conv-1', 'turn': "I need a bus to Haifa"})
+        response = await self.post('/analyze/turn/', {'conversation_id': 'conv-1', 'turn': "at 5pm", 'reset': True})
+        requirements = response.json()['requirements']
+        self.assertEqual((requirements['turns'], [entity['name'] for entity in requirements['entities']]), (1, ['5pm']))
+
+    async def test_conversation_id_is_required(self):
+        response = await self.post('/analyze/turn/', {'turn': "I need a bus to Haifa"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('conversation_id', response.json()['errors'])
+
+
+class AnalyzeStreamViewTests(ViewTestCase):
+
+    async def stream(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        return sse_events(b''.join([chunk async for chunk in response.streaming_content]))
+
+    async def test_events_in_stage_order(self):
+        response = await self.post('/analyze/stream/', {'conversation_id': 'conv-1', 'context': "I need a bus to Haifa at 5pm"})
+        events = await self.stream(response)
+        self.assertEqual([event for event, _ in events], ['classification', 'intents', 'entities', 'validation', 'done'])
+        payloads = dict(events)
+        self.assertEqual(payloads['classification']['summary'], "I need a bus to Haifa at 5pm")
+        self.assertEqual([entity['name'] for entity in payloads['entities']], ['Haifa', '5pm'])
+        done = payloads['done']
+        self.assertEqual((done['conversation_id'], done['status']), ('conv-1', 'success'))
+        self.assertEqual(done['requirements']['intents'], payloads['intents'])
+        self.assertEqual(done['validation'], payloads['validation'])
+
+    async def test_get_with_query_parameters(self):
+        response = await self.client.get('/analyze/stream/', {'conversation_id': 'conv-2', 'context': "I missed my bus"})
+        events = await self.stream(response)
+        self.assertEqual(events[-1][1]['conversation_id'], 'conv-2')
+
+    async def test_failure_is_reported_in_band(self):
+        response = await self.post('/analyze/stream/', {'conversation_id': 'conv-1', 'context': "boom"})
+        events = await self.stream(response)
+        self.assertEqual([event for event, _ in events], ['classification', 'intents', 'error'])
+        self.assertEqual(events[-1][1]['status'], 'failed')
+
+    async def test_bad_payload(self):
+        response = await self.post('/analyze/stream/', {'conversation_id': 'conv-1'})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the binary wire format (wire.py)
+"""
+
+import unittest
+from datetime import datetime
+
+from .analyzer import Entity, Intent, analysis_result, serialize_analysis
+from .wire import ResultView, dumps, encode_analysis, encode_result, is_record, loads
+
+
+def success_result() -> dict:
+    result = analysis_result('conv-1', {
+        'summary': 'Bus to Haifa tomorrow',
+        'intents': [Intent('find_route', 0.75), Intent('schedule', 0.5)],
+        'entities': [Entity('Haifa', 0.9, 'location'), Entity('tomorrow', 0.5, 'date'), Entity('Eilat', 0.25)],
+        'confidence': 0.75,
+    })
+    result['validation'] = {'is_complete': False, 'missing_items': ['time'], 'confidence': 0.5}
+    return result
+
+
+class ResultRecordTests(unittest.TestCase):
+
+    def test_success_round_trip(self):
+        result = success_result()
+        data = encode_result(result, timestamp_ms=1234)
+        self.assertTrue(is_record(data))
+        view = ResultView(data)
+        self.assertEqual(view.to_dict(), result)
+        self.assertEqual(dict(view), result)
+        self.assertEqual(view.timestamp_ms, 1234)
+
+    def test_lazy_field_access(self):
+        view = ResultView(encode_result(success_result()))
+        self.assertEqual(view.status, 'success')
+        self.assertTrue(view.is_validated)
+        self.assertFalse(view.is_complete)
+        self.assertEqual(view.intent_confidence('schedule'), 0.5)
+        self.assertFalse(view.has_intent('urgent_help'))
+        self.assertEqual(view.entity(2), ('Eilat', 0.25, None))
+
+    def test_failed_round_trip(self):
+        result = analysis_result('conv-2', ValueError("boom"))
+        self.assertEqual(ResultView(encode_result(result)).to_dict(), result)
+
+    def test_extra_keys_survive(self):
+        result = success_result()
+        result['worker'] = 'w1'
+        result['requirements']['language'] = 'he'
+        self.assertEqual(ResultView(encode_result(result)).to_dict(), result)
+
+    def test_bare_analysis(self):
+        analysis = {'summary': 's', 'intents': [Intent('find_route', 0.5)], 'entities': [Entity('Haifa', 0.5, 'location')], 'confidence': 0.5}
+        decoded = ResultView(encode_analysis(analysis)).analysis()
+        self.assertEqual(serialize_analysis(decoded), serialize_analysis(analysis))
+
+    def test_truncated_record(self):
+        data = encode_result(success_result())
+        with self.assertRaises(ValueError):
+            ResultView(data[:10])
+        # Header intact, intent/entity rows cut off
+        with self.assertRaises(ValueError):
+            ResultView(data[:60])
+
+
+class ValueEncodingTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        value = {
+            'args': [1, -2, 2 ** 70, 0.5, 'שלום', b'\x00\x01', None, True, False],
+            'eta': datetime(2026, 1, 2, 3, 4, 5),
+            'results': [success_result(), {'status': 'queued'}],
+        }
+        self.assertEqual(loads(dumps(value), lazy=False), value)
+
+    def test_results_are_records_and_views_are_copied(self):
+        payload = dumps([success_result()])
+        (view,) = loads(payload)
+        self.assertIsInstance(view, ResultView)
+        # Forwarding a view re-uses its bytes instead of re-encoding it
+        self.assertEqual(dumps([view]), payload)
+
+    def test_tuples_come_back_as_lists(self):
+        self.assertEqual(loads(dumps((1, (2, 3)))), [1, [2, 3]])
+
+    def test_errors(self):
+        with self.assertRaises(TypeError):
+            dumps({1, 2})
+        with self.assertRaises(ValueError):
+            loads(dumps('text')[:-1])
+        with self.assertRaises(ValueError):
+            loads(dumps(1) + b'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
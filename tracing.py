@@ -0,0 +1,504 @@
+"""
+Tracing - per-stage spans and a sampling profiler for the analysis hot path
+
+Stage histograms (metrics.py) say that p99 moved, not where one slow
+request spent its time. `TRACER.span(name)` wraps a stage in a span:
+- spans nest through a ContextVar, so the spans of `extract_intents` and
+  `extract_entities` running concurrently under `asyncio.gather` both
+  have the analysis span as their parent
+- timing is `time.monotonic_ns()`; wall-clock start times are derived
+  from one anchor, so spans stay ordered even if the system clock jumps
+- when a trace's root span ends, the whole trace goes to the exporter as
+  one OTLP/JSON `resourceSpans` document (the OpenTelemetry collector's
+  file format): `JsonFileExporter` appends one per line, `InMemoryExporter`
+  keeps them for tests and local runs
+- disabled (the default), `span()` returns one shared no-op span: no
+  allocation, no clock read, no ContextVar write
+
+Optional head sampling (`ratio`) records only a fraction of the traces.
+`SamplingProfiler` samples the stacks of the threads running traces and
+keeps folded stacks (`frame;frame;frame count`, the input of flamegraph.pl
+and speedscope) for the slowest N traces. The event loop thread runs many
+requests at once, so a slow trace's profile shows everything its thread
+did while the trace was open, which is what held that request up.
+
+Configured from the environment by the first root span of each process,
+not on import: a Celery prefork parent imports this module, and an
+exporter file named after the parent's pid or a profiler thread started
+there would be useless in the children. A child that inherits a
+configured tracer drops it and configures its own.
+- REQUIREMENTS_ANALYZER_TRACE: JSONL file path ('{pid}' is replaced by
+  the process id), 'memory', or unset to disable tracing
+- REQUIREMENTS_ANALYZER_TRACE_RATIO: fraction of traces recorded (default 1)
+- REQUIREMENTS_ANALYZER_PROFILE_SLOWEST: keep profiles of the N slowest
+  traces (enables the profiler), written on shutdown to
+  REQUIREMENTS_ANALYZER_PROFILE_DIR (default: the current directory);
+  REQUIREMENTS_ANALYZER_PROFILE_INTERVAL_MS sets the sampling interval
+"""
+
+import atexit
+import heapq
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'requirements_analyzer'
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Wall-clock time of monotonic time 0, so spans carry Unix timestamps
+_ANCHOR_NS = time.time_ns() - time.monotonic_ns()
+
+
+class _NoopSpan:
+    """The span of a disabled tracer; every method does nothing"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    """Finished spans of one trace, exported when its root ends"""
+
+    __slots__ = ('trace_id', 'spans', 'thread_id')
+
+    def __init__(self, trace_id: int):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.thread_id = threading.get_ident()
+
+
+# The innermost open span of the running task (None at the top, or _UNSAMPLED)
+_UNSAMPLED = object()
+_current: ContextVar[Any] = ContextVar('requirements_analyzer_span', default=None)
+
+
+class _UnsampledSpan(_NoopSpan):
+    """Root of a trace head sampling dropped: its children are dropped too"""
+
+    __slots__ = ('_token',)
+
+    def __enter__(self) -> "_UnsampledSpan":
+        self._token = _current.set(_UNSAMPLED)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        _current.reset(self._token)
+
+
+class Span:
+    """One timed stage; use as a context manager (see Tracer.span)"""
+
+    __slots__ = ('name', 'span_id', 'parent', 'trace', 'attributes', 'start_ns', 'end_ns', 'error', '_tracer', '_token')
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Optional[Dict[str, Any]]):
+        self.name = name
+        self.span_id = random.getrandbits(64) or 1
+        self.parent = parent
+        self.trace = parent.trace if parent is not None else _Trace(random.getrandbits(128) or 1)
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.error: Optional[BaseException] = None
+        self._tracer = tracer
+
+    @property
+    def duration_ns(self) -> int:
+        return self.end_ns - self.start_ns
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        if self.parent is None and self._tracer.profiler is not None:
+            self._tracer.profiler.begin(self.trace.thread_id)
+        self.start_ns = time.monotonic_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Optional[BaseException], traceback: Any) -> None:
+        self.end_ns = time.monotonic_ns()
+        _current.reset(self._token)
+        self.error = exc
+        self.trace.spans.append(self)
+        if self.parent is None:
+            self._tracer._finish(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The span in OTLP/JSON form"""
+        span: Dict[str, Any] = {
+            'traceId': f'{self.trace.trace_id:032x}',
+            'spanId': f'{self.span_id:016x}',
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(_ANCHOR_NS + self.start_ns),
+            'endTimeUnixNano': str(_ANCHOR_NS + self.end_ns),
+            'attributes': [_otlp_attribute(key, value) for key, value in (self.attributes or {}).items()],
+            'status': {'code': STATUS_OK},
+        }
+        if self.parent is not None:
+            span['parentSpanId'] = f'{self.parent.span_id:016x}'
+        if self.error is not None:
+            span['status'] = {'code': STATUS_ERROR, 'message': f'{type(self.error).__name__}: {self.error}'}
+        return span
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def otlp_document(spans: List[Span]) -> Dict[str, Any]:
+    """One OTLP/JSON resourceSpans document holding `spans`"""
+    return {'resourceSpans': [{
+        'resource': {'attributes': [
+            _otlp_attribute('service.name', SERVICE_NAME),
+            _otlp_attribute('process.pid', os.getpid()),
+        ]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in spans]}],
+    }]}
+
+
+class InMemoryExporter:
+    """Keeps exported traces (lists of spans); a collector stand-in for tests"""
+
+    def __init__(self, max_traces: int = 10_000):
+        self.traces: Deque[List[Span]] = deque(maxlen=max_traces)
+
+    def export(self, spans: List[Span]) -> None:
+        self.traces.append(spans)
+
+    def documents(self) -> List[Dict[str, Any]]:
+        return [otlp_document(spans) for spans in self.traces]
+
+    def close(self) -> None:
+        pass
+
+
+class JsonFileExporter:
+    """
+    Appends one OTLP/JSON document per trace to a file
+
+    Lines are buffered and written every `flush_every` traces (and on
+    close), so a trace costs a json.dumps, not a write syscall.
+    """
+
+    def __init__(self, path: str, flush_every: int = 64):
+        self.path = path.replace('{pid}', str(os.getpid()))
+        self.flush_every = flush_every
+        self._lines: List[str] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]) -> None:
+        line = json.dumps(otlp_document(spans), separators=(',', ':'))
+        with self._lock:
+            self._lines.append(line)
+            if len(self._lines) < self.flush_every:
+                return
+            lines, self._lines = self._lines, []
+        self._write(lines)
+
+    def _write(self, lines: List[str]) -> None:
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except OSError:
+            # Tracing must never fail an analysis
+            logger.warning("Could not write %d traces to %s", len(lines), self.path, exc_info=True)
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._lines = self._lines, []
+        if lines:
+            self._write(lines)
+
+    def close(self) -> None:
+        self.flush()
+
+
+def _frame_name(frame: Any) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})'
+
+
+class SamplingProfiler:
+    """
+    Samples thread stacks while traces run; keeps folded stacks of the slowest traces
+
+    A daemon thread wakes every `interval` seconds and records the stack of
+    every thread with an open trace. When a trace ends, its samples are
+    folded and kept if it is one of the `slowest` so far.
+    """
+
+    def __init__(self, slowest: int = 10, interval: float = 0.005, max_depth: int = 64):
+        """
+        Args:
+            slowest: Number of slowest traces whose profiles are kept
+            interval: Seconds between samples
+            max_depth: Innermost frames kept per sample
+        """
+        self.slowest = slowest
+        self.interval = interval
+        self.max_depth = max_depth
+        # (duration_ns, trace id, name, folded stacks), a min-heap on duration
+        self._kept: List[Tuple[int, int, str, Dict[str, int]]] = []
+        # thread id -> open trace count, and the samples taken since
+        self._active: Dict[int, int] = {}
+        self._samples: Dict[int, Deque[Tuple[int, Tuple[str, ...]]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        # A thread inherited through a fork is not running in the child
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='requirements-profiler', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def begin(self, thread_id: int) -> None:
+        """A trace opened on `thread_id`"""
+        with self._lock:
+            self._active[thread_id] = self._active.get(thread_id, 0) + 1
+            self._samples.setdefault(thread_id, deque(maxlen=100_000))
+
+    def end(self, root: Span) -> None:
+        """The trace of `root` ended: keep its profile if it is among the slowest"""
+        thread_id = root.trace.thread_id
+        with self._lock:
+            open_traces = self._active.get(thread_id, 1) - 1
+            samples = self._samples.get(thread_id, ())
+            duration = root.duration_ns
+            if len(self._kept) < self.slowest or duration > self._kept[0][0]:
+                stacks = Counter(
+                    ';'.join(stack) for sampled_ns, stack in samples
+                    if root.start_ns <= sampled_ns <= root.end_ns
+                )
+                entry = (duration, root.trace.trace_id, root.name, dict(stacks))
+                if len(self._kept) < self.slowest:
+                    heapq.heappush(self._kept, entry)
+                else:
+                    heapq.heapreplace(self._kept, entry)
+            if open_traces > 0:
+                self._active[thread_id] = open_traces
+            else:
+                # No trace left on the thread, nothing can claim its samples
+                self._active.pop(thread_id, None)
+                self._samples.pop(thread_id, None)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = [thread_id for thread_id in self._active if thread_id != own]
+            if not threads:
+                continue
+            now = time.monotonic_ns()
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                stack: List[str] = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    with self._lock:
+                        samples = self._samples.get(thread_id)
+                        if samples is not None:
+                            samples.append((now, tuple(stack)))
+            del frames
+
+    def profiles(self) -> List[Tuple[int, int, str, Dict[str, int]]]:
+        """(duration_ns, trace id, root name, folded stacks) of the kept traces, slowest first"""
+        with self._lock:
+            return sorted(self._kept, reverse=True)
+
+    def dump(self, directory: str) -> List[str]:
+        """
+        Write one folded-stacks file per kept trace
+
+        Returns:
+            The written paths, slowest trace first
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for rank, (duration, trace_id, name, stacks) in enumerate(self.profiles(), 1):
+            path = os.path.join(directory, f'profile-{rank:02d}-{duration // 1_000_000}ms-{trace_id:032x}.folded')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f'# {name} trace {trace_id:032x}: {duration / 1e6:.3f} ms, {sum(stacks.values())} samples\n')
+                for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                    f.write(f'{stack} {count}\n')
+            paths.append(path)
+        return paths
+
+
+class Tracer:
+    """Creates spans; disabled until an exporter or profiler is configured"""
+
+    def __init__(self, from_env: bool = False) -> None:
+        """
+        Args:
+            from_env: Configure from the environment on the first root span
+                of each process (see configure_from_env)
+        """
+        # Enabled until the first root span has read the environment
+        self.enabled = from_env
+        self.exporter: Any = None
+        self.profiler: Optional[SamplingProfiler] = None
+        self.ratio = 1.0
+        self.profile_dir: Optional[str] = None
+        self._from_env = from_env
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    def configure(
+        self,
+        exporter: Any = None,
+        ratio: float = 1.0,
+        profiler: Optional[SamplingProfiler] = None,
+        profile_dir: Optional[str] = None,
+    ) -> None:
+        """
+        (Re)configure tracing; with neither exporter nor profiler it is disabled
+
+        Args:
+            exporter: Object with export(spans) and close(), e.g. JsonFileExporter
+            ratio: Fraction of traces recorded (decided at the root span)
+            profiler: Sampling profiler for the slowest traces
+            profile_dir: Where `shutdown()` writes the profiler's folded stacks
+        """
+        self.shutdown()
+        self.exporter = exporter
+        self.profiler = profiler
+        self.ratio = ratio
+        self.profile_dir = profile_dir
+        if profiler is not None:
+            profiler.start()
+        self._pid = os.getpid()
+        self.enabled = exporter is not None or profiler is not None
+
+    def _configure_process(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Inherited through a fork: the parent flushes and dumps its own
+            # exporter and profiler, so drop them without a shutdown
+            self.exporter = None
+            self.profiler = None
+            configure_from_env(self)
+
+    def span(self, name: str, **attributes: Any) -> Any:
+        """
+        A context manager timing one stage
+
+        Keyword arguments become span attributes. Returns the shared no-op
+        span while tracing is disabled.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            return NOOP_SPAN
+        if parent is None and self._from_env and self._pid != os.getpid():
+            self._configure_process()
+            if not self.enabled:
+                return NOOP_SPAN
+        if parent is None and self.ratio < 1.0 and random.random() >= self.ratio:
+            return _UnsampledSpan()
+        return Span(self, name, parent, attributes or None)
+
+    def current_span(self) -> Any:
+        """The innermost open span of the running task, or the no-op span"""
+        span = _current.get()
+        return span if isinstance(span, Span) else NOOP_SPAN
+
+    def _finish(self, root: Span) -> None:
+        if self.profiler is not None:
+            self.profiler.end(root)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(root.trace.spans)
+            except Exception:
+                logger.warning("Span export failed", exc_info=True)
+
+    def shutdown(self) -> None:
+        """Stop the profiler, write its profiles, and flush the exporter"""
+        if self.profiler is not None:
+            self.profiler.stop()
+            if self.profile_dir is not None:
+                self.profiler.dump(self.profile_dir)
+        if self.exporter is not None:
+            self.exporter.close()
+        self.enabled = False
+
+
+def configure_from_env(tracer: "Tracer") -> None:
+    """
+    Configure `tracer` from the REQUIREMENTS_ANALYZER_TRACE*/PROFILE* variables
+
+    With neither set, the tracer is disabled. Call it in the process that
+    traces; the process-wide TRACER does so itself on its first root span.
+    """
+    target = os.getenv('REQUIREMENTS_ANALYZER_TRACE', '')
+    exporter: Any = None
+    if target == 'memory':
+        exporter = InMemoryExporter()
+    elif target:
+        exporter = JsonFileExporter(target)
+    profiler = None
+    slowest = int(os.getenv('REQUIREMENTS_ANALYZER_PROFILE_SLOWEST', '0'))
+    if slowest > 0:
+        interval = float(os.getenv('REQUIREMENTS_ANALYZER_PROFILE_INTERVAL_MS', '5')) / 1000
+        profiler = SamplingProfiler(slowest=slowest, interval=interval)
+    tracer.configure(
+        exporter,
+        ratio=float(os.getenv('REQUIREMENTS_ANALYZER_TRACE_RATIO', '1')),
+        profiler=profiler,
+        profile_dir=os.getenv('REQUIREMENTS_ANALYZER_PROFILE_DIR', '.') if profiler is not None else None,
+    )
+    if tracer.enabled and not tracer._atexit_registered:
+        atexit.register(tracer.shutdown)
+        tracer._atexit_registered = True
+
+
+# Process-wide tracer used by all analyzers, configured lazily per process
+TRACER = Tracer(from_env=True)
@@ -0,0 +1,20 @@
+"""
+URLs for the Requirements Analyzer API
+
+Include from the project's urlconf, e.g.
+    path('requirements/', include('apps.requirements_analyzer.urls'))
+"""
+
+from django.urls import path
+
+from .views import AnalyzeStreamView, AnalyzeTurnView, AnalyzeView, BatchAnalyzeView
+
+
+app_name = 'requirements_analyzer'
+
+urlpatterns = [
+    path('analyze/', AnalyzeView.as_view(), name='analyze'),
+    path('analyze/turn/', AnalyzeTurnView.as_view(), name='analyze-turn'),
+    path('analyze/batch/', BatchAnalyzeView.as_view(), name='analyze-batch'),
+    path('analyze/stream/', AnalyzeStreamView.as_view(), name='analyze-stream'),
+]
@@ -0,0 +1,269 @@
+"""
+Validation Rules - precompiled completeness checks for analyzed requirements
+
+Each intent declares what a request with that intent needs before it can be
+acted on, e.g. a route request needs at least one location:
+
+    DEFAULT_RULES = {
+        'find_route': {'requires': {'location': 1}, 'min_confidence': 0.5},
+        ...
+    }
+
+`RequirementsValidator` compiles the declarations once into a lookup table
+keyed by intent name -> tuple of (entity label, required count) pairs plus a
+confidence threshold. Validating a requirements dict is then one pass over
+its entities (counting labels) and one table lookup per intent; nothing in
+the rule declarations is interpreted per call.
+
+`validate_batch` validates a whole batch at once: intents and entities of
+every analysis are flattened into code/confidence columns, and the label
+counts, thresholds and requirements are evaluated as NumPy array
+operations over the batch (with a per-analysis loop when NumPy is not
+installed or the batch is small).
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+# Declarative rules: intent -> {'requires': {entity label: count}, 'min_confidence': float}
+DEFAULT_RULES: Dict[str, Dict[str, Any]] = {
+    'find_route': {'requires': {'location': 1}, 'min_confidence': 0.5},
+    'bus_schedule': {'requires': {'location': 1}, 'min_confidence': 0.5},
+    'missed_bus': {'requires': {'location': 1}, 'min_confidence': 0.5},
+    'urgent_help': {'min_confidence': 0.5},
+}
+
+# Missing item reported when no intent clears its threshold
+MISSING_INTENTS = 'intents'
+
+# Below this many analyses the array setup costs more than validating one by one
+VECTORIZE_MIN_BATCH = 32
+
+_NUMPY_UNSET = object()
+_np = _NUMPY_UNSET
+
+
+def _numpy():
+    """NumPy, imported on first use (None when not installed)"""
+    global _np
+    if _np is _NUMPY_UNSET:
+        try:
+            import numpy
+        except ImportError:  # NumPy is optional, batches are then validated one by one
+            numpy = None
+        _np = numpy
+    return _np
+
+
+class RuleError(ValueError):
+    """Raised at compile time for a malformed rule declaration"""
+
+
+def _field(item: Any, name: str) -> Any:
+    """Read a field from an Intent/Entity object or its serialized dict"""
+    # Serialized entities leave out a None label (Entity.to_dict), so missing keys read as None
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+
+def _confidence(item: Any) -> float:
+    """Confidence of an intent/entity; a missing or non-numeric one counts as 0.0"""
+    value = _field(item, "confidence")
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+class RequirementsValidator:
+    """Completeness validation against rules compiled once at construction"""
+
+    def __init__(
+        self,
+        rules: Mapping[str, Mapping[str, Any]] = DEFAULT_RULES,
+        default_min_confidence: float = 0.5,
+        min_entity_confidence: float = 0.3,
+    ):
+        """
+        Args:
+            rules: Declarative rules per intent (see DEFAULT_RULES)
+            default_min_confidence: Threshold for intents without a rule
+            min_entity_confidence: Entities below this do not count
+
+        Raises:
+            RuleError: If a rule has unknown keys or invalid values
+        """
+        self.default_min_confidence = default_min_confidence
+        self.min_entity_confidence = min_entity_confidence
+        # intent -> (min confidence, ((label, count), ...))
+        self._table: Dict[str, Tuple[float, Tuple[Tuple[str, int], ...]]] = {
+            intent: self._compile(intent, rule) for intent, rule in rules.items()
+        }
+        self._unruled = (default_min_confidence, ())
+        # Batch validation columns: labels that any rule requires, and intent
+        # codes (the last one for intents without a rule)
+        self._labels: Tuple[str, ...] = tuple(sorted({label for _, requires in self._table.values() for label, _ in requires}))
+        self._label_codes = {label: code for code, label in enumerate(self._labels)}
+        self._intent_codes = {intent: code for code, intent in enumerate(self._table)}
+        self._arrays: Any = None
+
+    @staticmethod
+    def _compile(intent: str, rule: Mapping[str, Any]) -> Tuple[float, Tuple[Tuple[str, int], ...]]:
+        unknown = set(rule) - {'requires', 'min_confidence'}
+        if unknown:
+            raise RuleError(f"Rule for {intent!r} has unknown keys: {sorted(unknown)}")
+        requires = rule.get('requires', {})
+        for label, count in requires.items():
+            if not isinstance(count, int) or count < 1:
+                raise RuleError(f"Rule for {intent!r} needs a positive count for {label!r}, got {count!r}")
+        min_confidence = float(rule.get('min_confidence', 0.0))
+        if not 0.0 <= min_confidence <= 1.0:
+            raise RuleError(f"Rule for {intent!r} has min_confidence outside [0, 1]: {min_confidence}")
+        return min_confidence, tuple(sorted(requires.items()))
+
+    def validate(self, requirements: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Check one analysis against the compiled rules
+
+        Args:
+            requirements: Analysis with 'intents' and 'entities', either
+                Intent/Entity objects or their serialized dicts
+
+        Returns:
+            {'is_complete', 'missing_items', 'confidence'}; missing items are
+            'intents' or the entity labels that are short, and confidence is
+            the fraction of requirements that are satisfied
+        """
+        if not isinstance(requirements, dict):
+            return {"is_complete": False, "missing_items": [MISSING_INTENTS], "confidence": 0.0}
+        table = self._table
+        unruled = self._unruled
+
+        counts: Dict[Any, int] = {}
+        min_entity_confidence = self.min_entity_confidence
+        for entity in requirements.get("entities") or ():
+            if _confidence(entity) >= min_entity_confidence:
+                label = _field(entity, "label")
+                counts[label] = counts.get(label, 0) + 1
+
+        needed: Dict[str, int] = {}
+        matched = False
+        for intent in requirements.get("intents") or ():
+            min_confidence, requires = table.get(_field(intent, "name"), unruled)
+            if _confidence(intent) < min_confidence:
+                continue
+            matched = True
+            for label, count in requires:
+                if count > needed.get(label, 0):
+                    needed[label] = count
+
+        if not matched:
+            return {"is_complete": False, "missing_items": [MISSING_INTENTS], "confidence": 0.0}
+        missing = sorted(label for label, count in needed.items() if counts.get(label, 0) < count)
+        satisfied = len(needed) - len(missing)
+        return {
+            "is_complete": not missing,
+            "missing_items": missing,
+            "confidence": satisfied / len(needed) if needed else 1.0,
+        }
+
+    def validate_batch(self, batch: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Validate many analyses in order (one result per analysis)
+
+        The results are the same as calling `validate` on each analysis; from
+        VECTORIZE_MIN_BATCH analyses on they are computed with NumPy array
+        operations over the whole batch.
+        """
+        batch = list(batch)
+        np = _numpy()
+        if np is None or len(batch) < VECTORIZE_MIN_BATCH:
+            validate = self.validate
+            return [validate(requirements) for requirements in batch]
+        return self._validate_vectorized(batch, np)
+
+    def _compiled_arrays(self, np: Any) -> Tuple[Any, Any]:
+        """Per intent code: min confidence, and required count of every label"""
+        if self._arrays is None:
+            codes = len(self._intent_codes)
+            thresholds = np.empty(codes + 1, dtype=np.float64)
+            requirements = np.zeros((codes + 1, len(self._labels)), dtype=np.int64)
+            for intent, code in self._intent_codes.items():
+                min_confidence, requires = self._table[intent]
+                thresholds[code] = min_confidence
+                for label, count in requires:
+                    requirements[code, self._label_codes[label]] = count
+            thresholds[codes] = self.default_min_confidence
+            self._arrays = (thresholds, requirements)
+        return self._arrays
+
+    def _validate_vectorized(self, batch: List[Any], np: Any) -> List[Dict[str, Any]]:
+        thresholds, requirements = self._compiled_arrays(np)
+        label_codes = self._label_codes
+        intent_codes = self._intent_codes
+        unruled = len(intent_codes)
+
+        # Flatten the batch into columns; entities with labels no rule needs are skipped
+        entity_rows: List[int] = []
+        entity_labels: List[int] = []
+        entity_confidences: List[float] = []
+        intent_rows: List[int] = []
+        intent_ids: List[int] = []
+        intent_confidences: List[float] = []
+        for row, requirements_dict in enumerate(batch):
+            if not isinstance(requirements_dict, dict):
+                continue
+            for entity in requirements_dict.get("entities") or ():
+                code = label_codes.get(_field(entity, "label"))
+                if code is not None:
+                    entity_rows.append(row)
+                    entity_labels.append(code)
+                    entity_confidences.append(_confidence(entity))
+            for intent in requirements_dict.get("intents") or ():
+                intent_rows.append(row)
+                intent_ids.append(intent_codes.get(_field(intent, "name"), unruled))
+                intent_confidences.append(_confidence(intent))
+
+        size, labels = len(batch), len(self._labels)
+        rows = np.array(entity_rows, dtype=np.intp)
+        kept = np.array(entity_confidences, dtype=np.float64) >= self.min_entity_confidence
+        cells = rows[kept] * labels + np.array(entity_labels, dtype=np.intp)[kept]
+        counts = np.bincount(cells, minlength=size * labels).reshape(size, labels)
+
+        intent_rows_array = np.array(intent_rows, dtype=np.intp)
+        intent_ids_array = np.array(intent_ids, dtype=np.intp)
+        passed = np.array(intent_confidences, dtype=np.float64) >= thresholds[intent_ids_array]
+        matched = np.zeros(size, dtype=bool)
+        matched[intent_rows_array[passed]] = True
+        # Each label needs the largest count any matched intent of the row requires
+        needed = np.zeros((size, labels), dtype=np.int64)
+        np.maximum.at(needed, intent_rows_array[passed], requirements[intent_ids_array[passed]])
+        missing = counts < needed
+        needed_counts = (needed > 0).sum(axis=1)
+        missing_counts = missing.sum(axis=1)
+
+        names = self._labels
+        results: List[Dict[str, Any]] = []
+        for row in range(size):
+            if not matched[row]:
+                results.append({"is_complete": False, "missing_items": [MISSING_INTENTS], "confidence": 0.0})
+                continue
+            total = int(needed_counts[row])
+            short = int(missing_counts[row])
+            results.append({
+                "is_complete": short == 0,
+                "missing_items": [names[code] for code in np.flatnonzero(missing[row])] if short else [],
+                "confidence": (total - short) / total if total else 1.0,
+            })
+        return results
+
+    def required_labels(self, intent: str) -> Tuple[Tuple[str, int], ...]:
+        """The compiled (label, count) requirements of an intent"""
+        return self._table.get(intent, self._unruled)[1]
+
+
+_default_validator: Optional[RequirementsValidator] = None
+
+
+def get_default_validator() -> RequirementsValidator:
+    """Process-wide validator compiled from DEFAULT_RULES"""
+    global _default_validator
+    if _default_validator is None:
+        _default_validator = RequirementsValidator()
+    return _default_validator
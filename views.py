@@ -0,0 +1,246 @@
+"""
+Views - the Requirements Analyzer over HTTP
+
+Async class-based Django views (Django 4.1+ runs `async def` handlers on the
+ASGI server's event loop), so requests await `RequirementsAnalyzer` directly
+instead of hopping through `sync_to_async` and a thread pool:
+- `POST analyze/`: one conversation, answered with the same payload as
+  `tasks.analyze_requirements_task` (plus 'validation' on request)
+- `POST analyze/turn/`: the next turn of a conversation, analyzed
+  incrementally (see session.py): only the new turn and a bounded window
+  of earlier ones are extracted, and the answer is the merged analysis of
+  the whole conversation so far plus 'turns'. Sessions live in the server
+  process, so route a conversation's turns to one process
+- `POST analyze/batch/`: many conversations analyzed concurrently with
+  `analyze_many`, one result per conversation in input order (with
+  `"dedup": true`, duplicates in the batch are analyzed once)
+- `GET|POST analyze/stream/`: server-sent events, one per analysis stage
+  ('classification', 'intents', 'entities', 'validation', then 'done'),
+  so clients see the keyword classification and summary within
+  milliseconds while LLM extraction is still running
+
+`analyze/` and `analyze/batch/` answer with wire.py records instead of
+JSON when the client sends `Accept: application/x-requirements-wire`.
+With tracing configured (see tracing.py), request validation, analysis
+and serialization are spans of one trace per request. With
+REQUIREMENTS_ANALYZER_SCHEDULER_SLOTS set, single and streamed analyses
+run in the interactive lane and batches in the bulk lane, so a large
+batch does not hold up other users (see scheduling.py).
+
+DRF 3.14's `APIView` has no async support, so DRF is used for request
+validation (serializers.py) only. Serve these views with an ASGI server
+(uvicorn/daphne): under WSGI every request would get its own event loop,
+and the shared analyzer's LLM client, batching and limiter state are bound
+to the loop they were first used on.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .analyzer import RequirementsAnalyzer, analysis_result
+from .cache import get_default_cache
+from .llm import get_default_backend
+from .scheduling import BULK, get_default_scheduler
+from .serializers import AnalyzeRequestSerializer, AnalyzeTurnRequestSerializer, BatchAnalyzeRequestSerializer
+from .session import SessionStore, session_store_from_env
+from .tracing import TRACER
+from .wire import CONTENT_TYPE, dumps
+
+
+_analyzer: Optional[RequirementsAnalyzer] = None
+_sessions: Optional[SessionStore] = None
+
+# Keep non-ASCII (Hebrew) text readable in responses
+_JSON_PARAMS = {'ensure_ascii': False}
+
+
+def get_analyzer() -> RequirementsAnalyzer:
+    """The analyzer shared by every request in this server process"""
+    global _analyzer
+    if _analyzer is None:
+        # numpy is imported with the index, on first request rather than at startup
+        from .context_window import get_default_context_budget
+        from .gazetteer import get_default_entity_extractor
+        from .intent_index import get_default_intent_index
+
+        _analyzer = RequirementsAnalyzer(
+            backend=get_default_backend(),
+            intent_index=get_default_intent_index(),
+            entity_extractor=get_default_entity_extractor(),
+            context_budget=get_default_context_budget(),
+            cache=get_default_cache(),
+            scheduler=get_default_scheduler(),
+        )
+    return _analyzer
+
+
+def get_session_store() -> SessionStore:
+    """The conversation sessions of this server process"""
+    global _sessions
+    if _sessions is None:
+        _sessions = session_store_from_env(get_analyzer())
+    return _sessions
+
+
+def _request_data(request: HttpRequest) -> Any:
+    """The JSON body of a POST, or the query parameters of a GET"""
+    if request.method == 'GET':
+        return request.GET.dict()
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+def _respond(request: HttpRequest, data: Any, status: int = 200) -> HttpResponse:
+    """JSON, or a wire.py encoding for clients that accept it"""
+    with TRACER.span('serialize'):
+        if CONTENT_TYPE in request.headers.get('Accept', ''):
+            return HttpResponse(dumps(data), content_type=CONTENT_TYPE, status=status)
+        return JsonResponse(data, status=status, json_dumps_params=_JSON_PARAMS)
+
+
+def _invalid(errors: Any) -> JsonResponse:
+    return JsonResponse({'errors': errors}, status=400, json_dumps_params=_JSON_PARAMS)
+
+
+def _sse(event: str, data: Any) -> bytes:
+    """One server-sent event frame (JSON is a single line, so one data: field)"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f'event: {event}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+def _stage_payload(stage: str, payload: Any) -> Any:
+    if stage in ('intents', 'entities'):
+        return [item.to_dict() for item in payload]
+    return payload
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AnalyzeView(View):
+    """Analyze one conversation"""
+
+    http_method_names = ['post']
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        with TRACER.span('http.analyze'):
+            with TRACER.span('validate_request'):
+                serializer = AnalyzeRequestSerializer(data=_request_data(request))
+                valid = serializer.is_valid()
+            if not valid:
+                return _invalid(serializer.errors)
+            data = serializer.validated_data
+            analyzer = get_analyzer()
+            try:
+                analysis = await analyzer.analyze_requirements(data['context'])
+            except Exception as e:
+                return _respond(request, analysis_result(data['conversation_id'], e), status=502)
+            result = analysis_result(data['conversation_id'], analysis)
+            if data['with_validation']:
+                result['validation'] = analyzer.validator.validate(result['requirements'])
+            return _respond(request, result)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AnalyzeTurnView(View):
+    """Analyze the next turn of a conversation, merged into its earlier turns"""
+
+    http_method_names = ['post']
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        with TRACER.span('http.analyze_turn'):
+            with TRACER.span('validate_request'):
+                serializer = AnalyzeTurnRequestSerializer(data=_request_data(request))
+                valid = serializer.is_valid()
+            if not valid:
+                return _invalid(serializer.errors)
+            data = serializer.validated_data
+            sessions = get_session_store()
+            if data['reset']:
+                sessions.discard(data['conversation_id'])
+            try:
+                analysis = await sessions.add_turn(data['conversation_id'], data['turn'])
+            except Exception as e:
+                return _respond(request, analysis_result(data['conversation_id'], e), status=502)
+            result = analysis_result(data['conversation_id'], analysis)
+            if data['with_validation']:
+                result['validation'] = get_analyzer().validator.validate(result['requirements'])
+            return _respond(request, result)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchAnalyzeView(View):
+    """Analyze many conversations concurrently, results in input order"""
+
+    http_method_names = ['post']
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        with TRACER.span('http.analyze_batch'):
+            with TRACER.span('validate_request'):
+                serializer = BatchAnalyzeRequestSerializer(data=_request_data(request))
+                valid = serializer.is_valid()
+            if not valid:
+                return _invalid(serializer.errors)
+            data = serializer.validated_data
+            conversations = data['conversations']
+            analyzer = get_analyzer()
+            results = []
+            contexts = (conversation['context'] for conversation in conversations)
+            async for index, analysis in analyzer.analyze_many(
+                contexts, max_concurrency=data['concurrency'], return_exceptions=True, deduplicate=data['dedup'], lane=BULK,
+            ):
+                results.append(analysis_result(conversations[index]['conversation_id'], analysis))
+            if data['with_validation']:
+                succeeded = [result for result in results if result['status'] == 'success']
+                for result, validation in zip(succeeded, analyzer.validate_batch(result['requirements'] for result in succeeded)):
+                    result['validation'] = validation
+            return _respond(request, {'results': results})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AnalyzeStreamView(View):
+    """Stream the analysis of one conversation as server-sent events"""
+
+    # GET for browser EventSource clients, POST for long contexts
+    http_method_names = ['get', 'post']
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        return await self.post(request)
+
+    async def post(self, request: HttpRequest) -> HttpResponse:
+        serializer = AnalyzeRequestSerializer(data=_request_data(request))
+        if not serializer.is_valid():
+            return _invalid(serializer.errors)
+        data = serializer.validated_data
+        response = StreamingHttpResponse(
+            self._events(data['conversation_id'], data['context']),
+            content_type='text/event-stream; charset=utf-8',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Tell nginx not to buffer the stream, or nothing arrives until 'done'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _events(self, conversation_id: str, context: str) -> AsyncIterator[bytes]:
+        analysis: Dict[str, Any] = {}
+        try:
+            async for stage, payload in get_analyzer().analyze_stages(context):
+                analysis[stage] = payload
+                yield _sse(stage, _stage_payload(stage, payload))
+        except Exception as e:
+            # Headers are already sent, so the failure is reported in-band
+            yield _sse('error', analysis_result(conversation_id, e))
+            return
+        result = analysis_result(conversation_id, {
+            'summary': analysis['classification']['summary'],
+            'intents': analysis['intents'],
+            'entities': analysis['entities'],
+            'confidence': 0.0,
+        })
+        result['validation'] = analysis['validation']
+        yield _sse('done', result)
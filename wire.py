@@ -0,0 +1,708 @@
+"""
+Wire Format - compact, versioned binary encoding of analysis results
+
+Task results, cached analyses, Kafka events and HTTP responses used to be
+JSON-encoded (and decoded in full) at every hop. This module encodes one
+analysis result (the `analyzer.analysis_result` shape) as a single record
+whose fields sit at fixed, computable offsets:
+
+    header        magic b'RW', version, flags, timestamp (ms), confidence,
+                  validation confidence, intent/entity/missing-item counts
+    string refs   conversation id, error, error message, summary and two
+                  JSON 'extra' blobs for keys outside the schema
+    intents       packed (name ref, float64 confidence) rows
+    entities      packed (name ref, label ref, float64 confidence) rows
+    missing       packed validation missing-item refs
+    strings       one UTF-8 blob; every string (repeated labels and
+                  intent names are stored once) is an (offset, length) ref
+
+`ResultView` reads fields straight from the received buffer through a
+memoryview: checking the status, an intent's confidence or whether an
+intent is present decodes nothing else, and strings are only decoded when
+they are read. It is a read-only Mapping, so code that indexes task
+results (`result['status']`) works on it unchanged; `to_dict()` decodes in
+full.
+
+`dumps`/`loads` wrap records in a small tagged encoding for arbitrary
+JSON-like values (Celery task messages and result metadata), so that
+`register_kombu_serializer()` can install the format as a Celery
+task/result serializer. Views returned by `loads` are re-encoded by
+copying their bytes, so a chord callback forwarding results never
+re-serializes them.
+"""
+
+import json
+import struct
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+
+MAGIC = b'RW'
+WIRE_VERSION = 1
+CONTENT_TYPE = 'application/x-requirements-wire'
+SERIALIZER_NAME = 'requirements-wire'
+
+# Flag bits
+_FAILED = 1
+_COMPLETE = 2
+_VALIDATED = 4
+_HAS_REQUIREMENTS = 8
+
+# magic, version, flags, timestamp (ms), confidence, validation confidence,
+# intent count, entity count, missing item count
+_HEADER = struct.Struct('<2sBBqddIIH')
+# conversation id, error, error message, summary, result extra, requirements extra
+_REF = struct.Struct('<II')
+_STRING_FIELDS = 6
+_INTENT = struct.Struct('<IId')
+_ENTITY = struct.Struct('<IIIId')
+# Offset of a None string (an empty string is a zero-length ref)
+_NONE = 0xFFFFFFFF
+
+_RESULT_KEYS = frozenset(('conversation_id', 'status', 'error', 'error_message', 'requirements', 'confidence', 'validation'))
+_REQUIREMENT_KEYS = frozenset(('summary', 'intents', 'entities', 'confidence'))
+_VALIDATION_KEYS = frozenset(('is_complete', 'missing_items', 'confidence'))
+_INTENT_KEYS = frozenset(('name', 'confidence'))
+_ENTITY_KEYS = frozenset(('name', 'confidence', 'label'))
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+
+class _Unfit(Exception):
+    """A result-like dict that would not round-trip through the record schema"""
+
+
+@lru_cache(maxsize=256)
+def _layout(intents: int, entities: int, missing: int) -> struct.Struct:
+    """Whole fixed-size part of a record (header to missing items) as one struct"""
+    body = 'II' * _STRING_FIELDS + 'IId' * intents + 'IIIId' * entities + 'II' * missing
+    return struct.Struct(_HEADER.format + body)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _extra(data: Dict[str, Any], known: frozenset, strict: bool) -> Optional[str]:
+    """JSON of the keys outside the schema, so they survive the round trip"""
+    if data.keys() <= known:
+        return None
+    extra = {key: value for key, value in data.items() if key not in known}
+    try:
+        encoded = json.dumps(extra, ensure_ascii=False, separators=(',', ':'))
+    except (TypeError, ValueError):
+        if strict:
+            raise _Unfit from None
+        raise
+    if strict and json.loads(encoded) != extra:
+        # e.g. tuples or non-string keys, which JSON would change
+        raise _Unfit
+    return encoded
+
+
+def _encode_record(result: Dict[str, Any], timestamp_ms: Optional[int], strict: bool) -> bytes:
+    """
+    Encode one result; in strict mode raise _Unfit instead of coercing
+    anything that would decode to a different value
+    """
+    requirements = result.get('requirements') or {}
+    validation = result.get('validation')
+    failed = result.get('status') == 'failed'
+    conversation_id = result.get('conversation_id')
+    if strict:
+        if (
+            result.get('status') not in ('success', 'failed')
+            or not isinstance(result.get('requirements'), dict)
+            or not _is_number(result.get('confidence'))
+            or failed != ('error' in result) or failed != ('error_message' in result)
+            or 'conversation_id' not in result
+            or not (conversation_id is None or isinstance(conversation_id, str))
+        ):
+            raise _Unfit
+        if requirements and not (
+            requirements.keys() >= _REQUIREMENT_KEYS
+            and _is_number(requirements['confidence'])
+            and isinstance(requirements['intents'], list) and isinstance(requirements['entities'], list)
+        ):
+            raise _Unfit
+        if validation is not None and not (
+            isinstance(validation, dict) and validation.keys() == _VALIDATION_KEYS
+            and isinstance(validation['is_complete'], bool) and _is_number(validation['confidence'])
+            and isinstance(validation['missing_items'], list)
+        ):
+            raise _Unfit
+    elif conversation_id is not None:
+        conversation_id = str(conversation_id)
+
+    blob: List[bytes] = []
+    refs: Dict[str, Tuple[int, int]] = {}
+    size = 0
+
+    def ref(value: Optional[str]) -> Tuple[int, int]:
+        # Equal strings (repeated labels and names) share one ref
+        nonlocal size
+        if value is None:
+            return _NONE, 0
+        if strict and type(value) is not str:
+            raise _Unfit
+        found = refs.get(value)
+        if found is None:
+            data = value.encode('utf-8')
+            found = refs[value] = (size, len(data))
+            blob.append(data)
+            size += len(data)
+        return found
+
+    intents = requirements.get('intents') or ()
+    entities = requirements.get('entities') or ()
+    missing = validation.get('missing_items', ()) if validation is not None else ()
+    flags = _FAILED if failed else 0
+    if requirements:
+        flags |= _HAS_REQUIREMENTS
+    if validation is not None:
+        flags |= _VALIDATED
+        if validation.get('is_complete'):
+            flags |= _COMPLETE
+    values: List[Any] = [
+        MAGIC, WIRE_VERSION, flags,
+        int(time.time() * 1000) if timestamp_ms is None else timestamp_ms,
+        result.get('confidence', 0.0),
+        validation.get('confidence', 0.0) if validation is not None else 0.0,
+        len(intents), len(entities), len(missing),
+    ]
+    values.extend(ref(conversation_id))
+    values.extend(ref(result.get('error')))
+    values.extend(ref(result.get('error_message')))
+    values.extend(ref(requirements.get('summary')))
+    values.extend(ref(_extra(result, _RESULT_KEYS, strict)))
+    values.extend(ref(_extra(requirements, _REQUIREMENT_KEYS, strict) if requirements else None))
+    for intent in intents:
+        if type(intent) is dict:
+            if strict and not (intent.keys() == _INTENT_KEYS and _is_number(intent['confidence'])):
+                raise _Unfit
+            values.extend(ref(intent['name']))
+            values.append(intent.get('confidence', 0.0))
+        elif strict:
+            raise _Unfit
+        else:
+            values.extend(ref(intent.name))
+            values.append(intent.confidence)
+    for entity in entities:
+        if type(entity) is dict:
+            if strict and not (
+                _INTENT_KEYS <= entity.keys() <= _ENTITY_KEYS and _is_number(entity['confidence'])
+                and ('label' not in entity or isinstance(entity['label'], str))
+            ):
+                raise _Unfit
+            values.extend(ref(entity['name']))
+            values.extend(ref(entity.get('label')))
+            values.append(entity.get('confidence', 0.0))
+        elif strict:
+            raise _Unfit
+        else:
+            values.extend(ref(entity.name))
+            values.extend(ref(entity.label))
+            values.append(entity.confidence)
+    for item in missing:
+        values.extend(ref(item))
+    try:
+        fixed = _layout(len(intents), len(entities), len(missing)).pack(*values)
+    except struct.error:
+        if strict:
+            raise _Unfit from None
+        raise
+    blob.insert(0, fixed)
+    return b''.join(blob)
+
+
+def encode_result(result: Dict[str, Any], timestamp_ms: Optional[int] = None) -> bytes:
+    """
+    Encode one analysis result (see analyzer.analysis_result)
+
+    Args:
+        result: Result dict; intents/entities may be Intent/Entity objects
+            or their serialized dicts, and it may carry a 'validation'
+        timestamp_ms: Record time, defaults to now
+
+    Returns:
+        The encoded record
+    """
+    return _encode_record(result, timestamp_ms, strict=False)
+
+
+def encode_analysis(analysis: Dict[str, Any], timestamp_ms: Optional[int] = None) -> bytes:
+    """Encode a bare analysis (what analyze_requirements returns); read it back with `ResultView.analysis()`"""
+    return encode_result({'requirements': analysis, 'confidence': analysis.get('confidence', 0.0)}, timestamp_ms)
+
+
+def is_record(data: Union[BytesLike, str]) -> bool:
+    """True if `data` starts like an encoded record (as opposed to e.g. legacy JSON)"""
+    return not isinstance(data, str) and bytes(data[:2]) == MAGIC
+
+
+class ResultView(Mapping):
+    """
+    Lazy, read-only view of an encoded result
+
+    Scalars are unpacked on access and strings decoded on access; nothing
+    is cached, so keep the decoded value if a field is read in a loop.
+    """
+
+    __slots__ = ('_view', '_flags', '_counts', '_strings')
+
+    def __init__(self, data: BytesLike):
+        """
+        Raises:
+            ValueError: If `data` is not a record of a supported version or is truncated
+        """
+        view = memoryview(data).cast('B')
+        if len(view) < _HEADER.size:
+            raise ValueError("Truncated record header")
+        magic, version, flags, _, _, _, intents, entities, missing = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an analysis record")
+        if version != WIRE_VERSION:
+            raise ValueError(f"Unsupported wire version {version}")
+        strings = (
+            _HEADER.size + _STRING_FIELDS * _REF.size
+            + intents * _INTENT.size + entities * _ENTITY.size + missing * _REF.size
+        )
+        if len(view) < strings:
+            raise ValueError("Truncated record")
+        self._view = view
+        self._flags = flags
+        self._counts = (intents, entities, missing)
+        self._strings = strings
+
+    # -- raw access ---------------------------------------------------------
+
+    @property
+    def buffer(self) -> memoryview:
+        """The encoded record (no copy)"""
+        return self._view
+
+    def __bytes__(self) -> bytes:
+        return self._view.tobytes()
+
+    def _string(self, offset: int, size: int) -> Optional[str]:
+        if offset == _NONE:
+            return None
+        start = self._strings + offset
+        return str(self._view[start:start + size], 'utf-8')
+
+    def _ref(self, index: int) -> Optional[str]:
+        return self._string(*_REF.unpack_from(self._view, _HEADER.size + index * _REF.size))
+
+    def _section(self, index: int) -> int:
+        """Start offset of the intents (0), entities (1) or missing items (2) rows"""
+        offset = _HEADER.size + _STRING_FIELDS * _REF.size
+        if index > 0:
+            offset += self._counts[0] * _INTENT.size
+        if index > 1:
+            offset += self._counts[1] * _ENTITY.size
+        return offset
+
+    # -- scalar fields ------------------------------------------------------
+
+    @property
+    def timestamp_ms(self) -> int:
+        return _HEADER.unpack_from(self._view, 0)[3]
+
+    @property
+    def confidence(self) -> float:
+        return _HEADER.unpack_from(self._view, 0)[4]
+
+    @property
+    def failed(self) -> bool:
+        return bool(self._flags & _FAILED)
+
+    @property
+    def status(self) -> str:
+        return 'failed' if self._flags & _FAILED else 'success'
+
+    @property
+    def is_validated(self) -> bool:
+        return bool(self._flags & _VALIDATED)
+
+    @property
+    def is_complete(self) -> bool:
+        return bool(self._flags & _COMPLETE)
+
+    @property
+    def conversation_id(self) -> Optional[str]:
+        return self._ref(0)
+
+    @property
+    def error(self) -> Optional[str]:
+        return self._ref(1)
+
+    @property
+    def error_message(self) -> Optional[str]:
+        return self._ref(2)
+
+    @property
+    def summary(self) -> Optional[str]:
+        return self._ref(3)
+
+    # -- packed lists -------------------------------------------------------
+
+    @property
+    def intent_count(self) -> int:
+        return self._counts[0]
+
+    @property
+    def entity_count(self) -> int:
+        return self._counts[1]
+
+    def intent(self, index: int) -> Tuple[str, float]:
+        """(name, confidence) of the index-th intent"""
+        if not 0 <= index < self._counts[0]:
+            raise IndexError(index)
+        offset, size, confidence = _INTENT.unpack_from(self._view, self._section(0) + index * _INTENT.size)
+        return self._string(offset, size), confidence
+
+    def entity(self, index: int) -> Tuple[str, float, Optional[str]]:
+        """(name, confidence, label) of the index-th entity"""
+        if not 0 <= index < self._counts[1]:
+            raise IndexError(index)
+        offset, size, label_offset, label_size, confidence = _ENTITY.unpack_from(
+            self._view, self._section(1) + index * _ENTITY.size,
+        )
+        return self._string(offset, size), confidence, self._string(label_offset, label_size)
+
+    def intent_confidence(self, name: str) -> Optional[float]:
+        """Confidence of intent `name` (None if absent), comparing raw bytes only"""
+        target = name.encode('utf-8')
+        view = self._view
+        strings = self._strings
+        for offset, size, confidence in _INTENT.iter_unpack(view[self._section(0):self._section(1)]):
+            if size == len(target) and view[strings + offset:strings + offset + size] == target:
+                return confidence
+        return None
+
+    def has_intent(self, name: str) -> bool:
+        return self.intent_confidence(name) is not None
+
+    def intents(self) -> List[Dict[str, Any]]:
+        """Intents as serialized dicts ({'name', 'confidence'})"""
+        return [
+            {'name': self._string(offset, size), 'confidence': confidence}
+            for offset, size, confidence in _INTENT.iter_unpack(self._view[self._section(0):self._section(1)])
+        ]
+
+    def entities(self) -> List[Dict[str, Any]]:
+        """Entities as serialized dicts (with 'label' when they have one)"""
+        entities = []
+        for offset, size, label_offset, label_size, confidence in _ENTITY.iter_unpack(self._view[self._section(1):self._section(2)]):
+            entity = {'name': self._string(offset, size), 'confidence': confidence}
+            if label_offset != _NONE:
+                entity['label'] = self._string(label_offset, label_size)
+            entities.append(entity)
+        return entities
+
+    # -- composite fields ---------------------------------------------------
+
+    @property
+    def validation(self) -> Optional[Dict[str, Any]]:
+        if not self._flags & _VALIDATED:
+            return None
+        missing = self._view[self._section(2):self._strings]
+        return {
+            'is_complete': bool(self._flags & _COMPLETE),
+            'missing_items': [self._string(offset, size) for offset, size in _REF.iter_unpack(missing)],
+            'confidence': _HEADER.unpack_from(self._view, 0)[5],
+        }
+
+    def requirements(self) -> Dict[str, Any]:
+        """The serialized analysis ({} for failures without one)"""
+        if not self._flags & _HAS_REQUIREMENTS:
+            return {}
+        requirements = {
+            'summary': self.summary,
+            'intents': self.intents(),
+            'entities': self.entities(),
+            'confidence': self.confidence,
+        }
+        extra = self._ref(5)
+        if extra is not None:
+            requirements.update(json.loads(extra))
+        return requirements
+
+    def analysis(self) -> Dict[str, Any]:
+        """The analysis with Intent/Entity objects, as analyze_requirements returns it"""
+        from .analyzer import deserialize_analysis
+
+        return deserialize_analysis(self.requirements())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Decode the whole result (one unpack of the fixed part, each string decoded once)"""
+        view = self._view
+        base = self._strings
+        intent_count, entity_count, missing_count = self._counts
+        values = _layout(intent_count, entity_count, missing_count).unpack_from(view, 0)
+        flags, confidence, validation_confidence = values[2], values[4], values[5]
+        decoded: Dict[int, str] = {}
+
+        def string(offset: int, size: int) -> Optional[str]:
+            if offset == _NONE:
+                return None
+            if not size:
+                return ''
+            value = decoded.get(offset)
+            if value is None:
+                value = decoded[offset] = str(view[base + offset:base + offset + size], 'utf-8')
+            return value
+
+        refs = [string(values[index], values[index + 1]) for index in range(9, 9 + 2 * _STRING_FIELDS, 2)]
+        result: Dict[str, Any] = {'conversation_id': refs[0], 'status': 'failed' if flags & _FAILED else 'success'}
+        if flags & _FAILED:
+            result['error'] = refs[1]
+            result['error_message'] = refs[2]
+        requirements: Dict[str, Any] = {}
+        position = 9 + 2 * _STRING_FIELDS
+        if flags & _HAS_REQUIREMENTS:
+            intents = []
+            for _ in range(intent_count):
+                intents.append({'name': string(values[position], values[position + 1]), 'confidence': values[position + 2]})
+                position += 3
+            entities = []
+            for _ in range(entity_count):
+                entity = {'name': string(values[position], values[position + 1]), 'confidence': values[position + 4]}
+                if values[position + 2] != _NONE:
+                    entity['label'] = string(values[position + 2], values[position + 3])
+                entities.append(entity)
+                position += 5
+            requirements = {'summary': refs[3], 'intents': intents, 'entities': entities, 'confidence': confidence}
+            if refs[5] is not None:
+                requirements.update(json.loads(refs[5]))
+        else:
+            position += 3 * intent_count + 5 * entity_count
+        result['requirements'] = requirements
+        result['confidence'] = confidence
+        if flags & _VALIDATED:
+            result['validation'] = {
+                'is_complete': bool(flags & _COMPLETE),
+                'missing_items': [string(values[index], values[index + 1]) for index in range(position, position + 2 * missing_count, 2)],
+                'confidence': validation_confidence,
+            }
+        if refs[4] is not None:
+            result.update(json.loads(refs[4]))
+        return result
+
+    # -- Mapping ------------------------------------------------------------
+
+    def __iter__(self) -> Iterator[str]:
+        yield 'conversation_id'
+        yield 'status'
+        if self._flags & _FAILED:
+            yield 'error'
+            yield 'error_message'
+        yield 'requirements'
+        yield 'confidence'
+        if self._flags & _VALIDATED:
+            yield 'validation'
+        extra = self._ref(4)
+        if extra is not None:
+            yield from json.loads(extra)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'conversation_id':
+            return self.conversation_id
+        if key == 'status':
+            return self.status
+        if key == 'requirements':
+            return self.requirements()
+        if key == 'confidence':
+            return self.confidence
+        if key in ('error', 'error_message') and self._flags & _FAILED:
+            return self.error if key == 'error' else self.error_message
+        if key == 'validation' and self._flags & _VALIDATED:
+            return self.validation
+        extra = self._ref(4)
+        if extra is not None:
+            values = json.loads(extra)
+            if key in values:
+                return values[key]
+        raise KeyError(key)
+
+    def __repr__(self) -> str:
+        return (
+            f"ResultView(conversation_id={self.conversation_id!r}, status={self.status!r}, "
+            f"intents={self.intent_count}, entities={self.entity_count}, bytes={len(self._view)})"
+        )
+
+
+# Tags of the generic value encoding
+_T_NONE = b'N'
+_T_TRUE = b'T'
+_T_FALSE = b'F'
+_T_INT = b'i'
+_T_BIGINT = b'I'
+_T_FLOAT = b'd'
+_T_STR = b's'
+_T_BYTES = b'b'
+_T_LIST = b'l'
+_T_MAP = b'm'
+_T_DATETIME = b't'
+_T_RECORD = b'R'
+
+_LENGTH = struct.Struct('<I')
+_INT64 = struct.Struct('<q')
+_FLOAT64 = struct.Struct('<d')
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def _encode_value(value: Any, parts: List[bytes]) -> None:
+    if value is None:
+        parts.append(_T_NONE)
+    elif value is True:
+        parts.append(_T_TRUE)
+    elif value is False:
+        parts.append(_T_FALSE)
+    elif isinstance(value, int):
+        if _INT64_MIN <= value <= _INT64_MAX:
+            parts.append(_T_INT + _INT64.pack(value))
+        else:
+            data = str(value).encode('ascii')
+            parts.append(_T_BIGINT + _LENGTH.pack(len(data)) + data)
+    elif isinstance(value, float):
+        parts.append(_T_FLOAT + _FLOAT64.pack(value))
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        parts.append(_T_STR + _LENGTH.pack(len(data)))
+        parts.append(data)
+    elif isinstance(value, ResultView):
+        parts.append(_T_RECORD + _LENGTH.pack(len(value.buffer)))
+        parts.append(value.buffer.tobytes())
+    elif isinstance(value, dict):
+        if 'requirements' in value and 'status' in value:
+            try:
+                record = _encode_record(value, 0, strict=True)
+            except _Unfit:
+                pass
+            else:
+                parts.append(_T_RECORD + _LENGTH.pack(len(record)))
+                parts.append(record)
+                return
+        parts.append(_T_MAP + _LENGTH.pack(len(value)))
+        for key, item in value.items():
+            _encode_value(key, parts)
+            _encode_value(item, parts)
+    elif isinstance(value, (list, tuple)):
+        # Tuples come back as lists, as with JSON
+        parts.append(_T_LIST + _LENGTH.pack(len(value)))
+        for item in value:
+            _encode_value(item, parts)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        parts.append(_T_BYTES + _LENGTH.pack(len(data)))
+        parts.append(data)
+    elif isinstance(value, datetime):
+        data = value.isoformat().encode('ascii')
+        parts.append(_T_DATETIME + _LENGTH.pack(len(data)))
+        parts.append(data)
+    else:
+        raise TypeError(f"Cannot encode {type(value).__name__} in the wire format")
+
+
+def dumps(value: Any) -> bytes:
+    """
+    Encode a JSON-like value; result-shaped dicts inside it become records
+
+    Raises:
+        TypeError: For values other than None, bool, int, float, str, bytes,
+            list/tuple, dict, datetime and ResultView
+    """
+    parts: List[bytes] = []
+    _encode_value(value, parts)
+    return b''.join(parts)
+
+
+def _decode_value(view: memoryview, offset: int, lazy: bool) -> Tuple[Any, int]:
+    tag = view[offset:offset + 1].tobytes()
+    offset += 1
+    if tag == _T_NONE:
+        return None, offset
+    if tag == _T_TRUE:
+        return True, offset
+    if tag == _T_FALSE:
+        return False, offset
+    if tag == _T_INT:
+        return _INT64.unpack_from(view, offset)[0], offset + _INT64.size
+    if tag == _T_FLOAT:
+        return _FLOAT64.unpack_from(view, offset)[0], offset + _FLOAT64.size
+    if tag in (_T_LIST, _T_MAP):
+        (count,) = _LENGTH.unpack_from(view, offset)
+        offset += _LENGTH.size
+        if tag == _T_LIST:
+            items = []
+            for _ in range(count):
+                item, offset = _decode_value(view, offset, lazy)
+                items.append(item)
+            return items, offset
+        mapping = {}
+        for _ in range(count):
+            key, offset = _decode_value(view, offset, lazy)
+            mapping[key], offset = _decode_value(view, offset, lazy)
+        return mapping, offset
+    (size,) = _LENGTH.unpack_from(view, offset)
+    start = offset + _LENGTH.size
+    end = start + size
+    if end > len(view):
+        raise ValueError("Truncated value")
+    data = view[start:end]
+    if tag == _T_STR:
+        return str(data, 'utf-8'), end
+    if tag == _T_RECORD:
+        record = ResultView(data)
+        return (record if lazy else record.to_dict()), end
+    if tag == _T_BYTES:
+        return data.tobytes(), end
+    if tag == _T_BIGINT:
+        return int(str(data, 'ascii')), end
+    if tag == _T_DATETIME:
+        return datetime.fromisoformat(str(data, 'ascii')), end
+    raise ValueError(f"Unknown wire tag {tag!r}")
+
+
+def loads(data: BytesLike, lazy: bool = True) -> Any:
+    """
+    Inverse of `dumps`
+
+    Args:
+        data: Encoded value
+        lazy: Return records as ResultView over `data` (kept alive by the
+            view) instead of decoding them to dicts
+
+    Raises:
+        ValueError: On unknown tags or truncated data
+    """
+    view = memoryview(data).cast('B')
+    try:
+        value, offset = _decode_value(view, 0, lazy)
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Truncated value: {e}") from e
+    if offset != len(view):
+        raise ValueError("Trailing bytes after value")
+    return value
+
+
+def register_kombu_serializer() -> None:
+    """
+    Register the format with kombu as SERIALIZER_NAME
+
+    Enable it in the Celery app with
+    `task_serializer = result_serializer = 'requirements-wire'` and add it
+    to `accept_content`/`result_accept_content`. Task results then come
+    back as ResultView objects (read-only Mappings; `dict(result)` or
+    `result.to_dict()` for a plain dict).
+    """
+    from kombu.serialization import register
+
+    register(SERIALIZER_NAME, dumps, loads, content_type=CONTENT_TYPE, content_encoding='binary')